@@ -1,62 +1,442 @@
 """API routes for the application
 
 This module contains all the API endpoints for user authentication, data retrieval,
-and statistics calculation
+and statistics calculation. Handlers run on the event loop; data loading and
+window computation go to the bounded compute pool and user-store access to
+the I/O threads (see ``app.services.executor``).
 """
 
-from fastapi import APIRouter, Body
-from app.services.data_loader import load_certain_data
+from typing import Awaitable, Callable, Dict, Hashable, List, Literal, Tuple
+from fastapi import (
+    APIRouter, Body, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from app.services.data_loader import (
+    dataset_version, delta_frame, downsampled_window_frame, get_dataset, get_generated_dataset,
+    get_user_columns, get_user_pyramid, get_user_rolling, get_user_rollups, window_frame
+)
+from app.services.dataset_cache import dataset_cache
+from app.models.dataset import Dataset
 from app.models.user import UserRegister, UserLogin, UserOut
+from app.models.ingest import IngestBatch
+from app.models.playback import PlaybackSubscribe, TickRequest, TickOut
+from app.models.simulation import AlertSubscribe, SessionCreate, SessionUpdate
+from app.models.stats import BulkStatsRequest
 from app.services.auth import register_user, login_user
+from app.services.executor import SingleFlight, run_compute, run_io
+from app.services.ingest import get_ingest_store
+from app.services.instrumentation import is_enabled, metrics, profiles
+from app.services.last_viewed import get_last_viewed_buffer
+from app.services.playback import PlaybackCursor, stream_playback
+from app.services.pyramid_cache import pyramid_cache
+from app.services.simulation import (
+    THRESHOLD_NAMES, SessionLimitError, alert_hub, get_simulation_engine, stream_alerts
+)
+from app.services.synthetic_source import SYNTHETIC_USERS, synthetic_source
+from app.services.response_cache import (
+    CachedResponse, cached_response, etag_matches, make_etag, not_modified_response, response_cache
+)
 from app.services.timestamps import get_last_viewed, update_last_viewed
-from app.utils.stats import update_stats
-from app.utils.timeparser import last_x
+from app.utils.serialization import (
+    COLUMNAR_JSON, SERIES_BINARY, encode_columnar_json, encode_series_binary, negotiate_media_type
+)
+from app.utils.downsample import MIN_POINTS, DownsamplePyramid
+from app.utils.instrumentation import instrumented
+from app.utils.rolling import RollingIndex
+from app.utils.rollups import (
+    ambulatory_glucose_profile, hour_of_day_histograms, summarize_window, time_in_ranges
+)
+from app.utils.stats import bulk_window_stats, cohort_summary, window_stats
+from app.utils.timeparser import TIME_INTERVALS, precise_day_bounds, window_bounds
 
 router = APIRouter()
 
+UserData = Tuple[Dict[str, np.ndarray], RollingIndex]
+
+_user_loads = SingleFlight()
+_response_loads = SingleFlight()
+
+def _load_user(user_id: int, real_data: bool, time_mod: str | None,
+               last_date: str | None) -> UserData:
+    """Load the column arrays and the rolling index of a user"""
+    return (get_user_columns(user_id, real_data, time_mod, last_date),
+            get_user_rolling(user_id, real_data, time_mod, last_date))
+
+async def _user_data(user_id: int, real_data: bool, time_mod: str | None = None,
+                     last_date: str | None = None) -> UserData:
+    """Load a user's data on the compute pool, sharing concurrent loads of the same user
+    Generated synthetic users are materialized for the window ``time_mod``
+    and ``last_date`` (see ``get_user_dataset``); without them the whole series
+    is loaded.
+    """
+    return await _user_loads.do(
+        (user_id, real_data, time_mod, last_date),
+        lambda: run_compute(_load_user, user_id, real_data, time_mod, last_date)
+    )
+
+async def _cached(key: Hashable, real_data: bool, if_none_match: str | None,
+                  compute: Callable[[], Awaitable[Response]]) -> Response:
+    """Answer a window query from the response cache
+    The key is extended with the dataset version. A client copy with the same
+    ETag gets 304 without any lookup; concurrent misses of one key share a
+    single computation.
+    Args:
+        key (Hashable): Query parameters that determine the response
+        real_data (bool): Whether the query reads the real or synthetic dataset
+        if_none_match (str | None): ``If-None-Match`` header of the request
+        compute (Callable[[], Awaitable[Response]]): Builds the response on a miss
+    Returns:
+        Response: Cached bytes with ``ETag`` and ``Cache-Control``, or 304
+    """
+    key = (key, dataset_version(real_data))
+    etag = make_etag(key)
+    if etag_matches(if_none_match, etag):
+        response_cache.record_not_modified()
+        return not_modified_response(etag)
+
+    cached = response_cache.get(key)
+    if cached is None:
+        async def fill() -> CachedResponse:
+            response = await compute()
+            entry = CachedResponse(bytes(response.body), response.media_type)
+            response_cache.put(key, entry)
+            return entry
+        cached = await _response_loads.do(key, fill)
+    return cached_response(cached, etag)
+
+@instrumented("serialization.glucose")
+def _series_response(window_data: pd.DataFrame, media_type: str) -> Response:
+    """Encode a glucose window in the negotiated media type
+    Args:
+        window_data (pd.DataFrame): Window with ``timestamps`` and ``glucose`` columns
+        media_type (str): Media type returned by ``negotiate_media_type``; binary
+            series with gaps longer than ~24.8 days are encoded as columnar JSON
+    Returns:
+        Response: Pre-encoded response
+    """
+    timestamps = window_data["timestamps"].to_numpy()
+    glucose = window_data["glucose"].to_numpy()
+    if media_type == SERIES_BINARY:
+        try:
+            content = encode_series_binary(timestamps, glucose)
+        except ValueError:
+            # Gaps the int32 deltas cannot hold are answered as columnar JSON
+            media_type = COLUMNAR_JSON
+    if media_type == COLUMNAR_JSON:
+        content = encode_columnar_json(timestamps, {"glucose": glucose})
+    elif media_type != SERIES_BINARY:
+        if np.isnan(glucose).any():
+            # Missing readings, e.g. ingested without glucose, are encoded as null
+            window_data = window_data.astype(object).where(window_data.notna(), None)
+        return JSONResponse(content=jsonable_encoder(window_data.to_dict("records")),
+                            headers={"Vary": "Accept"})
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
+def _compute_stats(user: UserData, time_mod: str, last_date: str | None) -> list:
+    """Calculate the formatted statistics of a window"""
+    partition, rolling = user
+    start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+    return window_stats(rolling, start, end, time_mod)
+
+def _stats_response(user: UserData, time_mod: str, last_date: str | None) -> Response:
+    """Calculate and encode the statistics of a window"""
+    return JSONResponse(content=jsonable_encoder({"stats": _compute_stats(user, time_mod,
+                                                                          last_date)}))
+
+def _analytics_window(user: UserData, time_mod: str, last_date: str | None) -> Tuple[int, int]:
+    """Row range of a window with the day boundaries of the statistics"""
+    partition, rolling = user
+    start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+    return precise_day_bounds(rolling.days, rolling.day_changes, start, end, time_mod)
+
+def _window_span(partition: Dict[str, np.ndarray], start: int, end: int) -> dict:
+    """First and last timestamp of a window, None for an empty window"""
+    if start >= end:
+        return {"window_start": None, "window_end": None}
+    times = partition["time"]
+    return {"window_start": pd.Timestamp(times[start]).isoformat(),
+            "window_end": pd.Timestamp(times[end - 1]).isoformat()}
+
+def _tir_response(user: UserData, user_id: int, real_data: bool, time_mod: str,
+                  last_date: str | None) -> Response:
+    """Calculate and encode time in ranges of a window from the rollups"""
+    partition, _ = user
+    start, end = _analytics_window(user, time_mod, last_date)
+    summary = summarize_window(get_user_rollups(user_id, real_data, time_mod, last_date),
+                               partition["glucose"],
+                               start, end)
+    return JSONResponse(content={"time_mod": time_mod, **_window_span(partition, start, end),
+                                 **time_in_ranges(summary)})
+
+def _agp_response(user: UserData, user_id: int, real_data: bool, time_mod: str,
+                  last_date: str | None) -> Response:
+    """Calculate and encode the ambulatory glucose profile of a window from the rollups"""
+    partition, _ = user
+    start, end = _analytics_window(user, time_mod, last_date)
+    histograms = hour_of_day_histograms(get_user_rollups(user_id, real_data, time_mod, last_date),
+                                        partition["time"].view("i8"), partition["glucose"],
+                                        start, end)
+    return JSONResponse(content={"time_mod": time_mod, **_window_span(partition, start, end),
+                                 "hours": ambulatory_glucose_profile(histograms)})
+
+def _bulk_groups(user_ids: List[int], real_data: bool, time_mod: str,
+                 last_date: str | None) -> List[Tuple[Dataset, List[int]]]:
+    """Group requested users by the dataset holding them
+    Synthetic users missing from the stored dataset are generated for the
+    window together, as one dataset, so their statistics are computed in one
+    pass like those of stored users.
+    Args:
+        user_ids (List[int]): Requested user IDs
+        real_data (bool): Whether to use the real or synthetic dataset
+        time_mod (str): Time window of the statistics
+        last_date (str | None): End of the window
+    Returns:
+        List[Tuple[Dataset, List[int]]]: Datasets with the request positions of their users
+    Raises:
+        HTTPException: If some user IDs are out of range
+    """
+    dataset = get_dataset(real_data)
+    stored, generated, missing = [], [], []
+    for position, user_id in enumerate(user_ids):
+        if dataset.has_user(user_id):
+            stored.append(position)
+        elif not real_data and 0 <= user_id < SYNTHETIC_USERS:
+            generated.append(position)
+        else:
+            missing.append(user_id)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Users not found: {missing}")
+    groups = [(dataset, stored)] if stored else []
+    if generated:
+        groups.append((get_generated_dataset([user_ids[i] for i in generated], time_mod,
+                                             last_date), generated))
+    return groups
+
+def _compute_bulk_stats(request: BulkStatsRequest) -> dict:
+    """Calculate numeric per-user statistics and cohort aggregates"""
+    if request.user_ids == "all":
+        user_ids = sorted(get_dataset(request.real_data).offsets)
+    else:
+        user_ids = list(request.user_ids)
+
+    # An empty request still yields an (empty) frame with the statistic columns
+    groups = _bulk_groups(user_ids, request.real_data, request.time_mod,
+                          request.last_date) or [(get_dataset(request.real_data), [])]
+    parts = []
+    for dataset, positions in groups:
+        bounds = np.array([dataset.offsets[user_ids[i]] for i in positions],
+                          dtype=np.int64).reshape(-1, 2)
+        part = bulk_window_stats(dataset.rolling, dataset.columns["time"].view("i8"),
+                                 bounds[:, 0], bounds[:, 1], request.time_mod, request.last_date)
+        parts.append(part.set_axis(positions))
+    stats = pd.concat(parts).sort_index()
+    users = stats.astype(object).where(stats.notna(), None)
+    users.insert(0, "user_id", user_ids)
+    return {
+        "time_mod": request.time_mod,
+        "last_date": request.last_date,
+        "users": users.to_dict("records"),
+        "cohort": cohort_summary(stats),
+    }
+
+def _compute_glucose(user: UserData, time_mod: str, last_date: str | None, media_type: str,
+                     pyramid: DownsamplePyramid | None = None, max_points: int | None = None,
+                     method: str = "lttb") -> Response:
+    """Slice, optionally downsample, and encode a glucose window"""
+    if pyramid is None or max_points is None:
+        window_data = window_frame(user[0], ("glucose",), time_mod, last_date)
+    else:
+        window_data = downsampled_window_frame(user[0], pyramid, ("glucose",), time_mod,
+                                               last_date, max_points, method)
+    return _series_response(window_data, media_type)
+
+def _live_user(user_id: int, last_date: str | None) -> Tuple[UserData, str]:
+    """Snapshot the live buffer of a user; windows end at the newest reading by default"""
+    try:
+        user = get_ingest_store().snapshot(user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    if last_date is None:
+        last_date = pd.Timestamp(user[0]["time"][-1]).isoformat()
+    return user, last_date
+
+def _live_stats_response(user_id: int, time_mod: str, last_date: str | None) -> Response:
+    """Calculate and encode the statistics of a window of the live buffer"""
+    user, last_date = _live_user(user_id, last_date)
+    return _stats_response(user, time_mod, last_date)
+
+def _live_glucose_response(user_id: int, time_mod: str, last_date: str | None, media_type: str,
+                           max_points: int | None, method: str) -> Response:
+    """Slice, optionally downsample, and encode a glucose window of the live buffer"""
+    user, last_date = _live_user(user_id, last_date)
+    pyramid = None
+    if max_points is not None:
+        partition = user[0]
+        pyramid = DownsamplePyramid(partition["time"].view("i8"), partition["glucose"])
+    return _compute_glucose(user, time_mod, last_date, media_type, pyramid, max_points, method)
+
+def _ingest_batch(batch: IngestBatch) -> dict:
+    """Convert a batch of readings to arrays and append it to the live buffers"""
+    times = pd.DatetimeIndex(pd.to_datetime(batch.time, format="ISO8601"))
+    if times.tz is not None:
+        times = times.tz_localize(None)
+    n_readings = len(batch.user_id)
+
+    def column(values: list | None) -> np.ndarray:
+        if values is None:
+            return np.full(n_readings, np.nan)
+        return np.array(values, dtype=np.float64)
+
+    return get_ingest_store().ingest(np.array(batch.user_id, dtype=np.int64),
+                                     times.asi8, column(batch.glucose),
+                                     column(batch.heart_rate), column(batch.steps))
+
+def _compute_delta(user: UserData, time_mod: str, last_date: str | None,
+                   since: str | None) -> dict:
+    """Slice the part of a glucose window after a client cursor"""
+    records, window_start, window_end = delta_frame(user[0], ("glucose",), time_mod,
+                                                    last_date, since)
+    return {
+        "window_start": window_start,
+        "window_end": window_end,
+        "records": records.to_dict("records")
+    }
+
 @router.post("/register", response_model=UserOut)
-def register(user: UserRegister) -> UserOut:
+async def register(user: UserRegister) -> UserOut:
     """Register a new user
     Args:
         user (UserRegister): User registration data
     Returns:
         UserOut: Registered user information
     """
-    return register_user(user)
+    return await run_io(register_user, user)
 
 @router.post("/login", response_model=UserOut)
-def login(user: UserLogin) -> UserOut:
+async def login(user: UserLogin) -> UserOut:
     """Authenticate and login a user
     Args:
         user (UserLogin): User login credentials
     Returns:
         UserOut: Authenticated user information
     """
-    return login_user(user)
+    return await run_io(login_user, user)
 
 @router.get("/api/stats/{user_id}")
-def get_stats(
+async def get_stats(
     user_id: int,
     real_data: bool,
     time_mod: str = "1h",
-    last_date: str | None = None
+    last_date: str | None = None,
+    live: bool = False,
+    if_none_match: str | None = Header(None)
 ) -> dict:
     """Get statistics for a specific user
+    Responses are cached and carry an ``ETag``; a matching ``If-None-Match``
+    gets 304. With ``live`` the window is read from the user's ingested
+    readings (see ``app.services.ingest``) and not cached.
     Args:
         user_id (int): ID of the user
-        real_data (bool): Whether to use real or simulated data
+        real_data (bool): Whether to use real or simulated data; ignored with ``live``
         time_mod (str, optional): Time window for statistics. Defaults to "1h"
-        last_date (str | None, optional): Last date to consider. Defaults to None
+        last_date (str | None, optional): Last date to consider. Defaults to None,
+            with ``live`` the newest reading
+        live (bool, optional): Whether to read ingested readings. Defaults to False
+        if_none_match (str | None, optional): If-None-Match header. Defaults to None
     Returns:
         dict: Dictionary containing calculated statistics
+    Raises:
+        HTTPException: 404 with ``live`` if no readings of the user were ingested
     """
-    data = load_certain_data(user_id, "glucose", "heart_rate", "steps", real_data=real_data)
-    window_data = last_x(data, time_mod, last_date)
-    stats = update_stats(window_data, time_mod, last_date)
-    return {"stats": stats}
+    if live:
+        return await run_compute(_live_stats_response, user_id, time_mod, last_date)
+
+    async def compute() -> Response:
+        user = await _user_data(user_id, real_data, time_mod, last_date)
+        return await run_compute(_stats_response, user, time_mod, last_date)
+
+    key = ("stats", user_id, real_data, time_mod, last_date)
+    return await _cached(key, real_data, if_none_match, compute)
+
+@router.post("/api/stats/bulk")
+async def get_bulk_stats(request: BulkStatsRequest) -> dict:
+    """Get the statistics of many users in one request
+    The metrics of ``/api/stats`` are computed for all users in one
+    vectorized pass and returned as numbers (None where undefined), together
+    with time in ranges per user and aggregates over the cohort. Synthetic
+    users outside the stored dataset are generated like in ``/api/stats``.
+    Args:
+        request (BulkStatsRequest): Users, dataset and time window
+    Returns:
+        dict: Per-user statistics and cohort aggregates
+    Raises:
+        HTTPException: 404 listing the user IDs that are out of range
+    """
+    return await run_compute(_compute_bulk_stats, request)
+
+@router.get("/api/tir/{user_id}")
+async def get_time_in_range(
+    user_id: int,
+    real_data: bool,
+    time_mod: str = "14d",
+    last_date: str | None = None,
+    if_none_match: str | None = Header(None)
+) -> dict:
+    """Get time in glucose ranges and the glucose metrics of a window
+    Computed from the user's hourly and daily rollups, so long windows cost
+    O(days). The window has the day boundaries of ``/api/stats``. Responses
+    are cached and carry an ``ETag``; a matching ``If-None-Match`` gets 304.
+    Args:
+        user_id (int): ID of the user
+        real_data (bool): Whether to use real or simulated data
+        time_mod (str, optional): Time window. Defaults to "14d"
+        last_date (str | None, optional): Last date to consider. Defaults to None
+        if_none_match (str | None, optional): If-None-Match header. Defaults to None
+    Returns:
+        dict: Window bounds, readings, percentage per glucose range, mean, std,
+            CV, GMI, minimum, maximum and median
+    """
+    async def compute() -> Response:
+        user = await _user_data(user_id, real_data, time_mod, last_date)
+        return await run_compute(_tir_response, user, user_id, real_data, time_mod, last_date)
+
+    key = ("tir", user_id, real_data, time_mod, last_date)
+    return await _cached(key, real_data, if_none_match, compute)
+
+@router.get("/api/agp/{user_id}")
+async def get_ambulatory_glucose_profile(
+    user_id: int,
+    real_data: bool,
+    time_mod: str = "14d",
+    last_date: str | None = None,
+    if_none_match: str | None = Header(None)
+) -> dict:
+    """Get the ambulatory glucose profile of a window
+    The 5th, 25th, 50th, 75th and 95th glucose percentiles of every hour of
+    the day over the window, merged from the user's hourly rollups. Responses
+    are cached and carry an ``ETag``; a matching ``If-None-Match`` gets 304.
+    Args:
+        user_id (int): ID of the user
+        real_data (bool): Whether to use real or simulated data
+        time_mod (str, optional): Time window. Defaults to "14d"
+        last_date (str | None, optional): Last date to consider. Defaults to None
+        if_none_match (str | None, optional): If-None-Match header. Defaults to None
+    Returns:
+        dict: Window bounds and one record of percentiles per hour of the day
+    """
+    async def compute() -> Response:
+        user = await _user_data(user_id, real_data, time_mod, last_date)
+        return await run_compute(_agp_response, user, user_id, real_data, time_mod, last_date)
+
+    key = ("agp", user_id, real_data, time_mod, last_date)
+    return await _cached(key, real_data, if_none_match, compute)
 
 @router.post("/update_last_viewed")
-def update_last_viewed_endpoint(
+async def update_last_viewed_endpoint(
     username: str = Body(...),
     last_viewed_timestamp: str = Body(...)
 ) -> dict:
@@ -67,36 +447,359 @@ def update_last_viewed_endpoint(
     Returns:
         dict: Status of the update operation
     """
-    success = update_last_viewed(username, last_viewed_timestamp)
+    success = await run_io(update_last_viewed, username, last_viewed_timestamp)
     return {"status": "success" if success else "user not found"}
 
 @router.get("/api/glucose/{user_id}")
-def get_glucose(
+async def get_glucose(
     user_id: int,
     real_data: bool,
     time_mod: str = "1h",
-    last_date: str | None = None
+    last_date: str | None = None,
+    max_points: int | None = Query(None, ge=MIN_POINTS),
+    downsample: Literal["lttb", "minmax"] = "lttb",
+    live: bool = False,
+    accept: str | None = Header(None),
+    if_none_match: str | None = Header(None)
 ) -> list:
     """Get glucose data for a specific user for plotting later
+    The ``Accept`` header selects the encoding: records JSON by default,
+    column-oriented JSON or the compact binary series (see
+    ``app.utils.serialization``). With ``max_points`` long windows are reduced
+    to that many samples with a shape-preserving downsampler, answered from
+    the user's cached pyramid (see ``app.utils.downsample``). Responses are
+    cached and carry an ``ETag``; a matching ``If-None-Match`` gets 304. With
+    ``live`` the window is read from the user's ingested readings (see
+    ``app.services.ingest``) and not cached.
+    Args:
+        user_id (int): ID of the user
+        real_data (bool): Whether to use real or simulated data; ignored with ``live``
+        time_mod (str, optional): Time window for data. Defaults to "1h"
+        last_date (str | None, optional): Last date to consider. Defaults to None,
+            with ``live`` the newest reading
+        max_points (int | None, optional): Maximum number of samples, at least
+            ``MIN_POINTS``. Defaults to None (all)
+        downsample (Literal["lttb", "minmax"], optional): Downsampling method.
+            Defaults to "lttb"
+        live (bool, optional): Whether to read ingested readings. Defaults to False
+        accept (str | None, optional): Accept header. Defaults to None
+        if_none_match (str | None, optional): If-None-Match header. Defaults to None
+    Returns:
+        list: List of glucose records, or a pre-encoded response
+    Raises:
+        HTTPException: 404 with ``live`` if no readings of the user were ingested
+    """
+    media_type = negotiate_media_type(accept)
+    if live:
+        return await run_compute(_live_glucose_response, user_id, time_mod, last_date,
+                                 media_type, max_points, downsample)
+
+    async def compute() -> Response:
+        user = await _user_data(user_id, real_data, time_mod, last_date)
+        pyramid = None
+        if max_points is not None:
+            pyramid = await run_compute(get_user_pyramid, user_id, real_data, time_mod, last_date)
+        return await run_compute(_compute_glucose, user, time_mod, last_date, media_type,
+                                 pyramid, max_points, downsample)
+
+    method = downsample if max_points is not None else None
+    key = ("glucose", user_id, real_data, time_mod, last_date, max_points, method, media_type)
+    return await _cached(key, real_data, if_none_match, compute)
+
+@router.post("/api/ingest")
+async def ingest(batch: IngestBatch) -> dict:
+    """Append live readings of many users to their in-memory buffers
+    Readings are sorted by user and time; those at or before the newest
+    buffered reading of their user are rejected. Buffered readings are read
+    with ``live=true`` on ``/api/glucose`` and ``/api/stats`` and compacted to
+    columnar storage in the background (see ``app.services.ingest``).
+    Args:
+        batch (IngestBatch): Readings as one list per field
+    Returns:
+        dict: Numbers of accepted and rejected readings and of users
+    """
+    return await run_compute(_ingest_batch, batch)
+
+@router.post("/api/tick", response_model=TickOut)
+async def playback_tick(tick: TickRequest) -> TickOut:
+    """Get the glucose plot window and the statistics for one playback tick
+    Both windows are computed from a single data load; optionally the last
+    viewed timestamp of the user is recorded as well. With ``since`` set only
+    the glucose records after it are returned.
+    Args:
+        tick (TickRequest): User, time windows and current playback timestamp
+    Returns:
+        TickOut: Glucose records, statistics and last viewed update status
+    """
+    # One load serves both windows, so it covers the longer one
+    time_mod = max(tick.plot_time_mod, tick.stats_time_mod,
+                   key=lambda name: TIME_INTERVALS.get(name, 0))
+    user = await _user_data(tick.user_id, tick.real_data, time_mod, tick.last_date)
+    plot = await run_compute(_compute_delta, user, tick.plot_time_mod, tick.last_date, tick.since)
+    stats = await run_compute(_compute_stats, user, tick.stats_time_mod, tick.last_date)
+
+    last_viewed_updated = None
+    if tick.username and tick.last_date:
+        last_viewed_updated = await run_io(update_last_viewed, tick.username, tick.last_date)
+
+    return TickOut(
+        glucose=plot["records"],
+        glucose_window_start=plot["window_start"],
+        glucose_window_end=plot["window_end"],
+        stats=stats,
+        last_viewed_updated=last_viewed_updated
+    )
+
+@router.websocket("/ws/playback")
+async def playback_stream(websocket: WebSocket) -> None:
+    """Stream playback to a client that subscribes once
+    The first client message is a ``PlaybackSubscribe``; later messages are
+    ``PlaybackControl`` updates. See ``app.services.playback`` for the protocol.
+    Args:
+        websocket (WebSocket): Client connection
+    """
+    await websocket.accept()
+    try:
+        subscription = PlaybackSubscribe(**await websocket.receive_json())
+        user = await _user_data(subscription.user_id, subscription.real_data)
+        cursor = PlaybackCursor(*user, subscription.plot_time_mod, subscription.stats_time_mod,
+                                subscription.start)
+    except WebSocketDisconnect:
+        return
+    except (ValidationError, ValueError, TypeError) as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1008)
+        return
+    await stream_playback(websocket, cursor, subscription)
+
+def _thresholds(model: SessionCreate | SessionUpdate) -> Dict[str, float | None]:
+    """Alert thresholds of a session request by name"""
+    return {name: getattr(model, name) for name in THRESHOLD_NAMES}
+
+@router.post("/api/simulation/sessions")
+async def create_simulation_session(request: SessionCreate) -> dict:
+    """Start a server-side simulation session of a user
+    The server advances the session's virtual clock and raises threshold
+    alerts (see ``app.services.simulation``).
+    Args:
+        request (SessionCreate): User, start, speed and alert thresholds
+    Returns:
+        dict: State of the new session, with its ``session_id``
+    Raises:
+        HTTPException: 422 if the user is out of range, the start is not a
+            timestamp or the speed is not finite, 429 if the session limit is
+            reached
+    """
+    try:
+        return await run_compute(
+            get_simulation_engine().create, request.user_id, request.real_data, request.start,
+            request.speed, request.paused, request.username, _thresholds(request))
+    except SessionLimitError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+@router.get("/api/simulation/sessions")
+async def list_simulation_sessions() -> list:
+    """Get the state of every simulation session
+    Returns:
+        list: Session states
+    """
+    return await run_compute(get_simulation_engine().states)
+
+@router.get("/api/simulation/sessions/{session_id}")
+async def get_simulation_session(session_id: str) -> dict:
+    """Get the clock, current sample and alert levels of a simulation session
+    Args:
+        session_id (str): Id of the session
+    Returns:
+        dict: Session state
+    Raises:
+        HTTPException: If there is no such session
+    """
+    state = get_simulation_engine().state(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return state
+
+@router.patch("/api/simulation/sessions/{session_id}")
+async def update_simulation_session(session_id: str, request: SessionUpdate) -> dict:
+    """Change the speed, pause state or alert thresholds of a simulation session
+    Args:
+        session_id (str): Id of the session
+        request (SessionUpdate): Fields to change; unset fields are kept
+    Returns:
+        dict: Session state
+    Raises:
+        HTTPException: 404 if there is no such session, 422 for a speed or
+            threshold that is not finite
+    """
+    try:
+        state = get_simulation_engine().update(session_id, request.speed, request.paused,
+                                               _thresholds(request))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return state
+
+@router.delete("/api/simulation/sessions/{session_id}")
+async def delete_simulation_session(session_id: str) -> dict:
+    """Stop a simulation session
+    Args:
+        session_id (str): Id of the session
+    Returns:
+        dict: Confirmation
+    Raises:
+        HTTPException: If there is no such session
+    """
+    if not get_simulation_engine().remove(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+@router.get("/api/simulation/alerts")
+async def get_simulation_alerts(after: int = 0, limit: int = Query(100, ge=1),
+                                session_id: str | None = None) -> list:
+    """Poll the queued simulation events
+    Args:
+        after (int, optional): Only events with a larger ``seq``. Defaults to 0
+        limit (int, optional): Maximum number of events, at least 1. Defaults to 100
+        session_id (str | None, optional): Only events of this session. Defaults to None
+    Returns:
+        list: Alert, end and error events, oldest first
+    """
+    return get_simulation_engine().events(after, limit, session_id)
+
+@router.websocket("/ws/simulation/alerts")
+async def simulation_alert_stream(websocket: WebSocket) -> None:
+    """Push simulation events to a client as the server ticks
+    The first client message is an ``AlertSubscribe``.
+    Args:
+        websocket (WebSocket): Client connection
+    """
+    await websocket.accept()
+    try:
+        subscription = AlertSubscribe(**await websocket.receive_json())
+    except WebSocketDisconnect:
+        return
+    except (ValidationError, ValueError, TypeError) as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1008)
+        return
+    await stream_alerts(websocket, subscription.session_ids)
+
+@router.get("/api/glucose/{user_id}/delta")
+async def get_glucose_delta(
+    user_id: int,
+    real_data: bool,
+    time_mod: str = "1h",
+    last_date: str | None = None,
+    since: str | None = None
+) -> dict:
+    """Get only the glucose records a client does not have yet
+    The client keeps the records it already received, drops those outside
+    ``[window_start, window_end]`` and appends the returned ones.
     Args:
         user_id (int): ID of the user
         real_data (bool): Whether to use real or simulated data
         time_mod (str, optional): Time window for data. Defaults to "1h"
         last_date (str | None, optional): Last date to consider. Defaults to None
+        since (str | None, optional): Last timestamp the client already has.
+            Defaults to None (return the whole window)
     Returns:
-        list: List of glucose records
+        dict: Window bounds and the glucose records after ``since``
     """
-    data = load_certain_data(user_id, "glucose", real_data=real_data)
-    window_data = last_x(data, time_mod, last_date)
-    return window_data.to_dict("records")
+    user = await _user_data(user_id, real_data, time_mod, last_date)
+    return await run_compute(_compute_delta, user, time_mod, last_date, since)
 
 @router.get("/api/last_viewed/{username}")
-def get_last_viewed_endpoint(username: str) -> dict:
+async def get_last_viewed_endpoint(username: str) -> dict:
     """Get the last viewed timestamp for a user
     Args:
         username (str): Username of the user
     Returns:
         dict: Dictionary containing the last viewed timestamp
     """
-    last_viewed = get_last_viewed(username)
+    last_viewed = await run_io(get_last_viewed, username)
     return {"last_viewed_timestamp": last_viewed}
+
+@router.get("/api/metrics")
+async def get_metrics() -> dict:
+    """Get the latency histograms per route and per stage
+    Empty unless ``CGM_INSTRUMENTATION`` is enabled (see
+    ``app.services.instrumentation``).
+    Returns:
+        dict: Whether instrumentation is on, histograms and stored profiles
+    """
+    return {"enabled": is_enabled(), **metrics.snapshot(), "profiles": profiles.list()}
+
+@router.get("/api/metrics/profiles/{profile_id}")
+async def get_profile(profile_id: str) -> dict:
+    """Get a captured request profile
+    Args:
+        profile_id (str): Id from the ``X-CGM-Profile-Id`` response header
+    Returns:
+        dict: Sampled stacks and hottest functions of the request
+    Raises:
+        HTTPException: If no profile has this id
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/api/metrics/datasets")
+async def get_dataset_metrics() -> dict:
+    """Get hit and memory statistics of the in-memory dataset cache
+    Returns:
+        dict: Cache counters and per-dataset sizes
+    """
+    return dataset_cache.stats()
+
+@router.get("/api/metrics/pyramids")
+async def get_pyramid_metrics() -> dict:
+    """Get hit and memory statistics of the downsampling pyramid cache
+    Returns:
+        dict: Cache counters and index sizes
+    """
+    return pyramid_cache.stats()
+
+@router.get("/api/metrics/synthetic")
+async def get_synthetic_metrics() -> dict:
+    """Get hit and memory statistics of the generated synthetic patients
+    Returns:
+        dict: Cache counters, patient sizes and the generator settings
+    """
+    return synthetic_source.stats()
+
+@router.get("/api/metrics/responses")
+async def get_response_metrics() -> dict:
+    """Get hit, eviction and 304 statistics of the response cache
+    Returns:
+        dict: Cache counters and body sizes
+    """
+    return response_cache.stats()
+
+@router.get("/api/metrics/ingest")
+async def get_ingest_metrics() -> dict:
+    """Get buffer and compaction statistics of the live ingestion
+    Returns:
+        dict: Ingestion counters, buffer sizes and compaction latencies
+    """
+    return get_ingest_store().metrics()
+
+@router.get("/api/metrics/simulation")
+async def get_simulation_metrics() -> dict:
+    """Get session counts, tick latencies and event counters of the simulation engine
+    Returns:
+        dict: Engine statistics and alert subscribers
+    """
+    return {**get_simulation_engine().metrics(), **alert_hub.stats()}
+
+@router.get("/api/metrics/last_viewed")
+async def get_last_viewed_metrics() -> dict:
+    """Get coalescing and flush statistics of the last viewed buffer
+    Returns:
+        dict: Buffer counters and flush latencies
+    """
+    return get_last_viewed_buffer().metrics()
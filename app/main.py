@@ -1,17 +1,63 @@
 """FastAPI application entry point
 """
 
+import asyncio
+import math
+from contextlib import asynccontextmanager, suppress
+from typing import Any
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api import routes
+from app.services.executor import shutdown_compute_executor
+from app.services.ingest import get_ingest_store
+from app.services.instrumentation import InstrumentationMiddleware
+from app.services.last_viewed import get_last_viewed_buffer
+from app.services.simulation import run_simulation
 
 # Server configuration
 HOST = "127.0.0.1"
 PORT = 8000
 FRONTEND_URL = "http://localhost:5173"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Run the last viewed flush and ingest compaction threads and the simulation
+    clock while the application is up"""
+    buffer = get_last_viewed_buffer()
+    ingest_store = get_ingest_store()
+    buffer.start()
+    ingest_store.start()
+    simulation = asyncio.create_task(run_simulation())
+    yield
+    simulation.cancel()
+    with suppress(asyncio.CancelledError):
+        await simulation
+    ingest_store.stop()
+    buffer.stop()
+    shutdown_compute_executor()
+
+app = FastAPI(lifespan=lifespan)
+
+def _json_safe(value: Any) -> Any:
+    """Replace the floats JSON cannot hold (NaN and infinities) with their names"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(_: Request, exc: RequestValidationError) -> JSONResponse:
+    """Answer invalid requests with 422 like FastAPI does, also when the rejected
+    input is NaN or infinite (the default handler fails to encode it)"""
+    return JSONResponse(status_code=422,
+                        content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
 
 # Configure CORS middleware
 app.add_middleware(
@@ -22,6 +68,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing and profiling; a pass-through unless CGM_INSTRUMENTATION is set
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(routes.router)
 
 if __name__ == "__main__":
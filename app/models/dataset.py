@@ -0,0 +1,132 @@
+"""Columnar dataset model shared by the data loading services"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from app.utils.instrumentation import span
+from app.utils.rolling import RollingIndex, build_rolling_index
+from app.utils.rollups import Rollups, build_rollups
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Parsed dataset with per-user partitions
+    Attributes:
+        path (str): Path of the file the dataset was loaded from
+        mtime_ns (int): Modification time of the file at load time
+        columns (Dict[str, np.ndarray]): Read-only column arrays sorted by user and time
+        offsets (Dict[int, Tuple[int, int]]): Row range ``[start, stop)`` of every user
+    """
+    path: str
+    mtime_ns: int
+    columns: Dict[str, np.ndarray]
+    offsets: Dict[int, Tuple[int, int]]
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows in the dataset"""
+        return len(self.columns["user_id"])
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the column arrays in bytes"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def has_user(self, user_id: int) -> bool:
+        """Check whether the dataset contains a user
+        Args:
+            user_id (int): The ID of the user
+        Returns:
+            bool: True if the user has at least one row
+        """
+        return user_id in self.offsets
+
+    def partition(self, user_id: int) -> Dict[str, np.ndarray]:
+        """Get zero-copy views of all columns for a single user
+        Args:
+            user_id (int): The ID of the user
+        Returns:
+            Dict[str, np.ndarray]: Column name to array view, sorted by time
+        Raises:
+            ValueError: If the user is not in the dataset
+        """
+        if user_id not in self.offsets:
+            raise ValueError(f"User {user_id} not found")
+        start, stop = self.offsets[user_id]
+        return {name: column[start:stop] for name, column in self.columns.items()}
+
+
+    @cached_property
+    def rolling(self) -> RollingIndex:
+        """Prefix sums for O(1) window statistics, built on first use"""
+        return build_rolling_index(self.columns["time"], self.columns["glucose"],
+                                   self.columns["heart_rate"], self.columns["steps"])
+
+    def user_rolling(self, user_id: int) -> RollingIndex:
+        """Get the rolling index of a single user
+        Args:
+            user_id (int): The ID of the user
+        Returns:
+            RollingIndex: Index with row numbers local to the user's partition
+        Raises:
+            ValueError: If the user is not in the dataset
+        """
+        if user_id not in self.offsets:
+            raise ValueError(f"User {user_id} not found")
+        start, stop = self.offsets[user_id]
+        return self.rolling.slice(start, stop)
+
+    @cached_property
+    def rollups(self) -> Rollups:
+        """Hourly and daily glucose rollups, built on first use"""
+        return build_rollups(self.columns["time"], self.columns["glucose"],
+                             sorted(start for start, _ in self.offsets.values()))
+
+    def user_rollups(self, user_id: int) -> Rollups:
+        """Get the rollups of a single user
+        Args:
+            user_id (int): The ID of the user
+        Returns:
+            Rollups: Rollups with row numbers local to the user's partition
+        Raises:
+            ValueError: If the user is not in the dataset
+        """
+        if user_id not in self.offsets:
+            raise ValueError(f"User {user_id} not found")
+        start, stop = self.offsets[user_id]
+        return self.rollups.slice(start, stop)
+
+
+def build_dataset(frame: pd.DataFrame, path: str = "", mtime_ns: int = 0) -> Dataset:
+    """Convert a raw DataFrame into a sorted, partitioned dataset
+    Args:
+        frame (pd.DataFrame): Raw data with at least ``user_id`` and ``time`` columns
+        path (str, optional): Source path of the data. Defaults to ""
+        mtime_ns (int, optional): Modification time of the source. Defaults to 0
+    Returns:
+        Dataset: Dataset with read-only typed columns
+    """
+    frame = frame.copy()
+    if not pd.api.types.is_datetime64_any_dtype(frame["time"]):
+        with span("dataset.to_datetime"):
+            frame["time"] = pd.to_datetime(frame["time"], errors="coerce")
+    with span("dataset.sort"):
+        frame = frame.sort_values(["user_id", "time"], kind="mergesort")
+
+    columns = {}
+    for name in frame.columns:
+        column = np.ascontiguousarray(frame[name].to_numpy())
+        column.setflags(write=False)
+        columns[name] = column
+
+    user_ids = columns["user_id"]
+    bounds = np.flatnonzero(np.diff(user_ids)) + 1
+    starts = np.concatenate(([0], bounds)) if len(user_ids) else np.array([], dtype=np.int64)
+    stops = np.concatenate((bounds, [len(user_ids)])) if len(user_ids) else starts
+    offsets = {
+        int(user_ids[start]): (int(start), int(stop))
+        for start, stop in zip(starts, stops)
+    }
+    return Dataset(path=path, mtime_ns=mtime_ns, columns=columns, offsets=offsets)
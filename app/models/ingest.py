@@ -0,0 +1,29 @@
+"""Ingestion-related Pydantic models for request validation"""
+
+from typing import List, Optional
+from pydantic import BaseModel, model_validator
+
+class IngestBatch(BaseModel):
+    """Model for a batch of live readings of many users, one list entry per reading
+    Attributes:
+        user_id (List[int]): ID of the data user of every reading
+        time (List[str]): ISO timestamp of every reading
+        glucose (Optional[List[Optional[float]]]): Glucose in mg/dL, None where missing
+        heart_rate (Optional[List[Optional[float]]]): Heart rate in bpm, None where missing
+        steps (Optional[List[Optional[float]]]): Steps, None where missing
+    """
+    user_id: List[int]
+    time: List[str]
+    glucose: Optional[List[Optional[float]]] = None
+    heart_rate: Optional[List[Optional[float]]] = None
+    steps: Optional[List[Optional[float]]] = None
+
+    @model_validator(mode="after")
+    def check_lengths(self) -> "IngestBatch":
+        """Check that all given lists have one entry per reading"""
+        for name in ("time", "glucose", "heart_rate", "steps"):
+            values = getattr(self, name)
+            if values is not None and len(values) != len(self.user_id):
+                raise ValueError(f"{name} has {len(values)} entries, expected "
+                                 f"{len(self.user_id)}")
+        return self
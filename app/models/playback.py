@@ -0,0 +1,77 @@
+"""Playback-related Pydantic models for request/response validation"""
+
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+class TickRequest(BaseModel):
+    """Model for a single playback tick request
+    Attributes:
+        user_id (int): ID of the data user (real or synthetic)
+        real_data (bool): Whether to use real or simulated data
+        plot_time_mod (str): Time window for the glucose plot
+        stats_time_mod (str): Time window for the statistics
+        last_date (Optional[str]): Current playback timestamp
+        username (Optional[str]): If set, the last viewed timestamp of this user
+            is updated to ``last_date``
+        since (Optional[str]): Last glucose timestamp the client already has; if
+            set only newer glucose records are returned
+    """
+    user_id: int
+    real_data: bool
+    plot_time_mod: str = "1h"
+    stats_time_mod: str = "1d"
+    last_date: Optional[str] = None
+    username: Optional[str] = None
+    since: Optional[str] = None
+
+class TickOut(BaseModel):
+    """Model for a playback tick response
+    Attributes:
+        glucose (List[dict]): Glucose records of the plot window (after ``since``
+            if it was given)
+        glucose_window_start (Optional[datetime]): First timestamp of the plot window
+        glucose_window_end (Optional[datetime]): Last timestamp of the plot window
+        stats (List[str]): Formatted statistics of the stats window
+        last_viewed_updated (Optional[bool]): Whether the last viewed timestamp
+            moved forward, None if no update was requested
+    """
+    glucose: List[dict]
+    glucose_window_start: Optional[datetime] = None
+    glucose_window_end: Optional[datetime] = None
+    stats: List[str]
+    last_viewed_updated: Optional[bool] = None
+
+class PlaybackSubscribe(BaseModel):
+    """First message of a live playback stream
+    Attributes:
+        user_id (int): ID of the data user (real or synthetic)
+        real_data (bool): Whether to use real or simulated data
+        plot_time_mod (str): Time window for the glucose plot
+        stats_time_mod (str): Time window for the statistics
+        start (Optional[str]): Playback timestamp to start from; defaults to
+            the first sample
+        interval (float): Seconds between playback steps
+        username (Optional[str]): If set, the last viewed timestamp of this user
+            follows the playback
+    """
+    user_id: int
+    real_data: bool
+    plot_time_mod: str = "1h"
+    stats_time_mod: str = "1d"
+    start: Optional[str] = None
+    interval: float = 2.0
+    username: Optional[str] = None
+
+class PlaybackControl(BaseModel):
+    """Control message of a running live playback stream; unset fields are kept
+    Attributes:
+        interval (Optional[float]): New seconds between playback steps
+        paused (Optional[bool]): Pause or resume the playback
+        plot_time_mod (Optional[str]): New plot window; a new snapshot is sent
+        stats_time_mod (Optional[str]): New stats window; a new snapshot is sent
+    """
+    interval: Optional[float] = None
+    paused: Optional[bool] = None
+    plot_time_mod: Optional[str] = None
+    stats_time_mod: Optional[str] = None
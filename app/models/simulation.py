@@ -0,0 +1,57 @@
+"""Simulation-related Pydantic models for request validation"""
+
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class SessionCreate(BaseModel):
+    """Model for starting a server-side simulation session
+    Attributes:
+        user_id (int): ID of the data user (real or synthetic)
+        real_data (bool): Whether to use real or simulated data
+        start (Optional[str]): Virtual time to start at; defaults to the first sample
+        speed (float): Speed multiplier of the virtual clock, positive and finite
+        paused (bool): Whether the session starts paused
+        username (Optional[str]): If set, the last viewed timestamp of this user
+            follows the session
+        glucose_low (Optional[float]): Low glucose alert threshold in mg/dL
+        glucose_high (Optional[float]): High glucose alert threshold in mg/dL
+        heart_rate_low (Optional[float]): Low heart rate alert threshold in bpm
+        heart_rate_high (Optional[float]): High heart rate alert threshold in bpm
+        Thresholds must be finite.
+    """
+    user_id: int
+    real_data: bool = False
+    start: Optional[str] = None
+    speed: float = Field(1.0, gt=0, allow_inf_nan=False)
+    paused: bool = False
+    username: Optional[str] = None
+    glucose_low: Optional[float] = Field(None, allow_inf_nan=False)
+    glucose_high: Optional[float] = Field(None, allow_inf_nan=False)
+    heart_rate_low: Optional[float] = Field(None, allow_inf_nan=False)
+    heart_rate_high: Optional[float] = Field(None, allow_inf_nan=False)
+
+class SessionUpdate(BaseModel):
+    """Model for changing a running simulation session; unset fields are kept
+    Attributes:
+        speed (Optional[float]): New speed multiplier, positive and finite
+        paused (Optional[bool]): Pause or resume the session
+        glucose_low (Optional[float]): New low glucose alert threshold
+        glucose_high (Optional[float]): New high glucose alert threshold
+        heart_rate_low (Optional[float]): New low heart rate alert threshold
+        heart_rate_high (Optional[float]): New high heart rate alert threshold
+        Thresholds must be finite.
+    """
+    speed: Optional[float] = Field(None, gt=0, allow_inf_nan=False)
+    paused: Optional[bool] = None
+    glucose_low: Optional[float] = Field(None, allow_inf_nan=False)
+    glucose_high: Optional[float] = Field(None, allow_inf_nan=False)
+    heart_rate_low: Optional[float] = Field(None, allow_inf_nan=False)
+    heart_rate_high: Optional[float] = Field(None, allow_inf_nan=False)
+
+class AlertSubscribe(BaseModel):
+    """First message of a simulation alert stream
+    Attributes:
+        session_ids (Optional[List[str]]): Only events of these sessions; all
+            sessions if not set
+    """
+    session_ids: Optional[List[str]] = None
@@ -0,0 +1,18 @@
+"""Statistics-related Pydantic models for request validation"""
+
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel
+
+class BulkStatsRequest(BaseModel):
+    """Model for a statistics request over many users
+    Attributes:
+        user_ids (Union[List[int], Literal["all"]]): IDs of the data users, or
+            "all" for every user of the dataset
+        real_data (bool): Whether to use real or simulated data
+        time_mod (str): Time window for the statistics
+        last_date (Optional[str]): Last date to consider
+    """
+    user_ids: Union[List[int], Literal["all"]] = "all"
+    real_data: bool = False
+    time_mod: str = "1d"
+    last_date: Optional[str] = None
@@ -1,28 +1,13 @@
 """Authentication service module for user registration and login functionality"""
 
-import json
 import random
-from typing import Optional, Dict, Any
+from typing import Optional
 from app.models.user import UserRegister, UserLogin, UserOut
+from app.utils.instrumentation import instrumented
+from app.services.synthetic_source import SYNTHETIC_USERS
+from app.services.user_store import get_user_repository
 
-USERS_FILE = "users.json"
-
-def _load_users() -> Dict[str, Any]:
-    """Load user data from the JSON file
-    Returns:
-        Dict[str, Any]: Dictionary containing user data
-    """
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def _save_users(users: Dict[str, Any]) -> None:
-    """Save user data to the JSON file
-    Args:
-        users (Dict[str, Any]): Dictionary containing user data to save
-    """
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2)
-
+@instrumented("auth.register_user")
 def register_user(data: UserRegister) -> UserOut:
     """Register a new user in the system
     Args:
@@ -33,8 +18,8 @@ def register_user(data: UserRegister) -> UserOut:
     Raises:
         ValueError: If the username is already taken
     """
-    users = _load_users()
-    if data.username in users:
+    repository = get_user_repository()
+    if repository.get(data.username) is not None:
         raise ValueError("Username already taken")
 
     real_id = None
@@ -42,19 +27,18 @@ def register_user(data: UserRegister) -> UserOut:
         real_id = data.real_user_id if data.real_user_id != 0 else random.randint(0, 25)
     synthetic_id = None
     if not data.use_real_data:
-        synthetic_id = data.synthetic_user_id if data.synthetic_user_id is not None else random.randint(0, 200)
+        synthetic_id = data.synthetic_user_id
+        if synthetic_id is None:
+            synthetic_id = random.randrange(SYNTHETIC_USERS)
 
-    user_id = len(users) + 1
-    users[data.username] = {
-        "id": user_id,
+    user_id = repository.create(data.username, {
         "password": data.password,
         "use_real_data": data.use_real_data,
         "real_user_id": real_id,
         "synthetic_user_id": synthetic_id,
         "last_viewed_timestamp": None
-    }
+    })
 
-    _save_users(users)
     return UserOut(
         user_id=user_id,
         username=data.username,
@@ -63,6 +47,7 @@ def register_user(data: UserRegister) -> UserOut:
         is_synthetic=not data.use_real_data
     )
 
+@instrumented("auth.login_user")
 def login_user(data: UserLogin) -> Optional[UserOut]:
     """Authenticate a user and return their data if successful
     Args:
@@ -71,8 +56,7 @@ def login_user(data: UserLogin) -> Optional[UserOut]:
         Optional[UserOut]: User data object if authentication is successful,
             None otherwise.
     """
-    users = _load_users()
-    user = users.get(data.username)
+    user = get_user_repository().get(data.username)
     if not user:
         raise ValueError("Invalid username")
     if not user["password"] == data.password:
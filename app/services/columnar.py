@@ -0,0 +1,220 @@
+"""Binary columnar storage for the health metrics datasets
+
+A dataset is stored as a directory next to its CSV file (``db.csv`` becomes
+``db.cols/``) holding one raw little-endian file per column, a per-user offset
+index and a ``meta.json`` header. Rows are partitioned by ``user_id`` and sorted
+by ``time``; timestamps are stored as int64 nanoseconds. Loading memory-maps the
+column files, so several worker processes share the same pages via the OS cache.
+Writers fill a ``.tmp`` sibling directory and move it into place when done, so
+a directory under the final name is always complete and the files that
+readers have mapped are never truncated.
+
+Usage:
+    python -m app.services.columnar [CSV_PATH ...]
+"""
+
+import json
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.models.dataset import Dataset, build_dataset
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+INDEX_FILE = "index.npy"
+TIME_COLUMN = "time"
+
+
+def columnar_path(csv_path: str) -> str:
+    """Get the columnar directory that belongs to a CSV file
+    Args:
+        csv_path (str): Path to the CSV file
+    Returns:
+        str: Path to the columnar directory
+    """
+    root, _ = os.path.splitext(csv_path)
+    return root + ".cols"
+
+
+def _storage_dtype(array: np.ndarray) -> Optional[np.dtype]:
+    """Get the on-disk dtype of a column, or None if it cannot be stored"""
+    if np.issubdtype(array.dtype, np.datetime64):
+        return np.dtype("<i8")
+    if np.issubdtype(array.dtype, np.number) or array.dtype == np.bool_:
+        return array.dtype.newbyteorder("<")
+    return None
+
+
+class ColumnarWriter:
+    """Incremental writer for the columnar layout
+
+    Rows must be appended grouped by user: all rows of a user in one call or in
+    consecutive calls. Non-numeric columns are not stored. The files are
+    written to ``path + ".tmp"``, which ``close`` moves to ``path``; a
+    directory already at ``path`` is replaced, while readers that mapped its
+    files keep their pages.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self._files: Dict[str, object] = {}
+        self._dtypes: Dict[str, str] = {}
+        self._index: List[List[int]] = []
+        self._rows = 0
+        # Left over by a writer that did not finish
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def append(self, columns: Dict[str, np.ndarray]) -> None:
+        """Append a block of rows
+        Args:
+            columns (Dict[str, np.ndarray]): Column arrays of equal length, including
+                ``user_id`` and ``time``, grouped by user and sorted by time
+        """
+        user_ids = np.asarray(columns["user_id"])
+        if not self._files:
+            for name, array in columns.items():
+                dtype = _storage_dtype(np.asarray(array))
+                if dtype is None:
+                    continue
+                self._dtypes[name] = dtype.str
+                self._files[name] = open(os.path.join(self.tmp_path, f"{name}.bin"), "wb")
+
+        for name, handle in self._files.items():
+            array = np.asarray(columns[name])
+            if name == TIME_COLUMN:
+                array = array.astype("datetime64[ns]").view("<i8")
+            handle.write(np.ascontiguousarray(array, dtype=self._dtypes[name]).tobytes())
+
+        if len(user_ids):
+            bounds = np.flatnonzero(np.diff(user_ids)) + 1
+            starts = np.concatenate(([0], bounds))
+            stops = np.concatenate((bounds, [len(user_ids)]))
+            for start, stop in zip(starts, stops):
+                user_id = int(user_ids[start])
+                if self._index and self._index[-1][0] == user_id:
+                    self._index[-1][2] = self._rows + int(stop)
+                else:
+                    self._index.append([user_id, self._rows + int(start), self._rows + int(stop)])
+        self._rows += len(user_ids)
+
+    def close(self) -> None:
+        """Flush the column files, write the index and header and move the directory into place"""
+        for handle in self._files.values():
+            handle.close()
+        index = np.array(self._index, dtype="<i8").reshape(-1, 3)
+        np.save(os.path.join(self.tmp_path, INDEX_FILE), index)
+        meta = {"version": FORMAT_VERSION, "rows": self._rows, "columns": self._dtypes}
+        with open(os.path.join(self.tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        if not os.path.isdir(self.path):
+            os.replace(self.tmp_path, self.path)
+            return
+        # A directory cannot replace a non-empty one in a single rename; the old
+        # copy is moved aside first and its files stay valid for open maps
+        old_path = self.path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(self.path, old_path)
+        os.replace(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def abort(self) -> None:
+        """Close the column files and drop the partial copy; ``path`` is left unchanged"""
+        for handle in self._files.values():
+            handle.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_columnar(dataset: Dataset, path: str) -> None:
+    """Write a parsed dataset in the columnar layout
+    Args:
+        dataset (Dataset): Dataset sorted and partitioned by user
+        path (str): Output directory
+    """
+    with ColumnarWriter(path) as writer:
+        writer.append(dataset.columns)
+
+
+def convert_csv(csv_path: str, out_path: str | None = None) -> str:
+    """Convert a CSV dataset to the columnar layout
+    Args:
+        csv_path (str): Path to the CSV file
+        out_path (str | None, optional): Output directory. Defaults to the
+            directory returned by ``columnar_path``
+    Returns:
+        str: Path to the written directory
+    """
+    out_path = out_path or columnar_path(csv_path)
+    write_columnar(build_dataset(pd.read_csv(csv_path), csv_path), out_path)
+    return out_path
+
+
+def columnar_mtime_ns(path: str) -> int:
+    """Get the modification time of a columnar dataset
+    Args:
+        path (str): Columnar directory
+    Returns:
+        int: Modification time of the header file in nanoseconds
+    """
+    return os.stat(os.path.join(path, META_FILE)).st_mtime_ns
+
+
+def load_columnar(path: str) -> Dataset:
+    """Memory-map a columnar dataset
+    Args:
+        path (str): Columnar directory
+    Returns:
+        Dataset: Dataset whose columns are read-only memory maps
+    Raises:
+        ValueError: If the directory uses an unsupported format version
+    """
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {meta['version']}")
+
+    columns = {}
+    for name, dtype in meta["columns"].items():
+        if meta["rows"]:
+            column = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r",
+                               shape=(meta["rows"],))
+        else:
+            column = np.empty(0, dtype=dtype)
+            column.setflags(write=False)
+        if name == TIME_COLUMN:
+            column = column.view("datetime64[ns]")
+        columns[name] = column
+
+    index = np.load(os.path.join(path, INDEX_FILE))
+    offsets = {int(user_id): (int(start), int(stop)) for user_id, start, stop in index}
+    return Dataset(path=path, mtime_ns=columnar_mtime_ns(path), columns=columns, offsets=offsets)
+
+
+def main(argv: List[str] | None = None) -> None:
+    """Convert the given CSV files, or both default datasets, to the columnar layout"""
+    from app.services.data_loader import REAL_DATA_PATH, SYNTHETIC_DATA_PATH
+
+    paths = argv if argv else [REAL_DATA_PATH, SYNTHETIC_DATA_PATH]
+    for csv_path in paths:
+        if not os.path.exists(csv_path):
+            print(f"Skipping {csv_path}: file not found")
+            continue
+        print(f"Converted {csv_path} -> {convert_csv(csv_path)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,12 +2,42 @@
 """
 
 import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
+from app.models.dataset import Dataset
+from app.services.dataset_cache import dataset_cache
+from app.utils.instrumentation import instrumented
+from app.services.pyramid_cache import pyramid_cache
+from app.services.synthetic_source import SYNTHETIC_USERS, synthetic_source
+from app.utils.downsample import DownsamplePyramid, check_downsample
+from app.utils.rolling import RollingIndex
+from app.utils.rollups import Rollups
+from app.utils.timeparser import parse_timestamp_ns, window_bounds
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 REAL_DATA_PATH = os.path.join(BASE_DIR, "data", "db.csv")
 SYNTHETIC_DATA_PATH = os.path.join(BASE_DIR, "synthetic", "prepr_synt_enhanced.csv")
 
+def get_dataset(real_data: bool) -> Dataset:
+    """Get the cached real or synthetic dataset
+    Args:
+        real_data (bool): Whether to use the real or synthetic dataset
+    Returns:
+        Dataset: Parsed dataset partitioned by user
+    """
+    return dataset_cache.get(REAL_DATA_PATH if real_data else SYNTHETIC_DATA_PATH)
+
+def dataset_version(real_data: bool) -> Tuple[str, int]:
+    """Get the on-disk version of the real or synthetic dataset
+    Only the files are checked; the dataset is not loaded.
+    Args:
+        real_data (bool): Whether to use the real or synthetic dataset
+    Returns:
+        Tuple[str, int]: Source path and modification time in nanoseconds
+    """
+    return dataset_cache.version(REAL_DATA_PATH if real_data else SYNTHETIC_DATA_PATH)
+
 def get_real_user_data(user_id: int, real_data: bool) -> pd.DataFrame:
     """Load all data for a specific user from either real or synthetic dataset
     Args:
@@ -16,16 +46,118 @@ def get_real_user_data(user_id: int, real_data: bool) -> pd.DataFrame:
     Returns:
         pd.DataFrame: DataFrame containing all user data
     """
-    db_path = REAL_DATA_PATH if real_data else SYNTHETIC_DATA_PATH
-    db = pd.read_csv(db_path)
+    partition = get_user_dataset(user_id, real_data).partition(user_id)
+    return pd.DataFrame(partition, copy=False)
+
+
+def get_user_dataset(user_id: int, real_data: bool, time_mod: Optional[str] = None,
+                     last_date: Optional[str] = None) -> Dataset:
+    """Get the dataset holding a user
+    Synthetic users missing from the synthetic dataset are generated on demand
+    for the days the window needs (see ``app.services.synthetic_source``).
+    Args:
+        user_id (int): The ID of the user
+        real_data (bool): Whether to use the real or synthetic dataset
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        Dataset: The real or synthetic dataset, or a generated one-user dataset
+    Raises:
+        ValueError: If the user ID is out of range
+    """
+    if real_data:
+        if user_id < 0 or user_id >= 26:
+            raise ValueError("Real User ID out of range (must be between 0 and 25)")
+        return get_dataset(True)
+    if user_id < 0 or user_id >= SYNTHETIC_USERS:
+        raise ValueError(
+            f"Synthetic User ID out of range (must be between 0 and {SYNTHETIC_USERS - 1})")
+
+    dataset = get_dataset(False)
+    if dataset.has_user(user_id):
+        return dataset
+    return synthetic_source.get(dataset, user_id, time_mod, last_date)
+
+
+def get_generated_dataset(user_ids: List[int], time_mod: Optional[str] = None,
+                          last_date: Optional[str] = None) -> Dataset:
+    """Generate synthetic users missing from the synthetic dataset as one dataset
+    Args:
+        user_ids (List[int]): IDs of the users, none of them stored
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        Dataset: Generated dataset holding all the users
+    Raises:
+        ValueError: If a user ID is out of range
+    """
+    invalid = [user_id for user_id in user_ids if user_id < 0 or user_id >= SYNTHETIC_USERS]
+    if invalid:
+        raise ValueError(
+            f"Synthetic User IDs out of range (must be between 0 and {SYNTHETIC_USERS - 1}): "
+            f"{invalid}")
+    return synthetic_source.generate_cohort(get_dataset(False), user_ids, time_mod, last_date)
+
+
+@instrumented("data_loader.get_user_columns")
+def get_user_columns(user_id: int, real_data: bool, time_mod: Optional[str] = None,
+                     last_date: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Get read-only column arrays for a user, sorted by time
+    Args:
+        user_id (int): The ID of the user to load data for
+        real_data (bool): Whether to load from real or synthetic dataset
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        Dict[str, np.ndarray]: Column name to zero-copy array view
+    """
+    return get_user_dataset(user_id, real_data, time_mod, last_date).partition(user_id)
+
+
+def get_user_rolling(user_id: int, real_data: bool, time_mod: Optional[str] = None,
+                     last_date: Optional[str] = None) -> RollingIndex:
+    """Get the precomputed window statistics index of a user
+    Args:
+        user_id (int): The ID of the user
+        real_data (bool): Whether to use the real or synthetic dataset
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        RollingIndex: Rolling index with row numbers local to the user's columns
+    """
+    return get_user_dataset(user_id, real_data, time_mod, last_date).user_rolling(user_id)
+
+
+def get_user_rollups(user_id: int, real_data: bool, time_mod: Optional[str] = None,
+                     last_date: Optional[str] = None) -> Rollups:
+    """Get the hourly and daily glucose rollups of a user
+    Args:
+        user_id (int): The ID of the user
+        real_data (bool): Whether to use the real or synthetic dataset
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        Rollups: Rollups with row numbers local to the user's columns
+    """
+    return get_user_dataset(user_id, real_data, time_mod, last_date).user_rollups(user_id)
 
-    if user_id not in db["user_id"].unique():
-        raise ValueError(f"User {user_id} not found")
 
-    user_data = db[db["user_id"] == user_id]
-    return user_data
+@instrumented("data_loader.get_user_pyramid")
+def get_user_pyramid(user_id: int, real_data: bool, time_mod: Optional[str] = None,
+                     last_date: Optional[str] = None) -> DownsamplePyramid:
+    """Get the cached downsampling pyramid of a user's glucose series
+    Args:
+        user_id (int): The ID of the user
+        real_data (bool): Whether to use the real or synthetic dataset
+        time_mod (Optional[str], optional): Window the data is read for. Defaults to None
+        last_date (Optional[str], optional): End of that window. Defaults to None
+    Returns:
+        DownsamplePyramid: Pyramid with row numbers local to the user's columns
+    """
+    return pyramid_cache.get(get_user_dataset(user_id, real_data, time_mod, last_date), user_id)
 
 
+@instrumented("data_loader.load_certain_data")
 def load_certain_data(user_id: int, *columns: str, real_data: bool) -> pd.DataFrame:
     """Load specific columns of data for a user
     Args:
@@ -35,20 +167,130 @@ def load_certain_data(user_id: int, *columns: str, real_data: bool) -> pd.DataFr
     Returns:
         pd.DataFrame: DataFrame containing requested columns
     """
-    if real_data and (user_id < 0 or user_id >= 26):
-        raise ValueError("Real User ID out of range (must be between 0 and 25)")
-    if not real_data and (user_id < 0 or user_id >= 201):
-        raise ValueError("Synthetic User ID out of range (must be between 0 and 200)")
+    partition = get_user_columns(user_id, real_data)
+
+    ret_data = {"timestamps": partition["time"]}
+    for column in columns:
+        ret_data[column] = partition[column]
+
+    return pd.DataFrame(ret_data, copy=False)
+
 
-    data = get_real_user_data(user_id, real_data)
+def _slice_frame(partition: Dict[str, np.ndarray], columns: Tuple[str, ...],
+                 start: int, end: int) -> pd.DataFrame:
+    """Build a zero-copy DataFrame from a row range of a user's columns"""
+    ret_data = {"timestamps": partition["time"][start:end]}
+    for column in columns:
+        ret_data[column] = partition[column][start:end]
 
-    if not pd.api.types.is_datetime64_any_dtype(data["time"]):
-        data["time"] = pd.to_datetime(data["time"], errors="coerce")
+    return pd.DataFrame(ret_data, copy=False)
 
-    data = data.sort_values("time", ascending=True)
 
-    columns = ("time",) + columns
-    ret_data = data[list(columns)].copy()
-    ret_data = ret_data.rename(columns={'time': 'timestamps'})
+def _rows_frame(partition: Dict[str, np.ndarray], columns: Tuple[str, ...],
+                rows: np.ndarray) -> pd.DataFrame:
+    """Build a DataFrame from selected rows of a user's columns"""
+    ret_data = {"timestamps": partition["time"][rows]}
+    for column in columns:
+        ret_data[column] = partition[column][rows]
 
-    return ret_data
+    return pd.DataFrame(ret_data, copy=False)
+
+
+@instrumented("data_loader.window_frame")
+def window_frame(partition: Dict[str, np.ndarray], columns: Tuple[str, ...], time_mod: str,
+                 last_date: str | None = None) -> pd.DataFrame:
+    """Slice the last X time interval out of a user's column arrays
+    Args:
+        partition (Dict[str, np.ndarray]): Column arrays of one user, sorted by time
+        columns (Tuple[str, ...]): Column names to include besides the timestamps
+        time_mod (str): Time interval string (e.g., '1h', '3h')
+        last_date (str | None, optional): ISO format date string to start from
+    Returns:
+        pd.DataFrame: DataFrame with the window of the requested columns
+    """
+    start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+    return _slice_frame(partition, columns, start, end)
+
+
+@instrumented("data_loader.downsampled_window_frame")
+def downsampled_window_frame(partition: Dict[str, np.ndarray], pyramid: DownsamplePyramid,
+                             columns: Tuple[str, ...], time_mod: str, last_date: str | None,
+                             max_points: int, method: str = "lttb") -> pd.DataFrame:
+    """Slice a window and reduce it to at most ``max_points`` glucose samples
+    Windows with at most ``max_points`` rows are returned as they are; larger
+    windows keep the shape of the glucose curve and drop missing samples.
+    Args:
+        partition (Dict[str, np.ndarray]): Column arrays of one user, sorted by time
+        pyramid (DownsamplePyramid): Pyramid of the user's glucose series
+        columns (Tuple[str, ...]): Column names to include besides the timestamps
+        time_mod (str): Time interval string (e.g., '30d', '90d')
+        last_date (str | None): ISO format date string to start from
+        max_points (int): Maximum number of rows to return
+        method (str, optional): ``lttb`` or ``minmax``. Defaults to ``lttb``
+    Returns:
+        pd.DataFrame: DataFrame with the selected rows of the requested columns
+    Raises:
+        ValueError: If the downsampling parameters are invalid
+    """
+    check_downsample(max_points, method)
+    start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+    if end - start <= max_points:
+        return _slice_frame(partition, columns, start, end)
+    return _rows_frame(partition, columns, pyramid.select(start, end, max_points, method))
+
+
+@instrumented("data_loader.delta_frame")
+def delta_frame(
+    partition: Dict[str, np.ndarray],
+    columns: Tuple[str, ...],
+    time_mod: str,
+    last_date: str | None = None,
+    since: str | None = None
+) -> Tuple[pd.DataFrame, Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """Slice only the part of a window that is newer than a client cursor
+    Args:
+        partition (Dict[str, np.ndarray]): Column arrays of one user, sorted by time
+        columns (Tuple[str, ...]): Column names to include besides the timestamps
+        time_mod (str): Time interval string (e.g., '1h', '3h')
+        last_date (str | None, optional): ISO format date string to start from
+        since (str | None, optional): Last timestamp the client already has.
+            Defaults to None (return the whole window)
+    Returns:
+        Tuple[pd.DataFrame, Optional[pd.Timestamp], Optional[pd.Timestamp]]: Rows
+            of the window after ``since`` and the first and last timestamp of the
+            window (None for an empty window)
+    """
+    timestamps_ns = partition["time"].view("i8")
+    start, end = window_bounds(timestamps_ns, time_mod, last_date)
+    if start == end:
+        return _slice_frame(partition, columns, start, end), None, None
+
+    first = start
+    if since:
+        first = int(np.searchsorted(timestamps_ns, parse_timestamp_ns(since), side="right"))
+        first = min(end, max(start, first))
+
+    times = partition["time"]
+    return (
+        _slice_frame(partition, columns, first, end),
+        pd.Timestamp(times[start]),
+        pd.Timestamp(times[end - 1]),
+    )
+
+
+def load_window(user_id: int, *columns: str, real_data: bool, time_mod: str,
+                last_date: str | None = None) -> pd.DataFrame:
+    """Load specific columns of a user for the last X time interval
+    Equivalent to ``last_x(load_certain_data(...), time_mod, last_date)`` but the
+    window is found by binary search on the cached, already sorted timestamps.
+    Args:
+        user_id (int): The ID of the user to load data for
+        *columns (str): Variable number of column names to load
+        real_data (bool): Whether to load from real or synthetic dataset
+        time_mod (str): Time interval string (e.g., '1h', '3h')
+        last_date (str | None, optional): ISO format date string to start from
+    Returns:
+        pd.DataFrame: DataFrame with the window of the requested columns
+    """
+    partition = get_user_columns(user_id, real_data, time_mod, last_date)
+    return window_frame(partition, columns, time_mod, last_date)
@@ -0,0 +1,132 @@
+"""Process-wide in-memory cache for the health metrics datasets
+
+Each dataset file is parsed once per process and kept as typed NumPy columns,
+sorted by ``user_id`` and ``time`` and partitioned by user. A cached dataset is
+reloaded when the modification time of its file changes. When a binary
+columnar copy of a CSV file exists and is up to date it is memory-mapped
+instead of parsing the CSV.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+import pandas as pd
+from app.models.dataset import Dataset, build_dataset
+from app.services.columnar import columnar_mtime_ns, columnar_path, load_columnar
+from app.utils.instrumentation import span
+
+ROLLING_COLUMNS = {"time", "glucose", "heart_rate", "steps"}
+
+
+class DatasetCache:
+    """Thread-safe cache of parsed datasets keyed by file path"""
+
+    def __init__(self) -> None:
+        self._datasets: Dict[str, Dataset] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+
+    @staticmethod
+    def _resolve_source(path: str) -> Tuple[str, int]:
+        """Pick the file to load a dataset from
+        Args:
+            path (str): Path to the CSV file
+        Returns:
+            Tuple[str, int]: Source path and its modification time in nanoseconds
+        """
+        binary_path = columnar_path(path)
+        try:
+            binary_mtime_ns = columnar_mtime_ns(binary_path)
+        except FileNotFoundError:
+            return path, os.stat(path).st_mtime_ns
+        try:
+            csv_mtime_ns = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return binary_path, binary_mtime_ns
+        if binary_mtime_ns >= csv_mtime_ns:
+            return binary_path, binary_mtime_ns
+        return path, csv_mtime_ns
+
+    def version(self, path: str) -> Tuple[str, int]:
+        """Get the version a dataset has on disk without loading it
+        Args:
+            path (str): Path to the CSV file
+        Returns:
+            Tuple[str, int]: Source path and its modification time in nanoseconds,
+                the same values ``get`` stores on the dataset
+        """
+        return self._resolve_source(path)
+
+    def get(self, path: str) -> Dataset:
+        """Get the dataset for a file, loading it if missing or stale
+        Args:
+            path (str): Path to the CSV file; its columnar copy is preferred
+        Returns:
+            Dataset: The cached dataset
+        """
+        source, mtime_ns = self._resolve_source(path)
+        dataset = self._datasets.get(path)
+        if dataset is not None and dataset.path == source and dataset.mtime_ns == mtime_ns:
+            self._hits += 1
+            return dataset
+
+        with self._lock:
+            dataset = self._datasets.get(path)
+            if dataset is not None and dataset.path == source and dataset.mtime_ns == mtime_ns:
+                self._hits += 1
+                return dataset
+            if dataset is not None:
+                self._reloads += 1
+            self._misses += 1
+            if source == path:
+                with span("dataset.read_csv"):
+                    frame = pd.read_csv(path)
+                dataset = build_dataset(frame, path, mtime_ns)
+            else:
+                with span("dataset.load_columnar"):
+                    dataset = load_columnar(source)
+            if ROLLING_COLUMNS <= dataset.columns.keys():
+                # Build the window statistics index and rollups up front, not on a request
+                with span("dataset.rolling_index"):
+                    _ = dataset.rolling
+                with span("dataset.rollups"):
+                    _ = dataset.rollups
+            self._datasets[path] = dataset
+            return dataset
+
+    def invalidate(self, path: str | None = None) -> None:
+        """Drop one cached dataset, or all of them
+        Args:
+            path (str | None, optional): Path to drop. Defaults to None (drop all)
+        """
+        with self._lock:
+            if path is None:
+                self._datasets.clear()
+            else:
+                self._datasets.pop(path, None)
+
+    def stats(self) -> dict:
+        """Get hit and memory statistics of the cache
+        Returns:
+            dict: Counters and per-dataset row, user and byte counts
+        """
+        datasets = list(self._datasets.values())
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "reloads": self._reloads,
+            "nbytes": sum(dataset.nbytes for dataset in datasets),
+            "datasets": {
+                dataset.path: {
+                    "rows": dataset.n_rows,
+                    "users": len(dataset.offsets),
+                    "nbytes": dataset.nbytes,
+                }
+                for dataset in datasets
+            },
+        }
+
+
+dataset_cache = DatasetCache()
@@ -0,0 +1,110 @@
+"""Concurrency helpers for the async request path
+
+Request handlers run on the event loop and hand work off explicitly:
+
+- ``run_compute`` runs CPU-bound window and statistics work on a bounded thread
+  pool, sized by the ``CGM_COMPUTE_WORKERS`` environment variable
+- ``run_io`` runs blocking user-store I/O on the event loop's default executor
+- ``SingleFlight`` shares one in-flight call between concurrent callers with
+  the same key
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+COMPUTE_WORKERS = int(os.environ.get("CGM_COMPUTE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_compute_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool for CPU-bound request work
+    Returns:
+        ThreadPoolExecutor: Pool with ``COMPUTE_WORKERS`` threads
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=COMPUTE_WORKERS,
+                                               thread_name_prefix="compute")
+    return _executor
+
+
+def shutdown_compute_executor() -> None:
+    """Shut the compute pool down; it is recreated on next use"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_compute(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a CPU-bound function on the compute pool in a copy of the current context
+    Args:
+        fn (Callable[..., T]): Function to run
+        *args (Any): Positional arguments
+        **kwargs (Any): Keyword arguments
+    Returns:
+        T: The function result
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_compute_executor(), call)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking I/O function off the event loop
+    Args:
+        fn (Callable[..., T]): Function to run
+        *args (Any): Positional arguments
+        **kwargs (Any): Keyword arguments
+    Returns:
+        T: The function result
+    """
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+class SingleFlight:
+    """Deduplicate concurrent async calls that share a key
+
+    While a call for a key is running, further callers with the same key await
+    its result instead of starting their own call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` unless a call with the same key is already in flight
+        Args:
+            key (Hashable): Deduplication key
+            fn (Callable[[], Awaitable[T]]): Coroutine function to run
+        Returns:
+            T: Result of the shared call
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Drop a finished call so the next caller starts a new one"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
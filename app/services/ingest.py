@@ -0,0 +1,559 @@
+"""Live ingestion of CGM readings into per-user ring buffers
+
+``POST /api/ingest`` appends batches of readings (glucose, heart rate and
+steps) of many users to bounded in-memory buffers, one per user:
+
+- a buffer serves the last ``CGM_INGEST_CAPACITY`` readings of a user in time
+  order; readings at or before the newest reading of the user are rejected
+- every append extends the prefix sums of ``RollingIndex``, so the statistics
+  of any window of the buffer stay O(1) and ``/api/glucose`` and
+  ``/api/stats`` with ``live=true`` read the recent window of a user straight
+  from the buffer, through the same code as the stored datasets
+- the arrays of a buffer have room for twice the capacity; when they are full
+  the readings still needed are copied to new arrays. Appends never write to
+  rows a snapshot can see, so snapshots are plain views
+
+Readings are compacted to the columnar layout of ``app.services.columnar``,
+one ``segment-<n>.cols`` directory per compaction under ``CGM_INGEST_DIR``:
+
+- every ``CGM_INGEST_COMPACT_INTERVAL`` seconds from a background thread,
+- as soon as ``CGM_INGEST_MAX_PENDING`` readings wait for compaction,
+- on shutdown.
+
+A buffer keeps readings that are not compacted yet even beyond its capacity,
+so no reading is dropped before it is stored. On startup the buffers are
+seeded with the newest ``CGM_INGEST_CAPACITY`` readings of every user in the
+segments, so after a restart live reads still work and readings at or before
+the stored ones are still rejected.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.columnar import ColumnarWriter, load_columnar
+from app.services.data_loader import BASE_DIR
+from app.utils.instrumentation import instrumented, span
+from app.utils.rolling import NS_PER_DAY, RollingIndex
+
+INGEST_CAPACITY = int(os.environ.get("CGM_INGEST_CAPACITY", "576"))
+INGEST_DIR = os.environ.get("CGM_INGEST_DIR", os.path.join(BASE_DIR, "ingest"))
+INGEST_COMPACT_INTERVAL = float(os.environ.get("CGM_INGEST_COMPACT_INTERVAL", "60"))
+INGEST_MAX_PENDING = int(os.environ.get("CGM_INGEST_MAX_PENDING", "100000"))
+# Typical glucose level; the sums of squares are taken around it, as RollingIndex
+# does around the dataset mean
+GLUCOSE_SHIFT = 120.0
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".cols"
+READING_COLUMNS = ("glucose", "heart_rate", "steps")
+ROW_COLUMNS = ("time", "glucose", "heart_rate", "steps", "days")
+PREFIX_COLUMNS = ("glucose_count", "glucose_sum", "glucose_sq_sum", "glucose_above", "steps_sum")
+
+UserData = Tuple[Dict[str, np.ndarray], RollingIndex]
+
+logger = logging.getLogger(__name__)
+
+
+def _running_sum(values: np.ndarray) -> np.ndarray:
+    """Cumulative sum with a leading zero, as the prefix sums of ``RollingIndex``"""
+    out = np.zeros((len(values) + 1, *values.shape[1:]), dtype=values.dtype)
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+@dataclass(frozen=True)
+class ReadingBatch:
+    """Readings of many users sorted by user and time, with running sums
+    The prefix arrays have a leading zero and run across users, so
+    ``p[b] - p[a]`` sums the rows ``a`` to ``b - 1`` of one user.
+    Attributes:
+        user_ids (np.ndarray): User of every reading
+        times_ns (np.ndarray): Epoch nanoseconds, strictly increasing per user
+        glucose (np.ndarray): Glucose values, NaN where missing
+        heart_rate (np.ndarray): Heart rate values, NaN where missing
+        steps (np.ndarray): Step counts, NaN where missing
+        days (np.ndarray): Day number of every reading
+        day_changes (np.ndarray): Prefix count of readings on another day than
+            the reading before
+        glucose_count (np.ndarray): Prefix count of non-missing glucose values
+        glucose_sum (np.ndarray): Prefix sum of glucose shifted by ``GLUCOSE_SHIFT``
+        glucose_sq_sum (np.ndarray): Prefix sum of squared shifted glucose
+        glucose_above (np.ndarray): Prefix counts of glucose at or above 54 and
+            70 and above 180 and 250, shape ``(n + 1, 4)``
+        steps_sum (np.ndarray): Prefix sum of steps
+    """
+    user_ids: np.ndarray
+    times_ns: np.ndarray
+    glucose: np.ndarray
+    heart_rate: np.ndarray
+    steps: np.ndarray
+    days: np.ndarray
+    day_changes: np.ndarray
+    glucose_count: np.ndarray
+    glucose_sum: np.ndarray
+    glucose_sq_sum: np.ndarray
+    glucose_above: np.ndarray
+    steps_sum: np.ndarray
+
+    def users(self) -> List[Tuple[int, int, int]]:
+        """Get the user and row range of every user in the batch"""
+        bounds = np.flatnonzero(np.diff(self.user_ids)) + 1
+        starts = np.concatenate(([0], bounds)).tolist()
+        stops = np.concatenate((bounds, [len(self.user_ids)])).tolist()
+        return [(int(self.user_ids[start]), start, stop) for start, stop in zip(starts, stops)
+                if stop > start]
+
+
+def prepare_batch(user_ids: np.ndarray, times_ns: np.ndarray, glucose: np.ndarray,
+                  heart_rate: np.ndarray, steps: np.ndarray) -> ReadingBatch:
+    """Sort readings by user and time and compute their running sums in one pass
+    Repeated timestamps of a user are dropped, keeping the first reading.
+    Args:
+        user_ids (np.ndarray): User of every reading
+        times_ns (np.ndarray): Epoch nanoseconds of every reading
+        glucose (np.ndarray): Glucose of every reading, NaN where missing
+        heart_rate (np.ndarray): Heart rate of every reading, NaN where missing
+        steps (np.ndarray): Steps of every reading, NaN where missing
+    Returns:
+        ReadingBatch: Sorted readings without repeated timestamps
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    order = np.lexsort((times_ns, user_ids))
+    user_ids, times_ns = user_ids[order], times_ns[order]
+    unique = np.ones(len(order), dtype=bool)
+    unique[1:] = (user_ids[1:] != user_ids[:-1]) | (times_ns[1:] != times_ns[:-1])
+    order, user_ids, times_ns = order[unique], user_ids[unique], times_ns[unique]
+    glucose, heart_rate, steps = (np.asarray(column, dtype=np.float64)[order]
+                                  for column in (glucose, heart_rate, steps))
+
+    days = times_ns // NS_PER_DAY
+    new_day = np.zeros(len(days), dtype=np.int64)
+    new_day[1:] = days[1:] != days[:-1]
+    present = ~np.isnan(glucose)
+    shifted = np.where(present, glucose - GLUCOSE_SHIFT, 0.0)
+    with np.errstate(invalid="ignore"):
+        above = np.stack((glucose >= 54, glucose >= 70, glucose > 180, glucose > 250), axis=1)
+    return ReadingBatch(
+        user_ids=user_ids, times_ns=times_ns, glucose=glucose, heart_rate=heart_rate,
+        steps=steps, days=days, day_changes=_running_sum(new_day),
+        glucose_count=_running_sum(present.astype(np.int64)), glucose_sum=_running_sum(shifted),
+        glucose_sq_sum=_running_sum(shifted * shifted),
+        glucose_above=_running_sum(above.astype(np.int32)),
+        steps_sum=_running_sum(np.nan_to_num(steps)),
+    )
+
+
+class ReadingBuffer:
+    """Readings of one user with running prefix sums
+
+    Rows are numbered by ``appended``, the count of readings ever appended;
+    row ``i`` is stored at array position ``i - base``.
+    """
+
+    def __init__(self, capacity: int = INGEST_CAPACITY) -> None:
+        self.capacity = capacity
+        self.base = 0
+        self.appended = 0
+        self.compacted = 0
+        self._allocate(2 * capacity)
+
+    def _allocate(self, size: int) -> None:
+        """Allocate empty arrays for ``size`` rows"""
+        self.time = np.empty(size, dtype=np.int64)
+        self.glucose = np.empty(size)
+        self.heart_rate = np.empty(size)
+        self.steps = np.empty(size)
+        self.days = np.empty(size, dtype=np.int64)
+        self.day_changes = np.empty(size, dtype=np.int64)
+        self.glucose_count = np.zeros(size + 1, dtype=np.int64)
+        self.glucose_sum = np.zeros(size + 1)
+        self.glucose_sq_sum = np.zeros(size + 1)
+        self.glucose_above = np.zeros((size + 1, 4), dtype=np.int32)
+        self.steps_sum = np.zeros(size + 1)
+
+    @property
+    def size(self) -> int:
+        """Number of rows held in the arrays"""
+        return self.appended - self.base
+
+    @property
+    def pending(self) -> int:
+        """Number of readings not compacted yet"""
+        return self.appended - self.compacted
+
+    @property
+    def last_ns(self) -> Optional[int]:
+        """Timestamp of the newest reading, None if empty"""
+        return int(self.time[self.size - 1]) if self.size else None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays"""
+        return sum(getattr(self, name).nbytes
+                   for name in (*ROW_COLUMNS, "day_changes", *PREFIX_COLUMNS))
+
+    def _reserve(self, n_new: int) -> None:
+        """Make room for ``n_new`` rows, moving the rows still needed to new arrays"""
+        if self.size + n_new <= len(self.time):
+            return
+        # Keep what a snapshot shows and what is not compacted yet
+        first = max(self.base, min(self.appended - self.capacity, self.compacted))
+        offset, n_kept = first - self.base, self.appended - first
+        old = {name: getattr(self, name) for name in (*ROW_COLUMNS, "day_changes",
+                                                      *PREFIX_COLUMNS)}
+        self._allocate(2 * max(self.capacity, n_kept + n_new))
+        for name in ROW_COLUMNS:
+            getattr(self, name)[:n_kept] = old[name][offset:offset + n_kept]
+        # Running sums only enter as differences; rebasing them keeps them small
+        if n_kept:
+            self.day_changes[:n_kept] = (old["day_changes"][offset:offset + n_kept]
+                                         - old["day_changes"][offset])
+        for name in PREFIX_COLUMNS:
+            getattr(self, name)[:n_kept + 1] = (old[name][offset:offset + n_kept + 1]
+                                                - old[name][offset])
+        self.base = first
+
+    def write(self, batch: ReadingBatch, start: int, stop: int) -> int:
+        """Append the rows ``[start, stop)`` of a batch, all of this user
+        Args:
+            batch (ReadingBatch): Prepared batch
+            start (int): First row
+            stop (int): Row after the last one
+        Returns:
+            int: Number of appended readings; those at or before the newest
+                buffered reading are skipped
+        """
+        last_ns = self.last_ns
+        if last_ns is not None and start < stop and batch.times_ns[start] <= last_ns:
+            start += int(np.searchsorted(batch.times_ns[start:stop], last_ns, side="right"))
+        n_new = stop - start
+        if n_new <= 0:
+            return 0
+        self._reserve(n_new)
+        position = self.size
+        rows = slice(position, position + n_new)
+        source, source_sums = slice(start, stop), slice(start + 1, stop + 1)
+
+        self.time[rows] = batch.times_ns[source]
+        self.glucose[rows] = batch.glucose[source]
+        self.heart_rate[rows] = batch.heart_rate[source]
+        self.steps[rows] = batch.steps[source]
+        self.days[rows] = batch.days[source]
+        first_changes = 0
+        if position:
+            first_changes = (self.day_changes[position - 1]
+                             + int(batch.days[start] != self.days[position - 1]))
+        self.day_changes[rows] = (batch.day_changes[source_sums]
+                                  + (first_changes - batch.day_changes[start + 1]))
+        # Continue the running sums of the buffer from the batch's running sums
+        sums = slice(position + 1, position + n_new + 1)
+        for name in PREFIX_COLUMNS:
+            own, other = getattr(self, name), getattr(batch, name)
+            own[sums] = other[source_sums] + (own[position] - other[start])
+        self.appended += n_new
+        return n_new
+
+    def append(self, times_ns: np.ndarray, glucose: np.ndarray, heart_rate: np.ndarray,
+               steps: np.ndarray) -> int:
+        """Append readings of this user
+        Args:
+            times_ns (np.ndarray): Epoch nanoseconds
+            glucose (np.ndarray): Glucose values, NaN where missing
+            heart_rate (np.ndarray): Heart rate values, NaN where missing
+            steps (np.ndarray): Step counts, NaN where missing
+        Returns:
+            int: Number of appended readings
+        """
+        batch = prepare_batch(np.zeros(len(times_ns), dtype=np.int64), times_ns, glucose,
+                              heart_rate, steps)
+        return self.write(batch, 0, len(batch.times_ns))
+
+    def snapshot(self) -> UserData:
+        """Get the last ``capacity`` readings as column views and their rolling index
+        Returns:
+            UserData: Columns as in ``Dataset.partition`` and the rolling index
+        """
+        stop = self.size
+        start = max(0, stop - self.capacity)
+        rows, sums = slice(start, stop), slice(start, stop + 1)
+        partition = {
+            "time": self.time[rows].view("M8[ns]"),
+            "glucose": self.glucose[rows],
+            "heart_rate": self.heart_rate[rows],
+            "steps": self.steps[rows],
+        }
+        rolling = RollingIndex(
+            glucose=self.glucose[rows],
+            heart_rate=self.heart_rate[rows],
+            glucose_count=self.glucose_count[sums],
+            glucose_sum=self.glucose_sum[sums],
+            glucose_sq_sum=self.glucose_sq_sum[sums],
+            glucose_shift=GLUCOSE_SHIFT,
+            glucose_above=self.glucose_above[sums],
+            steps_sum=self.steps_sum[sums],
+            days=self.days[rows],
+            day_changes=self.day_changes[rows],
+        )
+        return partition, rolling
+
+    def uncompacted(self) -> Dict[str, np.ndarray]:
+        """Get views of the readings not compacted yet"""
+        rows = slice(self.compacted - self.base, self.size)
+        return {"time": self.time[rows], "glucose": self.glucose[rows],
+                "heart_rate": self.heart_rate[rows], "steps": self.steps[rows]}
+
+
+def _segment_number(name: str) -> int:
+    """Number of a segment directory name, -1 for other names"""
+    if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+        return -1
+    number = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+    return int(number) if number.isdigit() else -1
+
+
+class IngestStore:
+    """Per-user reading buffers with periodic compaction to columnar segments"""
+
+    def __init__(self, path: str = INGEST_DIR, capacity: int = INGEST_CAPACITY,
+                 compact_interval: float = INGEST_COMPACT_INTERVAL,
+                 max_pending: int = INGEST_MAX_PENDING) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.compact_interval = compact_interval
+        self.max_pending = max_pending
+        self._buffers: Dict[int, ReadingBuffer] = {}
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = 0
+        self._next_segment: Optional[int] = None
+        self._accepted = 0
+        self._rejected = 0
+        self._batches = 0
+        self._compactions = 0
+        self._compacted = 0
+        self._recovered = 0
+        self._compact_seconds_total = 0.0
+        self._compact_seconds_last = 0.0
+
+    @instrumented("ingest.append")
+    def ingest(self, user_ids: np.ndarray, times_ns: np.ndarray, glucose: np.ndarray,
+               heart_rate: np.ndarray, steps: np.ndarray) -> dict:
+        """Append a batch of readings of many users
+        Readings may come in any order; they are sorted by user and time.
+        Readings at or before the newest buffered reading of their user, and
+        repeated timestamps of a user within the batch, are rejected.
+        Args:
+            user_ids (np.ndarray): User of every reading
+            times_ns (np.ndarray): Epoch nanoseconds of every reading
+            glucose (np.ndarray): Glucose of every reading, NaN where missing
+            heart_rate (np.ndarray): Heart rate of every reading, NaN where missing
+            steps (np.ndarray): Steps of every reading, NaN where missing
+        Returns:
+            dict: Numbers of accepted and rejected readings and of users
+        """
+        batch = prepare_batch(user_ids, times_ns, glucose, heart_rate, steps)
+        users = batch.users()
+        accepted = 0
+        with self._lock:
+            for user_id, start, stop in users:
+                buffer = self._buffers.get(user_id)
+                if buffer is None:
+                    buffer = self._buffers[user_id] = ReadingBuffer(self.capacity)
+                accepted += buffer.write(batch, start, stop)
+            self._accepted += accepted
+            self._rejected += len(user_ids) - accepted
+            self._batches += 1
+            self._pending += accepted
+            should_compact = self._pending >= self.max_pending
+
+        if should_compact:
+            self.compact()
+        return {"accepted": accepted, "rejected": len(user_ids) - accepted, "users": len(users)}
+
+    def snapshot(self, user_id: int) -> UserData:
+        """Get the buffered readings of a user
+        Args:
+            user_id (int): ID of the user
+        Returns:
+            UserData: Column views and rolling index of the last readings
+        Raises:
+            ValueError: If no readings of the user were ingested
+        """
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            if buffer is None or not buffer.size:
+                raise ValueError(f"No live readings of user {user_id}")
+            return buffer.snapshot()
+
+    def _segment_path(self) -> str:
+        """Path of the next segment, continuing the numbering on disk"""
+        if self._next_segment is None:
+            names = os.listdir(self.path) if os.path.isdir(self.path) else []
+            self._next_segment = max((_segment_number(name) for name in names), default=-1) + 1
+        path = os.path.join(self.path, f"{SEGMENT_PREFIX}{self._next_segment:08d}{SEGMENT_SUFFIX}")
+        self._next_segment += 1
+        return path
+
+    def compact(self) -> int:
+        """Write all readings not compacted yet to a new columnar segment
+        Returns:
+            int: Number of written readings
+        """
+        with self._compact_lock, span("ingest.compact"):
+            with self._lock:
+                pending = {user_id: (buffer, buffer.appended, buffer.uncompacted())
+                           for user_id, buffer in sorted(self._buffers.items())
+                           if buffer.pending}
+            if not pending:
+                return 0
+
+            start = time.perf_counter()
+            blocks = [columns for _, _, columns in pending.values()]
+            n_rows = sum(len(columns["time"]) for columns in blocks)
+            columns = {
+                "user_id": np.repeat(np.fromiter(pending, dtype=np.int64, count=len(pending)),
+                                     [len(columns["time"]) for columns in blocks]),
+                "time": np.concatenate([columns["time"] for columns in blocks]).view("M8[ns]"),
+                **{name: np.concatenate([columns[name] for columns in blocks])
+                   for name in READING_COLUMNS},
+            }
+            path = self._segment_path()
+            os.makedirs(self.path, exist_ok=True)
+            # The writer moves the segment into place once it is complete
+            with ColumnarWriter(path) as writer:
+                writer.append(columns)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                for buffer, appended, _ in pending.values():
+                    buffer.compacted = appended
+                self._pending -= n_rows
+                self._compactions += 1
+                self._compacted += n_rows
+                self._compact_seconds_total += elapsed
+                self._compact_seconds_last = elapsed
+            return n_rows
+
+    def segments(self) -> List[str]:
+        """Get the paths of the compacted segments in order"""
+        if not os.path.isdir(self.path):
+            return []
+        names = sorted((name for name in os.listdir(self.path) if _segment_number(name) >= 0),
+                       key=_segment_number)
+        return [os.path.join(self.path, name) for name in names]
+
+    @instrumented("ingest.recover")
+    def recover(self) -> int:
+        """Seed the buffers with the newest compacted readings of every user
+        Every user without a buffer gets the last ``capacity`` readings of the
+        segments, marked as compacted, so it is served by live reads and
+        readings at or before them are rejected like before the restart.
+        Returns:
+            int: Number of reloaded readings
+        """
+        tails: Dict[int, List[Dict[str, np.ndarray]]] = {}
+        for path in self.segments():
+            segment = load_columnar(path)
+            for user_id, (start, stop) in segment.offsets.items():
+                rows = slice(max(start, stop - self.capacity), stop)
+                parts = tails.setdefault(user_id, [])
+                parts.append({"time": np.array(segment.columns["time"][rows]).view("i8"),
+                              **{name: np.array(segment.columns[name][rows], dtype=np.float64)
+                                 for name in READING_COLUMNS}})
+                # Older parts are dropped once the newer ones fill the capacity
+                while sum(len(part["time"]) for part in parts[1:]) >= self.capacity:
+                    parts.pop(0)
+        if not tails:
+            return 0
+
+        users = {user_id: {name: np.concatenate([part[name] for part in parts])[-self.capacity:]
+                           for name in ("time", *READING_COLUMNS)}
+                 for user_id, parts in tails.items()}
+        blocks = list(users.values())
+        batch = prepare_batch(
+            np.repeat(np.fromiter(users, dtype=np.int64, count=len(users)),
+                      [len(block["time"]) for block in blocks]),
+            *(np.concatenate([block[name] for block in blocks])
+              for name in ("time", *READING_COLUMNS)))
+        recovered = 0
+        with self._lock:
+            for user_id, start, stop in batch.users():
+                if user_id in self._buffers:
+                    continue
+                buffer = self._buffers[user_id] = ReadingBuffer(self.capacity)
+                recovered += buffer.write(batch, start, stop)
+                buffer.compacted = buffer.appended
+            self._recovered += recovered
+        return recovered
+
+    def _run(self) -> None:
+        """Compact periodically until stopped"""
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Compacting ingested readings failed")
+
+    def start(self) -> None:
+        """Reload the compacted readings and start the background compaction thread"""
+        if self._thread is not None:
+            return
+        self.recover()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-compact", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background compaction thread and compact pending readings"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.compact()
+
+    def metrics(self) -> dict:
+        """Get ingestion and compaction counters
+        Returns:
+            dict: Counters, buffer sizes and compaction latencies in milliseconds
+        """
+        with self._lock:
+            return {
+                "users": len(self._buffers),
+                "buffered": sum(min(b.size, b.capacity) for b in self._buffers.values()),
+                "nbytes": sum(buffer.nbytes for buffer in self._buffers.values()),
+                "capacity": self.capacity,
+                "batches": self._batches,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "pending": self._pending,
+                "compactions": self._compactions,
+                "compacted": self._compacted,
+                "recovered": self._recovered,
+                "compact_ms_total": self._compact_seconds_total * 1000,
+                "compact_ms_last": self._compact_seconds_last * 1000,
+            }
+
+
+_store = IngestStore()
+
+
+def get_ingest_store() -> IngestStore:
+    """Get the process-wide ingest store"""
+    return _store
+
+
+def set_ingest_store(store: IngestStore) -> None:
+    """Replace the process-wide ingest store, compacting the old one
+    Args:
+        store (IngestStore): New store
+    """
+    global _store
+    if _store is not store:
+        _store.stop()
+    _store = store
@@ -0,0 +1,210 @@
+"""Opt-in request and stage instrumentation
+
+Set ``CGM_INSTRUMENTATION=1`` to enable it. When disabled, ``span`` returns a
+shared no-op context manager and ``instrumented`` functions only check one
+flag before calling through, so the hot path is unchanged apart from that
+check.
+
+When enabled:
+
+- ``InstrumentationMiddleware`` records a latency histogram per route (method
+  and path template) and adds a ``Server-Timing`` header with the stages of
+  the request
+- ``span``/``instrumented`` record a latency histogram per stage (dataset
+  loading, windowing, statistics, serialization, user-store I/O); stage times
+  are also attributed to the request that ran them, including work on the
+  compute and I/O threads
+- a request with the ``X-CGM-Profile: 1`` header or the ``profile=1`` query
+  flag is profiled by a sampling profiler that reads the stacks of all busy
+  threads every ``PROFILE_INTERVAL`` seconds; the result is kept under the id
+  returned in the ``X-CGM-Profile-Id`` header. Concurrent requests running at
+  the same time show up in the samples as well.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+# Stage timing lives in app.utils so models and utilities can use it; re-exported here
+from app.utils.instrumentation import (  # pylint: disable=unused-import
+    LatencyHistogram, MetricsRegistry, instrumented, is_enabled, metrics, request_stages,
+    set_enabled, span
+)
+
+PROFILE_HEADER = b"x-cgm-profile"
+PROFILE_ID_HEADER = "X-CGM-Profile-Id"
+PROFILE_INTERVAL = float(os.environ.get("CGM_PROFILE_INTERVAL", "0.001"))
+PROFILE_HISTORY = 16
+PROFILE_TOP = 50
+# Leaf frames of threads that are waiting for work rather than running it
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+IDLE_FUNCTIONS = {"_worker", "_bootstrap_inner", "run_forever"}
+
+
+class StackSampler:
+    """Sampling profiler over the stacks of all busy threads"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration_s = 0.0
+        self._summary: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        """Whether a leaf frame belongs to a thread waiting for work"""
+        return (frame.f_code.co_name in IDLE_FUNCTIONS
+                or os.path.basename(frame.f_code.co_filename) in IDLE_FILES)
+
+    def _run(self) -> None:
+        """Sample until stopped"""
+        own = threading.get_ident()
+        start = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id == own or self._is_idle(frame):
+                    continue
+                names = []
+                while frame is not None:
+                    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+                    names.append(f"{module}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+        self.duration_s = time.perf_counter() - start
+
+    def start(self) -> "StackSampler":
+        """Start sampling in a background thread"""
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        """Stop sampling and summarize; later calls return the same summary
+        Returns:
+            dict: Sample counts, the most frequent folded stacks (root first,
+                frames separated by ``;``) and the functions seen most often,
+                inclusive and as the leaf
+        """
+        if self._summary is not None:
+            return self._summary
+        self._stop.set()
+        self._thread.join()
+        inclusive: Counter = Counter()
+        leaf: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            leaf[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        self._summary = {
+            "interval_ms": self.interval * 1000,
+            "duration_ms": self.duration_s * 1000,
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "count": count}
+                       for stack, count in self.stacks.most_common(PROFILE_TOP)],
+            "top_inclusive": inclusive.most_common(20),
+            "top_self": leaf.most_common(20),
+        }
+        return self._summary
+
+
+class ProfileStore:
+    """The most recent request profiles"""
+
+    def __init__(self, max_profiles: int = PROFILE_HISTORY) -> None:
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict) -> str:
+        """Store a profile and get its id"""
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        """Get a stored profile"""
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        """Get the id, route and duration of every stored profile"""
+        with self._lock:
+            return [{"id": profile_id, "route": profile["route"],
+                     "duration_ms": profile["duration_ms"]}
+                    for profile_id, profile in self._profiles.items()]
+
+
+profiles = ProfileStore()
+
+
+def _wants_profile(scope: dict) -> bool:
+    """Check the profiling header and query flag of a request"""
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER and value.strip() in (b"1", b"true"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1] in ("1", "true")
+
+
+def _route_name(scope: dict) -> str:
+    """Method and path template of a routed request"""
+    route = scope.get("route")
+    return f"{scope.get('method', '')} {getattr(route, 'path', 'unmatched')}"
+
+
+def _server_timing(stages: Dict[str, float], total_s: float) -> str:
+    """Format stage durations as a Server-Timing header value"""
+    entries = [f"{name.replace('.', '-')};dur={1000 * seconds:.3f}"
+               for name, seconds in stages.items()]
+    entries.append(f"total;dur={1000 * total_s:.3f}")
+    return ", ".join(entries)
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware timing requests and capturing requested profiles"""
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if not is_enabled() or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler().start() if _wants_profile(scope) else None
+        stages: Dict[str, float] = {}
+        token = request_stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stages, elapsed).encode()))
+                if sampler is not None:
+                    profile = sampler.stop()
+                    profile["route"] = _route_name(scope)
+                    profile["stages_ms"] = {name: 1000 * s for name, s in stages.items()}
+                    headers.append((PROFILE_ID_HEADER.lower().encode(),
+                                    profiles.add(profile).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stages.reset(token)
+            metrics.observe_route(_route_name(scope), time.perf_counter() - start)
+            if sampler is not None:
+                sampler.stop()
@@ -0,0 +1,248 @@
+"""Write-behind buffer for last viewed timestamps
+
+Playback updates the last viewed timestamp of a user on every tick. The buffer
+applies the "only move forward" rule in memory, keeps only the newest pending
+timestamp per user and writes the pending ones to the user repository:
+
+- every ``flush_interval`` seconds from a background thread,
+- as soon as ``max_dirty`` users have pending timestamps,
+- on shutdown.
+
+Reads are served from memory. An entry is read again from the repository once
+it is older than ``flush_interval`` seconds, so with several worker processes
+another worker sees a timestamp at most about two flush intervals old (one
+until the writer flushes, one until the reader reloads); the newer of the
+stored and the in-memory timestamp wins, and the repository itself still only
+moves timestamps forward. At most ``max_users`` entries are kept, the least
+recently used are dropped first.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from app.utils.instrumentation import span
+from app.services.user_store import get_user_repository
+from app.utils.timeparser import parse_timestamp_ns
+
+FLUSH_INTERVAL = float(os.environ.get("CGM_LAST_VIEWED_FLUSH_INTERVAL", "5"))
+MAX_DIRTY = int(os.environ.get("CGM_LAST_VIEWED_MAX_DIRTY", "256"))
+MAX_USERS = int(os.environ.get("CGM_LAST_VIEWED_MAX_USERS", "10000"))
+
+# Timestamp in epoch nanoseconds, the timestamp string and the monotonic time it
+# was read from the repository
+Entry = Tuple[Optional[int], Optional[str], float]
+
+logger = logging.getLogger(__name__)
+
+
+class LastViewedBuffer:
+    """In-memory last viewed table with periodic flushing to the user repository"""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_dirty: int = MAX_DIRTY,
+                 max_users: int = MAX_USERS) -> None:
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.max_users = max_users
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._dirty: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._updates = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._flushed = 0
+        self._flush_seconds_total = 0.0
+        self._flush_seconds_max = 0.0
+        self._flush_seconds_last = 0.0
+        self._loads = 0
+        self._evictions = 0
+
+    def _fresh(self, username: str) -> Optional[Entry]:
+        """Get the entry of a user if it was read recently; must be called with ``_lock`` held"""
+        entry = self._entries.get(username)
+        if entry is None or time.monotonic() - entry[2] >= self.flush_interval:
+            return None
+        self._entries.move_to_end(username)
+        return entry
+
+    def _entry(self, username: str) -> Optional[Entry]:
+        """Get the in-memory entry of a user, reading it from the repository when
+        missing or older than ``flush_interval``
+        The repository is read without holding ``_lock``; the newer of the stored
+        and the in-memory timestamp is kept.
+        """
+        with self._lock:
+            entry = self._fresh(username)
+        if entry is not None:
+            return entry
+
+        user = get_user_repository().get(username)
+        loaded_at = time.monotonic()
+        with self._lock:
+            entry = self._fresh(username)
+            if entry is not None:
+                return entry
+            if user is None:
+                return None
+            # The stored timestamp, unless a held or pending one is newer
+            stored = user.get("last_viewed_timestamp")
+            candidates = [(parse_timestamp_ns(stored), stored)] if stored else []
+            held = self._entries.get(username)
+            if held is not None and held[0] is not None:
+                candidates.append(held[:2])
+            pending = self._dirty.get(username)
+            if pending:
+                candidates.append((parse_timestamp_ns(pending), pending))
+            newest = max(candidates, key=lambda candidate: candidate[0], default=(None, None))
+            entry = (*newest, loaded_at)
+            self._loads += 1
+            self._insert(username, entry)
+            return entry
+
+    def _insert(self, username: str, entry: Entry) -> None:
+        """Store the entry of a user as the most recently used, dropping the least
+        recently used ones beyond ``max_users``; must be called with ``_lock`` held
+        """
+        self._entries[username] = entry
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def update(self, username: str, last_viewed_timestamp: str) -> bool:
+        """Move the last viewed timestamp of a user forward
+        Args:
+            username (str): The username of the user
+            last_viewed_timestamp (str): The new timestamp
+        Returns:
+            bool: True if the timestamp was updated, False if it was not newer
+                or the user does not exist
+        """
+        timestamp_ns = parse_timestamp_ns(last_viewed_timestamp)
+        entry = self._entry(username)
+        if entry is None:
+            return False
+        with self._lock:
+            current_ns, _, loaded_at = self._entries.get(username, entry)
+            if current_ns is not None and timestamp_ns <= current_ns:
+                return False
+            self._updates += 1
+            if username in self._dirty:
+                self._coalesced += 1
+            self._insert(username, (timestamp_ns, last_viewed_timestamp, loaded_at))
+            self._dirty[username] = last_viewed_timestamp
+            should_flush = len(self._dirty) >= self.max_dirty
+
+        if should_flush:
+            self.flush()
+        return True
+
+    def get(self, username: str) -> Optional[str]:
+        """Get the last viewed timestamp of a user
+        Args:
+            username (str): The username of the user
+        Returns:
+            Optional[str]: The timestamp, or None if unset or the user does not exist
+        """
+        entry = self._entry(username)
+        return entry[1] if entry is not None else None
+
+    def flush(self) -> int:
+        """Write all pending timestamps to the user repository
+        Returns:
+            int: Number of written users
+        """
+        with self._flush_lock, span("last_viewed.flush"):
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+
+            start = time.perf_counter()
+            repository = get_user_repository()
+            try:
+                for username, timestamp in dirty.items():
+                    repository.update_last_viewed(username, timestamp)
+            except Exception:
+                # Keep the timestamps for the next flush unless newer ones arrived
+                with self._lock:
+                    for username, timestamp in dirty.items():
+                        self._dirty.setdefault(username, timestamp)
+                raise
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._flushes += 1
+                self._flushed += len(dirty)
+                self._flush_seconds_total += elapsed
+                self._flush_seconds_last = elapsed
+                self._flush_seconds_max = max(self._flush_seconds_max, elapsed)
+            return len(dirty)
+
+    def _run(self) -> None:
+        """Flush periodically until stopped"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Flushing last viewed timestamps failed")
+
+    def start(self) -> None:
+        """Start the background flush thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="last-viewed-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background flush thread and flush pending timestamps"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def metrics(self) -> dict:
+        """Get update, coalescing and flush counters
+        Returns:
+            dict: Counters and flush latencies in milliseconds
+        """
+        with self._lock:
+            return {
+                "updates": self._updates,
+                "coalesced": self._coalesced,
+                "dirty": len(self._dirty),
+                "cached_users": len(self._entries),
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "flushes": self._flushes,
+                "flushed": self._flushed,
+                "flush_ms_total": self._flush_seconds_total * 1000,
+                "flush_ms_last": self._flush_seconds_last * 1000,
+                "flush_ms_max": self._flush_seconds_max * 1000,
+            }
+
+
+_buffer = LastViewedBuffer()
+
+
+def get_last_viewed_buffer() -> LastViewedBuffer:
+    """Get the process-wide last viewed buffer"""
+    return _buffer
+
+
+def set_last_viewed_buffer(buffer: LastViewedBuffer) -> None:
+    """Replace the process-wide last viewed buffer, flushing the old one
+    Args:
+        buffer (LastViewedBuffer): New buffer
+    """
+    global _buffer
+    if _buffer is not buffer:
+        _buffer.stop()
+    _buffer = buffer
@@ -0,0 +1,222 @@
+"""Server-pushed live playback
+
+A client subscribes once over ``/ws/playback``; afterwards the server drives
+the playback clock. A ``PlaybackCursor`` keeps the user's already-loaded column
+arrays and rolling index and moves a row index forward by one sample per step,
+so a step costs two O(1) lookups instead of re-windowing the data. Steps are
+cheap enough to run on the event loop; snapshots, which hold the whole plot
+window (up to 25,920 rows for 90 days), are built and encoded on the compute
+pool.
+
+Messages sent to the client:
+
+- ``{"type": "snapshot", "date", "glucose", "window_start", "window_end", "stats"}``
+  with the whole plot window, first and after a window change
+- ``{"type": "tick", ...}`` with the same fields, where ``glucose`` only holds
+  the sample that entered the window; older samples than ``window_start`` drop out
+- ``{"type": "end", "date"}`` when the data is exhausted
+
+The last viewed timestamp follows the playback every ``PERSIST_INTERVAL``
+seconds and when the stream closes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.models.playback import PlaybackControl, PlaybackSubscribe
+from app.services.executor import run_compute, run_io
+from app.services.timestamps import update_last_viewed
+from app.utils.rolling import RollingIndex
+from app.utils.stats import window_stats
+from app.utils.timeparser import TIME_INTERVALS, parse_timestamp_ns
+
+PERSIST_INTERVAL = float(os.environ.get("CGM_PLAYBACK_PERSIST_INTERVAL", "5"))
+MIN_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+def _check_time_mod(time_mod: str) -> str:
+    """Validate a time interval string"""
+    if time_mod not in TIME_INTERVALS:
+        raise ValueError(f"Unknown time_mod: {time_mod}")
+    return time_mod
+
+
+class PlaybackCursor:
+    """Playback position over the rows of one user
+
+    The position is the row of the current playback date. As with ``/api/tick``
+    the plot and stats windows end with the first sample after that date.
+    """
+
+    def __init__(self, partition: Dict[str, np.ndarray], rolling: RollingIndex,
+                 plot_time_mod: str = "1h", stats_time_mod: str = "1d",
+                 start: Optional[str] = None) -> None:
+        self.partition = partition
+        self.rolling = rolling
+        self.plot_time_mod = _check_time_mod(plot_time_mod)
+        self.stats_time_mod = _check_time_mod(stats_time_mod)
+        self._times = partition["time"].view("i8")
+        self._start = start
+        if start:
+            self.position = int(np.searchsorted(self._times, parse_timestamp_ns(start),
+                                                side="right")) - 1
+        else:
+            self.position = 0
+
+    @property
+    def end(self) -> int:
+        """Row after the last one of the windows"""
+        return min(self.position + 2, len(self._times))
+
+    @property
+    def finished(self) -> bool:
+        """Whether there is no later sample to move to"""
+        return self.position + 1 >= len(self._times)
+
+    @property
+    def date(self) -> Optional[str]:
+        """Current playback date"""
+        if self.position < 0 or not len(self._times):
+            return self._start
+        return self._iso(self.position)
+
+    def _iso(self, row: int) -> str:
+        """ISO timestamp of a row"""
+        return pd.Timestamp(self._times[row]).isoformat()
+
+    def _window_start(self, time_mod: str) -> int:
+        """First row of the window of a time interval"""
+        return max(0, self.end - int(TIME_INTERVALS[time_mod] * 12))
+
+    def _records(self, start: int, end: int) -> List[dict]:
+        """Glucose records of a row range"""
+        glucose = self.partition["glucose"][start:end]
+        values = np.where(np.isnan(glucose), None, glucose).tolist()
+        return [{"timestamps": self._iso(row), "glucose": value}
+                for row, value in zip(range(start, end), values)]
+
+    def _message(self, kind: str, first: int) -> dict:
+        """Build a snapshot or tick message with the glucose rows from ``first``"""
+        end = self.end
+        start = self._window_start(self.plot_time_mod)
+        return {
+            "type": kind,
+            "date": self.date,
+            "glucose": self._records(max(first, start), end),
+            "window_start": self._iso(start) if end else None,
+            "window_end": self._iso(end - 1) if end else None,
+            "stats": window_stats(self.rolling, self._window_start(self.stats_time_mod), end,
+                                  self.stats_time_mod),
+        }
+
+    def snapshot(self) -> dict:
+        """Get the whole plot window and the stats at the current date"""
+        return self._message("snapshot", 0)
+
+    def snapshot_text(self) -> str:
+        """Get the snapshot encoded as a JSON text message"""
+        return json.dumps(self.snapshot(), separators=(",", ":"))
+
+    def advance(self) -> Optional[dict]:
+        """Move to the next sample
+        Returns:
+            Optional[dict]: Tick message, or None if the playback is finished
+        """
+        if self.finished:
+            return None
+        previous_end = self.end
+        self.position += 1
+        return self._message("tick", previous_end)
+
+
+async def stream_playback(websocket: WebSocket, cursor: PlaybackCursor,
+                          subscription: PlaybackSubscribe) -> None:
+    """Push playback messages until the client disconnects
+    Args:
+        websocket (WebSocket): Accepted connection
+        cursor (PlaybackCursor): Cursor at the start date
+        subscription (PlaybackSubscribe): Subscription message of the client
+    """
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    state = {"interval": max(subscription.interval, MIN_INTERVAL), "paused": False,
+             "snapshot": False, "closed": False}
+
+    async def receive_controls() -> None:
+        try:
+            while True:
+                try:
+                    control = PlaybackControl(**await websocket.receive_json())
+                    if control.plot_time_mod is not None:
+                        cursor.plot_time_mod = _check_time_mod(control.plot_time_mod)
+                        state["snapshot"] = True
+                    if control.stats_time_mod is not None:
+                        cursor.stats_time_mod = _check_time_mod(control.stats_time_mod)
+                        state["snapshot"] = True
+                except (ValidationError, ValueError, TypeError) as exc:
+                    await websocket.send_json({"type": "error", "detail": str(exc)})
+                    continue
+                if control.interval is not None:
+                    state["interval"] = max(control.interval, MIN_INTERVAL)
+                if control.paused is not None:
+                    state["paused"] = control.paused
+                wakeup.set()
+        except WebSocketDisconnect:
+            state["closed"] = True
+            wakeup.set()
+
+    async def send_snapshot() -> None:
+        await websocket.send_text(await run_compute(cursor.snapshot_text))
+
+    async def persist() -> None:
+        if subscription.username and cursor.date:
+            await run_io(update_last_viewed, subscription.username, cursor.date)
+
+    receiver = asyncio.create_task(receive_controls())
+    last_step = loop.time()
+    next_step = last_step + state["interval"]
+    next_persist = loop.time() + PERSIST_INTERVAL
+    try:
+        await send_snapshot()
+        if cursor.finished:
+            await websocket.send_json({"type": "end", "date": cursor.date})
+        while not state["closed"]:
+            idle = state["paused"] or cursor.finished
+            try:
+                await asyncio.wait_for(wakeup.wait(), None if idle else next_step - loop.time())
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            if state["closed"]:
+                break
+            next_step = min(next_step, last_step + state["interval"])
+            if state["snapshot"]:
+                state["snapshot"] = False
+                await send_snapshot()
+            if state["paused"] or cursor.finished or loop.time() < next_step:
+                continue
+
+            await websocket.send_json(cursor.advance())
+            last_step = loop.time()
+            next_step = max(next_step + state["interval"], last_step)
+            if cursor.finished:
+                await websocket.send_json({"type": "end", "date": cursor.date})
+            if loop.time() >= next_persist:
+                next_persist = loop.time() + PERSIST_INTERVAL
+                await persist()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        try:
+            await persist()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Saving the playback position failed")
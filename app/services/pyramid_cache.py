@@ -0,0 +1,83 @@
+"""Process-wide LRU cache of per-user downsampling pyramids
+
+A pyramid is built from a user's glucose column on the first downsampled
+request and kept for the dataset version it was built from: the key holds the
+dataset path and modification time, so a reloaded dataset never serves stale
+levels. The least recently used pyramids are dropped beyond
+``CGM_PYRAMID_CACHE_USERS`` entries.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+from app.models.dataset import Dataset
+from app.utils.downsample import DownsamplePyramid
+
+PYRAMID_CACHE_USERS = int(os.environ.get("CGM_PYRAMID_CACHE_USERS", "256"))
+
+PyramidKey = Tuple[str, int, int]
+
+
+class PyramidCache:
+    """Thread-safe LRU cache of downsampling pyramids"""
+
+    def __init__(self, max_entries: int = PYRAMID_CACHE_USERS) -> None:
+        self.max_entries = max_entries
+        self._pyramids: "OrderedDict[PyramidKey, DownsamplePyramid]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, dataset: Dataset, user_id: int) -> DownsamplePyramid:
+        """Get the pyramid of a user's glucose series, building it if missing
+        Args:
+            dataset (Dataset): Dataset the user belongs to
+            user_id (int): The ID of the user
+        Returns:
+            DownsamplePyramid: Pyramid with rows local to the user's partition
+        Raises:
+            ValueError: If the user is not in the dataset
+        """
+        key = (dataset.path, dataset.mtime_ns, user_id)
+        with self._lock:
+            pyramid = self._pyramids.get(key)
+            if pyramid is not None:
+                self._pyramids.move_to_end(key)
+                self._hits += 1
+                return pyramid
+
+        partition = dataset.partition(user_id)
+        pyramid = DownsamplePyramid(partition["time"].view("i8"), partition["glucose"])
+        with self._lock:
+            self._misses += 1
+            self._pyramids[key] = pyramid
+            self._pyramids.move_to_end(key)
+            while len(self._pyramids) > self.max_entries:
+                self._pyramids.popitem(last=False)
+                self._evictions += 1
+        return pyramid
+
+    def clear(self) -> None:
+        """Drop all pyramids"""
+        with self._lock:
+            self._pyramids.clear()
+
+    def stats(self) -> dict:
+        """Get hit counters and memory usage
+        Returns:
+            dict: Counters, number of cached pyramids and their index bytes
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._pyramids),
+                "max_entries": self.max_entries,
+                "nbytes": sum(pyramid.nbytes for pyramid in self._pyramids.values()),
+            }
+
+
+pyramid_cache = PyramidCache()
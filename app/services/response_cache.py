@@ -0,0 +1,164 @@
+"""Process-wide LRU cache of encoded window responses
+
+The datasets only change when their file is reloaded, so a window query is a
+pure function of its parameters and the dataset version (path and
+modification time). Responses are cached as encoded bytes under a key of
+those values; a hit skips loading, slicing and encoding.
+
+The ``ETag`` is a hash of the same key, so a matching ``If-None-Match`` is
+answered with 304 before anything is computed or looked up. The cache is
+bounded by ``CGM_RESPONSE_CACHE_ENTRIES`` entries and
+``CGM_RESPONSE_CACHE_BYTES`` bytes, dropping the least recently used ones;
+``CGM_RESPONSE_CACHE_CONTROL`` sets the ``Cache-Control`` header.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+from fastapi import Response
+
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("CGM_RESPONSE_CACHE_ENTRIES", "1024"))
+RESPONSE_CACHE_BYTES = int(os.environ.get("CGM_RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+CACHE_CONTROL = os.environ.get("CGM_RESPONSE_CACHE_CONTROL", "private, max-age=0, must-revalidate")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Encoded response body
+    Attributes:
+        body (bytes): Encoded content
+        media_type (str): Content type of the body
+    """
+    body: bytes
+    media_type: str
+
+
+def make_etag(key: Hashable) -> str:
+    """Derive a strong entity tag from a cache key
+    Args:
+        key (Hashable): Cache key including the dataset version
+    Returns:
+        str: Quoted entity tag
+    """
+    return '"' + hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an ``If-None-Match`` header against an entity tag
+    Args:
+        if_none_match (Optional[str]): Header value, a list of tags or ``*``
+        etag (str): Quoted entity tag of the current representation
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of encoded responses"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._responses: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """Get a cached response, counting the hit or miss
+        Args:
+            key (Hashable): Cache key
+        Returns:
+            Optional[CachedResponse]: The response, or None if not cached
+        """
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is None:
+                self._misses += 1
+                return None
+            self._responses.move_to_end(key)
+            self._hits += 1
+            return cached
+
+    def put(self, key: Hashable, cached: CachedResponse) -> None:
+        """Store a response, evicting the least recently used ones over the limits
+        Responses larger than the byte limit are not stored.
+        Args:
+            key (Hashable): Cache key
+            cached (CachedResponse): Encoded response
+        """
+        size = len(cached.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._responses.pop(key, None)
+            if previous is not None:
+                self._nbytes -= len(previous.body)
+            self._responses[key] = cached
+            self._nbytes += size
+            while len(self._responses) > self.max_entries or self._nbytes > self.max_bytes:
+                _, evicted = self._responses.popitem(last=False)
+                self._nbytes -= len(evicted.body)
+                self._evictions += 1
+
+    def record_not_modified(self) -> None:
+        """Count a request answered with 304"""
+        with self._lock:
+            self._not_modified += 1
+
+    def clear(self) -> None:
+        """Drop all responses and reset the counters"""
+        with self._lock:
+            self._responses.clear()
+            self._nbytes = 0
+            self._hits = self._misses = self._evictions = self._not_modified = 0
+
+    def stats(self) -> dict:
+        """Get the counters and the memory usage
+        Returns:
+            dict: Hit, miss, eviction and 304 counters, entries and body bytes
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "not_modified": self._not_modified,
+                "entries": len(self._responses),
+                "max_entries": self.max_entries,
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def cached_response(cached: CachedResponse, etag: str) -> Response:
+    """Build a response from cached bytes with the caching headers"""
+    return Response(content=cached.body, media_type=cached.media_type, headers={
+        "ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept",
+    })
+
+
+def not_modified_response(etag: str) -> Response:
+    """Build a 304 response for a current client copy"""
+    return Response(status_code=304, headers={
+        "ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept",
+    })
+
+
+response_cache = ResponseCache()
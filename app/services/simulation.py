@@ -0,0 +1,654 @@
+"""Server-side simulation of many patients on virtual clocks with threshold alerts
+
+A simulation session replays the samples of one data user (real or synthetic)
+on a virtual clock that the server advances, instead of a browser tab driving
+``/api/tick`` or ``/ws/playback``. ``SimulationEngine`` keeps every session in
+one slot of a set of arrays, so a tick handles all sessions in a few
+vectorized steps instead of once per session:
+
+- the clocks of the running sessions move forward by the elapsed wall time
+  times ``CGM_SIMULATION_RATE`` (virtual seconds per second, by default one
+  5-minute sample per second) times the speed of the session
+- every slot holds a chunk of the next ``CGM_SIMULATION_CHUNK`` samples of
+  its user, so the current sample of all sessions is found by one comparison
+  of the chunks with the clocks. A session reaching the end of its chunk
+  loads the next one from the dataset, which happens once per chunk
+- the glucose and heart rate of the current samples are compared with the
+  low and high thresholds of each session; alerts are edge-triggered, an
+  event is raised when a level changes (e.g. from ``normal`` to ``low`` and
+  back), not on every tick it stays out of range. Missing values keep the
+  previous level
+
+Events go to a bounded queue that clients poll by sequence number
+(``/api/simulation/alerts``) and to the subscribers of ``AlertHub``
+(``/ws/simulation/alerts``). ``run_simulation`` ticks the process-wide engine
+every ``CGM_SIMULATION_TICK_INTERVAL`` seconds on the compute pool while the
+application is up. Sessions opened with a username move that user's last
+viewed timestamp along every ``PERSIST_INTERVAL`` seconds, as playback does.
+
+Events:
+
+- ``{"type": "alert", "seq", "session_id", "user_id", "date", "metric",
+  "level", "previous", "value", "threshold"}`` where ``metric`` is
+  ``glucose`` or ``heart_rate`` and the levels are ``low``, ``normal`` or
+  ``high``; ``threshold`` is the crossed limit, None when back to normal
+- ``{"type": "end", "seq", "session_id", "user_id", "date"}`` when a session
+  reaches the last sample of its user
+- ``{"type": "error", "seq", "session_id", "user_id", "date", "detail"}`` when
+  the next samples of a session cannot be loaded; the session is finished
+  and the other sessions go on
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from app.services.data_loader import get_user_columns
+from app.services.executor import run_compute, run_io
+from app.services.playback import PERSIST_INTERVAL
+from app.services.timestamps import update_last_viewed
+from app.utils.timeparser import parse_timestamp_ns
+
+SIMULATION_TICK_INTERVAL = float(os.environ.get("CGM_SIMULATION_TICK_INTERVAL", "1"))
+SIMULATION_RATE = float(os.environ.get("CGM_SIMULATION_RATE", "300"))
+SIMULATION_CHUNK = int(os.environ.get("CGM_SIMULATION_CHUNK", "288"))
+SIMULATION_MAX_SESSIONS = int(os.environ.get("CGM_SIMULATION_MAX_SESSIONS", "50000"))
+SIMULATION_EVENT_HISTORY = int(os.environ.get("CGM_SIMULATION_EVENT_HISTORY", "10000"))
+SUBSCRIBER_QUEUE = int(os.environ.get("CGM_SIMULATION_SUBSCRIBER_QUEUE", "1000"))
+MIN_SPEED = 0.01
+MAX_SPEED = 1000.0
+INITIAL_SLOTS = 64
+# Glucose limits of the consensus target range; heart rate limits of an adult at rest
+DEFAULT_THRESHOLDS = {"glucose_low": 70.0, "glucose_high": 180.0,
+                      "heart_rate_low": 50.0, "heart_rate_high": 120.0}
+THRESHOLD_NAMES = tuple(DEFAULT_THRESHOLDS)
+METRICS = ("glucose", "heart_rate")
+# Level -1, 0 and 1 of a metric
+LEVELS = ("low", "normal", "high")
+# Time of the unused columns of a chunk; no clock reaches it
+PADDING_NS = np.iinfo(np.int64).max
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a session is started while ``max_sessions`` are running"""
+
+
+def _clamp_speed(speed: float) -> float:
+    """Limit a speed multiplier to ``[MIN_SPEED, MAX_SPEED]``
+    Raises:
+        ValueError: If the speed is not a finite number
+    """
+    speed = float(speed)
+    if not np.isfinite(speed):
+        raise ValueError(f"Speed must be finite, got {speed}")
+    return min(max(speed, MIN_SPEED), MAX_SPEED)
+
+
+def _iso_dates(times_ns: np.ndarray) -> List[str]:
+    """ISO timestamps to the second of epoch nanoseconds; samples fall on whole seconds"""
+    return np.datetime_as_string(times_ns.view("M8[ns]"), unit="s").tolist()
+
+
+def _iso(time_ns: int) -> str:
+    """ISO timestamp to the second of epoch nanoseconds"""
+    return _iso_dates(np.array([time_ns], dtype=np.int64))[0]
+
+
+def _check_thresholds(thresholds: Optional[Dict[str, Optional[float]]]) -> Dict[int, float]:
+    """Map threshold names to their column in the engine arrays, dropping None values
+    Raises:
+        ValueError: If a name is not one of ``THRESHOLD_NAMES`` or a value is not finite
+    """
+    columns = {}
+    for name, value in (thresholds or {}).items():
+        if name not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown threshold: {name}")
+        if value is not None:
+            if not np.isfinite(value):
+                raise ValueError(f"Threshold {name} must be finite, got {value}")
+            columns[THRESHOLD_NAMES.index(name)] = float(value)
+    return columns
+
+
+def _optional(value: float) -> Optional[float]:
+    """Float of a sample value, None where missing"""
+    return None if np.isnan(value) else float(value)
+
+
+@dataclass(frozen=True)
+class Session:
+    """A simulated patient; the clock and samples live in the engine arrays
+    Attributes:
+        session_id (str): Public id of the session
+        slot (int): Row of the session in the engine arrays
+        user_id (int): ID of the data user (real or synthetic)
+        real_data (bool): Whether the user is from the real dataset
+        username (Optional[str]): Account whose last viewed timestamp follows
+            the session, if any
+    """
+    session_id: str
+    slot: int
+    user_id: int
+    real_data: bool
+    username: Optional[str] = None
+
+
+class SimulationEngine:
+    """Virtual clocks and threshold alerts of many patients, one array slot each"""
+
+    def __init__(self, rate: float = SIMULATION_RATE, chunk: int = SIMULATION_CHUNK,
+                 max_sessions: int = SIMULATION_MAX_SESSIONS,
+                 history: int = SIMULATION_EVENT_HISTORY) -> None:
+        self.rate = rate
+        self.chunk = chunk
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # Serializes ticks, which load chunks between two holds of ``_lock``
+        self._tick_lock = threading.Lock()
+        self._sessions: Dict[str, Session] = {}
+        self._slot_sessions: List[Optional[Session]] = []
+        self._free: List[int] = []
+        self._size = 0
+        self._events: deque = deque(maxlen=history)
+        self._seq = 0
+        self._ticks = 0
+        self._alerts = 0
+        self._refills = 0
+        self._errors = 0
+        self._tick_seconds_total = 0.0
+        self._tick_seconds_last = 0.0
+        self._tick_seconds_max = 0.0
+        self._allocate(INITIAL_SLOTS)
+
+    def _allocate(self, capacity: int) -> None:
+        """Create the slot arrays with room for ``capacity`` sessions, keeping the used ones"""
+        size = self._size
+        arrays = {
+            "_used": np.zeros(capacity, dtype=bool),
+            "_generation": np.zeros(capacity, dtype=np.int64),
+            "_paused": np.zeros(capacity, dtype=bool),
+            "_finished": np.zeros(capacity, dtype=bool),
+            "_speed": np.ones(capacity),
+            "_clock": np.zeros(capacity, dtype=np.int64),
+            "_offset": np.zeros(capacity, dtype=np.int64),
+            "_length": np.zeros(capacity, dtype=np.int64),
+            "_rows": np.zeros(capacity, dtype=np.int64),
+            "_column": np.full(capacity, -1, dtype=np.int64),
+            "_thresholds": np.zeros((capacity, len(THRESHOLD_NAMES))),
+            "_levels": np.zeros((capacity, len(METRICS)), dtype=np.int8),
+            "_times": np.full((capacity, self.chunk), PADDING_NS, dtype=np.int64),
+            "_glucose": np.full((capacity, self.chunk), np.nan),
+            "_heart_rate": np.full((capacity, self.chunk), np.nan),
+        }
+        for name, array in arrays.items():
+            if size:
+                array[:size] = getattr(self, name)[:size]
+            setattr(self, name, array)
+        self._slot_sessions.extend([None] * (capacity - len(self._slot_sessions)))
+
+    def _take_slot(self) -> int:
+        """Get a free slot, growing the arrays when all are used"""
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._used):
+            self._allocate(2 * self._size)
+        self._size += 1
+        return self._size - 1
+
+    def _fill(self, slot: int, columns: Dict[str, np.ndarray], row: int) -> None:
+        """Load the chunk of a slot from a source row on and find the current column"""
+        times = columns["time"].view("i8")
+        stop = min(row + self.chunk, len(times))
+        n = stop - row
+        self._times[slot, :n] = times[row:stop]
+        self._times[slot, n:] = PADDING_NS
+        self._glucose[slot, :n] = columns["glucose"][row:stop]
+        self._heart_rate[slot, :n] = columns["heart_rate"][row:stop]
+        self._offset[slot] = row
+        self._length[slot] = n
+        self._rows[slot] = len(times)
+        self._column[slot] = np.searchsorted(self._times[slot, :n], self._clock[slot],
+                                             side="right") - 1
+
+    def _refill(self, slot: int, columns: Dict[str, np.ndarray]) -> None:
+        """Load the chunk of a slot that starts at its current sample"""
+        times = columns["time"].view("i8")
+        row = int(np.searchsorted(times, self._clock[slot], side="right")) - 1
+        self._fill(slot, columns, max(row, 0))
+        self._refills += 1
+
+    def create(self, user_id: int, real_data: bool = False, start: Optional[str] = None,
+               speed: float = 1.0, paused: bool = False, username: Optional[str] = None,
+               thresholds: Optional[Dict[str, Optional[float]]] = None) -> dict:
+        """Start a simulation session
+        Args:
+            user_id (int): ID of the data user (real or synthetic)
+            real_data (bool, optional): Whether to use real data. Defaults to False
+            start (Optional[str], optional): Virtual time to start at. Defaults
+                to the first sample of the user
+            speed (float, optional): Speed multiplier of the clock. Defaults to 1.0
+            paused (bool, optional): Whether to start paused. Defaults to False
+            username (Optional[str], optional): Account whose last viewed
+                timestamp follows the session. Defaults to None
+            thresholds (Optional[Dict[str, Optional[float]]], optional): Alert
+                thresholds replacing ``DEFAULT_THRESHOLDS``. Defaults to None
+        Returns:
+            dict: State of the new session (see ``state``)
+        Raises:
+            ValueError: If the user is out of range or has no samples, the
+                start is not a timestamp, the speed is not finite or a
+                threshold is unknown or not finite
+            SessionLimitError: If ``max_sessions`` sessions are open
+        """
+        columns = get_user_columns(user_id, real_data)
+        times = columns["time"].view("i8")
+        if not len(times):
+            raise ValueError(f"User {user_id} has no samples")
+        clock = parse_timestamp_ns(start) if start else int(times[0])
+        limits = _check_thresholds(thresholds)
+        speed = _clamp_speed(speed)
+        row = max(int(np.searchsorted(times, clock, side="right")) - 1, 0)
+
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(
+                    f"Too many simulation sessions (limit {self.max_sessions})")
+            slot = self._take_slot()
+            self._thresholds[slot] = list(DEFAULT_THRESHOLDS.values())
+            for column, value in limits.items():
+                self._thresholds[slot, column] = value
+            session = Session(uuid.uuid4().hex[:12], slot, user_id, real_data, username)
+            self._sessions[session.session_id] = session
+            self._slot_sessions[slot] = session
+            self._used[slot] = True
+            self._generation[slot] += 1
+            self._paused[slot] = paused
+            self._finished[slot] = False
+            self._speed[slot] = speed
+            self._clock[slot] = clock
+            self._levels[slot] = 0
+            self._fill(slot, columns, row)
+            return self._state(session)
+
+    def update(self, session_id: str, speed: Optional[float] = None,
+               paused: Optional[bool] = None,
+               thresholds: Optional[Dict[str, Optional[float]]] = None) -> Optional[dict]:
+        """Change the speed, pause state or thresholds of a session; None keeps a value
+        Args:
+            session_id (str): Id of the session
+            speed (Optional[float], optional): New speed multiplier. Defaults to None
+            paused (Optional[bool], optional): Pause or resume. Defaults to None
+            thresholds (Optional[Dict[str, Optional[float]]], optional): New
+                alert thresholds. Defaults to None
+        Returns:
+            Optional[dict]: State of the session, None if there is no such session
+        Raises:
+            ValueError: If the speed or a threshold is not finite, or a threshold is unknown
+        """
+        limits = _check_thresholds(thresholds)
+        if speed is not None:
+            speed = _clamp_speed(speed)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            for column, value in limits.items():
+                self._thresholds[session.slot, column] = value
+            if speed is not None:
+                self._speed[session.slot] = speed
+            if paused is not None:
+                self._paused[session.slot] = paused
+            return self._state(session)
+
+    def remove(self, session_id: str) -> bool:
+        """Stop a session
+        Args:
+            session_id (str): Id of the session
+        Returns:
+            bool: Whether the session existed
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._used[session.slot] = False
+            self._slot_sessions[session.slot] = None
+            self._free.append(session.slot)
+            return True
+
+    def _state(self, session: Session) -> dict:
+        """State of a session; the caller holds the lock"""
+        slot = session.slot
+        column = int(self._column[slot])
+        current = column >= 0
+        return {
+            "session_id": session.session_id,
+            "user_id": session.user_id,
+            "real_data": session.real_data,
+            "username": session.username,
+            "clock": _iso(self._clock[slot]),
+            "date": _iso(self._times[slot, column]) if current else None,
+            "glucose": _optional(self._glucose[slot, column]) if current else None,
+            "heart_rate": _optional(self._heart_rate[slot, column]) if current else None,
+            "speed": float(self._speed[slot]),
+            "paused": bool(self._paused[slot]),
+            "finished": bool(self._finished[slot]),
+            "levels": {metric: LEVELS[self._levels[slot, i] + 1]
+                       for i, metric in enumerate(METRICS)},
+            "thresholds": dict(zip(THRESHOLD_NAMES, self._thresholds[slot].tolist())),
+        }
+
+    def state(self, session_id: str) -> Optional[dict]:
+        """Get the state of a session
+        Args:
+            session_id (str): Id of the session
+        Returns:
+            Optional[dict]: Clock, current sample and its date, levels, speed,
+                pause state and thresholds, None if there is no such session
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return None if session is None else self._state(session)
+
+    def states(self) -> List[dict]:
+        """Get the state of every session
+        Returns:
+            List[dict]: States in creation order
+        """
+        with self._lock:
+            return [self._state(session) for session in self._sessions.values()]
+
+    @staticmethod
+    def _load_chunks(sessions: List[Tuple[int, Session]]) -> Tuple[Dict[int, dict], Dict[int, str]]:
+        """Load the columns of the users of sessions; one failing user only fails its sessions
+        Returns:
+            Tuple[Dict[int, dict], Dict[int, str]]: Columns by slot and error
+                messages by slot
+        """
+        users: Dict[Tuple[int, bool], object] = {}
+        loaded, failed = {}, {}
+        for slot, session in sessions:
+            key = (session.user_id, session.real_data)
+            if key not in users:
+                try:
+                    users[key] = get_user_columns(*key)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.exception("Loading samples of simulation session %s failed",
+                                     session.session_id)
+                    users[key] = exc
+            if isinstance(users[key], Exception):
+                failed[slot] = str(users[key])
+            else:
+                loaded[slot] = users[key]
+        return loaded, failed
+
+    def tick(self, elapsed_s: float) -> List[dict]:
+        """Advance the clocks of the running sessions and evaluate the thresholds
+        Sessions at the end of their chunk get the next one, loaded without
+        holding the engine lock, so other calls are not held up when a user's
+        dataset has to be loaded or generated. A session whose samples cannot
+        be loaded is finished with an error event.
+        Args:
+            elapsed_s (float): Wall seconds since the previous tick
+        Returns:
+            List[dict]: Alert, end and error events raised by this tick
+        """
+        started = time.perf_counter()
+        with self._tick_lock:
+            with self._lock:
+                n = self._size
+                running = self._used[:n] & ~self._paused[:n] & ~self._finished[:n]
+                step_ns = np.rint(self._speed[:n] * (self.rate * elapsed_s * 1e9)).astype(np.int64)
+                self._clock[:n] += np.where(running, step_ns, 0)
+                columns = np.count_nonzero(self._times[:n] <= self._clock[:n, None], axis=1) - 1
+                self._column[:n] = np.where(running, columns, self._column[:n])
+
+                at_chunk_end = running & (self._column[:n] == self._length[:n] - 1) \
+                    & (self._offset[:n] + self._length[:n] < self._rows[:n])
+                refills = [(slot, self._slot_sessions[slot])
+                           for slot in np.flatnonzero(at_chunk_end).tolist()]
+                generations = self._generation[:n].copy()
+
+            loaded, failed = self._load_chunks(refills)
+
+            with self._lock:
+                # Sessions removed (or slots reused) while the chunks were loading are skipped
+                running &= self._used[:n] & (self._generation[:n] == generations)
+                for slot, columns in loaded.items():
+                    if running[slot]:
+                        self._refill(slot, columns)
+                failed_slots = np.array([slot for slot in failed if running[slot]],
+                                        dtype=np.int64)
+                self._finished[failed_slots] = True
+                self._errors += len(failed_slots)
+                running[failed_slots] = False
+
+                events = self._evaluate(np.flatnonzero(running & (self._column[:n] >= 0)))
+                ended = np.flatnonzero(running & (self._offset[:n] + self._column[:n] + 1
+                                                  >= self._rows[:n]))
+                self._finished[ended] = True
+                events += self._add_events(ended, [{"type": "end"}] * len(ended))
+                events += self._add_events(failed_slots, [
+                    {"type": "error", "detail": failed[slot]} for slot in failed_slots.tolist()])
+
+                elapsed = time.perf_counter() - started
+                self._ticks += 1
+                self._tick_seconds_total += elapsed
+                self._tick_seconds_last = elapsed
+                self._tick_seconds_max = max(self._tick_seconds_max, elapsed)
+                return events
+
+    def _evaluate(self, slots: np.ndarray) -> List[dict]:
+        """Compare the current samples of slots with their thresholds and raise level changes"""
+        columns = self._column[slots]
+        values = np.stack((self._glucose[slots, columns], self._heart_rate[slots, columns]),
+                          axis=1)
+        thresholds = self._thresholds[slots]
+        low, high = thresholds[:, 0::2], thresholds[:, 1::2]
+        levels = (values > high).astype(np.int8) - (values < low).astype(np.int8)
+        previous = self._levels[slots]
+        levels = np.where(np.isnan(values), previous, levels)
+        self._levels[slots] = levels
+
+        rows, metrics = np.nonzero(levels != previous)
+        changed, before = levels[rows, metrics].tolist(), previous[rows, metrics].tolist()
+        limits = thresholds[rows, 2 * metrics + (levels[rows, metrics] > 0)].tolist()
+        fields = [
+            {"type": "alert", "metric": METRICS[metric], "level": LEVELS[level + 1],
+             "previous": LEVELS[old + 1], "value": value, "threshold": limit if level else None}
+            for metric, level, old, value, limit in zip(
+                metrics.tolist(), changed, before, values[rows, metrics].tolist(), limits)
+        ]
+        self._alerts += len(fields)
+        return self._add_events(slots[rows], fields)
+
+    def _add_events(self, slots: np.ndarray, fields: List[dict]) -> List[dict]:
+        """Number the events of slots at their current samples and add them to the queue"""
+        dates = _iso_dates(self._times[slots, self._column[slots]])
+        events = []
+        for slot, date, extra in zip(slots.tolist(), dates, fields):
+            session = self._slot_sessions[slot]
+            self._seq += 1
+            events.append({"type": extra["type"], "seq": self._seq,
+                           "session_id": session.session_id, "user_id": session.user_id,
+                           "date": date, **extra})
+        self._events.extend(events)
+        return events
+
+    def events(self, after: int = 0, limit: int = 100,
+               session_id: Optional[str] = None) -> List[dict]:
+        """Get queued events, oldest first
+        Only the last ``CGM_SIMULATION_EVENT_HISTORY`` events are kept.
+        Args:
+            after (int, optional): Only events with a larger ``seq``. Defaults to 0
+            limit (int, optional): Maximum number of events. Defaults to 100
+            session_id (Optional[str], optional): Only events of this session.
+                Defaults to None (all sessions)
+        Returns:
+            List[dict]: Events
+        """
+        with self._lock:
+            selected = [event for event in self._events if event["seq"] > after
+                        and (session_id is None or event["session_id"] == session_id)]
+        return selected[:limit]
+
+    def positions(self) -> List[Tuple[str, str]]:
+        """Get the current sample date of every session opened with a username
+        Returns:
+            List[Tuple[str, str]]: Username and ISO date pairs
+        """
+        with self._lock:
+            return [(session.username, _iso(self._times[session.slot, self._column[session.slot]]))
+                    for session in self._sessions.values()
+                    if session.username and self._column[session.slot] >= 0]
+
+    def metrics(self) -> dict:
+        """Get session counts, tick latencies in milliseconds and event counters
+        Returns:
+            dict: Engine statistics
+        """
+        with self._lock:
+            n = self._size
+            used = self._used[:n]
+            return {
+                "sessions": len(self._sessions),
+                "running": int(np.count_nonzero(used & ~self._paused[:n] & ~self._finished[:n])),
+                "paused": int(np.count_nonzero(used & self._paused[:n])),
+                "finished": int(np.count_nonzero(used & self._finished[:n])),
+                "slots": len(self._used),
+                "nbytes": sum(getattr(self, name).nbytes for name in
+                              ("_times", "_glucose", "_heart_rate", "_thresholds", "_clock")),
+                "ticks": self._ticks,
+                "tick_ms_last": self._tick_seconds_last * 1000,
+                "tick_ms_max": self._tick_seconds_max * 1000,
+                "tick_ms_mean": self._tick_seconds_total * 1000 / max(self._ticks, 1),
+                "alerts": self._alerts,
+                "events": self._seq,
+                "refills": self._refills,
+                "errors": self._errors,
+            }
+
+
+class AlertHub:
+    """Fan-out of simulation events to subscriber queues on the event loop
+    A subscriber that falls ``SUBSCRIBER_QUEUE`` events behind misses the
+    newer ones; they stay available from ``SimulationEngine.events``.
+    """
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE) -> None:
+        self.max_queue = max_queue
+        self._subscribers: Dict[asyncio.Queue, Optional[frozenset]] = {}
+        self.dropped = 0
+
+    def subscribe(self, session_ids: Optional[Iterable[str]] = None) -> asyncio.Queue:
+        """Register a subscriber
+        Args:
+            session_ids (Optional[Iterable[str]], optional): Only events of these
+                sessions. Defaults to None (all sessions)
+        Returns:
+            asyncio.Queue: Queue receiving the events
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers[queue] = None if session_ids is None else frozenset(session_ids)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Remove a subscriber"""
+        self._subscribers.pop(queue, None)
+
+    def publish(self, events: List[dict]) -> None:
+        """Put events into the queues of the matching subscribers"""
+        for queue, session_ids in self._subscribers.items():
+            for event in events:
+                if session_ids is not None and event["session_id"] not in session_ids:
+                    continue
+                if queue.full():
+                    self.dropped += 1
+                else:
+                    queue.put_nowait(event)
+
+    def stats(self) -> dict:
+        """Get the number of subscribers and dropped events"""
+        return {"subscribers": len(self._subscribers), "dropped": self.dropped}
+
+
+_engine = SimulationEngine()
+alert_hub = AlertHub()
+
+
+def get_simulation_engine() -> SimulationEngine:
+    """Get the process-wide simulation engine"""
+    return _engine
+
+
+def set_simulation_engine(engine: SimulationEngine) -> None:
+    """Replace the process-wide simulation engine (used by tests)"""
+    global _engine  # pylint: disable=global-statement
+    _engine = engine
+
+
+def _persist(positions: List[Tuple[str, str]]) -> None:
+    """Move the last viewed timestamps of accounts to their sessions' dates"""
+    for username, date in positions:
+        update_last_viewed(username, date)
+
+
+async def run_simulation(interval: float = SIMULATION_TICK_INTERVAL) -> None:
+    """Tick the process-wide engine and publish its events until cancelled
+    Args:
+        interval (float, optional): Wall seconds between ticks. Defaults to
+            ``SIMULATION_TICK_INTERVAL``
+    """
+    loop = asyncio.get_running_loop()
+    last_tick = loop.time()
+    next_persist = last_tick + PERSIST_INTERVAL
+    while True:
+        await asyncio.sleep(max(0.0, last_tick + interval - loop.time()))
+        now = loop.time()
+        engine = get_simulation_engine()
+        try:
+            alert_hub.publish(await run_compute(engine.tick, now - last_tick))
+            if now >= next_persist:
+                next_persist = now + PERSIST_INTERVAL
+                await run_io(_persist, engine.positions())
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Simulation tick failed")
+        last_tick = now
+
+
+async def stream_alerts(websocket: WebSocket, session_ids: Optional[List[str]] = None) -> None:
+    """Push simulation events to a client until it disconnects
+    Args:
+        websocket (WebSocket): Accepted connection
+        session_ids (Optional[List[str]], optional): Only events of these
+            sessions. Defaults to None (all sessions)
+    """
+    queue = alert_hub.subscribe(session_ids)
+
+    async def wait_closed() -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    closed = asyncio.create_task(wait_closed())
+    try:
+        while True:
+            event = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({event, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if event not in done:
+                event.cancel()
+                break
+            await websocket.send_json(event.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        alert_hub.unsubscribe(queue)
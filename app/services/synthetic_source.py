@@ -0,0 +1,292 @@
+"""On-demand synthetic patients derived from the synthetic dataset
+
+The synthetic dataset holds the output of the fitted synthesis pipeline (the
+clustered glucose curves and the heart rate and steps parameters predicted by
+``app.utils.model.predict_hr_steps``), one day per user. Users beyond it are
+not stored anywhere: every ``user_id`` below ``CGM_SYNTHETIC_USERS`` is
+generated when first requested, with the model of ``app.utils.patient_model``
+that ``app.utils.cohort`` also uses:
+
+- the patient's profile (a daily glucose curve and its heart rate and steps
+  parameters) is picked from the dataset's users with a generator seeded by
+  ``(CGM_SYNTHETIC_SEED, user_id)``
+- every day repeats the curve with a per-day offset and per-sample noise, and
+  draws heart rate and steps from the profile's parameters, with a generator
+  seeded by ``(CGM_SYNTHETIC_SEED, user_id, day)``
+
+So a patient is the same in every process and any range of days can be
+generated on its own. A patient has no last day: a query for a window
+(``time_mod`` and ``last_date``) gets the days that window covers, at least
+``CGM_SYNTHETIC_DAYS`` of them, and a query without ``last_date`` (whole
+series, playback and simulation) gets the first ``CGM_SYNTHETIC_DAYS`` days
+from the first day of the dataset. Stored users keep the rows of the dataset.
+Materialized ranges are kept in an LRU of ``CGM_SYNTHETIC_CACHE_USERS``
+entries, each as a one-user ``Dataset`` so the window, statistics and
+downsampling paths treat them like stored users; cohorts of bulk queries are
+generated together as one uncached ``Dataset``. The profiles are extracted
+once per dataset version; the key of every patient holds the dataset path and
+modification time, so a reloaded dataset never serves stale patients.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from app.models.dataset import Dataset
+from app.utils.instrumentation import instrumented
+from app.utils.patient_model import (
+    DAY_NS, SAMPLE_NS, SAMPLES_PER_DAY, profile_parameters, synthesize_days
+)
+from app.utils.timeparser import TIME_INTERVALS, parse_timestamp_ns
+
+SYNTHETIC_USERS = int(os.environ.get("CGM_SYNTHETIC_USERS", "1000000"))
+SYNTHETIC_DAYS = int(os.environ.get("CGM_SYNTHETIC_DAYS", "7"))
+SYNTHETIC_SEED = int(os.environ.get("CGM_SYNTHETIC_SEED", "0"))
+SYNTHETIC_CACHE_USERS = int(os.environ.get("CGM_SYNTHETIC_CACHE_USERS", "256"))
+
+PatientKey = Tuple[str, int, int, int, int]
+
+
+@dataclass(frozen=True)
+class PatientProfiles:
+    """Profiles synthetic patients are drawn from
+    Attributes:
+        glucose (np.ndarray): Daily glucose curves of shape (profiles, SAMPLES_PER_DAY)
+        hr_steps (np.ndarray): ``PROFILE_COLUMNS`` of every profile, shape (profiles, 4)
+        start_ns (int): Midnight of the first day of the source dataset
+        dtypes (Dict[str, np.dtype]): Column types of the source dataset
+    """
+    glucose: np.ndarray
+    hr_steps: np.ndarray
+    start_ns: int
+    dtypes: Dict[str, np.dtype]
+
+
+def extract_profiles(dataset: Dataset) -> PatientProfiles:
+    """Extract the profiles of all users with exactly one day of samples
+    Args:
+        dataset (Dataset): Synthetic dataset
+    Returns:
+        PatientProfiles: One profile per complete user, in user order
+    Raises:
+        ValueError: If no user has a full day of samples
+    """
+    bounds = [(start, stop) for _, (start, stop) in sorted(dataset.offsets.items())
+              if stop - start == SAMPLES_PER_DAY]
+    if not bounds:
+        raise ValueError(f"No user in {dataset.path} has {SAMPLES_PER_DAY} samples")
+    rows = (np.array([start for start, _ in bounds])[:, None] + np.arange(SAMPLES_PER_DAY))
+    columns = dataset.columns
+    hr_steps = profile_parameters(columns["heart_rate"][rows], columns["steps"][rows])
+    start_ns = int(columns["time"].view("i8").min()) // DAY_NS * DAY_NS
+    return PatientProfiles(glucose=columns["glucose"][rows].astype(np.float64),
+                           hr_steps=hr_steps, start_ns=start_ns,
+                           dtypes={name: column.dtype for name, column in columns.items()})
+
+
+def generate_patients(profiles: PatientProfiles, user_ids: Sequence[int], first_day: int,
+                      n_days: int, seed: int = SYNTHETIC_SEED) -> Dict[str, np.ndarray]:
+    """Generate the same days of many synthetic patients
+    Every day only depends on the seed, the user and the day number, so a
+    range of days equals the same days cut out of a longer range, and a
+    patient is the same whichever patients it is generated with.
+    Args:
+        profiles (PatientProfiles): Source profiles
+        user_ids (Sequence[int]): IDs of the patients
+        first_day (int): First day, counted from the first day of the dataset
+        n_days (int): Number of days
+        seed (int, optional): Seed of all patients. Defaults to SYNTHETIC_SEED
+    Returns:
+        Dict[str, np.ndarray]: Columns of the dataset, sorted by user in the
+            order of ``user_ids``, then by time
+    """
+    chosen = np.array([np.random.default_rng([seed, user_id]).integers(len(profiles.glucose))
+                       for user_id in user_ids], dtype=np.int64)
+    # One day offset, then glucose, heart rate and steps noise of every day
+    draws = np.empty((len(user_ids), n_days, 1 + 3 * SAMPLES_PER_DAY))
+    for i, user_id in enumerate(user_ids):
+        for day in range(n_days):
+            draws[i, day] = np.random.default_rng([seed, user_id, first_day + day]).standard_normal(
+                draws.shape[2])
+    noise = draws[:, :, 1:].reshape(len(user_ids), n_days, 3, SAMPLES_PER_DAY)
+    glucose, heart_rate, steps = synthesize_days(
+        profiles.glucose[chosen], profiles.hr_steps[chosen], draws[:, :, 0],
+        *(noise[:, :, stream].reshape(len(user_ids), -1) for stream in range(3)))
+
+    n_samples = n_days * SAMPLES_PER_DAY
+    first_ns = profiles.start_ns + first_day * DAY_NS
+    times = first_ns + np.arange(n_samples, dtype=np.int64) * SAMPLE_NS
+    columns = {
+        "user_id": np.repeat(np.asarray(user_ids, dtype=np.int64), n_samples),
+        "time": np.tile(times, len(user_ids)).view("M8[ns]"),
+        "glucose": glucose.ravel(),
+        "heart_rate": heart_rate.ravel(),
+        "steps": steps.ravel(),
+    }
+    return {name: columns[name].astype(dtype, copy=False)
+            for name, dtype in profiles.dtypes.items() if name in columns}
+
+
+def generate_patient(profiles: PatientProfiles, user_id: int, first_day: int, n_days: int,
+                     seed: int = SYNTHETIC_SEED) -> Dict[str, np.ndarray]:
+    """Generate days of a synthetic patient
+    Args:
+        profiles (PatientProfiles): Source profiles
+        user_id (int): ID of the patient
+        first_day (int): First day, counted from the first day of the dataset
+        n_days (int): Number of days
+        seed (int, optional): Seed of all patients. Defaults to SYNTHETIC_SEED
+    Returns:
+        Dict[str, np.ndarray]: Columns of the dataset, sorted by time
+    """
+    return generate_patients(profiles, [user_id], first_day, n_days, seed)
+
+
+class SyntheticSource:
+    """Thread-safe LRU of generated patients"""
+
+    def __init__(self, max_users: int = SYNTHETIC_CACHE_USERS, n_days: int = SYNTHETIC_DAYS,
+                 seed: int = SYNTHETIC_SEED) -> None:
+        self.max_users = max_users
+        self.n_days = n_days
+        self.seed = seed
+        self._patients: "OrderedDict[PatientKey, Dataset]" = OrderedDict()
+        self._profiles: Optional[Tuple[Tuple[str, int], PatientProfiles]] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def profiles(self, dataset: Dataset) -> PatientProfiles:
+        """Get the profiles of a dataset version, extracting them on first use"""
+        version = (dataset.path, dataset.mtime_ns)
+        cached = self._profiles
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        profiles = extract_profiles(dataset)
+        self._profiles = (version, profiles)
+        return profiles
+
+    def days(self, profiles: PatientProfiles, time_mod: Optional[str] = None,
+             last_date: Optional[str] = None) -> Tuple[int, int]:
+        """Get the days to generate for a window query
+        The window is found like ``window_bounds`` does, so it ends at the
+        first sample after ``last_date`` and holds ``time_mod`` of samples.
+        Args:
+            profiles (PatientProfiles): Source profiles
+            time_mod (Optional[str], optional): Window length. Defaults to None
+            last_date (Optional[str], optional): End of the window. Defaults to
+                None, the first ``n_days`` days
+        Returns:
+            Tuple[int, int]: First day and number of days, at least ``n_days``
+        """
+        if not last_date:
+            return 0, self.n_days
+        end = (parse_timestamp_ns(last_date) - profiles.start_ns) // SAMPLE_NS + 2
+        start = end - int(TIME_INTERVALS.get(time_mod, 0) * 12)
+        last_day = max((end - 1) // SAMPLES_PER_DAY, self.n_days - 1)
+        first_day = max(min(start // SAMPLES_PER_DAY, last_day - self.n_days + 1), 0)
+        return first_day, last_day - first_day + 1
+
+    @instrumented("synthetic_source.generate")
+    def _generate(self, dataset: Dataset, user_id: int, first_day: int, n_days: int) -> Dataset:
+        """Generate days of a patient as a one-user dataset"""
+        columns = generate_patient(self.profiles(dataset), user_id, first_day, n_days, self.seed)
+        for column in columns.values():
+            column.setflags(write=False)
+        return Dataset(path=f"{dataset.path}#synthetic-{self.seed}-{first_day}-{n_days}",
+                       mtime_ns=dataset.mtime_ns, columns=columns,
+                       offsets={user_id: (0, len(columns["time"]))})
+
+    @instrumented("synthetic_source.generate_cohort")
+    def generate_cohort(self, dataset: Dataset, user_ids: Sequence[int],
+                        time_mod: Optional[str] = None,
+                        last_date: Optional[str] = None) -> Dataset:
+        """Generate the days of many patients a window query needs as one dataset
+        The patients are generated in one pass and not kept in the LRU, so a
+        large cohort neither thrashes it nor evicts the patients of the
+        single-user routes.
+        Args:
+            dataset (Dataset): Synthetic dataset the profiles come from
+            user_ids (Sequence[int]): IDs of the patients; duplicates are generated once
+            time_mod (Optional[str], optional): Window length. Defaults to None
+            last_date (Optional[str], optional): End of the window. Defaults to
+                None, the first ``n_days`` days
+        Returns:
+            Dataset: Dataset holding the patients
+        Raises:
+            ValueError: If the dataset has no user with a full day of samples
+        """
+        profiles = self.profiles(dataset)
+        first_day, n_days = self.days(profiles, time_mod, last_date)
+        user_ids = list(dict.fromkeys(user_ids))
+        columns = generate_patients(profiles, user_ids, first_day, n_days, self.seed)
+        for column in columns.values():
+            column.setflags(write=False)
+        n_samples = n_days * SAMPLES_PER_DAY
+        return Dataset(path=f"{dataset.path}#synthetic-cohort-{self.seed}-{first_day}-{n_days}",
+                       mtime_ns=dataset.mtime_ns, columns=columns,
+                       offsets={user_id: (i * n_samples, (i + 1) * n_samples)
+                                for i, user_id in enumerate(user_ids)})
+
+    def get(self, dataset: Dataset, user_id: int, time_mod: Optional[str] = None,
+            last_date: Optional[str] = None) -> Dataset:
+        """Get the days of a patient a window query needs, generating them if not cached
+        Args:
+            dataset (Dataset): Synthetic dataset the profiles come from
+            user_id (int): ID of the patient
+            time_mod (Optional[str], optional): Window length. Defaults to None
+            last_date (Optional[str], optional): End of the window. Defaults to
+                None, the first ``n_days`` days
+        Returns:
+            Dataset: Dataset holding only the patient
+        Raises:
+            ValueError: If the dataset has no user with a full day of samples
+        """
+        first_day, n_days = self.days(self.profiles(dataset), time_mod, last_date)
+        key = (dataset.path, dataset.mtime_ns, user_id, first_day, n_days)
+        with self._lock:
+            patient = self._patients.get(key)
+            if patient is not None:
+                self._patients.move_to_end(key)
+                self._hits += 1
+                return patient
+
+        patient = self._generate(dataset, user_id, first_day, n_days)
+        with self._lock:
+            self._misses += 1
+            self._patients[key] = patient
+            self._patients.move_to_end(key)
+            while len(self._patients) > self.max_users:
+                self._patients.popitem(last=False)
+                self._evictions += 1
+        return patient
+
+    def clear(self) -> None:
+        """Drop all patients and the profiles"""
+        with self._lock:
+            self._patients.clear()
+            self._profiles = None
+
+    def stats(self) -> dict:
+        """Get hit counters and memory usage
+        Returns:
+            dict: Counters, number of cached patients and their column bytes
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._patients),
+                "max_entries": self.max_users,
+                "nbytes": sum(patient.nbytes for patient in self._patients.values()),
+                "users": SYNTHETIC_USERS,
+                "days": self.n_days,
+                "seed": self.seed,
+            }
+
+
+synthetic_source = SyntheticSource()
@@ -1,10 +1,15 @@
-"""Timestamp management service for tracking user data viewing progress"""
+"""Timestamp management service for tracking user data viewing progress
+
+Timestamps are kept in the write-behind buffer of ``app.services.last_viewed``
+and written to the user repository in batches.
+"""
 
 from typing import Optional
-import pandas as pd
-from app.services.auth import _load_users, _save_users
+from app.services.last_viewed import get_last_viewed_buffer
+from app.utils.instrumentation import instrumented
 
 
+@instrumented("timestamps.update_last_viewed")
 def update_last_viewed(username: str, last_viewed_timestamp: str) -> bool:
     """Update the last viewed timestamp for a user if the new timestamp is more recent
     Args:
@@ -13,17 +18,10 @@ def update_last_viewed(username: str, last_viewed_timestamp: str) -> bool:
     Returns:
         bool: True if the timestamp was updated, False otherwise
     """
-    users = _load_users()
-
-    current_timestamp = users[username].get("last_viewed_timestamp")
-
-    if current_timestamp is None or pd.to_datetime(last_viewed_timestamp) > pd.to_datetime(current_timestamp):
-        users[username]["last_viewed_timestamp"] = last_viewed_timestamp
-        _save_users(users)
-        return True
-    return False
+    return get_last_viewed_buffer().update(username, last_viewed_timestamp)
 
 
+@instrumented("timestamps.get_last_viewed")
 def get_last_viewed(username: str) -> Optional[str]:
     """This function retrieves the last viewed timestamp for a user
     Args:
@@ -31,8 +29,4 @@ def get_last_viewed(username: str) -> Optional[str]:
     Returns:
         Optional[str]: The last viewed timestamp if valid, None otherwise
     """
-    users = _load_users()
-
-    if username in users:
-        return users[username].get("last_viewed_timestamp")
-    return None
+    return get_last_viewed_buffer().get(username)
@@ -0,0 +1,310 @@
+"""User repositories backing registration, login and last viewed timestamps
+
+Two backends are available:
+
+- ``SqliteUserRepository`` (default): SQLite database in WAL mode with indexed
+  single-row reads and updates, safe to share between worker processes
+- ``JsonUserRepository``: the original ``users.json`` file, rewritten on every change
+
+The backend is selected with the ``CGM_USER_STORE`` environment variable
+(``sqlite`` or ``json``). On first use an empty SQLite database imports the
+users of ``users.json``.
+
+Usage:
+    python -m app.services.user_store migrate [JSON_PATH] [DB_PATH]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from app.utils.instrumentation import instrumented
+from app.utils.timeparser import parse_timestamp_ns
+
+USERS_FILE = "users.json"
+USERS_DB = "users.db"
+
+UserRecord = Dict[str, Any]
+
+
+class UserRepository(ABC):
+    """Storage interface for user records
+
+    Records have the shape of the ``users.json`` entries: ``id``, ``password``,
+    ``use_real_data``, ``real_user_id``, ``synthetic_user_id`` and
+    ``last_viewed_timestamp``.
+    """
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[UserRecord]:
+        """Get a user record
+        Args:
+            username (str): The username of the user
+        Returns:
+            Optional[UserRecord]: The record, or None if the user does not exist
+        """
+
+    @abstractmethod
+    def create(self, username: str, record: UserRecord) -> int:
+        """Store a new user and assign its ID
+        Args:
+            username (str): The username of the user
+            record (UserRecord): User fields; ``id`` is assigned unless given
+        Returns:
+            int: The user ID
+        Raises:
+            ValueError: If the username is already taken
+        """
+
+    @abstractmethod
+    def update_last_viewed(self, username: str, last_viewed_timestamp: str) -> bool:
+        """Move the last viewed timestamp forward
+        Args:
+            username (str): The username of the user
+            last_viewed_timestamp (str): New timestamp
+        Returns:
+            bool: True if the timestamp was updated, False if it was not newer
+                or the user does not exist
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Get the number of stored users"""
+
+    def close(self) -> None:
+        """Release resources held by the repository"""
+
+
+class JsonUserRepository(UserRepository):
+    """Repository reading and rewriting a whole JSON file per operation"""
+
+    def __init__(self, path: str = USERS_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    @instrumented("user_store.json_load")
+    def _load_users(self) -> Dict[str, UserRecord]:
+        """Load user data from the JSON file"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @instrumented("user_store.json_save")
+    def _save_users(self, users: Dict[str, UserRecord]) -> None:
+        """Save user data to the JSON file"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(users, f, indent=2)
+
+    def get(self, username: str) -> Optional[UserRecord]:
+        return self._load_users().get(username)
+
+    def create(self, username: str, record: UserRecord) -> int:
+        with self._lock:
+            users = self._load_users()
+            if username in users:
+                raise ValueError("Username already taken")
+            user_id = record.get("id")
+            if user_id is None:
+                user_id = max((user["id"] for user in users.values()), default=0) + 1
+            users[username] = {**record, "id": user_id}
+            self._save_users(users)
+            return user_id
+
+    def update_last_viewed(self, username: str, last_viewed_timestamp: str) -> bool:
+        with self._lock:
+            users = self._load_users()
+            if username not in users:
+                return False
+            current_timestamp = users[username].get("last_viewed_timestamp")
+            if (current_timestamp is None or parse_timestamp_ns(last_viewed_timestamp)
+                    > parse_timestamp_ns(current_timestamp)):
+                users[username]["last_viewed_timestamp"] = last_viewed_timestamp
+                self._save_users(users)
+                return True
+            return False
+
+    def count(self) -> int:
+        return len(self._load_users())
+
+    def all_users(self) -> Dict[str, UserRecord]:
+        """Get all stored users keyed by username"""
+        return self._load_users()
+
+
+class SqliteUserRepository(UserRepository):
+    """Repository backed by an SQLite database in WAL mode
+
+    Every thread uses its own connection. The last viewed timestamp is also
+    stored as epoch nanoseconds so the "only move forward" rule is a single
+    conditional ``UPDATE``.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            use_real_data INTEGER NOT NULL,
+            real_user_id INTEGER,
+            synthetic_user_id INTEGER,
+            last_viewed_timestamp TEXT,
+            last_viewed_ns INTEGER
+        )
+    """
+    _COLUMNS = ("id", "password", "use_real_data", "real_user_id", "synthetic_user_id",
+                "last_viewed_timestamp")
+
+    def __init__(self, path: str = USERS_DB) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute(self._SCHEMA)
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the connection of the current thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @instrumented("user_store.sqlite_get")
+    def get(self, username: str) -> Optional[UserRecord]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(self._COLUMNS, row))
+        record["use_real_data"] = bool(record["use_real_data"])
+        return record
+
+    @instrumented("user_store.sqlite_create")
+    def create(self, username: str, record: UserRecord) -> int:
+        timestamp = record.get("last_viewed_timestamp")
+        connection = self._connection()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO users (id, username, password, use_real_data, real_user_id,"
+                    " synthetic_user_id, last_viewed_timestamp, last_viewed_ns)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record.get("id"), username, record["password"], int(record["use_real_data"]),
+                     record.get("real_user_id"), record.get("synthetic_user_id"), timestamp,
+                     parse_timestamp_ns(timestamp) if timestamp else None),
+                )
+        except sqlite3.IntegrityError as exc:
+            raise ValueError("Username already taken") from exc
+        return cursor.lastrowid
+
+    @instrumented("user_store.sqlite_update_last_viewed")
+    def update_last_viewed(self, username: str, last_viewed_timestamp: str) -> bool:
+        timestamp_ns = parse_timestamp_ns(last_viewed_timestamp)
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "UPDATE users SET last_viewed_timestamp = ?, last_viewed_ns = ?"
+                " WHERE username = ? AND (last_viewed_ns IS NULL OR last_viewed_ns < ?)",
+                (last_viewed_timestamp, timestamp_ns, username, timestamp_ns),
+            )
+        return cursor.rowcount == 1
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def migrate_json_users(json_path: str, repository: UserRepository) -> int:
+    """Copy users from a ``users.json`` file into a repository
+    User IDs are kept; users that already exist in the repository are skipped.
+    Args:
+        json_path (str): Path to the JSON file
+        repository (UserRepository): Target repository
+    Returns:
+        int: Number of imported users
+    """
+    imported = 0
+    for username, user in JsonUserRepository(json_path).all_users().items():
+        if repository.get(username) is not None:
+            continue
+        repository.create(username, user)
+        imported += 1
+    return imported
+
+
+_repository: Optional[UserRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_user_repository() -> UserRepository:
+    """Get the process-wide user repository, creating it on first use
+    Returns:
+        UserRepository: The configured repository
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = _create_repository()
+    return _repository
+
+
+def set_user_repository(repository: Optional[UserRepository]) -> None:
+    """Replace the process-wide user repository
+    Args:
+        repository (Optional[UserRepository]): New repository, or None to create
+            the configured one on next use
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is not None and _repository is not repository:
+            _repository.close()
+        _repository = repository
+
+
+def _create_repository() -> UserRepository:
+    """Create the repository selected by ``CGM_USER_STORE``"""
+    backend = os.environ.get("CGM_USER_STORE", "sqlite")
+    if backend == "json":
+        return JsonUserRepository(os.environ.get("CGM_USERS_FILE", USERS_FILE))
+    if backend != "sqlite":
+        raise ValueError(f"Unknown user store: {backend}")
+
+    repository = SqliteUserRepository(os.environ.get("CGM_USERS_DB", USERS_DB))
+    json_path = os.environ.get("CGM_USERS_FILE", USERS_FILE)
+    if repository.count() == 0 and os.path.exists(json_path):
+        migrate_json_users(json_path, repository)
+    return repository
+
+
+def main(argv: List[str]) -> None:
+    """Import users from a JSON file into an SQLite database"""
+    if not argv or argv[0] != "migrate":
+        print(__doc__)
+        return
+    json_path = argv[1] if len(argv) > 1 else USERS_FILE
+    db_path = argv[2] if len(argv) > 2 else USERS_DB
+    repository = SqliteUserRepository(db_path)
+    print(f"Imported {migrate_json_users(json_path, repository)} users into {db_path}")
+    repository.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
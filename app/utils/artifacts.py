@@ -0,0 +1,194 @@
+"""Versioned model artifacts of the synthesis pipeline
+
+The training stage fits the glucose feature scaler and KDE, the KMeans
+clustering of the sampled synthetic users, the heart rate/steps scaler and the
+two random forests. The real dataset is summarized out of core (see
+``app.utils.features``), so it may be larger than memory. The fitted models
+are saved with joblib under ``<artifacts dir>/v<ARTIFACT_VERSION>-<key>/``,
+where the key hashes the real dataset file and the training parameters.
+Generation runs with the same data and parameters load them instead of
+refitting.
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.neighbors import KernelDensity
+from sklearn.preprocessing import StandardScaler
+from app.services.data_loader import BASE_DIR, REAL_DATA_PATH
+from app.utils.clustering import (N_CLUSTERS, fit_clusters, fit_glucose_density,
+                                  sample_synthetic_features)
+from app.utils.features import extract_real_features
+from app.utils.model import train_models
+
+ARTIFACT_VERSION = 2
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+MODELS_FILE = "models.joblib"
+META_FILE = "meta.json"
+HR_STEPS_COLUMNS = ["hr_mean", "hr_std", "steps_mean", "steps_std"]
+
+Timings = Dict[str, float]
+
+
+@dataclass(frozen=True)
+class SynthesisModels:
+    """Fitted models of the synthesis pipeline
+    Attributes:
+        glucose_scaler (StandardScaler): Scaler of the per-user glucose features
+        kde (KernelDensity): Density of the scaled glucose features
+        kmeans (KMeans): Clustering of the sampled synthetic users
+        hr_steps_scaler (StandardScaler): Scaler of the per-user HR and steps features
+        real_model (RandomForestRegressor): HR/steps model trained on real users
+        synth_model (RandomForestRegressor): HR/steps model trained on synthetic users
+    """
+    glucose_scaler: StandardScaler
+    kde: KernelDensity
+    kmeans: KMeans
+    hr_steps_scaler: StandardScaler
+    real_model: RandomForestRegressor
+    synth_model: RandomForestRegressor
+
+
+@contextmanager
+def timed_stage(name: str, timings: Timings) -> Iterator[None]:
+    """Record the wall time of a pipeline stage in seconds
+    Args:
+        name (str): Stage name
+        timings (Timings): Mapping the duration is stored in
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def artifact_key(data_path: str, n_samples: int, seed: int) -> str:
+    """Hash the real dataset file and the training parameters
+    Args:
+        data_path (str): Real dataset file
+        n_samples (int): Number of synthetic feature samples
+        seed (int): Training seed
+    Returns:
+        str: 16 hex digits identifying the training inputs
+    """
+    digest = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps({"n_samples": n_samples, "seed": seed}).encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_dir(key: str, artifacts_dir: str = ARTIFACTS_DIR) -> str:
+    """Get the directory of a versioned artifact"""
+    return os.path.join(artifacts_dir, f"v{ARTIFACT_VERSION}-{key}")
+
+
+def _synthesize_hr_steps(hr_steps_features: pd.DataFrame, cluster_ids: np.ndarray,
+                         rng: np.random.Generator) -> Tuple[StandardScaler, np.ndarray]:
+    """Derive HR and steps features of the synthetic users from their clusters"""
+    hr_steps_scaler = StandardScaler()
+    real_hr_steps_scaled = hr_steps_scaler.fit_transform(hr_steps_features)
+    synthetic_hr_steps = np.zeros((len(cluster_ids), 4))
+    feature_stds = np.std(real_hr_steps_scaled, axis=0)
+
+    for i in range(N_CLUSTERS):
+        cluster_mask = cluster_ids == i
+        cluster_size = cluster_mask.sum()
+        hr_steps_cluster_center = synthetic_hr_steps[cluster_mask].mean(axis=0).reshape(1, -1)
+        distances = np.linalg.norm(real_hr_steps_scaled - hr_steps_cluster_center, axis=1)
+        closest_real_user_idx = np.argmin(distances)
+        hr_steps_pattern = real_hr_steps_scaled[closest_real_user_idx]
+        noise = rng.normal(0, feature_stds * 0.1, (cluster_size, 4))
+        synthetic_hr_steps[cluster_mask] = hr_steps_pattern + noise
+
+    return hr_steps_scaler, hr_steps_scaler.inverse_transform(synthetic_hr_steps)
+
+
+def fit_synthesis_models(X_real: pd.DataFrame, y_real: pd.DataFrame, n_samples: int = 100,
+                         seed: int = 0, timings: Timings | None = None) -> SynthesisModels:
+    """Fit all models of the synthesis pipeline
+    Args:
+        X_real (pd.DataFrame): Per-user glucose features of the real data
+        y_real (pd.DataFrame): Per-user HR and steps features of the real data
+        n_samples (int, optional): Number of synthetic feature samples. Defaults to 100
+        seed (int, optional): Seed of the sampling and noise draws. Defaults to 0
+        timings (Timings | None, optional): Mapping that receives per-stage durations
+    Returns:
+        SynthesisModels: The fitted models
+    """
+    timings = {} if timings is None else timings
+    rng = np.random.default_rng(seed)
+
+    with timed_stage("density", timings):
+        glucose_scaler, kde = fit_glucose_density(X_real)
+    with timed_stage("sampling", timings):
+        synthetic_users, samples = sample_synthetic_features(glucose_scaler, kde, X_real.columns,
+                                                             n_samples, seed)
+    with timed_stage("clustering", timings):
+        kmeans = fit_clusters(samples)
+    with timed_stage("hr_steps", timings):
+        hr_steps_scaler, synthetic_hr_steps = _synthesize_hr_steps(y_real, kmeans.labels_, rng)
+        synthetic_users[HR_STEPS_COLUMNS] = synthetic_hr_steps
+    with timed_stage("random_forests", timings):
+        real_model, synth_model = train_models(X_real, y_real, synthetic_users[X_real.columns],
+                                               synthetic_users[HR_STEPS_COLUMNS])
+
+    return SynthesisModels(glucose_scaler, kde, kmeans, hr_steps_scaler, real_model, synth_model)
+
+
+def load_or_fit_models(data_path: str = REAL_DATA_PATH, n_samples: int = 100, seed: int = 0,
+                       artifacts_dir: str = ARTIFACTS_DIR, refit: bool = False,
+                       timings: Timings | None = None) -> SynthesisModels:
+    """Load the models for a dataset and parameters, fitting and saving them if needed
+    Args:
+        data_path (str, optional): Real dataset file. Defaults to REAL_DATA_PATH
+        n_samples (int, optional): Number of synthetic feature samples. Defaults to 100
+        seed (int, optional): Training seed. Defaults to 0
+        artifacts_dir (str, optional): Root of the artifacts. Defaults to ARTIFACTS_DIR
+        refit (bool, optional): Fit even if an artifact exists. Defaults to False
+        timings (Timings | None, optional): Mapping that receives per-stage durations
+    Returns:
+        SynthesisModels: The loaded or fitted models
+    """
+    timings = {} if timings is None else timings
+    with timed_stage("hash", timings):
+        key = artifact_key(data_path, n_samples, seed)
+    path = artifact_dir(key, artifacts_dir)
+    models_path = os.path.join(path, MODELS_FILE)
+
+    if not refit and os.path.exists(models_path):
+        with timed_stage("load_models", timings):
+            return joblib.load(models_path)
+
+    with timed_stage("features", timings):
+        X_real, y_real = extract_real_features(data_path)
+    models = fit_synthesis_models(X_real, y_real, n_samples, seed, timings)
+
+    with timed_stage("save_models", timings):
+        os.makedirs(path, exist_ok=True)
+        joblib.dump(models, models_path + ".tmp")
+        os.replace(models_path + ".tmp", models_path)
+        meta = {
+            "version": ARTIFACT_VERSION,
+            "key": key,
+            "data_path": data_path,
+            "n_samples": n_samples,
+            "seed": seed,
+            "sklearn_version": sklearn.__version__,
+            "timings_s": dict(timings),
+        }
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    return models
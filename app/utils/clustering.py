@@ -1,11 +1,15 @@
 """Clustering and density estimation utilities for synthetic data generation
 """
 
+from typing import Tuple
+import numpy as np
 import pandas as pd
 from sklearn.neighbors import KernelDensity
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 
+N_CLUSTERS = 5
+
 
 def extract_glucose_features(df: pd.DataFrame, is_synthetic: bool = False) -> pd.DataFrame:
     """Extract statistical features from glucose data
@@ -17,40 +21,105 @@ def extract_glucose_features(df: pd.DataFrame, is_synthetic: bool = False) -> pd
     """
     if is_synthetic:
         time_columns = [col for col in df.columns if col.startswith('t_')]
-        return pd.DataFrame({
-            'mean': df[time_columns].mean(axis=1),
-            'std': df[time_columns].std(axis=1),
-            'min': df[time_columns].min(axis=1),
-            'max': df[time_columns].max(axis=1),
-            'median': df[time_columns].median(axis=1),
-            'skew': df[time_columns].skew(axis=1).fillna(0)
-        })
+        return pd.DataFrame(wide_glucose_features(df[time_columns].to_numpy(dtype=float)),
+                            index=df.index)
     return pd.DataFrame(df.groupby('user_id')['glucose'].agg(
             ['mean', 'std', 'min', 'max', 'median', 'skew']
     ).dropna())
 
 
-def generate_synthetic_features(real_data: pd.DataFrame, n_samples: int = 100) -> tuple:
-    """Generate synthetic user features using KDE and K-means
+def wide_glucose_features(matrix: np.ndarray) -> dict:
+    """Row-wise glucose features of a (users, samples) matrix
+    One sort gives min, max and median; mean and the central moments come from
+    a single pass over the deviations. Missing values are skipped, as pandas
+    does; the skewness of rows with fewer than three values is 0.
     Args:
-        real_data (pd.DataFrame): Real user data
-        n_samples (int): Number of synthetic samples to generate
+        matrix (np.ndarray): Glucose values, one row per user
     Returns:
-        tuple: (synthetic_features, cluster_ids, scaler)
+        dict: ``mean``, ``std``, ``min``, ``max``, ``median`` and ``skew`` arrays
     """
-    user_features = extract_glucose_features(real_data)
+    ordered = np.sort(matrix, axis=1)
+    count = (~np.isnan(ordered)).sum(axis=1)
+    rows = np.arange(len(ordered))
+    last = np.maximum(count - 1, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nansum(ordered, axis=1) / count
+        deviation = ordered - mean[:, None]
+        m2 = np.nansum(deviation * deviation, axis=1)
+        m3 = np.nansum(deviation * deviation * deviation, axis=1)
+        std = np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)
+        skew = np.sqrt(count * (count - 1)) / (count - 2) * np.sqrt(count) * m3 / m2 ** 1.5
+        skew = np.where((count > 2) & (m2 > 0), skew, 0.0)
+        median = (ordered[rows, last // 2] + ordered[rows, count // 2]) / 2
+
+    present = count > 0
+    return {
+        'mean': np.where(present, mean, np.nan),
+        'std': std,
+        'min': np.where(present, ordered[:, 0], np.nan),
+        'max': np.where(present, ordered[rows, last], np.nan),
+        'median': np.where(present, median, np.nan),
+        'skew': skew
+    }
 
+
+def fit_glucose_density(user_features: pd.DataFrame) -> Tuple[StandardScaler, KernelDensity]:
+    """Fit the density of standardized per-user glucose features
+    Args:
+        user_features (pd.DataFrame): Per-user glucose features
+    Returns:
+        tuple: (scaler, kde)
+    """
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(user_features)
 
     kde = KernelDensity(kernel='gaussian', bandwidth=0.5)
     kde.fit(X_scaled)
+    return scaler, kde
 
-    samples = kde.sample(n_samples)
+
+def sample_synthetic_features(scaler: StandardScaler, kde: KernelDensity, columns: pd.Index,
+                              n_samples: int, random_state: int | None = None) -> tuple:
+    """Draw synthetic user features from a fitted density
+    Args:
+        scaler (StandardScaler): Scaler of the glucose features
+        kde (KernelDensity): Density fitted on the scaled features
+        columns (pd.Index): Feature names
+        n_samples (int): Number of synthetic samples to generate
+        random_state (int | None): Seed of the draws
+    Returns:
+        tuple: (synthetic_features, scaled_samples)
+    """
+    samples = kde.sample(n_samples, random_state=random_state)
     synthetic_glucose_features = scaler.inverse_transform(samples)
-    synthetic_users = pd.DataFrame(synthetic_glucose_features, columns=user_features.columns)
+    return pd.DataFrame(synthetic_glucose_features, columns=columns), samples
+
+
+def fit_clusters(samples: np.ndarray) -> KMeans:
+    """Cluster scaled synthetic feature samples
+    Args:
+        samples (np.ndarray): Scaled feature samples
+    Returns:
+        KMeans: Fitted clustering; ``labels_`` holds the cluster of every sample
+    """
+    return KMeans(n_clusters=N_CLUSTERS, random_state=42).fit(samples)
 
-    kmeans = KMeans(n_clusters=5, random_state=42)
-    cluster_ids = kmeans.fit_predict(samples)
+
+def generate_synthetic_features(real_data: pd.DataFrame, n_samples: int = 100,
+                                random_state: int | None = None) -> tuple:
+    """Generate synthetic user features using KDE and K-means
+    Args:
+        real_data (pd.DataFrame): Real user data
+        n_samples (int): Number of synthetic samples to generate
+        random_state (int | None): Seed of the KDE draws
+    Returns:
+        tuple: (synthetic_features, cluster_ids, scaler)
+    """
+    user_features = extract_glucose_features(real_data)
+    scaler, kde = fit_glucose_density(user_features)
+    synthetic_users, samples = sample_synthetic_features(scaler, kde, user_features.columns,
+                                                         n_samples, random_state)
+    cluster_ids = fit_clusters(samples).labels_
 
     return synthetic_users, cluster_ids, scaler
@@ -0,0 +1,269 @@
+"""Parallel generation of large synthetic cohorts for load testing
+
+Every cohort user is derived from a profile of the existing synthetic dataset:
+its daily glucose curve, repeated for every day with a per-day offset and
+per-sample noise, and its heart rate and steps parameters. The model lives in
+``app.utils.patient_model`` and is shared with the on-demand patients of
+``app.services.synthetic_source``. Users are split into shards that run on a
+process pool. Every shard draws from its own child of
+``SeedSequence(seed)``, split into one stream per kind of draw (profile picks,
+day offsets, glucose noise, heart rate and steps) that is consumed in user
+order, so the output only depends on the seed and the shard count, not on the
+number of workers or the chunk size.
+
+The output directory holds one file per shard (``shard-00000.cols/`` in the
+columnar layout, or ``shard-00000.csv``) and a ``manifest.json``. Shards are
+generated and appended to disk in chunks of users, so the memory of a worker
+does not grow with the shard size.
+
+Usage:
+    python -m app.utils.cohort --users 100000 --days 30 --seed 0 --out synthetic/cohort
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+import numpy as np
+import pandas as pd
+from app.services.data_loader import SYNTHETIC_DATA_PATH
+from app.utils.patient_model import (
+    PROFILE_COLUMNS, SAMPLES_PER_DAY, profile_parameters, synthesize_days
+)
+from app.utils.synthetic import OUTPUT_FORMATS, START_DATE, time_series_frame, write_time_series
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+USERS_PER_SHARD = 1000
+SHARD_CHUNK_USERS = 250
+# Random streams of a shard, each drawn in user order
+STREAMS = ("picks", "day_offsets", "glucose_noise", "heart_rate", "steps")
+
+
+@dataclass(frozen=True)
+class ProfilePool:
+    """Source profiles cohort users are drawn from
+    Attributes:
+        glucose (np.ndarray): Daily glucose curves of shape (profiles, SAMPLES_PER_DAY)
+        features (pd.DataFrame): Heart rate and steps parameters of every profile
+    """
+    glucose: np.ndarray
+    features: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Work order of one shard
+    Attributes:
+        index (int): Shard number
+        first_user_id (int): ID of the first user of the shard
+        n_users (int): Number of users in the shard
+        seed (np.random.SeedSequence): Seed of the shard's random stream
+    """
+    index: int
+    first_user_id: int
+    n_users: int
+    seed: np.random.SeedSequence
+
+
+def load_profile_pool(path: str = SYNTHETIC_DATA_PATH) -> ProfilePool:
+    """Build the profile pool from a dataset with one day of samples per user
+    Args:
+        path (str, optional): CSV dataset. Defaults to the synthetic dataset
+    Returns:
+        ProfilePool: One profile per user with complete data
+    Raises:
+        ValueError: If no user has a full day of samples
+    """
+    df = pd.read_csv(path)
+    df["time"] = pd.to_datetime(df["time"])
+    df = df.sort_values(["user_id", "time"], kind="mergesort")
+    df = df[df.groupby("user_id")["time"].transform("size") == SAMPLES_PER_DAY]
+    if df.empty:
+        raise ValueError(f"No user in {path} has {SAMPLES_PER_DAY} samples")
+
+    days = {name: df[name].to_numpy(dtype=float).reshape(-1, SAMPLES_PER_DAY)
+            for name in ("glucose", "heart_rate", "steps")}
+    features = pd.DataFrame(profile_parameters(days["heart_rate"], days["steps"]),
+                            columns=PROFILE_COLUMNS)
+    return ProfilePool(glucose=days["glucose"], features=features)
+
+
+def _streams(seed: np.random.SeedSequence | int) -> Dict[str, np.random.Generator]:
+    """One generator per entry of ``STREAMS``, derived from a shard seed"""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return {name: np.random.default_rng(np.random.SeedSequence(
+                seed.entropy, spawn_key=(*seed.spawn_key, i)))
+            for i, name in enumerate(STREAMS)}
+
+
+def iter_shard(pool: ProfilePool, first_user_id: int, n_users: int, n_days: int,
+               seed: np.random.SeedSequence | int, chunk_users: int = SHARD_CHUNK_USERS,
+               start_date: str = START_DATE) -> Iterator[pd.DataFrame]:
+    """Generate the time series of a block of consecutive users in chunks
+    Every kind of draw has its own stream that chunks continue in user order,
+    so the rows do not depend on ``chunk_users``.
+    Args:
+        pool (ProfilePool): Source profiles
+        first_user_id (int): ID of the first user
+        n_users (int): Number of users
+        n_days (int): Number of days per user
+        seed (np.random.SeedSequence | int): Seed of the block
+        chunk_users (int, optional): Users per chunk. Defaults to SHARD_CHUNK_USERS
+        start_date (str, optional): Timestamp of the first sample. Defaults to START_DATE
+    Yields:
+        pd.DataFrame: Rows of the next chunk, grouped by user and sorted by time
+    """
+    streams = _streams(seed)
+    picks = streams["picks"].integers(len(pool.glucose), size=n_users)
+    hr_steps = pool.features[PROFILE_COLUMNS].to_numpy(dtype=float)
+    for start in range(0, n_users, chunk_users):
+        block = picks[start:start + chunk_users]
+        shape = (len(block), n_days * SAMPLES_PER_DAY)
+        glucose, heart_rate, steps = synthesize_days(
+            pool.glucose[block], hr_steps[block],
+            streams["day_offsets"].standard_normal((len(block), n_days)),
+            streams["glucose_noise"].standard_normal(shape),
+            streams["heart_rate"].standard_normal(shape), streams["steps"].standard_normal(shape))
+
+        user_ids = np.arange(first_user_id + start, first_user_id + start + len(block))
+        yield time_series_frame(user_ids, glucose, heart_rate, steps, start_date)
+
+
+def generate_shard(pool: ProfilePool, first_user_id: int, n_users: int, n_days: int,
+                   seed: np.random.SeedSequence | int, start_date: str = START_DATE) -> pd.DataFrame:
+    """Generate the time series of a block of consecutive users in one frame
+    Args:
+        pool (ProfilePool): Source profiles
+        first_user_id (int): ID of the first user
+        n_users (int): Number of users
+        n_days (int): Number of days per user
+        seed (np.random.SeedSequence | int): Seed of the block
+        start_date (str, optional): Timestamp of the first sample. Defaults to START_DATE
+    Returns:
+        pd.DataFrame: Rows grouped by user and sorted by time
+    """
+    chunks = iter_shard(pool, first_user_id, n_users, n_days, seed, max(n_users, 1), start_date)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def plan_shards(n_users: int, n_shards: int, seed: int) -> List[ShardSpec]:
+    """Split a cohort into shards with independent seeds
+    Args:
+        n_users (int): Number of users
+        n_shards (int): Number of shards
+        seed (int): Cohort seed
+    Returns:
+        List[ShardSpec]: Non-empty shards covering user IDs ``0..n_users-1``
+    """
+    n_shards = max(1, min(n_shards, n_users))
+    bounds = np.linspace(0, n_users, n_shards + 1).astype(int)
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    return [ShardSpec(i, int(bounds[i]), int(bounds[i + 1] - bounds[i]), seeds[i])
+            for i in range(n_shards)]
+
+
+def shard_file(spec: ShardSpec, fmt: str) -> str:
+    """Get the file name of a shard"""
+    return f"shard-{spec.index:05d}" + (".cols" if fmt == "columnar" else ".csv")
+
+
+def _write_shard(pool: ProfilePool, spec: ShardSpec, n_days: int, out_dir: str, fmt: str,
+                 chunk_users: int, start_date: str) -> dict:
+    """Generate and stream one shard to disk; runs in a worker process"""
+    chunks = iter_shard(pool, spec.first_user_id, spec.n_users, n_days, spec.seed, chunk_users,
+                        start_date)
+    rows = write_time_series(chunks, os.path.join(out_dir, shard_file(spec, fmt)), fmt)
+    return {
+        "file": shard_file(spec, fmt),
+        "first_user_id": spec.first_user_id,
+        "users": spec.n_users,
+        "rows": rows,
+    }
+
+
+def generate_cohort(n_users: int, n_days: int, seed: int, out_dir: str,
+                    n_shards: int | None = None, workers: int | None = None,
+                    fmt: str = "columnar", profiles_path: str = SYNTHETIC_DATA_PATH,
+                    chunk_users: int = SHARD_CHUNK_USERS, start_date: str = START_DATE) -> dict:
+    """Generate a sharded cohort and write its manifest
+    Args:
+        n_users (int): Number of users
+        n_days (int): Number of days per user
+        seed (int): Cohort seed
+        out_dir (str): Output directory
+        n_shards (int | None, optional): Number of shards. Defaults to one per
+            USERS_PER_SHARD users
+        workers (int | None, optional): Worker processes. Defaults to the CPU count
+        fmt (str, optional): ``columnar`` or ``csv``. Defaults to ``columnar``
+        profiles_path (str, optional): Dataset the profiles come from
+        chunk_users (int, optional): Users generated and written at a time per
+            worker. Defaults to SHARD_CHUNK_USERS
+        start_date (str, optional): Timestamp of the first sample. Defaults to START_DATE
+    Returns:
+        dict: The manifest
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    pool = load_profile_pool(profiles_path)
+    specs = plan_shards(n_users, n_shards or math.ceil(n_users / USERS_PER_SHARD), seed)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_write_shard, pool, spec, n_days, out_dir, fmt, chunk_users,
+                                   start_date)
+                   for spec in specs]
+        shards = [future.result() for future in futures]
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "users": n_users,
+        "days": n_days,
+        "seed": seed,
+        "format": fmt,
+        "start_date": start_date,
+        "sample_minutes": 5,
+        "chunk_users": chunk_users,
+        "rows": sum(shard["rows"] for shard in shards),
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv: List[str] | None = None) -> None:
+    """Parse the command line and generate a cohort"""
+    parser = argparse.ArgumentParser(description="Generate a sharded synthetic cohort")
+    parser.add_argument("--users", type=int, required=True, help="number of users")
+    parser.add_argument("--days", type=int, default=1, help="days of samples per user")
+    parser.add_argument("--seed", type=int, default=0, help="cohort seed")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--shards", type=int, default=None,
+                        help=f"number of shards (default: one per {USERS_PER_SHARD} users)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="columnar")
+    parser.add_argument("--chunk-users", type=int, default=SHARD_CHUNK_USERS,
+                        help="users generated and written at a time per worker")
+    parser.add_argument("--profiles", default=SYNTHETIC_DATA_PATH,
+                        help="dataset the user profiles are drawn from")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    manifest = generate_cohort(args.users, args.days, args.seed, args.out, args.shards,
+                               args.workers, args.format, args.profiles, args.chunk_users)
+    print(f"Wrote {manifest['rows']} rows for {manifest['users']} users in "
+          f"{len(manifest['shards'])} shards to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
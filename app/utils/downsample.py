@@ -0,0 +1,162 @@
+"""Shape-preserving downsampling of long time series for plotting
+
+- ``minmax_indices``: split the series into equal buckets and keep the minimum
+  and maximum of each, so spikes survive
+- ``lttb_indices``: Largest-Triangle-Three-Buckets, keeping per bucket the
+  point that forms the largest triangle with the previously kept point and the
+  average of the next bucket
+- ``DownsamplePyramid``: min-max levels of a whole series, each half the size
+  of the previous one. A window is answered from the coarsest level that still
+  has enough points, so the cost depends on the requested size, not on the
+  window length.
+
+All functions return sorted row indices into the input arrays. Missing values
+are never selected.
+"""
+
+from typing import List
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+MIN_POINTS = 3
+MIN_LEVEL_POINTS = 256
+LEVEL_OVERSAMPLING = 2
+
+
+def check_downsample(max_points: int, method: str) -> None:
+    """Validate downsampling parameters
+    Raises:
+        ValueError: If the method is unknown or fewer than ``MIN_POINTS`` points are requested
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+
+
+def _bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    """Edges of ``n_buckets`` buckets of near-equal size over ``n`` points"""
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def minmax_indices(values: np.ndarray, n_out: int) -> np.ndarray:
+    """Keep the minimum and maximum of each of ``n_out // 2`` buckets
+    Args:
+        values (np.ndarray): Values without missing entries
+        n_out (int): Maximum number of points to keep
+    Returns:
+        np.ndarray: Sorted indices of at most ``n_out`` points
+    """
+    n = len(values)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(1, n_out // 2)
+    edges = _bucket_edges(n, n_buckets)
+    starts = edges[:-1]
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+
+    minima = np.minimum.reduceat(values, starts)
+    maxima = np.maximum.reduceat(values, starts)
+    is_min = np.flatnonzero(values == minima[bucket])
+    is_max = np.flatnonzero(values == maxima[bucket])
+    # First occurrence of the extremum in every bucket
+    first_min = is_min[np.unique(bucket[is_min], return_index=True)[1]]
+    first_max = is_max[np.unique(bucket[is_max], return_index=True)[1]]
+    return np.union1d(first_min, first_max)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Select points with Largest-Triangle-Three-Buckets
+    Args:
+        x (np.ndarray): Increasing x values, e.g. epoch nanoseconds
+        y (np.ndarray): Values without missing entries
+        n_out (int): Number of points to keep, at least 3
+    Returns:
+        np.ndarray: Sorted indices of ``n_out`` points including the first and last
+    Raises:
+        ValueError: If fewer than 3 points are requested
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < MIN_POINTS:
+        raise ValueError(f"LTTB needs at least {MIN_POINTS} output points")
+
+    x = (np.asarray(x) - x[0]).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Buckets over the inner points; the first and last point are always kept
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    average_x = np.add.reduceat(x[1:-1], starts - 1) / sizes
+    average_y = np.add.reduceat(y[1:-1], starts - 1) / sizes
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    """Downsample with the given method
+    Args:
+        x (np.ndarray): Increasing x values
+        y (np.ndarray): Values without missing entries
+        n_out (int): Number of points to keep
+        method (str, optional): ``lttb`` or ``minmax``. Defaults to ``lttb``
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    Raises:
+        ValueError: If the parameters are invalid
+    """
+    check_downsample(n_out, method)
+    if method == "lttb":
+        return lttb_indices(x, y, n_out)
+    return minmax_indices(y, n_out)
+
+
+class DownsamplePyramid:
+    """Multi-resolution min-max levels of one series"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, min_points: int = MIN_LEVEL_POINTS) -> None:
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=np.float64)
+        level = np.flatnonzero(~np.isnan(self.y))
+        self.levels: List[np.ndarray] = [level]
+        while len(level) >= 4 * min_points:
+            level = level[minmax_indices(self.y[level], len(level) // 2)]
+            self.levels.append(level)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the level indices"""
+        return sum(level.nbytes for level in self.levels)
+
+    def select(self, start: int, end: int, max_points: int, method: str = "lttb") -> np.ndarray:
+        """Downsample the rows ``[start, end)`` to at most ``max_points`` points
+        Args:
+            start (int): First row of the window
+            end (int): Row after the last one of the window
+            max_points (int): Maximum number of points
+            method (str, optional): ``lttb`` or ``minmax``. Defaults to ``lttb``
+        Returns:
+            np.ndarray: Sorted rows of the kept points
+        """
+        rows = self.levels[0][np.searchsorted(self.levels[0], start):
+                              np.searchsorted(self.levels[0], end)]
+        for level in reversed(self.levels[1:]):
+            candidate = level[np.searchsorted(level, start):np.searchsorted(level, end)]
+            if len(candidate) >= LEVEL_OVERSAMPLING * max_points:
+                rows = candidate
+                break
+        if len(rows) <= max_points:
+            return rows
+        return rows[downsample_indices(self.x[rows], self.y[rows], max_points, method)]
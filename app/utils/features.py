@@ -0,0 +1,58 @@
+"""Out-of-core extraction of the per-user features of a real dataset
+
+The dataset is read in chunks of rows and summarized with mergeable sketches,
+so memory depends on the number of users, not on the number of rows. The
+results have the layout of ``clustering.extract_glucose_features`` and
+``model.extract_hr_steps_features``. Mean, standard deviation, min, max and
+skewness are exact up to floating point; the glucose median comes from a
+histogram with ``MEDIAN_BIN_WIDTH`` mg/dL bins.
+"""
+
+from typing import Tuple
+import pandas as pd
+from app.utils.sketches import GroupedHistogram, GroupedMoments
+
+CHUNK_ROWS = 1_000_000
+MEDIAN_RANGE = (0.0, 600.0)
+MEDIAN_BIN_WIDTH = 0.5
+GLUCOSE_FEATURES = ["mean", "std", "min", "max", "median", "skew"]
+
+
+def extract_real_features(path: str, chunk_rows: int = CHUNK_ROWS) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Extract glucose and HR/steps features from a CSV dataset in one chunked pass
+    Args:
+        path (str): CSV file with ``user_id``, ``glucose``, ``heart_rate`` and ``steps``
+        chunk_rows (int, optional): Rows read at a time. Defaults to CHUNK_ROWS
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Glucose features and HR/steps features
+            per user, users with missing features dropped
+    """
+    glucose = GroupedMoments()
+    median = GroupedHistogram(*MEDIAN_RANGE, MEDIAN_BIN_WIDTH)
+    heart_rate = GroupedMoments()
+    steps = GroupedMoments()
+
+    chunks = pd.read_csv(path, usecols=["user_id", "glucose", "heart_rate", "steps"],
+                         chunksize=chunk_rows)
+    for chunk in chunks:
+        user_ids = chunk["user_id"].to_numpy()
+        glucose.update(user_ids, chunk["glucose"].to_numpy())
+        median.update(user_ids, chunk["glucose"].to_numpy())
+        heart_rate.update(user_ids, chunk["heart_rate"].to_numpy())
+        steps.update(user_ids, chunk["steps"].to_numpy())
+
+    glucose_features = glucose.result()
+    glucose_features["median"] = median.median()
+    glucose_features = glucose_features[GLUCOSE_FEATURES].dropna()
+    glucose_features.index.name = "user_id"
+
+    hr = heart_rate.result()
+    st = steps.result()
+    hr_steps_features = pd.DataFrame({
+        ("heart_rate", "mean"): hr["mean"],
+        ("heart_rate", "std"): hr["std"],
+        ("steps", "mean"): st["mean"],
+        ("steps", "std"): st["std"],
+    }).dropna()
+    hr_steps_features.index.name = "user_id"
+    return glucose_features.sort_index(), hr_steps_features.sort_index()
@@ -0,0 +1,174 @@
+"""Stage timing primitives of the opt-in instrumentation
+
+Kept free of application imports so that models, utilities and services can
+all time their stages. ``app.services.instrumentation`` adds the request
+middleware and the profiler on top and documents ``CGM_INSTRUMENTATION``.
+When it is off, ``span`` returns a shared no-op context manager and
+``instrumented`` functions only check one flag before calling through.
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_enabled = os.environ.get("CGM_INSTRUMENTATION", "0").lower() in ("1", "true", "yes", "on")
+# Stage durations of the current request, set by the request middleware
+request_stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_stages", default=None
+)
+
+
+def is_enabled() -> bool:
+    """Check whether instrumentation is on"""
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    """Turn instrumentation on or off at runtime, e.g. in tests"""
+    global _enabled
+    _enabled = enabled
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram in milliseconds"""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_s: float) -> None:
+        """Add one latency given in seconds"""
+        elapsed_ms = elapsed_s * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding a percentile, capped at the maximum"""
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        """Get the counters and percentile estimates"""
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets_ms": {str(bound): count for bound, count in zip(BUCKETS_MS, self.counts)
+                           if count} | ({"inf": self.counts[-1]} if self.counts[-1] else {}),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe latency histograms per route and per stage"""
+
+    def __init__(self) -> None:
+        self._routes: Dict[str, LatencyHistogram] = {}
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe_route(self, route: str, elapsed_s: float) -> None:
+        """Record the latency of a request"""
+        with self._lock:
+            self._routes.setdefault(route, LatencyHistogram()).observe(elapsed_s)
+
+    def observe_stage(self, stage: str, elapsed_s: float) -> None:
+        """Record the latency of a stage"""
+        with self._lock:
+            self._stages.setdefault(stage, LatencyHistogram()).observe(elapsed_s)
+
+    def reset(self) -> None:
+        """Drop all histograms"""
+        with self._lock:
+            self._routes.clear()
+            self._stages.clear()
+
+    def snapshot(self) -> dict:
+        """Get the histograms of all routes and stages"""
+        with self._lock:
+            return {
+                "routes": {name: h.snapshot() for name, h in sorted(self._routes.items())},
+                "stages": {name: h.snapshot() for name, h in sorted(self._stages.items())},
+            }
+
+
+metrics = MetricsRegistry()
+
+
+class _NoopSpan:
+    """Context manager that does nothing"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Context manager timing one stage"""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = time.perf_counter() - self.start
+        metrics.observe_stage(self.name, elapsed)
+        stages = request_stages.get()
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+
+
+def span(name: str):
+    """Time a block of code as a stage
+    Args:
+        name (str): Stage name, e.g. ``dataset.read_csv``
+    Returns:
+        A context manager; a shared no-op one when instrumentation is off
+    """
+    return _Span(name) if _enabled else _NOOP_SPAN
+
+
+def instrumented(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorate a function to be timed as a stage
+    Args:
+        name (str): Stage name
+    Returns:
+        Callable: Decorator
+    """
+    def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
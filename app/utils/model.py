@@ -27,10 +27,10 @@ def train_models(X_real: pd.DataFrame, y_real: pd.DataFrame,
     Returns:
         tuple: (real_model, synth_model)
     """
-    real_model = RandomForestRegressor(n_estimators=100, random_state=42)
+    real_model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
     real_model.fit(X_real, y_real)
 
-    synth_model = RandomForestRegressor(n_estimators=100, random_state=42)
+    synth_model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
     synth_model.fit(X_synth, y_synth)
 
     return real_model, synth_model
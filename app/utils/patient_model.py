@@ -0,0 +1,67 @@
+"""Generative model of synthetic patients
+
+A patient is a profile of the synthetic dataset (a daily glucose curve and the
+mean and standard deviation of its heart rate and steps) repeated for any
+number of days: every day shifts the curve by a normal offset and adds
+per-sample noise, heart rate and steps are drawn from the profile's normal
+distributions, and all values are clipped to plausible ranges.
+
+The model only takes standard normal draws, so callers decide how they are
+seeded: ``app.utils.cohort`` draws them from per-shard streams and
+``app.services.synthetic_source`` from per-day generators. The module only
+depends on numpy so the serving path can use it without the training stack.
+"""
+
+from typing import Tuple
+import numpy as np
+
+SAMPLES_PER_DAY = 288
+SAMPLE_NS = 300_000_000_000
+DAY_NS = SAMPLES_PER_DAY * SAMPLE_NS
+DAY_OFFSET_STD = 8.0
+GLUCOSE_NOISE_STD = 3.0
+GLUCOSE_RANGE = (40.0, 400.0)
+HEART_RATE_RANGE = (40, 200)
+STEPS_RANGE = (0, 500)
+PROFILE_COLUMNS = ["hr_mean", "hr_std", "steps_mean", "steps_std"]
+
+
+def profile_parameters(heart_rate: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """Heart rate and steps parameters of daily profiles
+    Args:
+        heart_rate (np.ndarray): Heart rate of shape (profiles, SAMPLES_PER_DAY)
+        steps (np.ndarray): Steps of shape (profiles, SAMPLES_PER_DAY)
+    Returns:
+        np.ndarray: ``PROFILE_COLUMNS`` of every profile, shape (profiles, 4);
+            standard deviations use one degree of freedom like pandas
+    """
+    heart_rate = np.asarray(heart_rate, dtype=np.float64)
+    steps = np.asarray(steps, dtype=np.float64)
+    return np.column_stack([heart_rate.mean(axis=1), heart_rate.std(axis=1, ddof=1),
+                            steps.mean(axis=1), steps.std(axis=1, ddof=1)])
+
+
+def synthesize_days(curves: np.ndarray, parameters: np.ndarray, day_offsets: np.ndarray,
+                    glucose_noise: np.ndarray, heart_rate_noise: np.ndarray,
+                    steps_noise: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Generate days of patients from their profiles and standard normal draws
+    Args:
+        curves (np.ndarray): Daily glucose curves of shape (patients, SAMPLES_PER_DAY)
+        parameters (np.ndarray): ``PROFILE_COLUMNS`` of every patient, shape (patients, 4)
+        day_offsets (np.ndarray): Draws of shape (patients, days)
+        glucose_noise (np.ndarray): Draws of shape (patients, days * SAMPLES_PER_DAY)
+        heart_rate_noise (np.ndarray): Draws of the same shape
+        steps_noise (np.ndarray): Draws of the same shape
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Glucose, heart rate and
+            steps of shape (patients, days * SAMPLES_PER_DAY), sorted by time
+    """
+    n_days = day_offsets.shape[1]
+    glucose = np.tile(curves, (1, n_days))
+    glucose += np.repeat(DAY_OFFSET_STD * day_offsets, SAMPLES_PER_DAY, axis=1)
+    glucose += GLUCOSE_NOISE_STD * glucose_noise
+    np.clip(glucose, *GLUCOSE_RANGE, out=glucose)
+    hr_mean, hr_std, steps_mean, steps_std = parameters.T[:, :, None]
+    heart_rate = np.clip(np.round(hr_mean + hr_std * heart_rate_noise), *HEART_RATE_RANGE)
+    steps = np.clip(np.round(steps_mean + steps_std * steps_noise), *STEPS_RANGE)
+    return glucose, heart_rate, steps
@@ -0,0 +1,157 @@
+"""Precomputed prefix sums for O(1) window statistics
+
+The index is built once per dataset over the rows sorted by user and time.
+Glucose is shifted by its dataset mean before accumulating squares, which keeps
+the variance computed from prefix sums numerically close to a direct two-pass
+computation. Missing values are skipped, as pandas does. Counts of glucose
+values above the range thresholds give time in ranges in O(1) as well.
+"""
+
+from dataclasses import dataclass
+from typing import Tuple
+import numpy as np
+
+NS_PER_DAY = 86_400_000_000_000
+# Consensus glucose ranges: below 54, 54-69, 70-180, 181-250 and above 250 mg/dL
+GLUCOSE_RANGES = ("very_low", "low", "in_range", "high", "very_high")
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """Cumulative sum with a leading zero, so ``p[b] - p[a]`` sums ``values[a:b]``"""
+    out = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+@dataclass(frozen=True)
+class RollingIndex:
+    """Prefix sums over glucose and steps plus day boundaries of the timestamps
+    Attributes:
+        glucose (np.ndarray): Raw glucose values
+        heart_rate (np.ndarray): Raw heart rate values
+        glucose_count (np.ndarray): Prefix count of non-missing glucose values
+        glucose_sum (np.ndarray): Prefix sum of shifted glucose values
+        glucose_sq_sum (np.ndarray): Prefix sum of squared shifted glucose values
+        glucose_shift (float): Constant subtracted from glucose before summing
+        glucose_above (np.ndarray): Prefix counts of glucose values at or above
+            54 and 70 and above 180 and 250, shape ``(n + 1, 4)``
+        steps_sum (np.ndarray): Prefix sum of steps, in the dtype of the steps column
+        days (np.ndarray): Day number (days since the epoch) of every row
+        day_changes (np.ndarray): Number of day changes up to and including every row
+    """
+    glucose: np.ndarray
+    heart_rate: np.ndarray
+    glucose_count: np.ndarray
+    glucose_sum: np.ndarray
+    glucose_sq_sum: np.ndarray
+    glucose_shift: float
+    glucose_above: np.ndarray
+    steps_sum: np.ndarray
+    days: np.ndarray
+    day_changes: np.ndarray
+
+    def slice(self, start: int, stop: int) -> "RollingIndex":
+        """Get the index of a row range, e.g. one user, with local row numbers
+        Args:
+            start (int): First row
+            stop (int): Row after the last one
+        Returns:
+            RollingIndex: Index made of views into this one
+        """
+        return RollingIndex(
+            glucose=self.glucose[start:stop],
+            heart_rate=self.heart_rate[start:stop],
+            glucose_count=self.glucose_count[start:stop + 1],
+            glucose_sum=self.glucose_sum[start:stop + 1],
+            glucose_sq_sum=self.glucose_sq_sum[start:stop + 1],
+            glucose_shift=self.glucose_shift,
+            glucose_above=self.glucose_above[start:stop + 1],
+            steps_sum=self.steps_sum[start:stop + 1],
+            days=self.days[start:stop],
+            day_changes=self.day_changes[start:stop],
+        )
+
+    def glucose_moments(self, start, end) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Count, mean and sample standard deviation of glucose in ``[start, end)``
+        Args:
+            start (int | np.ndarray): First row(s)
+            end (int | np.ndarray): Row(s) after the last one
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Count, mean and std (NaN
+                where undefined)
+        """
+        count = self.glucose_count[end] - self.glucose_count[start]
+        total = self.glucose_sum[end] - self.glucose_sum[start]
+        squares = self.glucose_sq_sum[end] - self.glucose_sq_sum[start]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = total / count
+            variance = (squares - total * mean) / (count - 1)
+            variance = np.where(count > 1, np.maximum(variance, 0.0), np.nan)
+            mean = np.where(count > 0, mean + self.glucose_shift, np.nan)
+        return count, mean, np.sqrt(variance)
+
+    def glucose_range_counts(self, start, end) -> np.ndarray:
+        """Number of glucose values in each of ``GLUCOSE_RANGES`` in ``[start, end)``
+        Args:
+            start (int | np.ndarray): First row(s)
+            end (int | np.ndarray): Row(s) after the last one
+        Returns:
+            np.ndarray: Counts with the ranges along the last axis
+        """
+        count = self.glucose_count[end] - self.glucose_count[start]
+        above = (self.glucose_above[end] - self.glucose_above[start]).astype(np.int64)
+        bounds = np.concatenate((np.expand_dims(count, -1), above,
+                                 np.zeros_like(np.expand_dims(count, -1))), axis=-1)
+        return bounds[..., :-1] - bounds[..., 1:]
+
+    def steps_total(self, start, end):
+        """Total steps in ``[start, end)``, in the dtype of the steps column"""
+        return self.steps_sum[end] - self.steps_sum[start]
+
+
+def build_rolling_index(timestamps: np.ndarray, glucose: np.ndarray, heart_rate: np.ndarray,
+                        steps: np.ndarray) -> RollingIndex:
+    """Build the prefix sums for rows sorted by user and time
+    Args:
+        timestamps (np.ndarray): datetime64[ns] timestamps
+        glucose (np.ndarray): Glucose values
+        heart_rate (np.ndarray): Heart rate values
+        steps (np.ndarray): Step counts
+    Returns:
+        RollingIndex: Index over all rows
+    """
+    glucose = np.asarray(glucose, dtype=np.float64)
+    present = ~np.isnan(glucose)
+    shift = float(glucose[present].mean()) if present.any() else 0.0
+    shifted = np.where(present, glucose - shift, 0.0)
+
+    with np.errstate(invalid="ignore"):
+        above = np.stack((glucose >= 54, glucose >= 70, glucose > 180, glucose > 250), axis=1)
+    glucose_above = np.zeros((len(glucose) + 1, 4), dtype=np.int32)
+    np.cumsum(above, axis=0, out=glucose_above[1:])
+
+    steps = np.asarray(steps)
+    if np.issubdtype(steps.dtype, np.floating):
+        steps = np.where(np.isnan(steps), 0.0, steps)
+
+    days = np.asarray(timestamps).view("i8") // NS_PER_DAY
+    changes = np.zeros(len(days), dtype=np.int64)
+    if len(days):
+        np.cumsum(days[1:] != days[:-1], out=changes[1:])
+
+    index = RollingIndex(
+        glucose=glucose,
+        heart_rate=np.asarray(heart_rate),
+        glucose_count=_prefix(present.astype(np.int64)),
+        glucose_sum=_prefix(shifted),
+        glucose_sq_sum=_prefix(shifted * shifted),
+        glucose_shift=shift,
+        glucose_above=glucose_above,
+        steps_sum=_prefix(steps),
+        days=days,
+        day_changes=changes,
+    )
+    for array in (index.glucose_count, index.glucose_sum, index.glucose_sq_sum,
+                  index.glucose_above, index.steps_sum, index.days, index.day_changes):
+        array.setflags(write=False)
+    return index
@@ -0,0 +1,368 @@
+"""Hourly and daily glucose rollups for long-horizon analytics
+
+Rows sorted by user and time are summarized per user and clock hour and per
+user and day: count, sum, sum of squares, minimum, maximum, the number of
+values in each of ``GLUCOSE_RANGES`` and a fixed-width histogram from
+``ROLLUP_LOW`` to ``ROLLUP_HIGH`` mg/dL as a mergeable quantile sketch (values
+outside go to the edge bins; quantiles are interpolated within a bin, see
+``app.utils.sketches.histogram_quantile``).
+
+A window of rows is summarized by adding up the days it covers completely,
+then the complete hours at its two ends and finally the raw samples of the
+partial hours at its edges, so the cost grows with the number of days, not
+with the number of samples. Counts, sums, extremes and time in ranges are
+exact; percentiles are accurate to about half a bin width.
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+from app.utils.rolling import GLUCOSE_RANGES, NS_PER_DAY
+from app.utils.sketches import histogram_quantile
+
+NS_PER_HOUR = 3_600_000_000_000
+HOURS_PER_DAY = 24
+ROLLUP_LOW = 40.0
+ROLLUP_HIGH = 400.0
+ROLLUP_BIN_WIDTH = 2.0
+ROLLUP_BINS = int(np.ceil((ROLLUP_HIGH - ROLLUP_LOW) / ROLLUP_BIN_WIDTH))
+AGP_PERCENTILES = (5, 25, 50, 75, 95)
+# Glucose management indicator (%) from the mean glucose in mg/dL
+GMI_INTERCEPT = 3.31
+GMI_SLOPE = 0.02392
+
+
+@dataclass(frozen=True)
+class RollupTable:
+    """Glucose summaries of consecutive row buckets of one period length
+    Attributes:
+        period_ns (int): Bucket length, an hour or a day
+        starts_ns (np.ndarray): Start of the period of every bucket
+        rows (np.ndarray): First row of every bucket followed by the row after
+            the last bucket, shape ``(buckets + 1,)``
+        count (np.ndarray): Number of non-missing glucose values
+        total (np.ndarray): Sum of glucose
+        sq_total (np.ndarray): Sum of squared glucose
+        minimum (np.ndarray): Minimum glucose, NaN for empty buckets
+        maximum (np.ndarray): Maximum glucose, NaN for empty buckets
+        range_counts (np.ndarray): Values in each of ``GLUCOSE_RANGES``, shape (buckets, 5)
+        histogram (np.ndarray): Histogram counts, shape (buckets, ROLLUP_BINS)
+    """
+    period_ns: int
+    starts_ns: np.ndarray
+    rows: np.ndarray
+    count: np.ndarray
+    total: np.ndarray
+    sq_total: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    range_counts: np.ndarray
+    histogram: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the table"""
+        return sum(array.nbytes for array in (
+            self.starts_ns, self.rows, self.count, self.total, self.sq_total, self.minimum,
+            self.maximum, self.range_counts, self.histogram))
+
+    def slice(self, start: int, stop: int) -> "RollupTable":
+        """Get the buckets of a row range, e.g. one user, with local row numbers
+        Args:
+            start (int): First row; a bucket starts there
+            stop (int): Row after the last one; a bucket starts there or it is the end
+        Returns:
+            RollupTable: Table made of views into this one, except ``rows``
+        """
+        first, last = np.searchsorted(self.rows, [start, stop])
+        return RollupTable(
+            period_ns=self.period_ns,
+            starts_ns=self.starts_ns[first:last],
+            rows=self.rows[first:last + 1] - start,
+            count=self.count[first:last],
+            total=self.total[first:last],
+            sq_total=self.sq_total[first:last],
+            minimum=self.minimum[first:last],
+            maximum=self.maximum[first:last],
+            range_counts=self.range_counts[first:last],
+            histogram=self.histogram[first:last],
+        )
+
+    def covered(self, start: int, end: int) -> Tuple[int, int]:
+        """Buckets lying completely inside the rows ``[start, end)``
+        Returns:
+            Tuple[int, int]: Bucket range ``[first, last)``, empty if ``first >= last``
+        """
+        first = int(np.searchsorted(self.rows, start, side="left"))
+        last = int(np.searchsorted(self.rows, end, side="right")) - 1
+        return first, last
+
+
+@dataclass(frozen=True)
+class Rollups:
+    """Hourly and daily rollup tables of the same rows
+    Attributes:
+        hourly (RollupTable): One bucket per user and clock hour with samples
+        daily (RollupTable): One bucket per user and day with samples
+    """
+    hourly: RollupTable
+    daily: RollupTable
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by both tables"""
+        return self.hourly.nbytes + self.daily.nbytes
+
+    def slice(self, start: int, stop: int) -> "Rollups":
+        """Get the rollups of a row range with local row numbers"""
+        return Rollups(hourly=self.hourly.slice(start, stop), daily=self.daily.slice(start, stop))
+
+
+def _range_codes(glucose: np.ndarray) -> np.ndarray:
+    """Index into ``GLUCOSE_RANGES`` of every non-missing value"""
+    return ((glucose >= 54).astype(np.int64) + (glucose >= 70) + (glucose > 180)
+            + (glucose > 250))
+
+
+def _histogram_bins(glucose: np.ndarray) -> np.ndarray:
+    """Histogram bin of every non-missing value"""
+    return np.clip(((glucose - ROLLUP_LOW) // ROLLUP_BIN_WIDTH).astype(np.int64),
+                   0, ROLLUP_BINS - 1)
+
+
+def _build_table(period_ns: int, timestamps_ns: np.ndarray, glucose: np.ndarray,
+                 user_starts: np.ndarray, histogram_dtype: type) -> RollupTable:
+    """Summarize the rows per user and period"""
+    n = len(glucose)
+    periods = timestamps_ns // period_ns
+    new_bucket = np.ones(n, dtype=bool)
+    new_bucket[1:] = periods[1:] != periods[:-1]
+    new_bucket[user_starts] = True
+    starts = np.flatnonzero(new_bucket)
+    n_buckets = len(starts)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+
+    present = ~np.isnan(glucose)
+    values = np.where(present, glucose, 0.0)
+    kept, kept_bucket = glucose[present], bucket[present]
+    if n:
+        count = np.add.reduceat(present.astype(np.int32), starts)
+        total = np.add.reduceat(values, starts)
+        sq_total = np.add.reduceat(values * values, starts)
+        minimum = np.fmin.reduceat(glucose, starts)
+        maximum = np.fmax.reduceat(glucose, starts)
+    else:
+        count, total, sq_total, minimum, maximum = (np.zeros(0) for _ in range(5))
+    range_counts = np.bincount(kept_bucket * len(GLUCOSE_RANGES) + _range_codes(kept),
+                               minlength=n_buckets * len(GLUCOSE_RANGES))
+    histogram = np.bincount(kept_bucket * ROLLUP_BINS + _histogram_bins(kept),
+                            minlength=n_buckets * ROLLUP_BINS)
+
+    table = RollupTable(
+        period_ns=period_ns,
+        starts_ns=periods[starts] * period_ns,
+        rows=np.append(starts, n).astype(np.int64),
+        count=count.astype(np.int32),
+        total=total,
+        sq_total=sq_total,
+        minimum=minimum,
+        maximum=maximum,
+        range_counts=range_counts.reshape(n_buckets, -1).astype(np.int32),
+        histogram=histogram.reshape(n_buckets, ROLLUP_BINS).astype(histogram_dtype),
+    )
+    for array in (table.starts_ns, table.rows, table.count, table.total, table.sq_total,
+                  table.minimum, table.maximum, table.range_counts, table.histogram):
+        array.setflags(write=False)
+    return table
+
+
+def build_rollups(timestamps: np.ndarray, glucose: np.ndarray,
+                  user_starts: Sequence[int] = ()) -> Rollups:
+    """Build the hourly and daily rollups of rows sorted by user and time
+    Args:
+        timestamps (np.ndarray): datetime64[ns] timestamps
+        glucose (np.ndarray): Glucose values
+        user_starts (Sequence[int], optional): First row of every user. Defaults to none
+    Returns:
+        Rollups: Rollups of all rows
+    """
+    timestamps_ns = np.asarray(timestamps).view("i8")
+    glucose = np.asarray(glucose, dtype=np.float64)
+    user_starts = np.asarray(user_starts, dtype=np.int64)
+    return Rollups(
+        # At most 12 samples per hour at 5-minute sampling; uint16 leaves ample room
+        hourly=_build_table(NS_PER_HOUR, timestamps_ns, glucose, user_starts, np.uint16),
+        daily=_build_table(NS_PER_DAY, timestamps_ns, glucose, user_starts, np.int32),
+    )
+
+
+@dataclass(frozen=True)
+class WindowSummary:
+    """Merged glucose summary of a window
+    Attributes:
+        count (int): Number of non-missing glucose values
+        total (float): Sum of glucose
+        sq_total (float): Sum of squared glucose
+        minimum (float): Minimum glucose, NaN for an empty window
+        maximum (float): Maximum glucose, NaN for an empty window
+        range_counts (np.ndarray): Values in each of ``GLUCOSE_RANGES``
+        histogram (np.ndarray): Histogram counts
+    """
+    count: int
+    total: float
+    sq_total: float
+    minimum: float
+    maximum: float
+    range_counts: np.ndarray
+    histogram: np.ndarray
+
+    @property
+    def mean(self) -> float:
+        """Mean glucose, NaN for an empty window"""
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation of glucose, NaN for fewer than two values"""
+        if self.count < 2:
+            return float("nan")
+        return float(np.sqrt(max(self.sq_total - self.total * self.mean, 0.0) / (self.count - 1)))
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile of glucose, NaN for an empty window"""
+        return float(histogram_quantile(self.histogram[None, :], q, ROLLUP_LOW,
+                                        ROLLUP_BIN_WIDTH)[0])
+
+
+def _window_parts(tables: List[RollupTable], start: int,
+                  end: int) -> Tuple[List[Tuple[RollupTable, int, int]], List[Tuple[int, int]]]:
+    """Split a row range into complete buckets of the coarsest tables and raw rows"""
+    if start >= end:
+        return [], []
+    if not tables:
+        return [], [(start, end)]
+    table, finer = tables[0], tables[1:]
+    first, last = table.covered(start, end)
+    if first >= last:
+        return _window_parts(finer, start, end)
+    head_buckets, head_rows = _window_parts(finer, start, int(table.rows[first]))
+    tail_buckets, tail_rows = _window_parts(finer, int(table.rows[last]), end)
+    return head_buckets + [(table, first, last)] + tail_buckets, head_rows + tail_rows
+
+
+def summarize_window(rollups: Rollups, glucose: np.ndarray, start: int, end: int) -> WindowSummary:
+    """Summarize glucose in the rows ``[start, end)`` of one user
+    Args:
+        rollups (Rollups): Rollups of the user, with local row numbers
+        glucose (np.ndarray): Glucose values of the user
+        start (int): First row
+        end (int): Row after the last one
+    Returns:
+        WindowSummary: Merged summary of the window
+    """
+    buckets, raw = _window_parts([rollups.daily, rollups.hourly], start, end)
+    count, total, sq_total = 0, 0.0, 0.0
+    minimum, maximum = np.nan, np.nan
+    range_counts = np.zeros(len(GLUCOSE_RANGES), dtype=np.int64)
+    histogram = np.zeros(ROLLUP_BINS, dtype=np.int64)
+    for table, first, last in buckets:
+        count += int(table.count[first:last].sum())
+        total += float(table.total[first:last].sum())
+        sq_total += float(table.sq_total[first:last].sum())
+        minimum = np.fmin.reduce(table.minimum[first:last], initial=minimum)
+        maximum = np.fmax.reduce(table.maximum[first:last], initial=maximum)
+        range_counts += table.range_counts[first:last].sum(axis=0)
+        histogram += table.histogram[first:last].sum(axis=0, dtype=np.int64)
+    for row_start, row_end in raw:
+        values = glucose[row_start:row_end]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            continue
+        count += len(values)
+        total += float(values.sum())
+        sq_total += float((values * values).sum())
+        minimum = np.fmin(minimum, values.min())
+        maximum = np.fmax(maximum, values.max())
+        range_counts += np.bincount(_range_codes(values), minlength=len(GLUCOSE_RANGES))
+        histogram += np.bincount(_histogram_bins(values), minlength=ROLLUP_BINS)
+    return WindowSummary(count, total, sq_total, float(minimum), float(maximum), range_counts,
+                         histogram)
+
+
+def hour_of_day_histograms(rollups: Rollups, timestamps_ns: np.ndarray, glucose: np.ndarray,
+                           start: int, end: int) -> np.ndarray:
+    """Glucose histograms of every hour of the day over the rows ``[start, end)``
+    Complete hours come from the hourly table, the partial hours at the edges
+    from the raw samples.
+    Args:
+        rollups (Rollups): Rollups of the user, with local row numbers
+        timestamps_ns (np.ndarray): Epoch nanoseconds of the user's rows
+        glucose (np.ndarray): Glucose values of the user
+        start (int): First row
+        end (int): Row after the last one
+    Returns:
+        np.ndarray: Counts of shape (24, ROLLUP_BINS)
+    """
+    histograms = np.zeros((HOURS_PER_DAY, ROLLUP_BINS), dtype=np.int64)
+    buckets, raw = _window_parts([rollups.hourly], start, end)
+    for table, first, last in buckets:
+        hours = (table.starts_ns[first:last] // NS_PER_HOUR) % HOURS_PER_DAY
+        counts = table.histogram[first:last]
+        # 24 masked sums are far faster than np.add.at over whole rows
+        for hour in range(HOURS_PER_DAY):
+            histograms[hour] += counts[hours == hour].sum(axis=0, dtype=np.int64)
+    for row_start, row_end in raw:
+        values = glucose[row_start:row_end]
+        present = ~np.isnan(values)
+        hours = (timestamps_ns[row_start:row_end][present] // NS_PER_HOUR) % HOURS_PER_DAY
+        cells = hours * ROLLUP_BINS + _histogram_bins(values[present])
+        histograms += np.bincount(cells, minlength=histograms.size).reshape(histograms.shape)
+    return histograms
+
+
+def ambulatory_glucose_profile(histograms: np.ndarray,
+                               percentiles: Sequence[float] = AGP_PERCENTILES) -> List[dict]:
+    """Percentile bands of glucose by hour of the day
+    Args:
+        histograms (np.ndarray): Counts per hour of the day, shape (24, ROLLUP_BINS)
+        percentiles (Sequence[float], optional): Percentiles of every band.
+            Defaults to AGP_PERCENTILES
+    Returns:
+        List[dict]: One record per hour with the count and ``p<percentile>``
+            values (None for hours without samples)
+    """
+    counts = histograms.sum(axis=1)
+    bands = {f"p{p:g}": histogram_quantile(histograms, p / 100, ROLLUP_LOW, ROLLUP_BIN_WIDTH)
+             for p in percentiles}
+    return [{"hour": hour, "count": int(counts[hour]),
+             **{name: None if np.isnan(values[hour]) else round(float(values[hour]), 1)
+                for name, values in bands.items()}}
+            for hour in range(HOURS_PER_DAY)]
+
+
+def time_in_ranges(summary: WindowSummary) -> dict:
+    """Time in ranges and the glucose metrics of a consensus AGP report
+    Args:
+        summary (WindowSummary): Summary of the window
+    Returns:
+        dict: Readings, percentage of readings per range, mean, standard
+            deviation, coefficient of variation (%), GMI (%), minimum, maximum
+            and median; None where undefined
+    """
+    def number(value: float, digits: int = 1):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    count = summary.count
+    mean, std = summary.mean, summary.std
+    return {
+        "readings": count,
+        "percent": {name: number(100 * value / count if count else np.nan, 2)
+                    for name, value in zip(GLUCOSE_RANGES, summary.range_counts)},
+        "mean": number(mean),
+        "std": number(std),
+        "cv": number(100 * std / mean if count else np.nan),
+        "gmi": number(GMI_INTERCEPT + GMI_SLOPE * mean, 2),
+        "min": number(summary.minimum),
+        "max": number(summary.maximum),
+        "median": number(summary.quantile(0.5)),
+    }
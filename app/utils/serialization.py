@@ -0,0 +1,134 @@
+"""Compact encodings for time-series responses
+
+Besides the default list of records, time-series endpoints can answer with:
+
+- ``application/vnd.cgm.columnar+json``: ``{"timestamps": [...], "<column>": [...]}``
+  with epoch-millisecond timestamps and one array per value column
+- ``application/vnd.cgm.series``: little-endian binary made of the magic
+  ``b"CGMS"``, a uint8 format version, a uint32 sample count, an int64 epoch-ms
+  first timestamp, ``count - 1`` int32 millisecond deltas and ``count`` float32
+  values
+
+``orjson`` is used for the columnar JSON encoding when it is installed; both
+encoders write missing or non-finite values as ``null``.
+"""
+
+import json
+import struct
+from typing import Dict, Tuple
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+RECORDS_JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.cgm.columnar+json"
+SERIES_BINARY = "application/vnd.cgm.series"
+MEDIA_TYPES = (RECORDS_JSON, COLUMNAR_JSON, SERIES_BINARY)
+
+SERIES_MAGIC = b"CGMS"
+SERIES_VERSION = 1
+_HEADER = struct.Struct("<4sBIq")
+_INT32 = np.iinfo(np.int32)
+
+
+def negotiate_media_type(accept: str | None) -> str:
+    """Pick the response encoding from an ``Accept`` header
+    Args:
+        accept (str | None): Value of the ``Accept`` header
+    Returns:
+        str: One of ``MEDIA_TYPES``; records JSON if nothing else matches
+    """
+    if not accept:
+        return RECORDS_JSON
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type in MEDIA_TYPES and quality > 0:
+            candidates.append((-quality, position, media_type))
+    return min(candidates)[2] if candidates else RECORDS_JSON
+
+
+def _epoch_ms(timestamps: np.ndarray) -> np.ndarray:
+    """Convert datetime64 values to int64 epoch milliseconds"""
+    return np.asarray(timestamps).astype("datetime64[ms]").view("i8")
+
+
+def _json_list(values: np.ndarray) -> list:
+    """Convert a column to a list, with None in place of NaN and infinities"""
+    if values.dtype.kind == "f" and not np.isfinite(values).all():
+        values = np.where(np.isfinite(values), values, None)
+    return values.tolist()
+
+
+def encode_columnar_json(timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> bytes:
+    """Encode a time series as column-oriented JSON
+    Args:
+        timestamps (np.ndarray): datetime64 timestamps
+        columns (Dict[str, np.ndarray]): Value columns of the same length
+    Returns:
+        bytes: UTF-8 encoded JSON document
+    """
+    payload = {"timestamps": _epoch_ms(timestamps)}
+    for name, values in columns.items():
+        payload[name] = np.ascontiguousarray(values, dtype=np.float64)
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps({name: _json_list(values) for name, values in payload.items()},
+                      separators=(",", ":"), allow_nan=False).encode()
+
+
+def encode_series_binary(timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Encode a single-valued time series in the compact binary layout
+    Args:
+        timestamps (np.ndarray): Sorted datetime64 timestamps
+        values (np.ndarray): Values of the same length
+    Returns:
+        bytes: Encoded series
+    Raises:
+        ValueError: If two consecutive samples are more than ~24.8 days apart
+    """
+    epoch_ms = _epoch_ms(timestamps)
+    first = int(epoch_ms[0]) if len(epoch_ms) else 0
+    deltas = np.diff(epoch_ms)
+    if len(deltas) and (deltas.min() < _INT32.min or deltas.max() > _INT32.max):
+        raise ValueError("Gap between samples too large for the binary series encoding")
+    deltas = deltas.astype("<i4")
+    return b"".join((
+        _HEADER.pack(SERIES_MAGIC, SERIES_VERSION, len(epoch_ms), first),
+        deltas.tobytes(),
+        np.asarray(values, dtype="<f4").tobytes(),
+    ))
+
+
+def decode_series_binary(payload: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a payload produced by ``encode_series_binary``
+    Args:
+        payload (bytes): Encoded series
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: datetime64[ms] timestamps and float32 values
+    Raises:
+        ValueError: If the payload is not a supported series
+    """
+    magic, version, count, first = _HEADER.unpack_from(payload)
+    if magic != SERIES_MAGIC or version != SERIES_VERSION:
+        raise ValueError("Unsupported series payload")
+    offset = _HEADER.size
+    deltas = np.frombuffer(payload, dtype="<i4", count=max(count - 1, 0), offset=offset)
+    offset += deltas.nbytes
+    values = np.frombuffer(payload, dtype="<f4", count=count, offset=offset)
+    epoch_ms = np.empty(count, dtype=np.int64)
+    if count:
+        epoch_ms[0] = first
+        np.cumsum(deltas, dtype=np.int64, out=epoch_ms[1:])
+        epoch_ms[1:] += first
+    return epoch_ms.view("datetime64[ms]"), values
@@ -0,0 +1,202 @@
+"""Mergeable per-group summaries for out-of-core feature extraction
+
+Both summaries are updated chunk by chunk and can be merged, so data that does
+not fit in memory, or is processed by several workers, is summarized in one
+pass:
+
+- ``GroupedMoments``: exact count, mean, standard deviation, min, max and
+  skewness from count, mean and the second and third central moments, combined
+  with the pairwise update formulas of Chan et al. and Pébay
+- ``GroupedHistogram``: fixed-width histogram per group; quantiles are
+  interpolated within a bin (``histogram_quantile``), so their error is about
+  half a bin width
+
+Missing values are skipped, as pandas does.
+"""
+
+from typing import Dict, Hashable
+import numpy as np
+import pandas as pd
+
+_MOMENT_COLUMNS = ["count", "mean", "m2", "m3", "min", "max"]
+
+
+def histogram_quantile(counts: np.ndarray, q: float, low: float, bin_width: float) -> np.ndarray:
+    """Approximate a quantile of every row of a fixed-width histogram matrix
+    Args:
+        counts (np.ndarray): Counts of shape (rows, bins)
+        q (float): Quantile in [0, 1]
+        low (float): Lower edge of the first bin
+        bin_width (float): Width of every bin
+    Returns:
+        np.ndarray: Quantile of every row, interpolated within its bin; NaN for empty rows
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n_bins = counts.shape[1]
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1]
+    rank = q * (total - 1)
+    bins = np.minimum((cumulative <= rank[:, None]).sum(axis=1), n_bins - 1)
+    rows = np.arange(len(bins))
+    before = np.where(bins > 0, cumulative[rows, np.maximum(bins - 1, 0)], 0)
+    in_bin = counts[rows, bins]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (rank - before + 0.5) / in_bin
+    values = low + (bins + np.clip(fraction, 0.0, 1.0)) * bin_width
+    return np.where(total > 0, values, np.nan)
+
+
+class GroupedMoments:
+    """Per-group running moments"""
+
+    def __init__(self) -> None:
+        self._moments = pd.DataFrame({name: pd.Series(dtype=float) for name in _MOMENT_COLUMNS})
+
+    @staticmethod
+    def _summarize(keys: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+        """Moments of one chunk"""
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        keys, values = np.asarray(keys)[present], values[present]
+        groups = pd.Series(values).groupby(keys)
+        count = groups.count().astype(float)
+        mean = groups.mean()
+        deviation = values - mean.reindex(keys).to_numpy()
+        centered = pd.DataFrame({"m2": deviation ** 2, "m3": deviation ** 3}).groupby(keys).sum()
+        return pd.DataFrame({
+            "count": count,
+            "mean": mean,
+            "m2": centered["m2"],
+            "m3": centered["m3"],
+            "min": groups.min(),
+            "max": groups.max(),
+        })
+
+    def _combine(self, other: pd.DataFrame) -> None:
+        """Merge chunk or partial moments into the running moments"""
+        index = self._moments.index.union(other.index)
+        a = self._moments.reindex(index)
+        b = other.reindex(index)
+        na = a["count"].fillna(0).to_numpy()
+        nb = b["count"].fillna(0).to_numpy()
+        mean_a = a["mean"].fillna(0).to_numpy()
+        mean_b = b["mean"].fillna(0).to_numpy()
+        m2_a, m2_b = a["m2"].fillna(0).to_numpy(), b["m2"].fillna(0).to_numpy()
+        m3_a, m3_b = a["m3"].fillna(0).to_numpy(), b["m3"].fillna(0).to_numpy()
+
+        n = na + nb
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = mean_b - mean_a
+            mean = np.where(n > 0, mean_a + delta * nb / n, np.nan)
+            m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * na * nb / n, 0.0)
+            m3 = (m3_a + m3_b
+                  + np.where(n > 0, delta ** 3 * na * nb * (na - nb) / n ** 2
+                             + 3 * delta * (na * m2_b - nb * m2_a) / n, 0.0))
+        self._moments = pd.DataFrame({
+            "count": n,
+            "mean": mean,
+            "m2": m2,
+            "m3": m3,
+            "min": np.fmin(a["min"].to_numpy(), b["min"].to_numpy()),
+            "max": np.fmax(a["max"].to_numpy(), b["max"].to_numpy()),
+        }, index=index)
+
+    def update(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Add a chunk of values
+        Args:
+            keys (np.ndarray): Group of every value
+            values (np.ndarray): Values; NaN is skipped
+        """
+        self._combine(self._summarize(keys, values))
+
+    def merge(self, other: "GroupedMoments") -> None:
+        """Add the moments accumulated by another instance"""
+        self._combine(other._moments)
+
+    def result(self) -> pd.DataFrame:
+        """Get the statistics of every group
+        Returns:
+            pd.DataFrame: ``count``, ``mean``, ``std`` (sample), ``min``, ``max``
+                and ``skew`` (bias-adjusted, as pandas) indexed by group; NaN
+                where there are too few values
+        """
+        n = self._moments["count"]
+        m2, m3 = self._moments["m2"], self._moments["m3"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.sqrt(m2 / (n - 1)).where(n > 1)
+            skew = (np.sqrt(n * (n - 1)) / (n - 2) * np.sqrt(n) * m3 / m2 ** 1.5).where(n > 2)
+            skew = skew.mask((n > 2) & (m2 == 0), 0.0)
+        return pd.DataFrame({
+            "count": n.astype(np.int64),
+            "mean": self._moments["mean"],
+            "std": std,
+            "min": self._moments["min"],
+            "max": self._moments["max"],
+            "skew": skew,
+        })
+
+
+class GroupedHistogram:
+    """Per-group fixed-width histogram for approximate quantiles"""
+
+    def __init__(self, low: float = 0.0, high: float = 600.0, bin_width: float = 0.5) -> None:
+        self.low = low
+        self.bin_width = bin_width
+        self.n_bins = int(np.ceil((high - low) / bin_width))
+        self._rows: Dict[Hashable, int] = {}
+        self._counts = np.zeros((0, self.n_bins), dtype=np.int64)
+
+    def _row_codes(self, keys: np.ndarray) -> np.ndarray:
+        """Map group keys to histogram rows, adding rows for new groups"""
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        rows = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques.tolist()):
+            rows[i] = self._rows.setdefault(key, len(self._rows))
+        if len(self._rows) > len(self._counts):
+            grown = np.zeros((len(self._rows), self.n_bins), dtype=np.int64)
+            grown[:len(self._counts)] = self._counts
+            self._counts = grown
+        return rows[inverse]
+
+    def update(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Add a chunk of values; values outside the range go to the edge bins
+        Args:
+            keys (np.ndarray): Group of every value
+            values (np.ndarray): Values; NaN is skipped
+        """
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        keys, values = np.asarray(keys)[present], values[present]
+        if not len(values):
+            return
+        rows = self._row_codes(keys)
+        bins = np.clip(((values - self.low) // self.bin_width).astype(np.int64), 0, self.n_bins - 1)
+        counts = np.bincount(rows * self.n_bins + bins, minlength=self._counts.size)
+        self._counts += counts.reshape(self._counts.shape)
+
+    def merge(self, other: "GroupedHistogram") -> None:
+        """Add the counts of another histogram with the same bins
+        Raises:
+            ValueError: If the bins differ
+        """
+        if (other.low, other.bin_width, other.n_bins) != (self.low, self.bin_width, self.n_bins):
+            raise ValueError("Histograms have different bins")
+        keys = np.array(list(other._rows), dtype=object)
+        if not len(keys):
+            return
+        rows = self._row_codes(keys)
+        np.add.at(self._counts, rows, other._counts[list(other._rows.values())])
+
+    def quantile(self, q: float) -> pd.Series:
+        """Approximate a quantile of every group
+        Args:
+            q (float): Quantile in [0, 1]
+        Returns:
+            pd.Series: Quantile indexed by group
+        """
+        values = histogram_quantile(self._counts, q, self.low, self.bin_width)
+        return pd.Series(values, index=pd.Index(list(self._rows)))
+
+    def median(self) -> pd.Series:
+        """Approximate median of every group"""
+        return self.quantile(0.5)
@@ -2,9 +2,19 @@
 """
 
 from typing import List
+import numpy as np
 import pandas as pd
-from app.utils.timeparser import precise_day_last_x
+from app.utils.instrumentation import instrumented
+from app.utils.rolling import GLUCOSE_RANGES, RollingIndex
+from app.utils.timeparser import (
+    precise_day_bounds, precise_day_bounds_many, precise_day_last_x, window_bounds_many
+)
 
+TIR_TARGET = 0.7
+TIR_HISTOGRAM_EDGES = np.arange(11) / 10
+COHORT_PERCENTILES = (10, 25, 50, 75, 90)
+
+@instrumented("stats.update_stats")
 def update_stats(full_data: pd.DataFrame, time_mod: str, last_date: str) -> List[str]:
     """Calculate and format health metrics statistics for a given time period
     Args:
@@ -23,6 +33,112 @@ def update_stats(full_data: pd.DataFrame, time_mod: str, last_date: str) -> List
     current_hr = df["heart_rate"].iloc[-1]
     steps_total = df["steps"].sum()
 
+    return _format_stats(current_gl, average_gl, std_gl, current_hr, steps_total)
+
+
+@instrumented("stats.window_stats")
+def window_stats(index: RollingIndex, start: int, end: int, time_mod: str) -> List[str]:
+    """Calculate the statistics of ``update_stats`` from precomputed prefix sums
+    Args:
+        index (RollingIndex): Rolling index of a single user
+        start (int): First row of the ``last_x`` window
+        end (int): Row after the last one of the window
+        time_mod (str): Time period modifier (e.g., '1d', '7d')
+    Returns:
+        List[str]: List of formatted statistics strings, as ``update_stats``
+    """
+    start, end = precise_day_bounds(index.days, index.day_changes, start, end, time_mod)
+    if start >= end:
+        return ["N/A"] * 5
+    _, average_gl, std_gl = index.glucose_moments(start, end)
+
+    return _format_stats(index.glucose[end - 1], average_gl, std_gl,
+                         index.heart_rate[end - 1], index.steps_total(start, end))
+
+
+@instrumented("stats.bulk_window_stats")
+def bulk_window_stats(index: RollingIndex, timestamps_ns: np.ndarray, starts: np.ndarray,
+                      stops: np.ndarray, time_mod: str, last_date: str | None) -> pd.DataFrame:
+    """Calculate the statistics of ``window_stats`` for many users in one pass
+    Args:
+        index (RollingIndex): Rolling index over the rows of all users
+        timestamps_ns (np.ndarray): Int64 epoch nanoseconds, sorted by user and time
+        starts (np.ndarray): First row of every user
+        stops (np.ndarray): Row after the last one of every user
+        time_mod (str): Time period modifier (e.g., '1d', '7d')
+        last_date (str | None): Reference date for the time period
+    Returns:
+        pd.DataFrame: One row per user with ``current_glucose``,
+            ``average_glucose``, ``std_glucose``, ``current_heart_rate``,
+            ``total_steps``, ``glucose_count`` and the fraction of glucose
+            values in each of ``GLUCOSE_RANGES``; NaN where undefined
+    """
+    start, end = window_bounds_many(timestamps_ns, starts, stops, time_mod, last_date)
+    start, end = precise_day_bounds_many(index.day_changes, start, end, time_mod)
+    nonempty = start < end
+    last = np.where(nonempty, end - 1, 0)
+    count, mean, std = index.glucose_moments(start, end)
+    range_counts = index.glucose_range_counts(start, end)
+
+    stats = pd.DataFrame({
+        "current_glucose": np.where(nonempty, index.glucose[last], np.nan),
+        "average_glucose": mean,
+        "std_glucose": std,
+        "current_heart_rate": np.where(nonempty, index.heart_rate[last], np.nan),
+        "total_steps": np.where(nonempty, index.steps_total(start, end), np.nan),
+        "glucose_count": count,
+    })
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fractions = range_counts / count[:, None]
+    for i, name in enumerate(GLUCOSE_RANGES):
+        stats[name] = fractions[:, i]
+    return stats
+
+
+def _distribution(values: pd.Series) -> dict:
+    """Mean and percentiles of a per-user statistic"""
+    values = values.dropna()
+    if values.empty:
+        return {"mean": None, **{f"p{p}": None for p in COHORT_PERCENTILES}}
+    percentiles = np.percentile(values, COHORT_PERCENTILES)
+    return {"mean": float(values.mean()),
+            **{f"p{p}": float(v) for p, v in zip(COHORT_PERCENTILES, percentiles)}}
+
+
+@instrumented("stats.cohort_summary")
+def cohort_summary(stats: pd.DataFrame) -> dict:
+    """Aggregate the per-user statistics of ``bulk_window_stats``
+    Args:
+        stats (pd.DataFrame): Output of ``bulk_window_stats``
+    Returns:
+        dict: User counts, distributions of the average and standard deviation
+            of glucose, pooled time in ranges, the histogram of the per-user
+            time in range and the share of users meeting the ``TIR_TARGET``
+    """
+    measured = stats[stats["glucose_count"] > 0]
+    total = measured["glucose_count"].sum()
+    pooled = {
+        name: float((measured[name] * measured["glucose_count"]).sum() / total) if total else None
+        for name in GLUCOSE_RANGES
+    }
+    histogram, _ = np.histogram(measured["in_range"], bins=TIR_HISTOGRAM_EDGES)
+    return {
+        "n_users": len(stats),
+        "n_users_with_glucose": len(measured),
+        "average_glucose": _distribution(measured["average_glucose"]),
+        "std_glucose": _distribution(measured["std_glucose"]),
+        "time_in_ranges": pooled,
+        "time_in_range_histogram": {
+            "bin_edges": TIR_HISTOGRAM_EDGES.tolist(),
+            "counts": histogram.tolist(),
+        },
+        "tir_target_met": float((measured["in_range"] >= TIR_TARGET).mean()) if len(measured)
+                          else None,
+    }
+
+
+def _format_stats(current_gl, average_gl, std_gl, current_hr, steps_total) -> List[str]:
+    """Format the statistics values for display"""
     return [
         f"Current: {current_gl:.1f} mg/dL",
         f"Average: {average_gl:.1f} mg/dL",
@@ -1,98 +1,185 @@
 """Synthetic data generation pipeline
+
+The models are fitted once per real dataset and cached (see
+``app.utils.artifacts``); runs print the duration of every stage.
+
+Usage:
+    python -m app.utils.synthetic [--samples N] [--seed S] [--refit]
 """
 
-from datetime import timedelta
+import argparse
+import os
+import sys
+from typing import Iterable, Iterator, List, Sequence
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from app.utils.clustering import extract_glucose_features, generate_synthetic_features
-from app.utils.model import extract_hr_steps_features, train_models, predict_hr_steps
+from app.services.columnar import ColumnarWriter
+from app.services.data_loader import BASE_DIR, REAL_DATA_PATH, SYNTHETIC_DATA_PATH
+from app.utils.artifacts import load_or_fit_models, timed_stage
+from app.utils.clustering import extract_glucose_features
+from app.utils.model import predict_hr_steps
+
+GLUCOSE_ONLY_DATA_PATH = os.path.join(BASE_DIR, "synthetic", "prepr_synt.csv")
+
+START_DATE = "2025-06-01 00:00:00"
+SAMPLE_FREQ = "5min"
+CHUNK_USERS = 1000
+OUTPUT_FORMATS = ("csv", "columnar")
 
 
 def generate_time_series(enhanced_synth_users: pd.DataFrame,
-                        glucose_only_data: pd.DataFrame) -> pd.DataFrame:
+                        glucose_only_data: pd.DataFrame,
+                        seed: int | np.random.Generator | None = None) -> pd.DataFrame:
     """Generate time series data for synthetic users
+    Heart rate and steps of every user are drawn from a generator spawned for
+    that user, so a fixed seed always yields the same dataset.
     Args:
         enhanced_synth_users (pd.DataFrame): Enhanced synthetic user features
         glucose_only_data (pd.DataFrame): Original glucose-only synthetic data
+        seed (int | np.random.Generator | None, optional): Seed or generator
+            for the random draws. Defaults to None (fresh entropy)
     Returns:
         pd.DataFrame: Complete synthetic time series data
     """
     time_columns = [col for col in glucose_only_data.columns if col.startswith("t_")]
-    synthetic_time_series = []
-
-    for idx, row in enhanced_synth_users.iterrows():
-        hr_series = np.random.normal(row['hr_mean'], row['hr_std'], 288)
-        steps_series = np.random.normal(row['steps_mean'], row['steps_std'], 288)
-
-        hr_series = np.clip(np.round(hr_series), 40, 200)
-        steps_series = np.clip(np.round(steps_series), 0, 500)
-
-        synthetic_time_series.append({
-            'user_id': idx,
-            'glucose': glucose_only_data.iloc[idx][time_columns].values,
-            'heart_rate': hr_series,
-            'steps': steps_series
-        })
-
-    rows = []
-    for user in synthetic_time_series:
-        start_date = "2025-06-01 00:00:00"
-        curr_date = pd.to_datetime(start_date).tz_localize(None)
-        for i, _ in enumerate(time_columns):
-            rows.append({
-                "user_id": user["user_id"],
-                "time": curr_date,
-                "glucose": user["glucose"][i],
-                "heart_rate": user["heart_rate"][i],
-                "steps": user["steps"][i]
-            })
-            curr_date = curr_date + timedelta(minutes=5)
-
-    return pd.DataFrame(rows)
-
-
-def main():
+    user_ids = enhanced_synth_users.index.to_numpy()
+    glucose = glucose_only_data[time_columns].to_numpy(dtype=float)[user_ids]
+    rngs = np.random.default_rng(seed).spawn(len(user_ids))
+    return build_time_series(user_ids, glucose, enhanced_synth_users, rngs)
+
+
+def iter_time_series(enhanced_synth_users: pd.DataFrame, glucose_only_data: pd.DataFrame,
+                     chunk_users: int = CHUNK_USERS,
+                     seed: int | np.random.Generator | None = None) -> Iterator[pd.DataFrame]:
+    """Generate the time series of synthetic users in chunks of users
+    Only one chunk is held in memory at a time. Every user draws from its own
+    spawned generator, so for a fixed seed the chunks concatenate to the
+    output of ``generate_time_series`` whatever ``chunk_users`` is.
+    Args:
+        enhanced_synth_users (pd.DataFrame): Enhanced synthetic user features
+        glucose_only_data (pd.DataFrame): Original glucose-only synthetic data
+        chunk_users (int, optional): Users per chunk. Defaults to CHUNK_USERS
+        seed (int | np.random.Generator | None, optional): Seed or generator
+            for the random draws. Defaults to None (fresh entropy)
+    Yields:
+        pd.DataFrame: Time series of the next chunk of users
+    """
+    time_columns = [col for col in glucose_only_data.columns if col.startswith("t_")]
+    rngs = np.random.default_rng(seed).spawn(len(enhanced_synth_users))
+    for start in range(0, len(enhanced_synth_users), chunk_users):
+        block = enhanced_synth_users.iloc[start:start + chunk_users]
+        user_ids = block.index.to_numpy()
+        glucose = glucose_only_data.iloc[user_ids][time_columns].to_numpy(dtype=float)
+        yield build_time_series(user_ids, glucose, block, rngs[start:start + chunk_users])
+
+
+def write_time_series(chunks: Iterable[pd.DataFrame], path: str, fmt: str = "csv") -> int:
+    """Append time-series chunks to a file as they are produced
+    Args:
+        chunks (Iterable[pd.DataFrame]): Chunks grouped by user and sorted by time
+        path (str): Output CSV file or columnar directory
+        fmt (str, optional): ``csv`` or ``columnar``. Defaults to ``csv``
+    Returns:
+        int: Number of written rows
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    rows = 0
+    if fmt == "columnar":
+        with ColumnarWriter(path) as writer:
+            for chunk in chunks:
+                writer.append({name: chunk[name].to_numpy() for name in chunk.columns})
+                rows += len(chunk)
+        return rows
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+            rows += len(chunk)
+    return rows
+
+
+def build_time_series(user_ids: np.ndarray, glucose: np.ndarray, features: pd.DataFrame,
+                      rngs: Sequence[np.random.Generator],
+                      start_date: str = START_DATE) -> pd.DataFrame:
+    """Assemble the long-format time series of a block of users
+    Args:
+        user_ids (np.ndarray): IDs of the users
+        glucose (np.ndarray): Glucose matrix of shape (users, samples)
+        features (pd.DataFrame): ``hr_mean``, ``hr_std``, ``steps_mean`` and
+            ``steps_std`` of every user, in the order of ``user_ids``
+        rngs (Sequence[np.random.Generator]): Generator of every user for its
+            heart rate and then steps draws
+        start_date (str, optional): Timestamp of the first sample. Defaults to START_DATE
+    Returns:
+        pd.DataFrame: Rows grouped by user and sorted by time
+    """
+    n_users, n_samples = glucose.shape
+    noise = np.empty((2, n_users, n_samples))
+    for i, rng in enumerate(rngs):
+        noise[:, i] = rng.standard_normal((2, n_samples))
+
+    def draw(stream: int, mean_column: str, std_column: str, low: int, high: int) -> np.ndarray:
+        mean = features[mean_column].to_numpy(dtype=float)[:, None]
+        std = features[std_column].to_numpy(dtype=float)[:, None]
+        return np.clip(np.round(mean + std * noise[stream]), low, high)
+
+    heart_rate = draw(0, "hr_mean", "hr_std", 40, 200)
+    steps = draw(1, "steps_mean", "steps_std", 0, 500)
+    return time_series_frame(user_ids, glucose, heart_rate, steps, start_date)
+
+
+def time_series_frame(user_ids: np.ndarray, glucose: np.ndarray, heart_rate: np.ndarray,
+                      steps: np.ndarray, start_date: str = START_DATE) -> pd.DataFrame:
+    """Lay out sample matrices of a block of users as a long-format time series
+    Args:
+        user_ids (np.ndarray): IDs of the users
+        glucose (np.ndarray): Glucose matrix of shape (users, samples)
+        heart_rate (np.ndarray): Heart rate matrix of the same shape
+        steps (np.ndarray): Steps matrix of the same shape
+        start_date (str, optional): Timestamp of the first sample. Defaults to START_DATE
+    Returns:
+        pd.DataFrame: Rows grouped by user and sorted by time
+    """
+    n_users, n_samples = glucose.shape
+    times = pd.date_range(start_date, periods=n_samples, freq=SAMPLE_FREQ)
+    return pd.DataFrame({
+        "user_id": np.repeat(user_ids, n_samples),
+        "time": np.tile(times.to_numpy(), n_users),
+        "glucose": glucose.ravel(),
+        "heart_rate": heart_rate.ravel(),
+        "steps": steps.ravel()
+    })
+
+
+def main(argv: List[str] | None = None):
     """Main function to generate synthetic dataset"""
-    real_data = pd.read_csv("../../data/db.csv")
-    real_data = real_data[["user_id", "time", "glucose", "heart_rate", "steps"]]
-
-    synthetic_users, cluster_ids, _ = generate_synthetic_features(real_data)
-
-    hr_steps_features = extract_hr_steps_features(real_data)
-    hr_steps_scaler = StandardScaler()
-    real_hr_steps_scaled = hr_steps_scaler.fit_transform(hr_steps_features)
-    synthetic_hr_steps = np.zeros((100, 4))
-    feature_stds = np.std(real_hr_steps_scaled, axis=0)
-
-    for i in range(5):
-        cluster_mask = cluster_ids == i
-        cluster_size = cluster_mask.sum()
-        hr_steps_cluster_center = synthetic_hr_steps[cluster_mask].mean(axis=0).reshape(1, -1)
-        distances = np.linalg.norm(real_hr_steps_scaled - hr_steps_cluster_center, axis=1)
-        closest_real_user_idx = np.argmin(distances)
-        hr_steps_pattern = real_hr_steps_scaled[closest_real_user_idx]
-        noise = np.random.normal(0, feature_stds * 0.1, (cluster_size, 4))
-        synthetic_hr_steps[cluster_mask] = hr_steps_pattern + noise
-
-    synthetic_hr_steps_original = hr_steps_scaler.inverse_transform(synthetic_hr_steps)
-    synthetic_users['hr_mean'] = synthetic_hr_steps_original[:, 0]
-    synthetic_users['hr_std'] = synthetic_hr_steps_original[:, 1]
-    synthetic_users['steps_mean'] = synthetic_hr_steps_original[:, 2]
-    synthetic_users['steps_std'] = synthetic_hr_steps_original[:, 3]
-
-    X_real = extract_glucose_features(real_data)
-    y_real = hr_steps_features
-    X_synth = synthetic_users[X_real.columns]
-    y_synth = synthetic_users[['hr_mean', 'hr_std', 'steps_mean', 'steps_std']]
-    real_model, synth_model = train_models(X_real, y_real, X_synth, y_synth)
-
-    glucose_only_data = pd.read_csv("../../synthetic/prepr_synt.csv")
-    glucose_stats = extract_glucose_features(glucose_only_data, is_synthetic=True)
-    enhanced_synth_users = predict_hr_steps(glucose_stats, real_model, synth_model)
-
-    final_df = generate_time_series(enhanced_synth_users, glucose_only_data)
-    final_df.to_csv("../../synthetic/prepr_synt_enhanced.csv", index=False)
+    parser = argparse.ArgumentParser(description="Generate the synthetic dataset")
+    parser.add_argument("--samples", type=int, default=100, help="synthetic feature samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed of training and generation")
+    parser.add_argument("--refit", action="store_true", help="refit cached models")
+    args = parser.parse_args(argv)
+
+    timings = {}
+    models = load_or_fit_models(REAL_DATA_PATH, args.samples, args.seed, refit=args.refit,
+                                timings=timings)
+
+    with timed_stage("predict", timings):
+        glucose_only_data = pd.read_csv(GLUCOSE_ONLY_DATA_PATH)
+        glucose_stats = extract_glucose_features(glucose_only_data, is_synthetic=True)
+        enhanced_synth_users = predict_hr_steps(glucose_stats, models.real_model,
+                                                models.synth_model)
+
+    with timed_stage("time_series", timings):
+        chunks = iter_time_series(enhanced_synth_users, glucose_only_data, seed=args.seed)
+        write_time_series(chunks, SYNTHETIC_DATA_PATH)
+
+    for stage, seconds in timings.items():
+        print(f"{stage:<16}{seconds:8.3f}s")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
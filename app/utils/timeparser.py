@@ -4,8 +4,11 @@ This module provides functions for filtering and processing time-series health
 metrics data based on various time intervals and reference dates.
 """
 
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Tuple
+import numpy as np
 import pandas as pd
+from app.utils.instrumentation import instrumented
 
 # Time intervals in hours
 TIME_INTERVALS: Dict[str, float] = {
@@ -22,6 +25,86 @@ TIME_INTERVALS: Dict[str, float] = {
 }
 
 
+@lru_cache(maxsize=4096)
+def parse_timestamp_ns(date: str) -> int:
+    """Parse a date string into tz-naive epoch nanoseconds
+    Args:
+        date (str): ISO format date string
+    Returns:
+        int: Nanoseconds since the epoch, with any timezone dropped
+    """
+    return pd.to_datetime(date).tz_localize(None).value
+
+
+@instrumented("timeparser.window_bounds")
+def window_bounds(timestamps_ns: np.ndarray, time_mod: str, last_date: str = None) -> Tuple[int, int]:
+    """Find the row range of the last X time interval in sorted timestamps
+    Args:
+        timestamps_ns (np.ndarray): Sorted int64 epoch nanoseconds
+        time_mod (str): Time interval string (e.g., '1h', '3h')
+        last_date (str, optional): ISO format date string to start from
+    Returns:
+        Tuple[int, int]: Row range ``[start, end)`` of the window
+    """
+    if time_mod not in TIME_INTERVALS:
+        raise ValueError(f"Unknown time_mod: {time_mod}")
+
+    window_size = int(TIME_INTERVALS[time_mod] * 12)
+
+    if last_date:
+        # First sample after last_date is included, as in the mask-based lookup
+        end = int(np.searchsorted(timestamps_ns, parse_timestamp_ns(last_date), side="right")) + 1
+    else:
+        end = 1
+
+    end = min(end, len(timestamps_ns))
+    start = max(0, end - window_size)
+    return start, end
+
+
+@instrumented("timeparser.window_bounds_many")
+def window_bounds_many(timestamps_ns: np.ndarray, starts: np.ndarray, stops: np.ndarray,
+                       time_mod: str, last_date: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the rows of the last X time interval in many sorted segments at once
+    Gives the same windows as ``window_bounds`` on every segment, e.g. every
+    user of a dataset sorted by user and time.
+    Args:
+        timestamps_ns (np.ndarray): Int64 epoch nanoseconds, sorted within every segment
+        starts (np.ndarray): First row of every segment
+        stops (np.ndarray): Row after the last one of every segment
+        time_mod (str): Time interval string (e.g., '1h', '3h')
+        last_date (str, optional): ISO format date string to start from
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Absolute rows ``[start, end)`` of every window
+    """
+    if time_mod not in TIME_INTERVALS:
+        raise ValueError(f"Unknown time_mod: {time_mod}")
+
+    window_size = int(TIME_INTERVALS[time_mod] * 12)
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+
+    if last_date:
+        # Binary search in all segments at once: the first row after last_date
+        target = parse_timestamp_ns(last_date)
+        lo, hi = starts.copy(), stops.copy()
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            after = timestamps_ns[np.where(active, mid, 0)] > target
+            hi = np.where(active & after, mid, hi)
+            lo = np.where(active & ~after, mid + 1, lo)
+            active = lo < hi
+        end = lo - starts + 1
+    else:
+        end = np.ones(len(starts), dtype=np.int64)
+
+    end = starts + np.minimum(end, stops - starts)
+    start = np.maximum(starts, end - window_size)
+    return start, end
+
+
+@instrumented("timeparser.last_x")
 def last_x(df: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFrame:
     """Returns a DataFrame slice for the last X time interval
     Args:
@@ -29,13 +112,19 @@ def last_x(df: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFra
         time_mod (str): Time interval string (e.g., '1h', '3h')
         last_date (str, optional): ISO format date string to start from
     Returns:
-        pd.DataFrame: Sliced DataFrame for the last X interval
+        pd.DataFrame: New DataFrame with the rows of the last X interval, indexed from 0
     """
     if time_mod not in TIME_INTERVALS:
         raise ValueError(f"Unknown time_mod: {time_mod}")
 
     if df.empty:
         return pd.DataFrame()
+
+    timestamps = df['timestamps']
+    if timestamps.dtype == 'datetime64[ns]' and timestamps.is_monotonic_increasing:
+        start, end = window_bounds(timestamps.to_numpy().view('i8'), time_mod, last_date)
+        return df.iloc[start:end].reset_index(drop=True)
+
     df = df.sort_values(by='timestamps').reset_index(drop=True)
 
     if isinstance(df['timestamps'].iloc[0], str):
@@ -54,9 +143,65 @@ def last_x(df: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFra
     end = min(end, len(df))
     start = max(0, end - window_size)
 
-    result = df.iloc[start:end].copy()
-    return result
+    return df.iloc[start:end].reset_index(drop=True)
+
+def time_mod_digits(time_mod: str) -> int:
+    """Get the number in a time interval string (e.g., 7 for '7d', 30 for '30min')
+    Args:
+        time_mod (str): Time interval string
+    Returns:
+        int: The digits of the string as a number
+    """
+    return int(''.join(char for char in time_mod if char.isdigit()))
+
+
+def precise_day_bounds(days: np.ndarray, day_changes: np.ndarray, start: int, end: int,
+                       time_mod: str) -> Tuple[int, int]:
+    """Row range of ``precise_day_last_x`` for a window of sorted rows
+    Args:
+        days (np.ndarray): Day number of every row, sorted within the window
+        day_changes (np.ndarray): Cumulative number of day changes per row
+        start (int): First row of the ``last_x`` window
+        end (int): Row after the last one of the window
+        time_mod (str): Time interval string (e.g., '1d', '3d')
+    Returns:
+        Tuple[int, int]: Row range with the first day removed if the window
+            covers more days than the interval
+    """
+    if start >= end:
+        return start, end
+    digits = time_mod_digits(time_mod)
+    unique_days = int(day_changes[end - 1] - day_changes[start]) + 1
+
+    if (digits != unique_days) and (unique_days > digits):
+        start += int(np.searchsorted(days[start:end], days[start], side="right"))
+
+    return start, end
+
+
+def precise_day_bounds_many(day_changes: np.ndarray, start: np.ndarray, end: np.ndarray,
+                            time_mod: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized ``precise_day_bounds`` over many windows
+    Args:
+        day_changes (np.ndarray): Cumulative number of day changes per row
+        start (np.ndarray): First row of every ``last_x`` window
+        end (np.ndarray): Row after the last one of every window
+        time_mod (str): Time interval string (e.g., '1d', '3d')
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row ranges with the first day removed where
+            a window covers more days than the interval
+    """
+    digits = time_mod_digits(time_mod)
+    nonempty = start < end
+    first, last = np.where(nonempty, start, 0), np.where(nonempty, end - 1, 0)
+    unique_days = day_changes[last] - day_changes[first] + 1
+    # The rows of the first day end where the day change count next increases
+    first_day_end = np.searchsorted(day_changes, day_changes[first], side="right")
+    drop_first_day = nonempty & (unique_days > digits)
+    return np.where(drop_first_day, np.minimum(first_day_end, end), start), end
+
 
+@instrumented("timeparser.precise_day_last_x")
 def precise_day_last_x(full_data: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFrame:
     """Returns a DataFrame slice for the last X days with precise day boundaries
     Args:
@@ -71,7 +216,7 @@ def precise_day_last_x(full_data: pd.DataFrame, time_mod: str, last_date: str =
     if not pd.api.types.is_datetime64_any_dtype(df["timestamps"]):
         df["timestamps"] = pd.to_datetime(df["timestamps"])
 
-    digits = int(''.join(char for char in time_mod if char.isdigit()))
+    digits = time_mod_digits(time_mod)
     unique_days = df["timestamps"].dt.date.nunique()
 
     if (digits != unique_days) and (unique_days > digits):
@@ -0,0 +1,103 @@
+"""Shared helpers for the benchmark scripts
+
+Benchmarks are plain scripts run from the repository root, e.g.
+``python -m benchmarks.bench_columnar``.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+def measure(fn: Callable[[], object], repeat: int = 100, warmup: int = 3) -> Dict[str, float]:
+    """Time repeated calls of a function
+    Args:
+        fn (Callable[[], object]): Function to call
+        repeat (int, optional): Number of timed calls. Defaults to 100
+        warmup (int, optional): Number of untimed calls before timing. Defaults to 3
+    Returns:
+        Dict[str, float]: Mean, p50 and p99 latency in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return summarize(timings)
+
+
+def summarize(timings_s: np.ndarray | List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds
+    Args:
+        timings_s (np.ndarray | List[float]): Latencies in seconds
+    Returns:
+        Dict[str, float]: Mean, p50 and p99 latency in milliseconds
+    """
+    timings_ms = np.asarray(timings_s, dtype=float) * 1000
+    return {
+        "mean_ms": float(timings_ms.mean()),
+        "p50_ms": float(np.percentile(timings_ms, 50)),
+        "p99_ms": float(np.percentile(timings_ms, 99)),
+    }
+
+
+def print_table(rows: List[Dict[str, object]]) -> None:
+    """Print benchmark rows as an aligned text table
+    Args:
+        rows (List[Dict[str, object]]): Rows sharing the same keys
+    """
+    if not rows:
+        return
+    headers = list(rows[0])
+    cells = [[f"{row[h]:.3f}" if isinstance(row[h], float) else str(row[h]) for h in headers]
+             for row in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for c in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(c, widths)))
+
+
+def environment() -> Dict[str, object]:
+    """Describe the machine and the code a benchmark ran on
+    Returns:
+        Dict[str, object]: Timestamp, git commit, Python, NumPy and pandas versions
+            and platform details
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_json(payload: Dict[str, object], path: Optional[str]) -> None:
+    """Write benchmark results as JSON to a file, or to stdout if no path is given
+    Args:
+        payload (Dict[str, object]): Results
+        path (Optional[str]): Output file
+    """
+    text = json.dumps(payload, indent=2, default=float)
+    if path is None:
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
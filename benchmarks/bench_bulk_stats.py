@@ -0,0 +1,95 @@
+"""Bulk statistics for a cohort compared with one computation per user
+
+Builds cohorts of 200 and 10,000 users with one week of 5-minute samples and
+compares ``bulk_window_stats`` plus ``cohort_summary`` with calling
+``window_stats`` once per user, as a dashboard issuing one ``/api/stats``
+request per user would (without any HTTP or loading overhead).
+
+The generated case sends 1,000 synthetic user IDs that are not stored through
+``/api/stats/bulk`` (generated together as one dataset) and compares it with
+one ``/api/stats`` request per user (each generated through the LRU of
+``app.services.synthetic_source``).
+
+Usage:
+    python -m benchmarks.bench_bulk_stats
+"""
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.dataset import build_dataset
+from app.services.response_cache import response_cache
+from app.services.synthetic_source import synthetic_source
+from app.utils.stats import bulk_window_stats, cohort_summary, window_stats
+from app.utils.timeparser import window_bounds
+from benchmarks._common import measure, print_table
+
+USER_COUNTS = (200, 10_000)
+SAMPLES_PER_USER = 7 * 288
+TIME_MOD = "3d"
+LAST_DATE = "2025-06-06T12:00:00"
+GENERATED_USERS = range(100_000, 101_000)
+
+
+def _cohort(n_users: int):
+    """Build a dataset of random users"""
+    rng = np.random.default_rng(0)
+    n_rows = n_users * SAMPLES_PER_USER
+    times = pd.date_range("2025-06-01", periods=SAMPLES_PER_USER, freq="5min").to_numpy()
+    return build_dataset(pd.DataFrame({
+        "user_id": np.repeat(np.arange(n_users), SAMPLES_PER_USER),
+        "time": np.tile(times, n_users),
+        "glucose": rng.normal(130, 40, n_rows),
+        "heart_rate": rng.normal(75, 10, n_rows),
+        "steps": rng.integers(0, 200, n_rows),
+    }))
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    rows = []
+    for n_users in USER_COUNTS:
+        dataset = _cohort(n_users)
+        user_ids = sorted(dataset.offsets)
+        bounds = np.array([dataset.offsets[user_id] for user_id in user_ids])
+        times = dataset.columns["time"].view("i8")
+        _ = dataset.rolling
+
+        def bulk():
+            stats = bulk_window_stats(dataset.rolling, times, bounds[:, 0], bounds[:, 1],
+                                      TIME_MOD, LAST_DATE)
+            return cohort_summary(stats)
+
+        def per_user():
+            for user_id in user_ids:
+                partition = dataset.partition(user_id)
+                start, end = window_bounds(partition["time"].view("i8"), TIME_MOD, LAST_DATE)
+                window_stats(dataset.user_rolling(user_id), start, end, TIME_MOD)
+
+        for name, fn in (("bulk", bulk), ("per_user", per_user)):
+            rows.append({"users": n_users, "method": name,
+                         **measure(fn, repeat=5 if n_users > 1000 else 20, warmup=1)})
+
+    client = TestClient(app)
+
+    def generated_bulk():
+        response_cache.clear()
+        client.post("/api/stats/bulk", json={"user_ids": list(GENERATED_USERS),
+                                             "time_mod": TIME_MOD, "last_date": LAST_DATE})
+
+    def generated_per_user():
+        response_cache.clear()
+        synthetic_source.clear()
+        for user_id in GENERATED_USERS:
+            client.get(f"/api/stats/{user_id}?real_data=false&time_mod={TIME_MOD}"
+                       f"&last_date={LAST_DATE}")
+
+    for name, fn in (("bulk", generated_bulk), ("per_user", generated_per_user)):
+        rows.append({"users": f"{len(GENERATED_USERS)} generated", "method": name,
+                     **measure(fn, repeat=3, warmup=1)})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
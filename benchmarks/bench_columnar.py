@@ -0,0 +1,68 @@
+"""Benchmark the columnar dataset format against the CSV path
+
+Compares cold-start load time and per-request latency of ``load_certain_data``
+for the synthetic dataset read from CSV, from the cached CSV and from the
+memory-mapped columnar copy.
+
+Usage:
+    python -m benchmarks.bench_columnar
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+from app.services import data_loader
+from app.services.columnar import convert_csv
+from app.services.dataset_cache import DatasetCache
+from benchmarks._common import measure, print_table
+
+
+def _cold_start(path: str, repeat: int = 5) -> float:
+    """Average time to load a dataset into an empty cache, in milliseconds"""
+    total = 0.0
+    for _ in range(repeat):
+        cache = DatasetCache()
+        start = time.perf_counter()
+        cache.get(path)
+        total += time.perf_counter() - start
+    return total / repeat * 1000
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    workdir = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(workdir, "synthetic.csv")
+        shutil.copy(data_loader.SYNTHETIC_DATA_PATH, csv_path)
+        data_loader.SYNTHETIC_DATA_PATH = csv_path
+
+        def uncached_request():
+            db = pd.read_csv(csv_path)
+            data = db[db["user_id"] == 7].copy()
+            data["time"] = pd.to_datetime(data["time"], errors="coerce")
+            return data.sort_values("time")
+
+        def cached_request():
+            return data_loader.load_certain_data(7, "glucose", "heart_rate", "steps",
+                                                 real_data=False)
+
+        rows = [{"source": "csv (no cache)", "cold_start_ms": float("nan"),
+                 **measure(uncached_request, repeat=20)}]
+
+        data_loader.dataset_cache = DatasetCache()
+        rows.append({"source": "csv (cached)", "cold_start_ms": _cold_start(csv_path),
+                     **measure(cached_request)})
+
+        convert_csv(csv_path)
+        data_loader.dataset_cache = DatasetCache()
+        rows.append({"source": "columnar (mmap)", "cold_start_ms": _cold_start(csv_path),
+                     **measure(cached_request)})
+        print_table(rows)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Concurrency benchmark of the playback tick endpoint
+
+Every simulated viewer plays back one synthetic user at the 0.5 s speed
+setting: it sends ``POST /api/tick`` every 0.5 s, advancing the playback date
+by five minutes and passing the previous glucose window end as ``since``, like
+the frontend does. Latency is measured from sending a request to receiving the
+response. The app runs in-process through httpx's ASGI transport unless a
+server URL is given.
+
+Usage:
+    python -m benchmarks.bench_concurrency [BASE_URL]
+"""
+
+import asyncio
+import sys
+import time
+from typing import List, Optional
+import httpx
+import pandas as pd
+from app.services.data_loader import get_dataset
+from benchmarks._common import print_table, summarize
+
+VIEWER_COUNTS = (1, 10, 50, 200)
+TICK_INTERVAL_S = 0.5
+DURATION_S = 10.0
+N_SYNTHETIC_USERS = 200
+
+
+async def _viewer(client: httpx.AsyncClient, user_id: int, start: pd.Timestamp,
+                  deadline: float, latencies: List[float]) -> None:
+    """Play back one user until the deadline, recording tick latencies"""
+    date = start
+    since = None
+    while time.perf_counter() < deadline:
+        tick_start = time.perf_counter()
+        response = await client.post("/api/tick", json={
+            "user_id": user_id,
+            "real_data": False,
+            "last_date": date.isoformat(),
+            "since": since,
+        })
+        latencies.append(time.perf_counter() - tick_start)
+        response.raise_for_status()
+        since = response.json()["glucose_window_end"] or since
+        date += pd.Timedelta(minutes=5)
+        await asyncio.sleep(max(0.0, TICK_INTERVAL_S - (time.perf_counter() - tick_start)))
+
+
+async def _run(n_viewers: int, base_url: Optional[str]) -> dict:
+    """Run one round of viewers and summarize it"""
+    if base_url is None:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    else:
+        transport = None
+
+    start = pd.Timestamp(get_dataset(False).columns["time"][0]) + pd.Timedelta(hours=3)
+    latencies: List[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as client:
+        deadline = time.perf_counter() + DURATION_S
+        await asyncio.gather(*(
+            _viewer(client, i % N_SYNTHETIC_USERS, start, deadline, latencies)
+            for i in range(n_viewers)
+        ))
+    return {
+        "viewers": n_viewers,
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / DURATION_S,
+        **summarize(latencies),
+    }
+
+
+def main(argv: List[str]) -> None:
+    """Run every viewer count and print a table"""
+    base_url = argv[0] if argv else None
+    get_dataset(False)
+    rows = [asyncio.run(_run(n_viewers, base_url)) for n_viewers in VIEWER_COUNTS]
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+"""Payload size and latency of downsampled glucose windows
+
+Builds one user with 90 days of 5-minute samples and times the glucose
+endpoint's compute step (window slicing, downsampling and encoding to records
+JSON) for 30d and 90d windows, raw and reduced to ``MAX_POINTS`` with LTTB and
+min-max bucketing. The pyramid is built once up front; its build time is
+reported separately.
+
+Usage:
+    python -m benchmarks.bench_downsample
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from app.api.routes import _compute_glucose
+from app.models.dataset import build_dataset
+from app.utils.downsample import DownsamplePyramid
+from benchmarks._common import measure, print_table
+
+N_DAYS = 90
+MAX_POINTS = 1000
+WINDOWS = ("30d", "90d")
+LAST_DATE = "2025-08-29T23:55:00"
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    n_samples = N_DAYS * 288
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "user_id": np.zeros(n_samples, dtype=np.int64),
+        "time": pd.date_range("2025-06-01", periods=n_samples, freq="5min"),
+        "glucose": np.clip(120 + np.cumsum(rng.normal(0, 2, n_samples)), 40, 400),
+    })
+    partition = build_dataset(frame).partition(0)
+    # Only the glucose columns are used; no rolling index is needed
+    user = (partition, None)
+
+    start = time.perf_counter()
+    pyramid = DownsamplePyramid(partition["time"].view("i8"), partition["glucose"])
+    build_ms = 1000 * (time.perf_counter() - start)
+    print(f"pyramid build: {build_ms:.2f} ms, {pyramid.nbytes / 1024:.0f} KiB, "
+          f"levels {[len(level) for level in pyramid.levels]}")
+
+    variants = {
+        "raw": (None, None, "lttb"),
+        "lttb": (pyramid, MAX_POINTS, "lttb"),
+        "minmax": (pyramid, MAX_POINTS, "minmax"),
+    }
+    rows = []
+    for time_mod in WINDOWS:
+        for name, (pyr, max_points, method) in variants.items():
+            def compute():
+                return _compute_glucose(user, time_mod, LAST_DATE, "application/json",
+                                        pyr, max_points, method)
+            rows.append({
+                "time_mod": time_mod,
+                "variant": name,
+                "bytes": len(compute().body),
+                **measure(compute, repeat=20),
+            })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Throughput of live ingestion in readings per second
+
+Feeds batches of 5-minute readings to a fresh ingest store, as a gateway
+uploading many users' devices at once, for several batch shapes (users per
+batch x readings per user):
+
+- ``store``: ``IngestStore.ingest`` on ready arrays, with the ring buffer
+  moves included but no compaction
+- ``http``: ``POST /api/ingest`` through the ASGI app, including JSON
+  parsing and validation
+- ``compact``: writing everything ingested by the store case to one
+  columnar segment
+
+The ``ms`` column is the time per batch, of the whole compaction, or for
+``live_stats`` the p50 latency of a ``/api/stats?live=true`` query of one user
+after the ``store`` case.
+
+Usage:
+    python -m benchmarks.bench_ingest
+"""
+
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ingest import IngestStore, set_ingest_store
+from benchmarks._common import measure, print_table
+
+# Users per batch x readings per user
+SHAPES = ((1_000, 1), (1_000, 12), (10_000, 12), (100, 288))
+N_BATCHES = 20
+HTTP_BATCHES = 5
+SAMPLE_NS = 300_000_000_000
+START_NS = pd.Timestamp("2025-06-01").value
+
+
+def _batch(rng: np.random.Generator, n_users: int, per_user: int, batch: int) -> dict:
+    """Readings of ``per_user`` consecutive samples of every user"""
+    steps = batch * per_user + np.arange(per_user)
+    return {
+        "user_ids": np.repeat(np.arange(n_users), per_user),
+        "times_ns": np.tile(START_NS + steps * SAMPLE_NS, n_users),
+        "glucose": rng.normal(130, 35, n_users * per_user),
+        "heart_rate": rng.normal(72, 9, n_users * per_user),
+        "steps": rng.integers(0, 120, n_users * per_user).astype(float),
+    }
+
+
+def _payload(columns: dict) -> dict:
+    """JSON body of ``POST /api/ingest`` for a batch"""
+    times = pd.DatetimeIndex(columns["times_ns"]).strftime("%Y-%m-%dT%H:%M:%S")
+    return {"user_id": columns["user_ids"].tolist(), "time": list(times),
+            "glucose": columns["glucose"].tolist(), "heart_rate": columns["heart_rate"].tolist(),
+            "steps": columns["steps"].tolist()}
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    rng = np.random.default_rng(0)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_users, per_user in SHAPES:
+            shape = f"{n_users}x{per_user}"
+            batches = [_batch(rng, n_users, per_user, i) for i in range(N_BATCHES)]
+            n_readings = n_users * per_user
+
+            store = IngestStore(f"{tmp}/{shape}", max_pending=2 ** 62)
+            start = time.perf_counter()
+            for columns in batches:
+                store.ingest(**columns)
+            elapsed = time.perf_counter() - start
+            rows.append({"shape": shape, "case": "store",
+                         "readings_per_s": N_BATCHES * n_readings / elapsed,
+                         "ms": 1000 * elapsed / N_BATCHES})
+
+            set_ingest_store(store)
+            client = TestClient(app)
+            query = measure(
+                lambda: client.get("/api/stats/0?real_data=false&time_mod=1d&live=true"),
+                repeat=50)
+            rows.append({"shape": shape, "case": "live_stats", "readings_per_s": float("nan"),
+                         "ms": query["p50_ms"]})
+
+            start = time.perf_counter()
+            compacted = store.compact()
+            elapsed = time.perf_counter() - start
+            rows.append({"shape": shape, "case": "compact",
+                         "readings_per_s": compacted / elapsed, "ms": 1000 * elapsed})
+
+            set_ingest_store(IngestStore(f"{tmp}/{shape}-http", max_pending=2 ** 62))
+            payloads = [_payload(_batch(rng, n_users, per_user, i)) for i in range(HTTP_BATCHES)]
+            start = time.perf_counter()
+            for payload in payloads:
+                client.post("/api/ingest", json=payload).raise_for_status()
+            elapsed = time.perf_counter() - start
+            rows.append({"shape": shape, "case": "http",
+                         "readings_per_s": HTTP_BATCHES * n_readings / elapsed,
+                         "ms": 1000 * elapsed / HTTP_BATCHES})
+        set_ingest_store(IngestStore())
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
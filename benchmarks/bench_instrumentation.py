@@ -0,0 +1,53 @@
+"""Overhead of the instrumentation layer
+
+Times a trivial function with and without the ``instrumented`` wrapper, and
+the glucose and stats endpoints (response cache cleared before every call)
+with instrumentation off and on.
+
+Usage:
+    python -m benchmarks.bench_instrumentation
+"""
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import instrumentation
+from app.services.response_cache import response_cache
+from benchmarks._common import measure, print_table
+
+URLS = {
+    "glucose_1d": "/api/glucose/3?real_data=false&time_mod=1d&last_date=2025-06-01T23:55:00",
+    "stats_1d": "/api/stats/3?real_data=false&time_mod=1d&last_date=2025-06-01T23:55:00",
+}
+CALLS = 100_000
+
+
+def _identity(x):
+    return x
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    wrapped = instrumentation.instrumented("bench.identity")(_identity)
+    rows = []
+    for enabled in (False, True):
+        instrumentation.set_enabled(enabled)
+        for name, fn in (("raw_call", _identity), ("wrapped_call", wrapped)):
+            timing = measure(lambda fn=fn: [fn(i) for i in range(CALLS)], repeat=10)
+            rows.append({"enabled": enabled, "case": name,
+                         "per_call_us": 1000 * timing["p50_ms"] / CALLS})
+
+    client = TestClient(app)
+    for enabled in (False, True):
+        instrumentation.set_enabled(enabled)
+        for name, url in URLS.items():
+            def request(url=url):
+                response_cache.clear()
+                client.get(url)
+            rows.append({"enabled": enabled, "case": name,
+                         "per_call_us": 1000 * measure(request, repeat=200)["p50_ms"]})
+    instrumentation.set_enabled(False)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Peak memory of synthetic dataset generation as the cohort grows
+
+Compares building the whole cohort in one frame before writing it with
+streaming chunks of users to disk. Every measurement runs in a fresh
+interpreter and reports that process's peak RSS.
+
+Usage:
+    python -m benchmarks.bench_memory
+"""
+
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from app.utils.cohort import SHARD_CHUNK_USERS, generate_shard, iter_shard, load_profile_pool
+from app.utils.synthetic import write_time_series
+from benchmarks._common import print_table
+
+USER_COUNTS = (1_000, 10_000, 50_000)
+N_DAYS = 1
+MODES = ("in_memory", "streaming")
+
+
+def _child(mode: str, n_users: int, out_path: str) -> None:
+    """Generate one cohort and print the peak RSS in MiB"""
+    pool = load_profile_pool()
+    if mode == "in_memory":
+        frame = generate_shard(pool, 0, n_users, N_DAYS, seed=0)
+        write_time_series([frame], out_path, fmt="columnar")
+    else:
+        write_time_series(iter_shard(pool, 0, n_users, N_DAYS, seed=0), out_path, fmt="columnar")
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def _peak_rss_mib(mode: str, n_users: int, workdir: str) -> float:
+    """Run one generation in a subprocess and return its peak RSS"""
+    out_path = os.path.join(workdir, f"{mode}-{n_users}.cols")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_memory", "--child", mode, str(n_users), out_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    shutil.rmtree(out_path, ignore_errors=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    workdir = tempfile.mkdtemp()
+    rows = []
+    try:
+        for n_users in USER_COUNTS:
+            peaks = {mode: _peak_rss_mib(mode, n_users, workdir) for mode in MODES}
+            rows.append({
+                "users": n_users,
+                "rows": n_users * N_DAYS * 288,
+                "chunk_users": SHARD_CHUNK_USERS,
+                "in_memory_peak_mib": peaks["in_memory"],
+                "streaming_peak_mib": peaks["streaming"],
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _child(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
@@ -0,0 +1,114 @@
+"""Server CPU per live playback stream compared with tick polling
+
+Opens many concurrent ``/ws/playback`` subscriptions against the app in this
+process, driving the ASGI interface directly, and compares the process CPU
+time with the same number of viewers polling ``POST /api/tick`` through
+httpx's ASGI transport. Both sides step every ``INTERVAL_S`` seconds. The
+harness runs in the same process, so its own (small) client-side work is
+included in both columns.
+
+Usage:
+    python -m benchmarks.bench_playback_stream
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List
+import httpx
+from app.main import app
+from app.services.data_loader import get_dataset
+from benchmarks._common import print_table
+
+STREAM_COUNTS = (10, 100, 500)
+INTERVAL_S = 0.5
+DURATION_S = 10.0
+N_SYNTHETIC_USERS = 200
+START = "2025-06-01T03:00:00"
+
+
+async def _stream(user_id: int, deadline: float, counts: Dict[str, int]) -> None:
+    """Hold one playback subscription open until the deadline"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+        "path": "/ws/playback", "raw_path": b"/ws/playback", "root_path": "",
+        "query_string": b"", "headers": [], "subprotocols": [],
+        "server": ("bench", 80), "client": ("bench", user_id),
+    }
+    await inbox.put({"type": "websocket.connect"})
+    server = asyncio.create_task(app(scope, inbox.get, outbox.put))
+    await outbox.get()
+    await inbox.put({"type": "websocket.receive", "text": json.dumps({
+        "user_id": user_id, "real_data": False, "start": START, "interval": INTERVAL_S,
+    })})
+
+    loop = asyncio.get_running_loop()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            message = await asyncio.wait_for(outbox.get(), remaining)
+        except asyncio.TimeoutError:
+            break
+        if message["type"] == "websocket.send":
+            kind = json.loads(message["text"])["type"]
+            counts[kind] = counts.get(kind, 0) + 1
+    await inbox.put({"type": "websocket.disconnect", "code": 1000})
+    await server
+
+
+async def _poll(client: httpx.AsyncClient, user_id: int, deadline: float,
+                counts: Dict[str, int]) -> None:
+    """Poll the tick endpoint like the previous frontend until the deadline"""
+    loop = asyncio.get_running_loop()
+    date, since = START, None
+    while loop.time() < deadline:
+        started = loop.time()
+        tick = (await client.post("/api/tick", json={
+            "user_id": user_id, "real_data": False, "last_date": date, "since": since,
+        })).json()
+        counts["tick"] = counts.get("tick", 0) + 1
+        if tick["glucose"]:
+            since = tick["glucose"][-1]["timestamps"]
+            date = since
+        await asyncio.sleep(max(0.0, INTERVAL_S - (loop.time() - started)))
+
+
+async def _run(n_streams: int, mode: str) -> Dict[str, float]:
+    """Run one round and measure the CPU time of the process"""
+    counts: Dict[str, int] = {}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + DURATION_S
+    cpu_start = time.process_time()
+    if mode == "stream":
+        await asyncio.gather(*(_stream(i % N_SYNTHETIC_USERS, deadline, counts)
+                               for i in range(n_streams)))
+    else:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await asyncio.gather(*(_poll(client, i % N_SYNTHETIC_USERS, deadline, counts)
+                                   for i in range(n_streams)))
+    cpu_s = time.process_time() - cpu_start
+    return {"cpu_s": cpu_s, "ticks": counts.get("tick", 0)}
+
+
+def main() -> None:
+    """Run every stream count in both modes and print a table"""
+    get_dataset(False)
+    rows: List[Dict[str, object]] = []
+    for n_streams in STREAM_COUNTS:
+        row: Dict[str, object] = {"streams": n_streams}
+        for mode in ("stream", "poll"):
+            result = asyncio.run(_run(n_streams, mode))
+            row[f"{mode}_ticks"] = result["ticks"]
+            row[f"{mode}_cpu_pct_per_stream"] = 100 * result["cpu_s"] / DURATION_S / n_streams
+            row[f"{mode}_cpu_ms_per_tick"] = 1000 * result["cpu_s"] / max(result["ticks"], 1)
+        rows.append(row)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Latency of cached window queries
+
+Requests the same glucose and stats windows through the app in this process
+(httpx's ASGI transport): with an empty cache on every call, from the response
+cache, and as a conditional request answered with 304.
+
+Usage:
+    python -m benchmarks.bench_response_cache
+"""
+
+import asyncio
+from typing import Dict, List
+import httpx
+from app.main import app
+from app.services.data_loader import get_dataset
+from app.services.response_cache import response_cache
+from benchmarks._common import print_table, summarize
+
+QUERIES = {
+    "glucose_1d": "/api/glucose/3?real_data=false&time_mod=1d&last_date=2025-06-01T23:55:00",
+    "stats_1d": "/api/stats/3?real_data=false&time_mod=1d&last_date=2025-06-01T23:55:00",
+}
+REPEAT = 200
+
+
+async def _time(client: httpx.AsyncClient, url: str, mode: str) -> List[float]:
+    """Time repeated requests of one URL in one mode"""
+    loop = asyncio.get_running_loop()
+    etag = (await client.get(url)).headers["etag"]
+    headers = {"If-None-Match": etag} if mode == "not_modified" else {}
+    timings = []
+    for _ in range(REPEAT):
+        if mode == "miss":
+            response_cache.clear()
+        start = loop.time()
+        await client.get(url, headers=headers)
+        timings.append(loop.time() - start)
+    return timings
+
+
+async def _run() -> List[Dict[str, object]]:
+    """Measure every query in every mode"""
+    rows: List[Dict[str, object]] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, url in QUERIES.items():
+            for mode in ("miss", "hit", "not_modified"):
+                rows.append({"query": name, "mode": mode, **summarize(await _time(client, url, mode))})
+    return rows
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    get_dataset(False)
+    print_table(asyncio.run(_run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Latency of glucose analytics over long windows, from rollups and from raw samples
+
+Builds one user with 90 days of 5-minute samples and times time in ranges
+(summary, range counts and median) and the ambulatory glucose profile (24
+hourly percentile bands) for 14d, 30d and 90d windows, merged from the hourly
+and daily rollups and computed from the raw samples with NumPy. The rollups
+are built once up front; their build time and size are reported separately.
+
+Usage:
+    python -m benchmarks.bench_rollups
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from app.utils.rollups import (
+    AGP_PERCENTILES, NS_PER_HOUR, ambulatory_glucose_profile, build_rollups,
+    hour_of_day_histograms, summarize_window, time_in_ranges
+)
+from benchmarks._common import measure, print_table
+
+N_DAYS = 90
+WINDOW_DAYS = (14, 30, 90)
+RANGE_EDGES = (54, 70, 180, 250)
+
+
+def _raw_tir(glucose: np.ndarray) -> dict:
+    """Time in ranges and metrics from the raw samples"""
+    values = glucose[~np.isnan(glucose)]
+    counts = np.bincount(np.searchsorted(RANGE_EDGES, values, side="right"), minlength=5)
+    return {"percent": 100 * counts / len(values), "mean": values.mean(),
+            "std": values.std(ddof=1), "median": np.median(values)}
+
+
+def _raw_agp(timestamps_ns: np.ndarray, glucose: np.ndarray) -> list:
+    """Hourly percentile bands from the raw samples"""
+    hours = (timestamps_ns // NS_PER_HOUR) % 24
+    return [np.nanpercentile(glucose[hours == hour], AGP_PERCENTILES) for hour in range(24)]
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    n_samples = N_DAYS * 288
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2025-06-01", periods=n_samples, freq="5min").values
+    timestamps_ns = times.view("i8")
+    glucose = np.clip(120 + np.cumsum(rng.normal(0, 2, n_samples)), 40, 400)
+
+    start = time.perf_counter()
+    rollups = build_rollups(times, glucose)
+    build_ms = 1000 * (time.perf_counter() - start)
+    print(f"rollups build: {build_ms:.2f} ms, {rollups.nbytes / 1024:.0f} KiB")
+
+    rows = []
+    for days in WINDOW_DAYS:
+        # Windows start mid-day so the edges fall back to hourly buckets and raw samples
+        first = n_samples - days * 288 + 7
+        cases = {
+            "tir.rollups": lambda: time_in_ranges(
+                summarize_window(rollups, glucose, first, n_samples)),
+            "tir.raw": lambda: _raw_tir(glucose[first:]),
+            "agp.rollups": lambda: ambulatory_glucose_profile(hour_of_day_histograms(
+                rollups, timestamps_ns, glucose, first, n_samples)),
+            "agp.raw": lambda: _raw_agp(timestamps_ns[first:], glucose[first:]),
+        }
+        for name, fn in cases.items():
+            rows.append({"window": f"{days}d", "case": name, **measure(fn, repeat=50)})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark glucose window encodings for long windows
+
+Compares the default records path (``to_dict("records")`` plus FastAPI's
+``jsonable_encoder`` and ``json.dumps``) with the columnar JSON and the
+compact binary encodings for 30d and 90d windows.
+
+Usage:
+    python -m benchmarks.bench_serialization
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from app.utils.serialization import encode_columnar_json, encode_series_binary
+from benchmarks._common import measure, print_table
+
+WINDOWS = {"30d": 30 * 288, "90d": 90 * 288}
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    rows = []
+    for time_mod, n_samples in WINDOWS.items():
+        window = pd.DataFrame({
+            "timestamps": pd.date_range("2025-06-01", periods=n_samples, freq="5min"),
+            "glucose": np.random.default_rng(0).normal(120, 30, n_samples),
+        })
+        timestamps = window["timestamps"].to_numpy()
+        glucose = window["glucose"].to_numpy()
+
+        encoders = {
+            "records": lambda: json.dumps(jsonable_encoder(window.to_dict("records"))).encode(),
+            "columnar_json": lambda: encode_columnar_json(timestamps, {"glucose": glucose}),
+            "binary": lambda: encode_series_binary(timestamps, glucose),
+        }
+        for name, encode in encoders.items():
+            rows.append({
+                "time_mod": time_mod,
+                "encoding": name,
+                "bytes": len(encode()),
+                **measure(encode, repeat=20),
+            })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
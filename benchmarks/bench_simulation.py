@@ -0,0 +1,75 @@
+"""Tick latency of the server-side simulation engine as the sessions grow
+
+Starts ``SimulationEngine`` sessions over the users of a 200x7 fixture (see
+``benchmarks.fixtures``), at random start times in the first days, with a mix
+of speeds (0.5x, 1x, 2x and 5x of one 5-minute sample per second) and a tenth
+of them paused, then runs ``N_TICKS`` ticks of one second each back to back.
+The engine has to finish a tick well within the one-second tick interval on
+one core; ``budget_pct`` is the p99 tick latency as a share of that interval.
+Chunk refills from the dataset and alert events are included in the ticks.
+
+Usage:
+    python -m benchmarks.bench_simulation
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from app.services.simulation import SIMULATION_TICK_INTERVAL, SimulationEngine
+from app.utils.synthetic import START_DATE
+from benchmarks._common import print_table, summarize
+from benchmarks.fixtures import fixture_path, synthetic_dataset
+
+SESSION_COUNTS = (1_000, 10_000, 20_000)
+N_USERS = 200
+N_DAYS = 7
+N_TICKS = 300
+SPEEDS = (0.5, 1.0, 2.0, 5.0)
+PAUSED_SHARE = 0.1
+START_SPREAD_S = 2 * 86_400
+
+
+def _sessions(engine: SimulationEngine, n_sessions: int, rng: np.random.Generator) -> float:
+    """Start sessions on the engine and return the seconds it took"""
+    first = pd.Timestamp(START_DATE)
+    offsets = rng.integers(0, START_SPREAD_S, n_sessions)
+    speeds = rng.choice(SPEEDS, n_sessions)
+    paused = rng.random(n_sessions) < PAUSED_SHARE
+    start = time.perf_counter()
+    for i in range(n_sessions):
+        engine.create(i % N_USERS, start=(first + pd.Timedelta(seconds=int(offsets[i]))).isoformat(),
+                      speed=float(speeds[i]), paused=bool(paused[i]))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    rng = np.random.default_rng(0)
+    rows = []
+    with synthetic_dataset(fixture_path(N_USERS, N_DAYS)):
+        for n_sessions in SESSION_COUNTS:
+            engine = SimulationEngine(max_sessions=n_sessions)
+            created_s = _sessions(engine, n_sessions, rng)
+            timings = np.empty(N_TICKS)
+            n_events = 0
+            for i in range(N_TICKS):
+                start = time.perf_counter()
+                n_events += len(engine.tick(SIMULATION_TICK_INTERVAL))
+                timings[i] = time.perf_counter() - start
+            stats = summarize(timings)
+            metrics = engine.metrics()
+            rows.append({
+                "sessions": n_sessions,
+                **stats,
+                "max_ms": float(timings.max() * 1000),
+                "budget_pct": stats["p99_ms"] / (10 * SIMULATION_TICK_INTERVAL),
+                "events_per_tick": n_events / N_TICKS,
+                "refills_per_tick": metrics["refills"] / N_TICKS,
+                "create_us": 1e6 * created_s / n_sessions,
+                "mib": metrics["nbytes"] / 2 ** 20,
+            })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark of synthetic time-series generation as the cohort grows
+
+Compares the previous per-row generator (``iterrows`` plus one dict per
+sample) with the array-based ``generate_time_series``. The per-row version is
+only timed up to ``LEGACY_MAX_USERS`` users.
+
+Usage:
+    python -m benchmarks.bench_synthetic
+"""
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from app.utils.synthetic import generate_time_series
+from benchmarks._common import measure, print_table
+
+USER_COUNTS = (200, 10_000, 100_000)
+LEGACY_MAX_USERS = 10_000
+N_SAMPLES = 288
+
+
+def legacy_generate_time_series(enhanced_synth_users: pd.DataFrame,
+                                glucose_only_data: pd.DataFrame) -> pd.DataFrame:
+    """Time-series generation as implemented before the array-based version"""
+    time_columns = [col for col in glucose_only_data.columns if col.startswith("t_")]
+    synthetic_time_series = []
+    for idx, row in enhanced_synth_users.iterrows():
+        hr_series = np.clip(np.round(np.random.normal(row['hr_mean'], row['hr_std'], 288)), 40, 200)
+        steps_series = np.clip(np.round(np.random.normal(row['steps_mean'], row['steps_std'], 288)),
+                               0, 500)
+        synthetic_time_series.append({
+            'user_id': idx,
+            'glucose': glucose_only_data.iloc[idx][time_columns].values,
+            'heart_rate': hr_series,
+            'steps': steps_series
+        })
+    rows = []
+    for user in synthetic_time_series:
+        curr_date = pd.to_datetime("2025-06-01 00:00:00").tz_localize(None)
+        for i, _ in enumerate(time_columns):
+            rows.append({
+                "user_id": user["user_id"],
+                "time": curr_date,
+                "glucose": user["glucose"][i],
+                "heart_rate": user["heart_rate"][i],
+                "steps": user["steps"][i]
+            })
+            curr_date = curr_date + timedelta(minutes=5)
+    return pd.DataFrame(rows)
+
+
+def _inputs(n_users: int):
+    """Random user features and glucose rows"""
+    rng = np.random.default_rng(0)
+    glucose_only = pd.DataFrame(rng.normal(110, 20, (n_users, N_SAMPLES)),
+                                columns=[f"t_{i}" for i in range(N_SAMPLES)])
+    enhanced = pd.DataFrame({
+        "hr_mean": rng.uniform(60, 100, n_users),
+        "hr_std": rng.uniform(5, 15, n_users),
+        "steps_mean": rng.uniform(10, 100, n_users),
+        "steps_std": rng.uniform(10, 50, n_users),
+    })
+    return enhanced, glucose_only
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    rows = []
+    for n_users in USER_COUNTS:
+        enhanced, glucose_only = _inputs(n_users)
+        repeat = 5 if n_users < 100_000 else 1
+        vectorized = measure(lambda: generate_time_series(enhanced, glucose_only, seed=0),
+                             repeat=repeat, warmup=1)["p50_ms"]
+        legacy = float("nan")
+        if n_users <= LEGACY_MAX_USERS:
+            legacy = measure(lambda: legacy_generate_time_series(enhanced, glucose_only),
+                             repeat=1, warmup=0)["p50_ms"]
+        rows.append({
+            "users": n_users,
+            "rows": n_users * N_SAMPLES,
+            "legacy_ms": legacy,
+            "vectorized_ms": vectorized,
+            "speedup": legacy / vectorized,
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""First-request latency and memory of on-demand synthetic patients
+
+Times loading a synthetic user that is not cached yet (generation of
+``SYNTHETIC_DAYS`` days, the one-user dataset and its rolling index), a cached
+user, and the first and a cached ``/api/stats`` computation, for users beyond
+the synthetic dataset. Every miss uses a new user ID.
+
+Usage:
+    python -m benchmarks.bench_synthetic_source
+"""
+
+import itertools
+from app.api.routes import _compute_stats, _load_user
+from app.services.data_loader import get_dataset
+from app.services.synthetic_source import SYNTHETIC_DAYS, synthetic_source
+from benchmarks._common import measure, print_table
+
+FIRST_USER_ID = 1_000
+TIME_MOD = "1d"
+LAST_DATE = "2025-06-03T12:00:00"
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    get_dataset(False)
+    new_users = itertools.count(FIRST_USER_ID)
+
+    def load(user_id: int):
+        return _load_user(user_id, False, TIME_MOD, LAST_DATE)
+
+    rows = [
+        {"case": "load, new user", **measure(lambda: load(next(new_users)), 200)},
+        {"case": "load, cached user", **measure(lambda: load(FIRST_USER_ID), 200)},
+        {"case": "stats 1d, new user", **measure(
+            lambda: _compute_stats(load(next(new_users)), TIME_MOD, LAST_DATE), 200)},
+        {"case": "stats 1d, cached user", **measure(
+            lambda: _compute_stats(load(FIRST_USER_ID), TIME_MOD, LAST_DATE), 200)},
+    ]
+    print_table(rows)
+    stats = synthetic_source.stats()
+    print(f"{SYNTHETIC_DAYS} days per patient, {stats['entries']} cached patients, "
+          f"{stats['nbytes'] / stats['entries'] / 1024:.0f} KiB of columns each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Microbenchmark of time-window slicing for every interval in TIME_INTERVALS
+
+Compares the previous mask-based ``last_x`` (sort, boolean mask, ``idxmax``,
+copy) with the binary-search ``last_x`` and with ``window_bounds`` on raw
+nanoseconds, for a user with 90 days of 5-minute samples.
+
+Usage:
+    python -m benchmarks.bench_timeparser
+"""
+
+import numpy as np
+import pandas as pd
+from app.utils.timeparser import TIME_INTERVALS, last_x, window_bounds
+from benchmarks._common import measure, print_table
+
+N_DAYS = 90
+
+
+def legacy_last_x(df: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFrame:
+    """Window lookup as implemented before the binary-search path"""
+    df = df.sort_values(by="timestamps").reset_index(drop=True)
+    if isinstance(df["timestamps"].iloc[0], str):
+        df["timestamps"] = pd.to_datetime(df["timestamps"])
+    window_size = int(TIME_INTERVALS[time_mod] * 12)
+    if last_date:
+        last_date = pd.to_datetime(last_date).tz_localize(None)
+        mask = df["timestamps"] > last_date
+        end = mask.idxmax() + 1 if mask.any() else len(df)
+    else:
+        end = 1
+    end = min(end, len(df))
+    return df.iloc[max(0, end - window_size):end].copy()
+
+
+def main() -> None:
+    """Run the benchmark and print a table"""
+    timestamps = pd.date_range("2025-06-01", periods=N_DAYS * 288, freq="5min")
+    df = pd.DataFrame({
+        "timestamps": timestamps,
+        "glucose": np.random.default_rng(0).normal(100, 10, len(timestamps)),
+    })
+    timestamps_ns = df["timestamps"].to_numpy().view("i8")
+    last_date = str(timestamps[-100])
+
+    rows = []
+    for time_mod in TIME_INTERVALS:
+        legacy = measure(lambda: legacy_last_x(df, time_mod, last_date))["p50_ms"]
+        sliced = measure(lambda: last_x(df, time_mod, last_date))["p50_ms"]
+        bounds = measure(lambda: window_bounds(timestamps_ns, time_mod, last_date), repeat=1000)["p50_ms"]
+        rows.append({
+            "time_mod": time_mod,
+            "legacy_p50_ms": legacy,
+            "last_x_p50_ms": sliced,
+            "window_bounds_p50_ms": bounds,
+            "speedup": legacy / sliced,
+        })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
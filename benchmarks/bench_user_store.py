@@ -0,0 +1,85 @@
+"""Load test of the per-tick user store operations as the user count grows
+
+Every simulated playback tick moves one random user's last viewed timestamp
+forward and reads it back, against the JSON file and the SQLite repository.
+
+Usage:
+    python -m benchmarks.bench_user_store
+"""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import pandas as pd
+from app.services.user_store import JsonUserRepository, SqliteUserRepository
+from benchmarks._common import measure, print_table
+
+USER_COUNTS = (100, 1_000, 10_000, 100_000)
+JSON_MAX_USERS = 10_000
+
+
+def _users(n_users: int) -> dict:
+    """Registered users as stored in ``users.json``"""
+    return {
+        f"user-{i}": {
+            "id": i + 1,
+            "password": "secret",
+            "use_real_data": False,
+            "real_user_id": None,
+            "synthetic_user_id": i % 201,
+            "last_viewed_timestamp": None,
+        }
+        for i in range(n_users)
+    }
+
+
+def _populate_sqlite(path: str, users: dict) -> SqliteUserRepository:
+    """Create an SQLite repository holding the given users"""
+    repository = SqliteUserRepository(path)
+    connection = repository._connection()
+    with connection:
+        connection.executemany(
+            "INSERT INTO users (id, username, password, use_real_data, synthetic_user_id)"
+            " VALUES (?, ?, ?, 0, ?)",
+            [(u["id"], name, u["password"], u["synthetic_user_id"]) for name, u in users.items()],
+        )
+    return repository
+
+
+def main() -> None:
+    """Run the load test and print a table"""
+    workdir = tempfile.mkdtemp()
+    start = pd.Timestamp("2025-06-01")
+    rows = []
+    try:
+        for n_users in USER_COUNTS:
+            users = _users(n_users)
+            repositories = {"sqlite": _populate_sqlite(os.path.join(workdir, f"{n_users}.db"), users)}
+            if n_users <= JSON_MAX_USERS:
+                json_path = os.path.join(workdir, f"{n_users}.json")
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(users, f, indent=2)
+                repositories["json"] = JsonUserRepository(json_path)
+
+            for backend, repository in repositories.items():
+                rng = random.Random(0)
+                step = iter(range(10**9))
+
+                def tick():
+                    username = f"user-{rng.randrange(n_users)}"
+                    timestamp = (start + pd.Timedelta(minutes=5 * next(step))).isoformat()
+                    repository.update_last_viewed(username, timestamp)
+                    repository.get(username)
+
+                rows.append({"users": n_users, "backend": backend,
+                             **measure(tick, repeat=200 if backend == "sqlite" else 20)})
+                repository.close()
+        print_table(rows)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
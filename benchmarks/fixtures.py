@@ -0,0 +1,61 @@
+"""Scalable synthetic fixtures for the benchmarks
+
+A fixture is a dataset CSV of ``n_users`` users with ``n_days`` of 5-minute
+samples, produced by the cohort generator (``app.utils.cohort``) from the
+bundled synthetic profiles, so it runs offline. Fixtures are written once per
+scale and seed under ``CGM_BENCH_FIXTURES`` (default: a directory in the
+system temp dir) and reused by later runs.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+from app.services import data_loader
+from app.utils.cohort import SHARD_CHUNK_USERS, iter_shard, load_profile_pool
+from app.utils.synthetic import START_DATE, write_time_series
+
+FIXTURES_DIR = os.environ.get("CGM_BENCH_FIXTURES",
+                              os.path.join(tempfile.gettempdir(), "cgm-bench-fixtures"))
+
+
+def parse_scale(scale: str) -> Tuple[int, int]:
+    """Parse a ``<users>x<days>`` scale, e.g. ``200x7``
+    Raises:
+        ValueError: If the string is not of that form
+    """
+    try:
+        n_users, n_days = (int(part) for part in scale.lower().split("x"))
+    except ValueError as exc:
+        raise ValueError(f"Scale must look like 200x7, got {scale!r}") from exc
+    return n_users, n_days
+
+
+def fixture_path(n_users: int, n_days: int, seed: int = 0) -> str:
+    """Get the CSV of a fixture, generating it on first use
+    Args:
+        n_users (int): Number of users, with IDs from 0
+        n_days (int): Days of samples per user, from ``START_DATE``
+        seed (int, optional): Generator seed. Defaults to 0
+    Returns:
+        str: Path of the CSV file
+    """
+    path = os.path.join(FIXTURES_DIR, f"cohort-{n_users}x{n_days}-seed{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(FIXTURES_DIR, exist_ok=True)
+        chunks = iter_shard(load_profile_pool(), 0, n_users, n_days, seed, SHARD_CHUNK_USERS,
+                            START_DATE)
+        write_time_series(chunks, path + ".tmp", fmt="csv")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+@contextmanager
+def synthetic_dataset(path: str) -> Iterator[str]:
+    """Serve a fixture as the synthetic dataset of the app in this process"""
+    previous = data_loader.SYNTHETIC_DATA_PATH
+    data_loader.SYNTHETIC_DATA_PATH = path
+    try:
+        yield path
+    finally:
+        data_loader.SYNTHETIC_DATA_PATH = previous
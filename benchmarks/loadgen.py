@@ -0,0 +1,286 @@
+"""Load generator replaying the playback pattern of the frontend
+
+Every viewer registers a synthetic user and plays it back from
+``START_OFFSET`` after the first sample, one 5-minute sample per tick, at each
+of the three speed settings of ``HomePage.jsx`` (a tick every 2 s, 1 s and
+0.5 s). Modes:
+
+- ``poll``: per tick ``GET /api/glucose`` (1h plot window), ``GET /api/stats``
+  (1d) and ``POST /update_last_viewed``, as the frontend did before playback
+  streaming
+- ``tick``: one ``POST /api/tick`` per tick, with the last viewed update
+- ``stream``: one ``/ws/playback`` subscription per viewer; the latency of a
+  tick is the time past its schedule at which its message arrived. Only
+  in-process, because no WebSocket client is a dependency
+
+By default the app runs in this process on a fixture dataset (see
+``benchmarks.fixtures``) with a temporary user store, driven through httpx's
+ASGI transport; with ``--url`` the HTTP modes run against a local server
+instead, which must serve a dataset with the fixture's users. The report is
+JSON with requests, errors, throughput and latency percentiles per endpoint
+for every speed (registration is reported separately), and the peak resident
+memory of this process, which includes the server when it runs in-process.
+
+Usage:
+    python -m benchmarks.loadgen [--mode poll] [--viewers 50] [--duration 10] [--scale 200x1]
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+import pandas as pd
+from app.main import app
+from app.services.data_loader import get_dataset
+from app.services.last_viewed import LastViewedBuffer, get_last_viewed_buffer, set_last_viewed_buffer
+from app.services.user_store import SqliteUserRepository, set_user_repository
+from app.utils.synthetic import START_DATE
+from benchmarks._common import environment, summarize, write_json
+from benchmarks.fixtures import fixture_path, parse_scale, synthetic_dataset
+
+MODES = ("poll", "tick", "stream")
+SPEED_INTERVALS_S = (2.0, 1.0, 0.5)
+PLOT_TIME_MOD = "1h"
+STATS_TIME_MOD = "1d"
+START_OFFSET = pd.Timedelta(hours=3)
+SAMPLE_STEP = pd.Timedelta(minutes=5)
+DEFAULT_VIEWERS = 50
+DEFAULT_DURATION_S = 10.0
+DEFAULT_SCALE = "200x1"
+
+
+class Recorder:
+    """Latencies and errors per endpoint of one run"""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, name: str, call) -> Optional[httpx.Response]:
+        """Await a request, recording its latency or its failure"""
+        start = time.perf_counter()
+        try:
+            response = await call
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, duration_s: float) -> dict:
+        """Summarize the run"""
+        requests = sum(len(values) for values in self.latencies.values())
+        return {
+            "requests": requests,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": requests / duration_s,
+            "endpoints": {name: {"count": len(values), "errors": self.errors.get(name, 0),
+                                 **summarize(values)}
+                          for name, values in sorted(self.latencies.items())},
+        }
+
+
+def _playback_dates(n_days: int) -> List[str]:
+    """Playback timestamps of one pass over a fixture"""
+    dates = pd.date_range(pd.Timestamp(START_DATE) + START_OFFSET,
+                          pd.Timestamp(START_DATE) + pd.Timedelta(days=n_days) - SAMPLE_STEP,
+                          freq=SAMPLE_STEP)
+    return list(dates.strftime("%Y-%m-%dT%H:%M:%S"))
+
+
+async def _register(client: httpx.AsyncClient, recorder: Recorder, username: str,
+                    user_id: int) -> None:
+    """Register the viewer as a synthetic user"""
+    await recorder.request("POST /register", client.post("/register", json={
+        "username": username, "password": "loadgen", "use_real_data": False,
+        "synthetic_user_id": user_id,
+    }))
+
+
+async def _poll_viewer(client: httpx.AsyncClient, recorder: Recorder, mode: str, username: str,
+                       user_id: int, dates: List[str], interval: float, deadline: float) -> None:
+    """Play back one user over HTTP until the deadline"""
+    loop = asyncio.get_running_loop()
+    tick = 0
+    while loop.time() < deadline:
+        started = loop.time()
+        date = dates[tick % len(dates)]
+        if mode == "poll":
+            params = {"real_data": "false", "last_date": date}
+            await asyncio.gather(
+                recorder.request("GET /api/glucose", client.get(
+                    f"/api/glucose/{user_id}", params={**params, "time_mod": PLOT_TIME_MOD})),
+                recorder.request("GET /api/stats", client.get(
+                    f"/api/stats/{user_id}", params={**params, "time_mod": STATS_TIME_MOD})),
+                recorder.request("POST /update_last_viewed", client.post(
+                    "/update_last_viewed",
+                    json={"username": username, "last_viewed_timestamp": date})),
+            )
+        else:
+            await recorder.request("POST /api/tick", client.post("/api/tick", json={
+                "user_id": user_id, "real_data": False, "plot_time_mod": PLOT_TIME_MOD,
+                "stats_time_mod": STATS_TIME_MOD, "last_date": date, "username": username,
+            }))
+        tick += 1
+        await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+
+async def _stream_viewer(recorder: Recorder, username: str, user_id: int, start: str,
+                         interval: float, deadline: float) -> None:
+    """Hold one in-process playback subscription open until the deadline"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+        "path": "/ws/playback", "raw_path": b"/ws/playback", "root_path": "",
+        "query_string": b"", "headers": [], "subprotocols": [],
+        "server": ("loadgen", 80), "client": ("loadgen", user_id),
+    }
+    await inbox.put({"type": "websocket.connect"})
+    server = asyncio.create_task(app(scope, inbox.get, outbox.put))
+    await outbox.get()
+    loop = asyncio.get_running_loop()
+    subscribed = loop.time()
+    await inbox.put({"type": "websocket.receive", "text": json.dumps({
+        "user_id": user_id, "real_data": False, "plot_time_mod": PLOT_TIME_MOD,
+        "stats_time_mod": STATS_TIME_MOD, "start": start, "interval": interval,
+        "username": username,
+    })})
+
+    ticks = 0
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            message = await asyncio.wait_for(outbox.get(), remaining)
+        except asyncio.TimeoutError:
+            break
+        if message["type"] != "websocket.send":
+            break
+        kind = json.loads(message["text"])["type"]
+        if kind == "error":
+            recorder.errors["WS /ws/playback"] += 1
+            break
+        # The snapshot is due at once, every tick ``interval`` seconds later
+        due = subscribed + ticks * interval
+        recorder.latencies["WS /ws/playback"].append(max(0.0, loop.time() - due))
+        ticks += 1
+    await inbox.put({"type": "websocket.disconnect", "code": 1000})
+    await server
+
+
+async def _run_speed(client: httpx.AsyncClient, mode: str, n_viewers: int, n_users: int,
+                     dates: List[str], interval: float, duration_s: float) -> dict:
+    """Run all viewers at one speed"""
+    run_id = uuid.uuid4().hex[:8]
+    usernames = [f"loadgen-{run_id}-{i}" for i in range(n_viewers)]
+    setup = Recorder()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.gather(*(_register(client, setup, username, i % n_users)
+                           for i, username in enumerate(usernames)))
+    registration = setup.report(loop.time() - started)
+
+    recorder = Recorder()
+    deadline = loop.time() + duration_s
+    if mode == "stream":
+        viewers = (_stream_viewer(recorder, username, i % n_users, dates[0], interval, deadline)
+                   for i, username in enumerate(usernames))
+    else:
+        viewers = (_poll_viewer(client, recorder, mode, username, i % n_users, dates, interval,
+                                deadline) for i, username in enumerate(usernames))
+    await asyncio.gather(*viewers)
+    return {"interval_s": interval, **recorder.report(duration_s), "registration": registration}
+
+
+async def _run(mode: str, n_viewers: int, n_users: int, n_days: int, duration_s: float,
+               url: Optional[str]) -> List[dict]:
+    """Run every speed setting in turn"""
+    dates = _playback_dates(n_days)
+    if url is not None:
+        client = httpx.AsyncClient(base_url=url, timeout=30)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadgen")
+    async with client:
+        return [await _run_speed(client, mode, n_viewers, n_users, dates, interval, duration_s)
+                for interval in SPEED_INTERVALS_S]
+
+
+def _peak_rss_mib() -> float:
+    """Peak resident memory of this process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def run(mode: str, n_viewers: int, duration_s: float, scale: str, url: Optional[str]) -> dict:
+    """Generate the load and collect the report
+    Args:
+        mode (str): ``poll``, ``tick`` or ``stream``
+        n_viewers (int): Concurrent viewers
+        duration_s (float): Seconds per speed setting
+        scale (str): Fixture scale, users x days; with ``url`` only the users
+            and days to play back
+        url (Optional[str]): Base URL of a running server, or None to run in-process
+    Returns:
+        dict: Environment, parameters and one result per speed
+    Raises:
+        ValueError: If the mode is unknown or streaming is requested against a URL
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    if mode == "stream" and url is not None:
+        raise ValueError("The stream mode only runs in-process")
+    n_users, n_days = parse_scale(scale)
+    params = {"mode": mode, "viewers": n_viewers, "duration_s": duration_s, "scale": scale,
+              "target": url or "in-process"}
+
+    if url is not None:
+        speeds = asyncio.run(_run(mode, n_viewers, n_users, n_days, duration_s, url))
+        return {"environment": environment(), **params, "speeds": speeds,
+                "peak_rss_mib": _peak_rss_mib()}
+
+    previous_buffer = get_last_viewed_buffer()
+    with tempfile.TemporaryDirectory() as tmp, synthetic_dataset(fixture_path(n_users, n_days)):
+        set_user_repository(SqliteUserRepository(os.path.join(tmp, "users.db")))
+        buffer = LastViewedBuffer()
+        set_last_viewed_buffer(buffer)
+        buffer.start()
+        try:
+            get_dataset(False)
+            speeds = asyncio.run(_run(mode, n_viewers, n_users, n_days, duration_s, None))
+        finally:
+            set_last_viewed_buffer(previous_buffer)
+            set_user_repository(None)
+    return {"environment": environment(), **params, "speeds": speeds,
+            "peak_rss_mib": _peak_rss_mib()}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the load generator and write the JSON report"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=MODES, default="poll")
+    parser.add_argument("--viewers", type=int, default=DEFAULT_VIEWERS)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_S,
+                        help="seconds per speed setting")
+    parser.add_argument("--scale", default=DEFAULT_SCALE, help="fixture users x days")
+    parser.add_argument("--url", help="base URL of a running server instead of in-process")
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    write_json(run(args.mode, args.viewers, args.duration, args.scale, args.url), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Reproducible benchmark suite of the backend hot paths
+
+Runs every case below for each fixture scale (users x days, see
+``benchmarks.fixtures``) and reports latency, throughput and the peak memory
+allocated by one call as JSON, so that runs on different commits or machines
+can be compared with ``--compare``:
+
+- ``dataset.load``: cold parse of the fixture CSV, partitioning and indexing
+- ``load_certain_data``, ``last_x``, ``precise_day_last_x``, ``update_stats``:
+  the DataFrame path per user
+- ``window_stats``: the prefix-sum statistics used by the routes
+- ``register_user``, ``update_last_viewed`` (write-behind buffer) and
+  ``repository.update_last_viewed`` (direct write) against a temporary SQLite
+  user store
+- ``generate_time_series``: synthetic generation for the users and days of the
+  scale from random profiles
+
+Per-user cases cycle through the first ``SAMPLED_USERS`` users; the window
+ends at the last sample of the fixture. Peak memory is traced with
+``tracemalloc`` in a separate untimed call.
+
+Usage:
+    python -m benchmarks.suite [--scales 50x1,200x7] [--repeat 50] [--output results.json]
+    python -m benchmarks.suite --compare before.json after.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.models.user import UserRegister
+from app.services import data_loader
+from app.services.auth import register_user
+from app.services.dataset_cache import dataset_cache
+from app.services.last_viewed import LastViewedBuffer, get_last_viewed_buffer, set_last_viewed_buffer
+from app.services.timestamps import update_last_viewed
+from app.services.user_store import SqliteUserRepository, set_user_repository
+from app.utils.stats import update_stats, window_stats
+from app.utils.synthetic import START_DATE, generate_time_series
+from app.utils.timeparser import last_x, precise_day_last_x, window_bounds
+from benchmarks._common import environment, print_table, summarize, write_json
+from benchmarks.fixtures import fixture_path, parse_scale, synthetic_dataset
+
+DEFAULT_SCALES = ("50x1", "200x1", "200x7")
+DEFAULT_REPEAT = 50
+COLD_REPEAT = 3
+SAMPLED_USERS = 64
+PLOT_TIME_MOD = "1h"
+STATS_TIME_MODS = ("1d", "7d")
+COMPARED_METRICS = ("p50_ms", "p99_ms", "peak_mib")
+
+
+def _run_case(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Time a case, then trace the memory of one more call
+    Returns:
+        Dict[str, float]: Latency summary, calls per second and peak traced MiB
+    """
+    fn()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {**summarize(timings), "ops_per_s": float(repeat / timings.sum()),
+            "peak_mib": peak / 2 ** 20}
+
+
+def _cycle(values: List) -> Callable[[], object]:
+    """Get a function returning the next value of an endless cycle"""
+    return itertools.cycle(values).__next__
+
+
+def _profiles(n_users: int, n_days: int):
+    """Random profiles and glucose rows for ``generate_time_series``"""
+    rng = np.random.default_rng(0)
+    n_samples = n_days * 288
+    glucose_only = pd.DataFrame(rng.normal(110, 20, (n_users, n_samples)),
+                                columns=[f"t_{i}" for i in range(n_samples)])
+    enhanced = pd.DataFrame({
+        "hr_mean": rng.uniform(60, 100, n_users),
+        "hr_std": rng.uniform(5, 15, n_users),
+        "steps_mean": rng.uniform(10, 100, n_users),
+        "steps_std": rng.uniform(5, 30, n_users),
+    })
+    return enhanced, glucose_only
+
+
+def _scale_cases(n_users: int, n_days: int, path: str,
+                 repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run every case on one fixture"""
+    results = {}
+    last_date = (pd.Timestamp(START_DATE) + pd.Timedelta(days=n_days)
+                 - pd.Timedelta(minutes=5)).isoformat()
+
+    def cold_load():
+        dataset_cache.invalidate(path)
+        return data_loader.get_dataset(False)
+    results["dataset.load"] = _run_case(cold_load, COLD_REPEAT)
+
+    user_ids = list(range(min(n_users, SAMPLED_USERS)))
+    next_user = _cycle(user_ids)
+    frames = [data_loader.load_certain_data(user_id, "glucose", "heart_rate", "steps",
+                                            real_data=False) for user_id in user_ids]
+    next_frame = _cycle(frames)
+    results["load_certain_data"] = _run_case(
+        lambda: data_loader.load_certain_data(next_user(), "glucose", "heart_rate", "steps",
+                                              real_data=False), repeat)
+    results[f"last_x.{PLOT_TIME_MOD}"] = _run_case(
+        lambda: last_x(next_frame(), PLOT_TIME_MOD, last_date), repeat)
+    for time_mod in STATS_TIME_MODS:
+        results[f"precise_day_last_x.{time_mod}"] = _run_case(
+            lambda: precise_day_last_x(next_frame(), time_mod, last_date), repeat)
+        results[f"update_stats.{time_mod}"] = _run_case(
+            lambda: update_stats(next_frame(), time_mod, last_date), repeat)
+
+        def indexed_stats():
+            user_id = next_user()
+            index = data_loader.get_user_rolling(user_id, False)
+            timestamps_ns = data_loader.get_user_columns(user_id, False)["time"].view("i8")
+            start, end = window_bounds(timestamps_ns, time_mod, last_date)
+            return window_stats(index, start, end, time_mod)
+        results[f"window_stats.{time_mod}"] = _run_case(indexed_stats, repeat)
+
+    enhanced, glucose_only = _profiles(n_users, n_days)
+    results["generate_time_series"] = _run_case(
+        lambda: generate_time_series(enhanced, glucose_only, seed=0), max(1, repeat // 10))
+    return results
+
+
+def _user_store_cases(repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run the user-store cases against a temporary SQLite database"""
+    results = {}
+    previous_buffer = get_last_viewed_buffer()
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = SqliteUserRepository(os.path.join(tmp, "users.db"))
+        set_user_repository(repository)
+        set_last_viewed_buffer(LastViewedBuffer())
+        try:
+            counter = itertools.count()
+            results["register_user"] = _run_case(lambda: register_user(UserRegister(
+                username=f"bench-{next(counter)}", password="bench", use_real_data=False,
+                synthetic_user_id=0)), repeat)
+
+            timestamps = iter(pd.date_range(START_DATE, periods=4 * repeat + 8, freq="5min")
+                              .strftime("%Y-%m-%dT%H:%M:%S"))
+            results["update_last_viewed"] = _run_case(
+                lambda: update_last_viewed("bench-0", next(timestamps)), repeat)
+            results["repository.update_last_viewed"] = _run_case(
+                lambda: repository.update_last_viewed("bench-1", next(timestamps)), repeat)
+        finally:
+            set_last_viewed_buffer(previous_buffer)
+            set_user_repository(None)
+    return results
+
+
+def run(scales: List[str], repeat: int) -> dict:
+    """Run the suite
+    Args:
+        scales (List[str]): Fixture scales such as ``200x7``
+        repeat (int): Timed calls per case
+    Returns:
+        dict: Environment and results per scale
+    """
+    results = {}
+    for scale in scales:
+        n_users, n_days = parse_scale(scale)
+        path = fixture_path(n_users, n_days)
+        with synthetic_dataset(path):
+            results[scale] = {"users": n_users, "days": n_days,
+                              "cases": _scale_cases(n_users, n_days, path, repeat)}
+        dataset_cache.invalidate(path)
+    results["user_store"] = {"cases": _user_store_cases(repeat)}
+    return {"environment": environment(), "repeat": repeat, "results": results}
+
+
+def _rows(payload: dict) -> List[Dict[str, object]]:
+    """Flatten results to table rows"""
+    return [{"scale": scale, "case": case, **metrics}
+            for scale, result in payload["results"].items()
+            for case, metrics in result["cases"].items()]
+
+
+def compare(before: dict, after: dict) -> List[Dict[str, object]]:
+    """Compare two result files case by case
+    Returns:
+        List[Dict[str, object]]: Rows with the ratio after / before of every
+            compared metric; below 1 is an improvement
+    """
+    after_rows = {(row["scale"], row["case"]): row for row in _rows(after)}
+    rows = []
+    for row in _rows(before):
+        other = after_rows.get((row["scale"], row["case"]))
+        if other is None:
+            continue
+        rows.append({"scale": row["scale"], "case": row["case"], **{
+            f"{metric}_ratio": other[metric] / row[metric] if row[metric] else float("nan")
+            for metric in COMPARED_METRICS
+        }})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the suite or compare two result files"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES),
+                        help="comma-separated users x days, e.g. 50x1,200x7")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            after = json.load(f)
+        print_table(compare(before, after))
+        return
+
+    payload = run(args.scales.split(","), args.repeat)
+    print_table(_rows(payload))
+    if args.output:
+        write_json(payload, args.output)
+
+
+if __name__ == "__main__":
+    main()
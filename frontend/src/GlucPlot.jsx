@@ -1,37 +1,7 @@
-import React, { useEffect, useState } from "react";
+import React from "react";
 import Plot from "react-plotly.js";
-import axios from "axios";
-
-// Helper: how many hours/minutes for each timeMod
-const TIME_MOD_HOURS = {
-  "30min": 0.5,
-  "1h": 1,
-  "3h": 3
-};
-
-function GlucosePlot({ userId, timeMod = "1h", updateInterval = 2000, currentDate, isSynthetic }) {
-  const [data, setData] = useState([]);
-
-  // Fetch data when currentDate changes
-  useEffect(() => {
-    if (!userId) return;
-
-    const fetchData = () => {
-      const url = `http://localhost:8000/api/glucose/${userId}?time_mod=${timeMod}&real_data=${!isSynthetic}${currentDate ? `&last_date=${currentDate}` : ''}`;
-      console.log("\n=== Debug: GlucPlot fetchData ===");
-      console.log("Fetching from URL:", url);
-      axios.get(url)
-        .then(res => {
-          console.log("Received data:", res.data);
-          console.log("Number of records:", res.data.length);
-          setData(res.data);
-        })
-        .catch(err => console.error("Error fetching glucose data:", err));
-    };
-
-    fetchData();
-  }, [userId, timeMod, currentDate, isSynthetic]);
 
+function GlucosePlot({ data = [] }) {
   const x = data.map(d => d.timestamps);
   const y = data.map(d => d.glucose);
   console.log("\n=== Debug: GlucPlot data processing ===");
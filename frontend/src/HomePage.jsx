@@ -18,7 +18,6 @@ function HomePage() {
     const [statsTimeMod, setStatsTimeMod] = useState('1d');
     const [speedIndex, setSpeedIndex] = useState(0);
     const [currentDate, setCurrentDate] = useState(null);
-    const updateIntervalRef = useRef(null);
 
     // Get the correct user ID based on data type
     const activeUserId = isSynthetic ? syntheticUserId : realUserId;
@@ -36,41 +35,31 @@ function HomePage() {
       { label: '90 days', value: '90d' }
     ];
 
-    // Add new useEffect for initial date fetch
+    // Playback start: the user's last viewed timestamp or the first sample
+    const [startDate, setStartDate] = useState(null);
+
     useEffect(() => {
+        const fetchFirstTimestamp = async () => {
+            const response = await axios.get(`http://localhost:8000/api/glucose/${activeUserId}?time_mod=30min&real_data=${!isSynthetic}`);
+            if (response.data && response.data.length > 0) {
+                console.log("Using first timestamp from data:", response.data[0].timestamps);
+                setStartDate(response.data[0].timestamps);
+            }
+        };
+
         const fetchInitialDate = async () => {
             try {
-                console.log("\n=== Debug: fetchInitialDate ===");
-                console.log(`Username: ${username}`);
-                console.log(`Active User ID: ${activeUserId}`);
-                console.log(`Is Synthetic: ${isSynthetic}`);
-                
-                // First try to get the user's last viewed timestamp
                 const lastViewedResponse = await axios.get(`http://localhost:8000/api/last_viewed/${username}`);
-                console.log("Last viewed response:", lastViewedResponse.data);
-                
                 if (lastViewedResponse.data && lastViewedResponse.data.last_viewed_timestamp) {
                     console.log("Using last viewed timestamp:", lastViewedResponse.data.last_viewed_timestamp);
-                    setCurrentDate(lastViewedResponse.data.last_viewed_timestamp);
+                    setStartDate(lastViewedResponse.data.last_viewed_timestamp);
                 } else {
-                    console.log("No last viewed timestamp, fetching initial data");
-                    // If no last viewed timestamp, start from the beginning
-                    const response = await axios.get(`http://localhost:8000/api/glucose/${activeUserId}?time_mod=${plotTimeMod}&real_data=${!isSynthetic}`);
-                    if (response.data && response.data.length > 0) {
-                        console.log("Using first timestamp from data:", response.data[0].timestamps);
-                        setCurrentDate(response.data[0].timestamps);
-                    }
+                    await fetchFirstTimestamp();
                 }
             } catch (error) {
                 console.error('Error fetching initial date:', error);
-                // If error getting last viewed, start from the beginning
                 try {
-                    console.log("Error occurred, trying to fetch initial glucose data");
-                    const response = await axios.get(`http://localhost:8000/api/glucose/${activeUserId}?time_mod=${plotTimeMod}&real_data=${!isSynthetic}`);
-                    if (response.data && response.data.length > 0) {
-                        console.log("Using first timestamp from fallback data:", response.data[0].timestamps);
-                        setCurrentDate(response.data[0].timestamps);
-                    }
+                    await fetchFirstTimestamp();
                 } catch (innerError) {
                     console.error('Error fetching initial glucose data:', innerError);
                 }
@@ -80,70 +69,80 @@ function HomePage() {
         if (activeUserId && username) {
             fetchInitialDate();
         }
-    }, [activeUserId, username, plotTimeMod, isSynthetic]);
+    }, [activeUserId, username, isSynthetic]);
 
-    // Update timestamp whenever currentDate changes
-    useEffect(() => {
-        const updateLastViewed = async () => {
-            try {
-                if (currentDate) {  // Only update if we have a date
-                    console.log("\n=== Debug: updateLastViewed ===");
-                    console.log(`Updating last viewed timestamp for ${username}:`, currentDate);
-                    await axios.post('http://localhost:8000/update_last_viewed', {
-                        username: username,
-                        last_viewed_timestamp: currentDate
-                    });
-                }
-            } catch (error) {
-                console.error('Error updating last viewed timestamp:', error);
-            }
-        };
+    // Plot data and stats pushed by the server
+    const [tick, setTick] = useState({ glucose: [], stats: [] });
+    const socketRef = useRef(null);
+    const settingsRef = useRef({ plotTimeMod, statsTimeMod, speedIndex });
+    settingsRef.current = { plotTimeMod, statsTimeMod, speedIndex };
 
-        if (username && currentDate) {
-            updateLastViewed();
+    const sendControl = (control) => {
+        const socket = socketRef.current;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(control));
         }
-    }, [currentDate, username]);
+    };
 
-    // Update current date based on speed
+    // Subscribe once; the server advances the playback, pushes every new
+    // sample with refreshed stats and records the last viewed timestamp.
     useEffect(() => {
-        if (!currentDate) return;  // Don't start interval until we have initial date
+        if (!activeUserId || !startDate) return;
 
-        if (updateIntervalRef.current) {
-            clearInterval(updateIntervalRef.current);
-        }
+        const socket = new WebSocket('ws://localhost:8000/ws/playback');
+        socketRef.current = socket;
 
-        updateIntervalRef.current = setInterval(async () => {
-            try {
-                console.log("\n=== Debug: Interval Update ===");
-                console.log("Current timestamp:", currentDate);
-                
-                // Get the next record's date
-                const url = `http://localhost:8000/api/glucose/${activeUserId}?time_mod=${plotTimeMod}&real_data=${!isSynthetic}${currentDate ? `&last_date=${currentDate}` : ''}`;
-                console.log("Fetching URL:", url);
-                
-                const response = await axios.get(url);
-                if (response.data && response.data.length > 0) {
-                    // Get the last record in the response
-                    const nextRecord = response.data[response.data.length - 1];
-                    if (nextRecord && nextRecord.timestamps !== currentDate) {
-                        console.log("Found next timestamp:", nextRecord.timestamps);
-                        setCurrentDate(nextRecord.timestamps);
-                    } else {
-                        console.log("No new timestamp found, reached end of data");
-                        clearInterval(updateIntervalRef.current);
-                    }
-                }
-            } catch (error) {
-                console.error('Error fetching next date:', error);
+        socket.onopen = () => {
+            const settings = settingsRef.current;
+            socket.send(JSON.stringify({
+                user_id: Number(activeUserId),
+                real_data: !isSynthetic,
+                plot_time_mod: settings.plotTimeMod,
+                stats_time_mod: settings.statsTimeMod,
+                start: startDate,
+                interval: SPEED_OPTIONS[settings.speedIndex].interval / 1000,
+                username: username
+            }));
+        };
+
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'snapshot') {
+                setTick({ glucose: message.glucose, stats: message.stats });
+                setCurrentDate(message.date);
+            } else if (message.type === 'tick') {
+                setTick(prev => ({
+                    glucose: prev.glucose
+                        .filter(d => d.timestamps >= message.window_start)
+                        .concat(message.glucose),
+                    stats: message.stats
+                }));
+                setCurrentDate(message.date);
+            } else if (message.type === 'end') {
+                console.log("Reached end of data");
+            } else if (message.type === 'error') {
+                console.error('Playback error:', message.detail);
+                setTick(prev => ({ ...prev, stats: ["Error loading stats"] }));
             }
-        }, SPEED_OPTIONS[speedIndex].interval);
+        };
+
+        socket.onerror = (error) => {
+            console.error('Playback stream error:', error);
+        };
 
         return () => {
-            if (updateIntervalRef.current) {
-                clearInterval(updateIntervalRef.current);
-            }
+            socketRef.current = null;
+            socket.close();
         };
-    }, [speedIndex, activeUserId, plotTimeMod, currentDate, isSynthetic]);
+    }, [activeUserId, startDate, isSynthetic, username]);
+
+    useEffect(() => {
+        sendControl({ interval: SPEED_OPTIONS[speedIndex].interval / 1000 });
+    }, [speedIndex]);
+
+    useEffect(() => {
+        sendControl({ plot_time_mod: plotTimeMod, stats_time_mod: statsTimeMod });
+    }, [plotTimeMod, statsTimeMod]);
 
     const handleSpeedChange = () => {
         setSpeedIndex((prevIndex) => (prevIndex + 1) % SPEED_OPTIONS.length);
@@ -181,13 +180,7 @@ function HomePage() {
             }}>
                 <div style={{ display: 'flex', flexDirection: 'column', alignItems: 'flex-start' }}>
                     <h2 style={{ marginBottom: 30}}>CGM Simulator</h2>
-                    <StatsCircles 
-                        userId={activeUserId} 
-                        timeMod={statsTimeMod} 
-                        updateInterval={SPEED_OPTIONS[speedIndex].interval}
-                        currentDate={currentDate}
-                        isSynthetic={isSynthetic}
-                    />
+                    <StatsCircles stats={tick.stats} />
                 </div>
                 <div style={{ display: 'flex', gap: '20px', alignItems: 'center' }}>
                     <div>
@@ -236,13 +229,7 @@ function HomePage() {
                 position: 'relative',
                 marginBottom: 20
             }}>
-                <GlucosePlot 
-                    userId={activeUserId} 
-                    timeMod={plotTimeMod} 
-                    updateInterval={SPEED_OPTIONS[speedIndex].interval}
-                    currentDate={currentDate}
-                    isSynthetic={isSynthetic}
-                />
+                <GlucosePlot data={tick.glucose} />
             </div>
             <div style={{ 
                 display: 'flex', 
@@ -251,13 +238,7 @@ function HomePage() {
                 gap: 40,
                 marginBottom: 20
             }}>
-                <StatsRow2 
-                    userId={activeUserId} 
-                    timeMod={statsTimeMod} 
-                    updateInterval={SPEED_OPTIONS[speedIndex].interval}
-                    currentDate={currentDate}
-                    isSynthetic={isSynthetic}
-                />
+                <StatsRow2 stats={tick.stats} />
                 <div style={{ fontSize: 16 }}>
                     <label style={{ marginRight: 8 }}>Stats interval:</label>
                     <select
@@ -275,30 +256,7 @@ function HomePage() {
     );
 }
 
-function StatsCircles({ userId, timeMod, updateInterval, currentDate, isSynthetic }) {
-    const [stats, setStats] = useState([]);
-
-    useEffect(() => {
-        if (!userId) return;
-
-        const fetchStats = () => {
-            const url = `http://localhost:8000/api/stats/${userId}?time_mod=${timeMod}&real_data=${!isSynthetic}${currentDate ? `&last_date=${currentDate}` : ''}`;
-            console.log("\n=== Debug: StatsCircles fetchStats ===");
-            console.log("Fetching from URL:", url);
-            axios.get(url)
-                .then(res => {
-                    console.log("Received stats:", res.data);
-                    setStats(res.data.stats);
-                })
-                .catch(err => {
-                    console.error("Error fetching stats:", err);
-                    setStats(["Error loading stats"]);
-                });
-        };
-
-        fetchStats();
-    }, [userId, timeMod, currentDate, isSynthetic]);
-
+function StatsCircles({ stats }) {
     const row1 = [
         { value: stats[0]?.split(':')[1]?.trim(), label: 'Current Glucose', color: '#1976d2' },
         { value: stats[3]?.split(':')[1]?.trim(), label: 'Current Heart Rate', color: '#d32f2f' }
@@ -356,30 +314,7 @@ function StatCircle({ value, label, color }) {
   );
 }
 
-function StatsRow2({ userId, timeMod, updateInterval, currentDate, isSynthetic }) {
-    const [stats, setStats] = useState([]);
-
-    useEffect(() => {
-        if (!userId) return;
-
-        const fetchStats = () => {
-            const url = `http://localhost:8000/api/stats/${userId}?time_mod=${timeMod}&real_data=${!isSynthetic}${currentDate ? `&last_date=${currentDate}` : ''}`;
-            console.log("\n=== Debug: StatsRow2 fetchStats ===");
-            console.log("Fetching from URL:", url);
-            axios.get(url)
-                .then(res => {
-                    console.log("Received stats:", res.data);
-                    setStats(res.data.stats);
-                })
-                .catch(err => {
-                    console.error("Error fetching stats:", err);
-                    setStats(["Error loading stats"]);
-                });
-        };
-
-        fetchStats();
-    }, [userId, timeMod, currentDate, isSynthetic]);
-
+function StatsRow2({ stats }) {
     const row2 = [stats[1], stats[2], stats[4]];
 
     return (
@@ -2,4 +2,20 @@ import sys
 import os
 
 # Add the project root directory to the Python path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.last_viewed import LastViewedBuffer, set_last_viewed_buffer
+from app.services.user_store import SqliteUserRepository, set_user_repository
+
+
+@pytest.fixture
+def client(tmp_path):
+    """API client with an isolated user store"""
+    set_user_repository(SqliteUserRepository(str(tmp_path / "users.db")))
+    set_last_viewed_buffer(LastViewedBuffer())
+    yield TestClient(app)
+    set_last_viewed_buffer(LastViewedBuffer())
+    set_user_repository(None)
@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.artifacts import artifact_dir, artifact_key, load_or_fit_models
+from app.utils.clustering import extract_glucose_features
+
+
+@pytest.fixture
+def real_csv(tmp_path):
+    """Small real-like dataset with 30 users"""
+    rng = np.random.default_rng(0)
+    n_users, n_samples = 30, 48
+    df = pd.DataFrame({
+        "user_id": np.repeat(np.arange(n_users), n_samples),
+        "time": np.tile(pd.date_range("2025-06-01", periods=n_samples, freq="5min"), n_users),
+        "glucose": rng.normal(np.repeat(rng.uniform(90, 160, n_users), n_samples), 15),
+        "heart_rate": rng.normal(np.repeat(rng.uniform(60, 90, n_users), n_samples), 8),
+        "steps": rng.poisson(np.repeat(rng.uniform(5, 60, n_users), n_samples)),
+    })
+    path = tmp_path / "db.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_models_are_fitted_once_and_loaded(real_csv, tmp_path):
+    """The second run loads the saved artifact instead of refitting"""
+    artifacts = str(tmp_path / "artifacts")
+    first_timings, second_timings = {}, {}
+    first = load_or_fit_models(real_csv, n_samples=20, seed=1, artifacts_dir=artifacts,
+                               timings=first_timings)
+    second = load_or_fit_models(real_csv, n_samples=20, seed=1, artifacts_dir=artifacts,
+                                timings=second_timings)
+
+    assert "random_forests" in first_timings and "save_models" in first_timings
+    assert "load_models" in second_timings and "random_forests" not in second_timings
+    path = artifact_dir(artifact_key(real_csv, 20, 1), artifacts)
+    assert sorted(os.listdir(path)) == ["meta.json", "models.joblib"]
+
+    features = extract_glucose_features(pd.read_csv(real_csv))
+    np.testing.assert_array_equal(first.real_model.predict(features),
+                                  second.real_model.predict(features))
+    assert second.kmeans.n_clusters == 5
+
+
+def test_artifact_key_tracks_data_and_parameters(real_csv, tmp_path):
+    """Changing the data or the parameters selects another artifact"""
+    key = artifact_key(real_csv, 20, 1)
+    assert artifact_key(real_csv, 20, 2) != key
+    assert artifact_key(real_csv, 30, 1) != key
+
+    with open(real_csv, "a", encoding="utf-8") as f:
+        f.write("29,2025-06-01 04:00:00,120.0,70.0,10\n")
+    assert artifact_key(real_csv, 20, 1) != key
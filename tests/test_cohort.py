@@ -0,0 +1,74 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.columnar import load_columnar
+from app.utils.cohort import (generate_cohort, generate_shard, iter_shard, load_profile_pool,
+                              plan_shards)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """Profiles of the bundled synthetic dataset"""
+    return load_profile_pool()
+
+
+def test_plan_shards_covers_all_users():
+    """Shards are contiguous, non-empty and have distinct seeds"""
+    specs = plan_shards(10, 3, seed=0)
+
+    assert [(s.first_user_id, s.n_users) for s in specs] == [(0, 3), (3, 3), (6, 4)]
+    assert len({tuple(s.seed.generate_state(2)) for s in specs}) == 3
+    assert len(plan_shards(2, 8, seed=0)) == 2
+
+
+def test_generate_shard_layout(pool):
+    """Every user gets n_days of 5-minute samples within the clipping ranges"""
+    df = generate_shard(pool, first_user_id=10, n_users=3, n_days=2, seed=5)
+
+    assert len(df) == 3 * 2 * 288
+    assert df["user_id"].unique().tolist() == [10, 11, 12]
+    user = df[df["user_id"] == 11]
+    assert user["time"].iloc[0] == pd.Timestamp("2025-06-01")
+    assert user["time"].iloc[-1] == pd.Timestamp("2025-06-02 23:55:00")
+    assert df["glucose"].between(40, 400).all()
+    assert df["heart_rate"].between(40, 200).all()
+    assert df["steps"].between(0, 500).all()
+
+
+def test_generate_cohort_is_reproducible_across_workers(tmp_path, pool):
+    """The output depends on the seed and shard count, not on the workers"""
+    first = generate_cohort(7, 1, seed=3, out_dir=str(tmp_path / "a"), n_shards=3, workers=1)
+    second = generate_cohort(7, 1, seed=3, out_dir=str(tmp_path / "b"), n_shards=3, workers=2)
+
+    assert first == second
+    assert first["rows"] == 7 * 288
+    assert json.loads((tmp_path / "a" / "manifest.json").read_text()) == first
+    for shard in first["shards"]:
+        a = load_columnar(str(tmp_path / "a" / shard["file"]))
+        b = load_columnar(str(tmp_path / "b" / shard["file"]))
+        assert sorted(a.offsets) == list(range(shard["first_user_id"],
+                                               shard["first_user_id"] + shard["users"]))
+        for name in ("time", "glucose", "heart_rate", "steps"):
+            np.testing.assert_array_equal(a.columns[name], b.columns[name])
+
+
+def test_generate_cohort_csv(tmp_path):
+    """The CSV format writes one readable file per shard"""
+    manifest = generate_cohort(4, 1, seed=0, out_dir=str(tmp_path), n_shards=2, workers=1,
+                               fmt="csv")
+
+    frames = [pd.read_csv(tmp_path / shard["file"]) for shard in manifest["shards"]]
+    assert [len(frame) for frame in frames] == [2 * 288, 2 * 288]
+    assert list(frames[0].columns) == ["user_id", "time", "glucose", "heart_rate", "steps"]
+    with pytest.raises(ValueError):
+        generate_cohort(4, 1, seed=0, out_dir=str(tmp_path), fmt="parquet")
+
+
+def test_iter_shard_chunks(pool):
+    """Chunks cover the consecutive users of the shard"""
+    chunks = list(iter_shard(pool, first_user_id=0, n_users=5, n_days=1, seed=2, chunk_users=2))
+    whole = generate_shard(pool, first_user_id=0, n_users=5, n_days=1, seed=2)
+
+    assert [len(chunk) // 288 for chunk in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import data_loader
+from app.services.columnar import ColumnarWriter, convert_csv, load_columnar
+from app.services.dataset_cache import DatasetCache
+from app.services.synthetic_source import SYNTHETIC_USERS
+
+
+@pytest.fixture
+def synthetic_csv(tmp_path, monkeypatch):
+    """Small unsorted synthetic dataset wired into the data loader"""
+    times = pd.date_range("2025-06-01", periods=6, freq="5min")
+    frame = pd.DataFrame({
+        "user_id": [1, 0, 1, 0, 1, 0],
+        "time": [str(t) for t in times[::-1]],
+        "glucose": [110.0, 100.0, 111.0, 101.0, 112.0, 102.0],
+        "heart_rate": [70.0, 60.0, 71.0, 61.0, 72.0, 62.0],
+        "steps": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    })
+    path = tmp_path / "synthetic.csv"
+    frame.to_csv(path, index=False)
+    cache = DatasetCache()
+    monkeypatch.setattr(data_loader, "SYNTHETIC_DATA_PATH", str(path))
+    monkeypatch.setattr(data_loader, "dataset_cache", cache)
+    return path, cache
+
+
+def test_load_certain_data_is_sorted_and_typed(synthetic_csv):
+    """Returned data is sorted by time and has a datetime column"""
+    data = data_loader.load_certain_data(0, "glucose", real_data=False)
+
+    assert list(data.columns) == ["timestamps", "glucose"]
+    assert pd.api.types.is_datetime64_any_dtype(data["timestamps"])
+    assert data["timestamps"].is_monotonic_increasing
+    assert data["glucose"].tolist() == [102.0, 101.0, 100.0]
+
+
+def test_load_certain_data_is_zero_copy(synthetic_csv):
+    """Repeated loads share the cached arrays and count as hits"""
+    _, cache = synthetic_csv
+    first = data_loader.load_certain_data(1, "glucose", real_data=False)
+    second = data_loader.load_certain_data(1, "glucose", real_data=False)
+
+    assert np.shares_memory(first["glucose"].to_numpy(), second["glucose"].to_numpy())
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["nbytes"] > 0
+
+
+def test_cache_reloads_when_file_changes(synthetic_csv):
+    """A newer file modification time invalidates the cached dataset"""
+    path, cache = synthetic_csv
+    data_loader.load_certain_data(0, "glucose", real_data=False)
+
+    frame = pd.read_csv(path)
+    frame["glucose"] += 1
+    frame.to_csv(path, index=False)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    data = data_loader.load_certain_data(0, "glucose", real_data=False)
+    assert data["glucose"].tolist() == [103.0, 102.0, 101.0]
+    assert cache.stats()["reloads"] == 1
+
+
+def test_out_of_range_user_raises(synthetic_csv):
+    """User IDs outside the synthetic ID space are reported"""
+    with pytest.raises(ValueError, match="out of range"):
+        data_loader.load_certain_data(-1, "glucose", real_data=False)
+    with pytest.raises(ValueError, match="out of range"):
+        data_loader.load_certain_data(SYNTHETIC_USERS, "glucose", real_data=False)
+
+
+def test_columnar_copy_is_preferred(synthetic_csv):
+    """The memory-mapped columnar copy is used when present and matches the CSV"""
+    path, cache = synthetic_csv
+    expected = data_loader.load_certain_data(1, "glucose", "steps", real_data=False)
+
+    convert_csv(str(path))
+    data = data_loader.load_certain_data(1, "glucose", "steps", real_data=False)
+
+    dataset = cache.get(str(path))
+    assert dataset.path.endswith(".cols")
+    assert isinstance(dataset.columns["glucose"], np.memmap)
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_columnar_rewrite_keeps_mapped_copy(tmp_path):
+    """Rewriting a columnar copy swaps in a complete directory; open maps keep the old rows"""
+    path = str(tmp_path / "data.cols")
+    columns = {"user_id": np.zeros(3, dtype=np.int64),
+               "time": pd.date_range("2025-06-01", periods=3, freq="5min").values,
+               "glucose": np.array([100.0, 110.0, 120.0])}
+    with ColumnarWriter(path) as writer:
+        writer.append(columns)
+    old = load_columnar(path)
+
+    with ColumnarWriter(path) as writer:
+        writer.append({**columns, "glucose": columns["glucose"] + 1})
+    with pytest.raises(RuntimeError):
+        with ColumnarWriter(path) as writer:
+            writer.append(columns)
+            raise RuntimeError("interrupted")
+
+    assert old.columns["glucose"].tolist() == [100.0, 110.0, 120.0]
+    assert load_columnar(path).columns["glucose"].tolist() == [101.0, 111.0, 121.0]
+    assert sorted(os.listdir(tmp_path)) == ["data.cols"]
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.dataset import build_dataset
+from app.services.pyramid_cache import PyramidCache
+from app.utils.downsample import DownsamplePyramid, downsample_indices, lttb_indices, minmax_indices
+from app.utils.serialization import COLUMNAR_JSON
+
+LAST_DATE = "2025-06-01T23:55:00"
+
+
+def _series(n: int, seed: int = 0):
+    """Random walk with one spike, sampled every 5 minutes"""
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.int64) * 300_000_000_000
+    y = 120 + np.cumsum(rng.normal(0, 2, n))
+    y[n // 3] = 450.0
+    return x, y
+
+
+def _reference_lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> list:
+    """Straightforward LTTB over the same buckets"""
+    x = (x - x[0]).astype(float)
+    n = len(y)
+    edges = np.linspace(0, n - 2, n_out - 1).astype(np.int64) + 1
+    selected, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            cx, cy = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+
+def test_lttb_matches_reference():
+    """The vectorized buckets select the same points as a plain loop"""
+    x, y = _series(2000)
+    for n_out in (3, 10, 257):
+        assert lttb_indices(x, y, n_out).tolist() == _reference_lttb(x, y, n_out)
+
+
+def test_minmax_keeps_extremes():
+    """Min-max bucketing keeps the global extremes and the size limit"""
+    x, y = _series(5000)
+    rows = minmax_indices(y, 100)
+    assert len(rows) <= 100
+    assert np.all(np.diff(rows) > 0)
+    assert np.argmax(y) in rows and np.argmin(y) in rows
+
+
+def test_short_series_unchanged():
+    """Series not longer than the limit are returned whole"""
+    x, y = _series(50)
+    assert downsample_indices(x, y, 50).tolist() == list(range(50))
+    assert downsample_indices(x, y, 80, "minmax").tolist() == list(range(50))
+
+
+def test_invalid_parameters():
+    """Unknown methods and too small limits are rejected"""
+    x, y = _series(50)
+    with pytest.raises(ValueError):
+        downsample_indices(x, y, 10, "mean")
+    with pytest.raises(ValueError):
+        downsample_indices(x, y, 2)
+
+
+def test_pyramid_select():
+    """Windows are answered from coarse levels and keep spikes and bounds"""
+    x, y = _series(25920)
+    y[100] = np.nan
+    pyramid = DownsamplePyramid(x, y, min_points=64)
+    assert len(pyramid.levels) > 1
+    assert 100 not in pyramid.levels[0]
+
+    for method in ("lttb", "minmax"):
+        rows = pyramid.select(5000, 20000, 500, method)
+        assert 0 < len(rows) <= 500
+        assert rows[0] >= 5000 and rows[-1] < 20000
+        assert np.all(np.diff(rows) > 0)
+        assert 25920 // 3 in rows
+    assert pyramid.select(0, 10, 500).tolist() == list(range(10))
+
+
+def test_pyramid_cache_keys_on_dataset_version():
+    """A reloaded dataset builds a new pyramid; the least recently used is evicted"""
+    frame = pd.DataFrame({
+        "user_id": np.repeat([0, 1], 10),
+        "time": np.tile(pd.date_range("2025-06-01", periods=10, freq="5min"), 2),
+        "glucose": np.arange(20, dtype=float),
+    })
+    cache = PyramidCache(max_entries=1)
+    dataset = build_dataset(frame, "data.csv", 1)
+    first = cache.get(dataset, 0)
+    assert cache.get(dataset, 0) is first
+    assert cache.get(build_dataset(frame, "data.csv", 2), 0) is not first
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 2, 1, 1)
+
+
+def test_glucose_max_points_route():
+    """Downsampled windows are a subset of the raw window in every encoding"""
+    client = TestClient(app)
+    url = f"/api/glucose/3?real_data=false&time_mod=1d&last_date={LAST_DATE}"
+    raw = client.get(url).json()
+    assert len(raw) > 50
+
+    sampled = client.get(url + "&max_points=50").json()
+    assert 3 <= len(sampled) <= 50
+    raw_by_time = {record["timestamps"]: record for record in raw}
+    assert all(raw_by_time[record["timestamps"]] == record for record in sampled)
+    assert sampled[0] == raw[0] and sampled[-1] == raw[-1]
+
+    columnar = client.get(url + "&max_points=50", headers={"Accept": COLUMNAR_JSON})
+    assert columnar.headers["content-type"] == COLUMNAR_JSON
+    minmax = client.get(url + "&max_points=50&downsample=minmax").json()
+    assert len(minmax) <= 50
+    assert client.get(url + f"&max_points={len(raw)}").json() == raw
+    assert client.get("/api/metrics/pyramids").json()["entries"] >= 1
+    for invalid in ("&max_points=2", "&max_points=-5", "&max_points=50&downsample=mean"):
+        assert client.get(url + invalid).status_code == 422
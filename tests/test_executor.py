@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from app.services.executor import SingleFlight, run_compute
+
+
+def test_single_flight_shares_concurrent_calls():
+    """Concurrent callers with the same key share one call"""
+    flight = SingleFlight()
+    started = []
+
+    async def load():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        return "data"
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+        again = await flight.do("key", load)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert results == ["data"] * 5
+    assert again == "data"
+    assert len(started) == 2
+    assert (flight.calls, flight.shared) == (2, 4)
+
+
+def test_single_flight_propagates_errors():
+    """A failing call raises in every waiting caller and is not cached"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("User 999 not found")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.calls == 1
+
+
+def test_run_compute_runs_off_the_event_loop():
+    """Compute work runs on a pool thread"""
+    async def main():
+        return await run_compute(lambda: threading.current_thread().name)
+
+    assert asyncio.run(main()).startswith("compute")
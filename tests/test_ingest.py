@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.columnar import load_columnar
+from app.services.ingest import IngestStore, ReadingBuffer, set_ingest_store
+from app.utils.rolling import build_rolling_index
+from app.utils.serialization import COLUMNAR_JSON, SERIES_BINARY
+from app.utils.stats import window_stats
+from app.utils.timeparser import window_bounds
+
+N_READINGS = 1500
+
+
+@pytest.fixture
+def readings():
+    """Three days of 5-minute readings of one user with missing values"""
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2025-06-01 07:00:00", periods=N_READINGS, freq="5min")
+    glucose = rng.normal(130, 40, N_READINGS)
+    glucose[::29] = np.nan
+    heart_rate = rng.normal(70, 8, N_READINGS)
+    steps = rng.integers(0, 120, N_READINGS).astype(float)
+    return times.values, glucose, heart_rate, steps
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Process-wide ingest store writing to a temporary directory"""
+    ingest_store = IngestStore(str(tmp_path / "ingest"), capacity=600)
+    set_ingest_store(ingest_store)
+    yield ingest_store
+    set_ingest_store(IngestStore(str(tmp_path / "unused")))
+
+
+def test_buffer_stats_match_stored_dataset(readings):
+    """Statistics of a buffer fed in small batches equal those of the same rows stored"""
+    times, glucose, heart_rate, steps = readings
+    buffer = ReadingBuffer(capacity=400)
+    for start in range(0, N_READINGS, 7):
+        rows = slice(start, start + 7)
+        buffer.append(times[rows].view("i8"), glucose[rows], heart_rate[rows], steps[rows])
+        buffer.compacted = buffer.appended
+
+    partition, rolling = buffer.snapshot()
+    np.testing.assert_array_equal(partition["time"], times[-400:])
+    expected = build_rolling_index(times[-400:], glucose[-400:], heart_rate[-400:], steps[-400:])
+    last_date = pd.Timestamp(times[-20]).isoformat()
+    for time_mod in ("1h", "3h", "1d"):
+        start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+        assert window_stats(rolling, start, end, time_mod) \
+            == window_stats(expected, start, end, time_mod)
+    assert buffer.size < 2 * 400
+
+
+def test_ingest_sorts_and_rejects_old_readings(store):
+    """Batches may be unordered; readings not newer than the buffer are rejected"""
+    times = pd.date_range("2025-06-01", periods=6, freq="5min").values.view("i8")
+    result = store.ingest([2, 1, 1, 2, 1], times[[1, 2, 0, 0, 2]], [110, 120, 100, 90, 125],
+                          [60] * 5, [1] * 5)
+    assert result == {"accepted": 4, "rejected": 1, "users": 2}
+    partition, _ = store.snapshot(1)
+    np.testing.assert_array_equal(partition["glucose"], [100, 120])
+
+    result = store.ingest([1, 1], times[[1, 3]], [105, 130], [60, 61], [0, 0])
+    assert result == {"accepted": 1, "rejected": 1, "users": 1}
+    np.testing.assert_array_equal(store.snapshot(1)[0]["glucose"], [100, 120, 130])
+    with pytest.raises(ValueError):
+        store.snapshot(3)
+
+
+def test_compaction_keeps_every_reading(store, readings):
+    """Readings past the capacity are compacted, not dropped"""
+    times, glucose, heart_rate, steps = readings
+    ids = np.full(N_READINGS, 5)
+    store.ingest(ids[:1000], times[:1000].view("i8"), glucose[:1000], heart_rate[:1000],
+                 steps[:1000])
+    assert store.compact() == 1000
+    assert store.compact() == 0
+    store.ingest(ids[1000:], times[1000:].view("i8"), glucose[1000:], heart_rate[1000:],
+                 steps[1000:])
+    store.stop()
+
+    segments = [load_columnar(path) for path in store.segments()]
+    assert len(segments) == 2
+    stored = {name: np.concatenate([segment.partition(5)[name] for segment in segments])
+              for name in ("time", "glucose", "steps")}
+    np.testing.assert_array_equal(stored["time"], times)
+    np.testing.assert_array_equal(stored["glucose"], glucose)
+    np.testing.assert_array_equal(stored["steps"], steps)
+    assert store.metrics()["pending"] == 0
+    assert len(store.snapshot(5)[0]["time"]) == 600
+
+
+def test_live_endpoints_read_ingested_readings(store, readings):
+    """Ingested readings are served by the live glucose and stats endpoints"""
+    times, glucose, heart_rate, steps = readings
+    client = TestClient(app)
+    n = 300
+    response = client.post("/api/ingest", json={
+        "user_id": [9] * n,
+        "time": [pd.Timestamp(t).isoformat() for t in times[:n]],
+        "glucose": [None if np.isnan(g) else float(g) for g in glucose[:n]],
+        "heart_rate": heart_rate[:n].tolist(),
+        "steps": steps[:n].tolist(),
+    })
+    assert response.json() == {"accepted": n, "rejected": 0, "users": 1}
+
+    expected = build_rolling_index(times[:n], glucose[:n], heart_rate[:n], steps[:n])
+    start, end = window_bounds(times[:n].view("i8"), "1d", pd.Timestamp(times[n - 1]).isoformat())
+    stats = client.get("/api/stats/9?real_data=false&time_mod=1d&live=true").json()["stats"]
+    assert stats == window_stats(expected, start, end, "1d")
+
+    records = client.get("/api/glucose/9?real_data=false&time_mod=1h&live=true").json()
+    assert len(records) == 12
+    assert records[-1]["timestamps"] == pd.Timestamp(times[n - 1]).isoformat()
+    assert client.get("/api/metrics/ingest").json()["accepted"] == n
+
+    invalid = client.post("/api/ingest", json={"user_id": [1, 2], "time": ["2025-06-01"]})
+    assert invalid.status_code == 422
+
+
+def test_restart_reloads_compacted_readings(tmp_path, readings):
+    """A new store over the same directory serves the stored readings and rejects older ones"""
+    times, glucose, heart_rate, steps = readings
+    path = str(tmp_path / "ingest")
+    first = IngestStore(path, capacity=100)
+    first.ingest(np.repeat([1, 2], 150), np.tile(times[:150].view("i8"), 2),
+                 np.tile(glucose[:150], 2), np.tile(heart_rate[:150], 2), np.tile(steps[:150], 2))
+    first.compact()
+    first.ingest([1], times[150:151].view("i8"), glucose[150:151], heart_rate[150:151],
+                 steps[150:151])
+    first.stop()
+
+    second = IngestStore(path, capacity=100)
+    assert second.recover() == 200
+    partition, _ = second.snapshot(1)
+    np.testing.assert_array_equal(partition["time"], times[51:151])
+    np.testing.assert_array_equal(partition["glucose"], glucose[51:151])
+    assert second.metrics()["pending"] == 0
+
+    result = second.ingest([1, 2, 2], times[[100, 149, 150]].view("i8"), [100, 110, 120],
+                           [60, 61, 62], [0, 0, 0])
+    assert (result["accepted"], result["rejected"]) == (1, 2)
+    assert second.compact() == 1
+
+
+def test_live_endpoints_without_readings(store):
+    """Live reads of a user without ingested readings get 404"""
+    client = TestClient(app)
+    for url in ("/api/stats/77?real_data=false&live=true",
+                "/api/glucose/77?real_data=false&live=true"):
+        response = client.get(url)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "No live readings of user 77"
+
+
+def test_live_binary_series_with_long_gaps(store):
+    """Gaps the binary series cannot hold are answered as columnar JSON"""
+    client = TestClient(app)
+    client.post("/api/ingest", json={"user_id": [5, 5], "time": ["2025-01-01", "2025-06-01"],
+                                     "glucose": [100.0, 120.0]})
+
+    response = client.get("/api/glucose/5?real_data=false&live=true",
+                          headers={"Accept": SERIES_BINARY})
+
+    assert response.headers["content-type"] == COLUMNAR_JSON
+    assert response.json()["glucose"] == [100.0, 120.0]
@@ -0,0 +1,102 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import instrumentation
+from app.services.instrumentation import LatencyHistogram, instrumented, metrics, span
+from app.services.last_viewed import LastViewedBuffer, set_last_viewed_buffer
+from app.services.response_cache import response_cache
+from app.services.user_store import SqliteUserRepository, set_user_repository
+
+GLUCOSE_URL = "/api/glucose/3?real_data=false&time_mod=3h&last_date=2025-06-01T05:00:00"
+
+
+@pytest.fixture
+def client():
+    """API client with instrumentation on and fresh histograms"""
+    instrumentation.set_enabled(True)
+    metrics.reset()
+    response_cache.clear()
+    yield TestClient(app)
+    instrumentation.set_enabled(False)
+    metrics.reset()
+    response_cache.clear()
+
+
+def test_disabled_is_pass_through():
+    """Without instrumentation nothing is recorded and no header is added"""
+    instrumentation.set_enabled(False)
+    metrics.reset()
+    assert span("a") is span("b")
+
+    @instrumented("test.noop")
+    def double(x):
+        return 2 * x
+
+    assert double(3) == 6
+    response = TestClient(app).get(GLUCOSE_URL + "&profile=1")
+    assert "server-timing" not in response.headers
+    assert "x-cgm-profile-id" not in response.headers
+    assert metrics.snapshot() == {"routes": {}, "stages": {}}
+
+
+def test_histogram_percentiles():
+    """Percentiles come from bucket bounds, capped at the maximum"""
+    histogram = LatencyHistogram()
+    for ms in [0.2] * 90 + [20] * 9 + [300]:
+        histogram.observe(ms / 1000)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50_ms"] == 0.25
+    assert snapshot["p99_ms"] == 25
+    assert snapshot["max_ms"] == pytest.approx(300)
+
+
+def test_route_and_stage_histograms(client: TestClient):
+    """Requests are timed per route template and their stages per name"""
+    response = client.get(GLUCOSE_URL)
+    client.get(GLUCOSE_URL.replace("/3?", "/4?"))
+    assert "data_loader-window_frame;dur=" in response.headers["server-timing"]
+    assert "total;dur=" in response.headers["server-timing"]
+
+    snapshot = client.get("/api/metrics").json()
+    assert snapshot["enabled"] is True
+    assert snapshot["routes"]["GET /api/glucose/{user_id}"]["count"] == 2
+    for stage in ("data_loader.window_frame", "timeparser.window_bounds",
+                  "serialization.glucose"):
+        assert snapshot["stages"][stage]["count"] == 2
+
+
+def test_profile_capture(client: TestClient):
+    """A flagged request is sampled and its profile can be fetched by id"""
+    response = client.get("/api/stats/3?real_data=false&time_mod=7d",
+                          headers={"X-CGM-Profile": "1"})
+    profile_id = response.headers["x-cgm-profile-id"]
+
+    profile = client.get(f"/api/metrics/profiles/{profile_id}").json()
+    assert profile["route"] == "GET /api/stats/{user_id}"
+    assert profile["duration_ms"] > 0
+    assert {"stacks", "top_inclusive", "top_self", "stages_ms"} <= profile.keys()
+    assert client.get("/api/metrics").json()["profiles"][-1]["id"] == profile_id
+    assert client.get("/api/metrics/profiles/unknown").status_code == 404
+
+
+def test_sqlite_user_store_stages(client: TestClient, tmp_path):
+    """Registration and last viewed reads and writes of the SQLite store are timed"""
+    set_user_repository(SqliteUserRepository(str(tmp_path / "users.db")))
+    set_last_viewed_buffer(LastViewedBuffer())
+    try:
+        client.post("/register", json={"username": "ann", "password": "secret",
+                                       "use_real_data": False})
+        client.post("/update_last_viewed", json={"username": "ann",
+                                                 "last_viewed_timestamp": "2025-06-01T01:00:00"})
+        client.get("/api/last_viewed/ann")
+        # Replacing the buffer flushes the pending timestamp
+        set_last_viewed_buffer(LastViewedBuffer())
+    finally:
+        set_user_repository(None)
+
+    stages = client.get("/api/metrics").json()["stages"]
+    for stage in ("user_store.sqlite_create", "user_store.sqlite_get",
+                  "user_store.sqlite_update_last_viewed", "timestamps.update_last_viewed",
+                  "timestamps.get_last_viewed"):
+        assert stages[stage]["count"] >= 1
@@ -0,0 +1,75 @@
+import time
+import pytest
+from app.services.last_viewed import LastViewedBuffer
+from app.services.user_store import SqliteUserRepository, set_user_repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """SQLite user store with two users"""
+    repo = SqliteUserRepository(str(tmp_path / "users.db"))
+    for username in ("alice", "bob"):
+        repo.create(username, {"password": "secret", "use_real_data": False,
+                               "synthetic_user_id": 1, "last_viewed_timestamp": None})
+    set_user_repository(repo)
+    yield repo
+    set_user_repository(None)
+
+
+def test_updates_are_coalesced_until_flush(repository):
+    """Only the newest pending timestamp per user reaches the repository"""
+    buffer = LastViewedBuffer(max_dirty=100)
+
+    assert buffer.update("alice", "2025-06-01T00:05:00") is True
+    assert buffer.update("alice", "2025-06-01T00:10:00") is True
+    assert buffer.update("alice", "2025-06-01T00:00:00") is False
+    assert buffer.update("nobody", "2025-06-01T00:00:00") is False
+    assert buffer.get("alice") == "2025-06-01T00:10:00"
+    assert repository.get("alice")["last_viewed_timestamp"] is None
+
+    assert buffer.flush() == 1
+    assert repository.get("alice")["last_viewed_timestamp"] == "2025-06-01T00:10:00"
+    metrics = buffer.metrics()
+    assert metrics["updates"] == 2
+    assert metrics["coalesced"] == 1
+    assert metrics["flushes"] == 1
+    assert metrics["dirty"] == 0
+
+
+def test_flush_after_max_dirty(repository):
+    """Reaching the dirty limit flushes immediately"""
+    buffer = LastViewedBuffer(max_dirty=2)
+    buffer.update("alice", "2025-06-01T00:05:00")
+    assert repository.get("alice")["last_viewed_timestamp"] is None
+
+    buffer.update("bob", "2025-06-01T00:05:00")
+    assert repository.get("alice")["last_viewed_timestamp"] == "2025-06-01T00:05:00"
+    assert repository.get("bob")["last_viewed_timestamp"] == "2025-06-01T00:05:00"
+
+
+def test_stop_flushes_pending(repository):
+    """Stopping the background thread writes pending timestamps"""
+    buffer = LastViewedBuffer(flush_interval=60)
+    buffer.start()
+    buffer.update("bob", "2025-06-02T00:00:00")
+    buffer.stop()
+
+    assert repository.get("bob")["last_viewed_timestamp"] == "2025-06-02T00:00:00"
+
+
+def test_entries_are_reloaded_and_bounded(repository):
+    """Timestamps written by another process are seen after one flush interval, and
+    only ``max_users`` entries are kept"""
+    buffer = LastViewedBuffer(flush_interval=0.05, max_users=1)
+    buffer.update("alice", "2025-06-01T00:05:00")
+    buffer.flush()
+    repository.update_last_viewed("alice", "2025-06-01T00:30:00")
+    assert buffer.get("alice") == "2025-06-01T00:05:00"
+    time.sleep(0.06)
+    assert buffer.get("alice") == "2025-06-01T00:30:00"
+
+    buffer.update("bob", "2025-06-01T00:10:00")
+    assert buffer.metrics()["cached_users"] == 1
+    assert buffer.get("alice") == "2025-06-01T00:30:00"
+    assert buffer.get("bob") == "2025-06-01T00:10:00"
+    assert buffer.metrics()["evictions"] >= 2
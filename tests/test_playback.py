@@ -0,0 +1,114 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.services.data_loader import get_user_columns, get_user_rolling
+from app.services.last_viewed import get_last_viewed_buffer
+from app.services.playback import PlaybackCursor
+
+
+def _cursor(start=None, plot_time_mod="1h", stats_time_mod="1d"):
+    """Cursor over synthetic user 3"""
+    return PlaybackCursor(get_user_columns(3, False), get_user_rolling(3, False),
+                          plot_time_mod, stats_time_mod, start)
+
+
+def test_cursor_steps_match_tick_endpoint(client: TestClient):
+    """Every step carries the window and stats a tick at the same date returns"""
+    cursor = _cursor("2025-06-01T02:00:00", "30min", "3h")
+    window = cursor.snapshot()["glucose"]
+
+    for _ in range(15):
+        message = cursor.advance()
+        window = [r for r in window if r["timestamps"] >= message["window_start"]]
+        window += message["glucose"]
+        tick = client.post("/api/tick", json={
+            "user_id": 3,
+            "real_data": False,
+            "plot_time_mod": "30min",
+            "stats_time_mod": "3h",
+            "last_date": message["date"],
+        }).json()
+        assert window == tick["glucose"]
+        assert message["stats"] == tick["stats"]
+        assert message["window_end"] == tick["glucose_window_end"]
+
+
+def test_cursor_start_and_end():
+    """The cursor starts at the first sample by default and stops at the last one"""
+    cursor = _cursor()
+    assert cursor.date == "2025-06-01T00:00:00"
+    assert [r["timestamps"] for r in cursor.snapshot()["glucose"]] == [
+        "2025-06-01T00:00:00", "2025-06-01T00:05:00"]
+
+    cursor = _cursor("2025-06-01T23:50:00")
+    assert cursor.advance()["date"] == "2025-06-01T23:55:00"
+    assert cursor.finished
+    assert cursor.advance() is None
+
+    with pytest.raises(ValueError):
+        _cursor(plot_time_mod="2h")
+
+
+def test_stream_pushes_ticks_and_applies_controls(client: TestClient):
+    """The stream sends a snapshot, then ticks; window changes resend the snapshot"""
+    with client.websocket_connect("/ws/playback") as ws:
+        ws.send_json({"user_id": 3, "real_data": False, "start": "2025-06-01T01:00:00",
+                      "interval": 0.05})
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["date"] == "2025-06-01T01:00:00"
+        assert len(snapshot["glucose"]) == 12
+
+        ticks = [ws.receive_json() for _ in range(3)]
+        assert [t["type"] for t in ticks] == ["tick"] * 3
+        assert [t["date"] for t in ticks] == [
+            "2025-06-01T01:05:00", "2025-06-01T01:10:00", "2025-06-01T01:15:00"]
+
+        ws.send_json({"paused": True, "plot_time_mod": "3h"})
+        message = ws.receive_json()
+        while message["type"] != "snapshot":
+            message = ws.receive_json()
+        assert len(message["glucose"]) > 12
+
+        ws.send_json({"stats_time_mod": "2h"})
+        assert ws.receive_json()["type"] == "error"
+
+
+def test_stream_builds_snapshots_on_the_compute_pool(client: TestClient, monkeypatch):
+    """Snapshots are built and encoded through run_compute, not on the event loop"""
+    calls = []
+
+    async def run_compute(fn, *args):
+        calls.append(fn.__name__)
+        return fn(*args)
+
+    monkeypatch.setattr("app.services.playback.run_compute", run_compute)
+    with client.websocket_connect("/ws/playback") as ws:
+        ws.send_json({"user_id": 3, "real_data": False, "start": "2025-06-01T12:00:00",
+                      "plot_time_mod": "6h", "interval": 60})
+        snapshot = ws.receive_json()
+    assert calls == ["snapshot_text"]
+    assert snapshot == _cursor("2025-06-01T12:00:00", "6h").snapshot()
+    assert len(snapshot["glucose"]) == 72
+
+
+def test_stream_rejects_bad_subscriptions(client: TestClient):
+    """Unknown users and malformed subscriptions get an error message"""
+    with client.websocket_connect("/ws/playback") as ws:
+        ws.send_json({"user_id": -1, "real_data": False})
+        assert ws.receive_json()["type"] == "error"
+    with client.websocket_connect("/ws/playback") as ws:
+        ws.send_json({"real_data": False})
+        assert ws.receive_json()["type"] == "error"
+
+
+def test_stream_saves_last_viewed_on_close(client: TestClient):
+    """Closing the stream records the playback position"""
+    client.post("/register", json={"username": "viewer", "password": "secret",
+                                   "use_real_data": False})
+    with client.websocket_connect("/ws/playback") as ws:
+        ws.send_json({"user_id": 3, "real_data": False, "start": "2025-06-01T01:00:00",
+                      "interval": 0.05, "username": "viewer"})
+        ws.receive_json()
+        last = [ws.receive_json() for _ in range(2)][-1]
+
+    assert get_last_viewed_buffer().get("viewer") >= last["date"]
@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import routes
+from app.main import app
+from app.services.response_cache import CachedResponse, ResponseCache, etag_matches, response_cache
+from app.utils.serialization import SERIES_BINARY
+
+GLUCOSE_URL = "/api/glucose/3?real_data=false&time_mod=3h&last_date=2025-06-01T05:00:00"
+STATS_URL = "/api/stats/3?real_data=false&time_mod=1d&last_date=2025-06-01T05:00:00"
+
+
+@pytest.fixture
+def client():
+    """API client with an empty response cache"""
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+def test_lru_bounds():
+    """Entries beyond the count or byte limit evict the least recently used ones"""
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("a", CachedResponse(b"1234", "application/json"))
+    cache.put("b", CachedResponse(b"1234", "application/json"))
+    assert cache.get("a") is not None
+    cache.put("c", CachedResponse(b"1234", "application/json"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    cache.put("d", CachedResponse(b"12345678", "application/json"))
+    assert cache.get("a") is None and cache.get("c") is None
+    cache.put("e", CachedResponse(b"x" * 11, "application/json"))
+    assert cache.get("e") is None
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["nbytes"], stats["evictions"]) == (1, 8, 3)
+    assert (stats["hits"], stats["misses"]) == (3, 4)
+
+
+def test_etag_matches():
+    """Lists, weak tags and the wildcard match; other tags do not"""
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+@pytest.mark.parametrize("url", [GLUCOSE_URL, STATS_URL])
+def test_repeated_query_hits_cache(client: TestClient, url: str):
+    """The second identical query is served from the cache with the same ETag"""
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert "max-age" in first.headers["cache-control"]
+
+    stats = client.get("/api/metrics/responses").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_cached_body_matches_uncached(client: TestClient):
+    """Cached responses are byte-identical to freshly computed ones"""
+    cached = client.get(STATS_URL).json()
+    response_cache.clear()
+    assert client.get(STATS_URL).json() == cached
+    assert set(cached) == {"stats"}
+
+
+def test_if_none_match_returns_304(client: TestClient):
+    """A current client copy is answered with an empty 304"""
+    etag = client.get(GLUCOSE_URL).headers["etag"]
+    response = client.get(GLUCOSE_URL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert client.get(GLUCOSE_URL, headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get("/api/metrics/responses").json()["not_modified"] == 1
+
+
+def test_key_includes_media_type_and_version(client: TestClient, monkeypatch):
+    """Other encodings and a reloaded dataset get their own entries and ETags"""
+    json_etag = client.get(GLUCOSE_URL).headers["etag"]
+    binary = client.get(GLUCOSE_URL, headers={"Accept": SERIES_BINARY})
+    assert binary.headers["content-type"] == SERIES_BINARY
+    assert binary.headers["etag"] != json_etag
+
+    monkeypatch.setattr(routes, "dataset_version", lambda real_data: ("reloaded.csv", 1))
+    reloaded = client.get(GLUCOSE_URL, headers={"If-None-Match": json_etag})
+    assert reloaded.status_code == 200
+    assert reloaded.headers["etag"] != json_etag
+    assert client.get("/api/metrics/responses").json()["misses"] == 3
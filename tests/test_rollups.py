@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.rolling import build_rolling_index
+from app.utils.rollups import (
+    ROLLUP_BIN_WIDTH, ambulatory_glucose_profile, build_rollups, hour_of_day_histograms,
+    summarize_window, time_in_ranges
+)
+
+LAST_DATE = "2025-06-01T23:55:00"
+
+
+@pytest.fixture
+def user_rows():
+    """Ten days of 5-minute glucose of one user, with gaps, missing values and a
+    start in the middle of an hour"""
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2025-06-01 00:35:00", periods=10 * 288, freq="5min")
+    times = times.delete(np.arange(400, 460))
+    glucose = rng.gamma(9, 14, len(times)) + 20
+    glucose[::53] = np.nan
+    return times.values, glucose
+
+
+def test_window_summary_matches_raw_samples(user_rows):
+    """Windows merged from daily and hourly buckets and raw edges equal the raw samples"""
+    times, glucose = user_rows
+    rollups = build_rollups(times, glucose)
+    index = build_rolling_index(times, glucose, np.zeros(len(glucose)), np.zeros(len(glucose)))
+    for start, end in [(0, len(glucose)), (7, 2000), (300, 317), (1000, 1000), (5, 6)]:
+        summary = summarize_window(rollups, glucose, start, end)
+        values = glucose[start:end][~np.isnan(glucose[start:end])]
+        assert summary.count == len(values)
+        if len(values) > 1:
+            assert summary.mean == pytest.approx(values.mean())
+            assert summary.std == pytest.approx(values.std(ddof=1))
+            assert (summary.minimum, summary.maximum) == (values.min(), values.max())
+            assert abs(summary.quantile(0.5) - np.median(values)) <= ROLLUP_BIN_WIDTH
+        np.testing.assert_array_equal(summary.range_counts,
+                                      index.glucose_range_counts(start, end))
+
+
+def test_empty_window_has_no_metrics(user_rows):
+    """An empty window has zero readings and no metrics"""
+    times, glucose = user_rows
+    result = time_in_ranges(summarize_window(build_rollups(times, glucose), glucose, 10, 10))
+    assert result["readings"] == 0
+    assert result["mean"] is None and result["median"] is None
+    assert all(value is None for value in result["percent"].values())
+
+
+def test_ambulatory_glucose_profile_matches_percentiles(user_rows):
+    """Hourly percentile bands lie within a bin width of the samples around their rank"""
+    times, glucose = user_rows
+    timestamps_ns = times.view("i8")
+    start, end = 100, len(glucose) - 100
+    histograms = hour_of_day_histograms(build_rollups(times, glucose), timestamps_ns, glucose,
+                                        start, end)
+    profile = ambulatory_glucose_profile(histograms)
+
+    hours = pd.DatetimeIndex(times[start:end]).hour
+    for record in profile:
+        values = np.sort(glucose[start:end][(hours == record["hour"])
+                                            & ~np.isnan(glucose[start:end])])
+        assert record["count"] == len(values)
+        for p in (5, 50, 95):
+            rank = p / 100 * (len(values) - 1)
+            low, high = values[int(np.floor(rank))], values[int(np.ceil(rank))]
+            assert low - ROLLUP_BIN_WIDTH <= record[f"p{p}"] <= high + ROLLUP_BIN_WIDTH
+
+
+def test_analytics_endpoints_match_stats():
+    """Time in ranges agrees with the stats of the same window; AGP covers every hour"""
+    client = TestClient(app)
+    params = f"real_data=false&time_mod=1d&last_date={LAST_DATE}"
+    tir = client.get(f"/api/tir/3?{params}")
+    assert tir.status_code == 200
+    body = tir.json()
+    stats = client.get(f"/api/stats/3?{params}").json()["stats"]
+    assert stats[1] == f"Average: {body['mean']:.1f} mg/dL"
+    assert stats[2] == f"Std Dev: {body['std']:.1f} mg/dL"
+    assert sum(body["percent"].values()) == pytest.approx(100)
+    assert body["window_start"] == "2025-06-01T00:00:00"
+
+    assert client.get(f"/api/tir/3?{params}",
+                      headers={"If-None-Match": tir.headers["etag"]}).status_code == 304
+
+    agp = client.get(f"/api/agp/3?{params}").json()
+    assert [record["hour"] for record in agp["hours"]] == list(range(24))
+    assert sum(record["count"] for record in agp["hours"]) == body["readings"]
+    assert all(record["p5"] <= record["p50"] <= record["p95"] for record in agp["hours"])
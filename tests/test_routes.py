@@ -0,0 +1,110 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.services.user_store import get_user_repository
+
+LAST_DATE = "2025-06-01T05:00:00"
+
+
+def test_tick_matches_separate_endpoints(client: TestClient):
+    """The batched tick returns the same windows as the single endpoints"""
+    glucose = client.get(f"/api/glucose/3?real_data=false&time_mod=1h&last_date={LAST_DATE}").json()
+    stats = client.get(f"/api/stats/3?real_data=false&time_mod=7d&last_date={LAST_DATE}").json()
+
+    tick = client.post("/api/tick", json={
+        "user_id": 3,
+        "real_data": False,
+        "plot_time_mod": "1h",
+        "stats_time_mod": "7d",
+        "last_date": LAST_DATE,
+    }).json()
+
+    assert tick["glucose"] == glucose
+    assert tick["stats"] == stats["stats"]
+    assert tick["last_viewed_updated"] is None
+
+
+def test_tick_records_last_viewed(client: TestClient):
+    """A tick with a username moves the last viewed timestamp forward"""
+    client.post("/register", json={
+        "username": "viewer",
+        "password": "secret",
+        "use_real_data": False,
+        "synthetic_user_id": 3,
+    })
+
+    tick = {"user_id": 3, "real_data": False, "last_date": LAST_DATE, "username": "viewer"}
+    assert client.post("/api/tick", json=tick).json()["last_viewed_updated"] is True
+    assert client.post("/api/tick", json=tick).json()["last_viewed_updated"] is False
+    assert client.get("/api/last_viewed/viewer").json() == {"last_viewed_timestamp": LAST_DATE}
+    assert get_user_repository().get("viewer")["last_viewed_timestamp"] is None
+
+    metrics = client.get("/api/metrics/last_viewed").json()
+    assert metrics["updates"] == 1
+    assert metrics["dirty"] == 1
+
+
+@pytest.mark.parametrize("time_mod", ["30min", "3h", "1d"])
+def test_glucose_delta_reconstructs_window(client: TestClient, time_mod: str):
+    """Previous window plus the delta equals the next full window"""
+    query = f"real_data=false&time_mod={time_mod}"
+    previous = client.get(f"/api/glucose/3?{query}&last_date={LAST_DATE}").json()
+    next_date = previous[-1]["timestamps"]
+    expected = client.get(f"/api/glucose/3?{query}&last_date={next_date}").json()
+
+    delta = client.get(f"/api/glucose/3/delta?{query}&last_date={next_date}&since={next_date}").json()
+    kept = [r for r in previous
+            if delta["window_start"] <= r["timestamps"] <= delta["window_end"]]
+
+    assert len(delta["records"]) == 1
+    assert kept + delta["records"] == expected
+
+
+def test_glucose_delta_without_cursor(client: TestClient):
+    """Without a cursor the delta contains the whole window"""
+    full = client.get(f"/api/glucose/3?real_data=false&last_date={LAST_DATE}").json()
+    delta = client.get(f"/api/glucose/3/delta?real_data=false&last_date={LAST_DATE}").json()
+
+    assert delta["records"] == full
+    assert delta["window_start"] == full[0]["timestamps"]
+    assert delta["window_end"] == full[-1]["timestamps"]
+
+
+def test_bulk_stats_matches_single_user_stats(client: TestClient):
+    """Bulk statistics hold the numbers behind the formatted single-user stats"""
+    bulk = client.post("/api/stats/bulk", json={
+        "user_ids": [3, 7], "real_data": False, "time_mod": "1d", "last_date": LAST_DATE,
+    }).json()
+    assert [user["user_id"] for user in bulk["users"]] == [3, 7]
+    for user in bulk["users"]:
+        stats = client.get(
+            f"/api/stats/{user['user_id']}?real_data=false&time_mod=1d&last_date={LAST_DATE}"
+        ).json()["stats"]
+        assert stats[1] == f"Average: {user['average_glucose']:.1f} mg/dL"
+        assert stats[2] == f"Std Dev: {user['std_glucose']:.1f} mg/dL"
+    assert bulk["cohort"]["n_users"] == 2
+
+    everyone = client.post("/api/stats/bulk", json={"time_mod": "7d"}).json()
+    assert everyone["cohort"]["n_users"] == len(everyone["users"]) > 2
+    assert sum(everyone["cohort"]["time_in_range_histogram"]["counts"]) \
+        == everyone["cohort"]["n_users_with_glucose"]
+
+
+def test_bulk_stats_generated_and_unknown_users(client: TestClient):
+    """Generated synthetic users are served in request order; out-of-range IDs get 404"""
+    bulk = client.post("/api/stats/bulk", json={
+        "user_ids": [5000, 3], "real_data": False, "time_mod": "1d",
+    })
+    assert bulk.status_code == 200
+    users = bulk.json()["users"]
+    assert [user["user_id"] for user in users] == [5000, 3]
+    cached = client.get("/api/metrics/synthetic").json()
+    many = client.post("/api/stats/bulk", json={"user_ids": list(range(5000, 5300))}).json()
+    assert many["cohort"]["n_users"] == 300
+    assert many["users"][0] == users[0]
+    assert client.get("/api/metrics/synthetic").json() == cached
+    single = client.get("/api/stats/5000?real_data=false&time_mod=1d").json()["stats"]
+    assert single[1] == f"Average: {users[0]['average_glucose']:.1f} mg/dL"
+
+    missing = client.post("/api/stats/bulk", json={"user_ids": [3, -1, 10 ** 9]})
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == f"Users not found: [-1, {10 ** 9}]"
@@ -0,0 +1,70 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import serialization
+from app.utils.serialization import (
+    COLUMNAR_JSON, RECORDS_JSON, SERIES_BINARY, decode_series_binary, encode_columnar_json,
+    encode_series_binary, negotiate_media_type
+)
+
+LAST_DATE = "2025-06-01T12:00:00"
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, RECORDS_JSON),
+    ("*/*", RECORDS_JSON),
+    ("application/json", RECORDS_JSON),
+    (COLUMNAR_JSON, COLUMNAR_JSON),
+    (f"{SERIES_BINARY}, {COLUMNAR_JSON};q=0.5", SERIES_BINARY),
+    (f"{SERIES_BINARY};q=0.2, {COLUMNAR_JSON};q=0.5", COLUMNAR_JSON),
+    (f"{SERIES_BINARY};q=0", RECORDS_JSON),
+])
+def test_negotiate_media_type(accept, expected):
+    """Supported media types are picked by quality, then order"""
+    assert negotiate_media_type(accept) == expected
+
+
+def test_series_binary_roundtrip():
+    """Binary series decode back to the original timestamps and values"""
+    timestamps = pd.date_range("2025-06-01", periods=50, freq="5min").to_numpy()
+    values = np.linspace(60, 250, 50)
+
+    decoded_timestamps, decoded_values = decode_series_binary(encode_series_binary(timestamps, values))
+
+    np.testing.assert_array_equal(decoded_timestamps, timestamps.astype("datetime64[ms]"))
+    np.testing.assert_allclose(decoded_values, values, rtol=1e-6)
+
+
+def test_glucose_endpoint_encodings_agree():
+    """Columnar JSON and binary responses carry the same series as the records"""
+    client = TestClient(app)
+    url = f"/api/glucose/3?real_data=false&time_mod=3h&last_date={LAST_DATE}"
+    records = client.get(url).json()
+    expected_times = pd.to_datetime([r["timestamps"] for r in records]).to_numpy()
+    expected_glucose = [r["glucose"] for r in records]
+
+    columnar = client.get(url, headers={"Accept": COLUMNAR_JSON})
+    assert columnar.headers["content-type"] == COLUMNAR_JSON
+    payload = json.loads(columnar.content)
+    np.testing.assert_array_equal(np.array(payload["timestamps"], dtype="datetime64[ms]"),
+                                  expected_times)
+    assert payload["glucose"] == expected_glucose
+
+    binary = client.get(url, headers={"Accept": SERIES_BINARY})
+    timestamps, glucose = decode_series_binary(binary.content)
+    np.testing.assert_array_equal(timestamps, expected_times)
+    np.testing.assert_allclose(glucose, expected_glucose, rtol=1e-6)
+
+
+def test_columnar_json_fallback_writes_null(monkeypatch):
+    """Without orjson missing values are encoded as null, not as a bare NaN"""
+    monkeypatch.setattr(serialization, "orjson", None)
+    timestamps = pd.date_range("2025-06-01", periods=3, freq="5min").to_numpy()
+
+    payload = encode_columnar_json(timestamps, {"glucose": np.array([100.0, np.nan, np.inf])})
+
+    assert json.loads(payload, parse_constant=pytest.fail)["glucose"] == [100.0, None, None]
+
@@ -0,0 +1,199 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.data_loader import get_user_columns
+from app.services.simulation import AlertHub, SimulationEngine, set_simulation_engine
+
+START = "2025-06-01T02:00:00"
+
+
+@pytest.fixture
+def engine():
+    """Process-wide simulation engine with small chunks, so sessions cross chunk boundaries"""
+    simulation_engine = SimulationEngine(chunk=16)
+    set_simulation_engine(simulation_engine)
+    yield simulation_engine
+    set_simulation_engine(SimulationEngine())
+
+
+def _row(user_id: int, date: str) -> int:
+    """Row of a synthetic user's sample at a date"""
+    times = get_user_columns(user_id, False)["time"]
+    return int(np.searchsorted(times, np.datetime64(date)))
+
+
+def test_clocks_follow_speed_and_pause(engine):
+    """Each tick moves a session by its speed in 5-minute samples; paused sessions stay"""
+    sessions = [engine.create(3, start=START)["session_id"],
+                engine.create(4, start=START, speed=2.0)["session_id"],
+                engine.create(5, start=START, paused=True)["session_id"],
+                engine.create(3, start=START, speed=0.5)["session_id"]]
+    first = _row(3, START)
+    for _ in range(40):
+        engine.tick(1.0)
+
+    expected = {sessions[0]: (3, first + 40), sessions[1]: (4, first + 80),
+                sessions[2]: (5, first), sessions[3]: (3, first + 20)}
+    for session_id, (user_id, row) in expected.items():
+        state = engine.state(session_id)
+        columns = get_user_columns(user_id, False)
+        assert state["date"] == pd.Timestamp(columns["time"][row]).isoformat()
+        assert state["glucose"] == columns["glucose"][row]
+        assert state["heart_rate"] == columns["heart_rate"][row]
+
+    engine.update(sessions[2], paused=False, speed=3.0)
+    engine.update(sessions[0], paused=True)
+    engine.tick(1.0)
+    assert engine.state(sessions[2])["date"] == pd.Timestamp(
+        get_user_columns(5, False)["time"][first + 3]).isoformat()
+    assert engine.state(sessions[0])["date"] == pd.Timestamp(
+        get_user_columns(3, False)["time"][first + 40]).isoformat()
+    assert engine.metrics()["refills"] > 0
+
+
+def test_alerts_are_raised_on_level_changes(engine):
+    """One alert per change of the glucose level, none while it stays out of range"""
+    thresholds = {"glucose_low": 100.0, "glucose_high": 140.0, "heart_rate_low": 0.0,
+                  "heart_rate_high": 1000.0}
+    session_id = engine.create(7, thresholds=thresholds)["session_id"]
+    events = []
+    while not engine.state(session_id)["finished"]:
+        events += engine.tick(1.0)
+
+    glucose = get_user_columns(7, False)["glucose"]
+    levels = np.where(glucose > 140, 1, np.where(glucose < 100, -1, 0))
+    expected, previous = [], 0
+    for row in range(1, len(glucose)):
+        if not np.isnan(glucose[row]) and levels[row] != previous:
+            expected.append((("low", "normal", "high")[levels[row] + 1], float(glucose[row])))
+            previous = levels[row]
+    alerts = [event for event in events if event["type"] == "alert"]
+    assert len(expected) > 2
+    assert [(event["level"], event["value"]) for event in alerts] == expected
+    assert all(event["metric"] == "glucose" for event in alerts)
+    assert events[-1]["type"] == "end"
+    assert [event["seq"] for event in events] == list(range(1, len(events) + 1))
+    assert engine.events(after=events[-3]["seq"]) == events[-2:]
+
+
+def test_session_ends_at_last_sample(engine):
+    """A session stops at the last sample of its user and raises one end event"""
+    times = get_user_columns(2, False)["time"]
+    start = pd.Timestamp(times[-3]).isoformat()
+    session_id = engine.create(2, start=start, speed=10.0)["session_id"]
+    events = engine.tick(1.0) + engine.tick(1.0)
+    assert [event["type"] for event in events if event["type"] == "end"] == ["end"]
+    state = engine.state(session_id)
+    assert state["finished"] and state["date"] == pd.Timestamp(times[-1]).isoformat()
+    assert engine.metrics()["finished"] == 1
+
+
+def test_simulation_endpoints(engine):
+    """Sessions are created, changed and removed over HTTP; alerts can be polled"""
+    client = TestClient(app)
+    created = client.post("/api/simulation/sessions", json={
+        "user_id": 3, "real_data": False, "start": START, "glucose_high": 0.0,
+    }).json()
+    session_id = created["session_id"]
+    assert created["thresholds"]["glucose_high"] == 0.0
+    assert created["thresholds"]["glucose_low"] == 70.0
+
+    engine.tick(1.0)
+    alerts = client.get(f"/api/simulation/alerts?session_id={session_id}").json()
+    assert [(alert["metric"], alert["level"]) for alert in alerts] == [("glucose", "high")]
+
+    updated = client.patch(f"/api/simulation/sessions/{session_id}",
+                           json={"paused": True, "speed": 4}).json()
+    assert updated["paused"] and updated["speed"] == 4.0
+    assert client.get(f"/api/simulation/sessions/{session_id}").json() == updated
+    assert len(client.get("/api/simulation/sessions").json()) == 1
+    assert client.get("/api/metrics/simulation").json()["paused"] == 1
+    assert client.delete(f"/api/simulation/sessions/{session_id}").status_code == 200
+    assert client.get(f"/api/simulation/sessions/{session_id}").status_code == 404
+    assert client.patch(f"/api/simulation/sessions/{session_id}", json={}).status_code == 404
+
+
+def test_failed_refill_finishes_only_its_session(engine, monkeypatch):
+    """A session whose next samples cannot be loaded ends with an error event"""
+    healthy = engine.create(3, start=START, speed=16.0)["session_id"]
+    broken = engine.create(4, start=START, speed=16.0)["session_id"]
+
+    def get_columns(user_id: int, real_data: bool):
+        if user_id == 4:
+            raise OSError("dataset unavailable")
+        return get_user_columns(user_id, real_data)
+
+    monkeypatch.setattr("app.services.simulation.get_user_columns", get_columns)
+    events = engine.tick(1.0)
+    errors = [event for event in events if event["type"] == "error"]
+    assert [(event["session_id"], event["detail"]) for event in errors] \
+        == [(broken, "dataset unavailable")]
+    assert engine.state(broken)["finished"]
+    assert not engine.state(healthy)["finished"]
+    engine.tick(1.0)
+    assert engine.metrics()["errors"] == 1
+    assert engine.metrics()["refills"] == 2
+
+
+def test_create_session_errors(engine):
+    """Unknown users get 422 and sessions beyond the limit 429"""
+    client = TestClient(app)
+    assert client.post("/api/simulation/sessions", json={"user_id": -1}).status_code == 422
+    set_simulation_engine(SimulationEngine(max_sessions=1))
+    assert client.post("/api/simulation/sessions", json={"user_id": 3}).status_code == 200
+    limited = client.post("/api/simulation/sessions", json={"user_id": 3})
+    assert limited.status_code == 429
+    assert limited.json()["detail"] == "Too many simulation sessions (limit 1)"
+
+
+def test_non_finite_values_are_rejected(engine):
+    """NaN and infinite speeds and thresholds get 422 and never reach the clocks"""
+    client = TestClient(app)
+    headers = {"content-type": "application/json"}
+    for body in ('{"user_id": 3, "speed": NaN}', '{"user_id": 3, "speed": Infinity}',
+                 '{"user_id": 3, "speed": 0}', '{"user_id": 3, "glucose_low": NaN}'):
+        assert client.post("/api/simulation/sessions", content=body,
+                           headers=headers).status_code == 422
+    session_id = client.post("/api/simulation/sessions", json={"user_id": 3}).json()["session_id"]
+    assert client.patch(f"/api/simulation/sessions/{session_id}", content='{"speed": NaN}',
+                        headers=headers).status_code == 422
+    with pytest.raises(ValueError, match="finite"):
+        engine.create(3, speed=float("nan"))
+    with pytest.raises(ValueError, match="finite"):
+        engine.update(session_id, thresholds={"glucose_high": float("inf")})
+    assert engine.metrics()["sessions"] == 1
+    assert client.get("/api/simulation/alerts?limit=-1").status_code == 422
+
+
+def test_refills_load_without_the_engine_lock(engine, monkeypatch):
+    """Chunks are loaded while other calls can take the engine lock"""
+    session_id = engine.create(3, start=START, speed=16.0)["session_id"]
+    locked = []
+
+    def get_columns(user_id: int, real_data: bool):
+        locked.append(engine._lock.locked())  # pylint: disable=protected-access
+        return get_user_columns(user_id, real_data)
+
+    monkeypatch.setattr("app.services.simulation.get_user_columns", get_columns)
+    engine.tick(1.0)
+    assert locked == [False]
+    assert engine.metrics()["refills"] == 1
+    assert not engine.state(session_id)["finished"]
+
+
+def test_alert_hub_filters_sessions():
+    """Subscribers receive the events of their sessions only"""
+    async def run():
+        hub = AlertHub(max_queue=2)
+        every, one = hub.subscribe(), hub.subscribe(["a"])
+        hub.publish([{"session_id": "a", "seq": 1}, {"session_id": "b", "seq": 2},
+                     {"session_id": "a", "seq": 3}])
+        assert [every.get_nowait()["seq"] for _ in range(every.qsize())] == [1, 2]
+        assert [one.get_nowait()["seq"] for _ in range(one.qsize())] == [1, 3]
+        hub.unsubscribe(every)
+        return hub.stats()
+
+    assert asyncio.run(run()) == {"subscribers": 1, "dropped": 1}
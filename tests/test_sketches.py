@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.clustering import extract_glucose_features
+from app.utils.features import extract_real_features
+from app.utils.model import extract_hr_steps_features
+from app.utils.sketches import GroupedHistogram, GroupedMoments, histogram_quantile
+
+
+@pytest.fixture
+def grouped_values():
+    """Skewed values of 40 groups with some missing values"""
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 40, 50_000)
+    values = rng.gamma(4, 30, 50_000) + 40
+    values[::97] = np.nan
+    return keys, values
+
+
+def test_grouped_moments_match_pandas_across_chunks(grouped_values):
+    """Chunked and merged moments equal pandas' grouped statistics"""
+    keys, values = grouped_values
+    expected = pd.Series(values).groupby(keys).agg(["mean", "std", "min", "max", "skew"])
+
+    chunked = GroupedMoments()
+    for start in range(0, len(keys), 7_000):
+        chunked.update(keys[start:start + 7_000], values[start:start + 7_000])
+    left, right = GroupedMoments(), GroupedMoments()
+    left.update(keys[:20_000], values[:20_000])
+    right.update(keys[20_000:], values[20_000:])
+    left.merge(right)
+
+    for moments in (chunked, left):
+        result = moments.result()
+        pd.testing.assert_frame_equal(result[expected.columns], expected, check_exact=False,
+                                      rtol=1e-10, atol=1e-10)
+
+
+def test_grouped_moments_edge_cases():
+    """Too few values give NaN; constant groups have zero std and skew"""
+    moments = GroupedMoments()
+    moments.update(np.array([0, 0, 0, 1, 2]), np.array([5.0, 5.0, 5.0, 1.0, np.nan]))
+    result = moments.result()
+
+    assert result.loc[0, "std"] == 0 and result.loc[0, "skew"] == 0
+    assert np.isnan(result.loc[1, "std"]) and np.isnan(result.loc[1, "skew"])
+    assert 2 not in result.index
+
+
+def test_grouped_histogram_median_within_half_bin(grouped_values):
+    """Histogram medians are within about half a bin of the exact medians"""
+    keys, values = grouped_values
+    expected = pd.Series(values).groupby(keys).median()
+
+    left, right = GroupedHistogram(bin_width=0.5), GroupedHistogram(bin_width=0.5)
+    left.update(keys[:30_000], values[:30_000])
+    right.update(keys[30_000:], values[30_000:])
+    left.merge(right)
+
+    error = (left.median().sort_index() - expected).abs()
+    assert error.max() <= 0.26
+    with pytest.raises(ValueError):
+        left.merge(GroupedHistogram(bin_width=1.0))
+
+
+def test_extract_real_features_matches_in_memory(tmp_path):
+    """Chunked feature extraction reproduces the in-memory features"""
+    rng = np.random.default_rng(1)
+    n = 20_000
+    df = pd.DataFrame({
+        "user_id": rng.integers(0, 25, n),
+        "time": "2025-06-01 00:00:00",
+        "glucose": rng.gamma(4, 30, n) + 40,
+        "heart_rate": rng.normal(70, 9, n),
+        "steps": rng.poisson(20, n),
+    })
+    path = tmp_path / "db.csv"
+    df.to_csv(path, index=False)
+    df = pd.read_csv(path)
+
+    glucose, hr_steps = extract_real_features(str(path), chunk_rows=3_000)
+    expected_glucose = extract_glucose_features(df)
+    expected_hr_steps = extract_hr_steps_features(df)
+
+    exact = ["mean", "std", "min", "max", "skew"]
+    pd.testing.assert_frame_equal(glucose[exact], expected_glucose[exact], check_exact=False,
+                                  rtol=1e-10, atol=1e-10)
+    assert (glucose["median"] - expected_glucose["median"]).abs().max() <= 0.26
+    pd.testing.assert_frame_equal(hr_steps, expected_hr_steps, check_exact=False, rtol=1e-10)
+
+
+def test_wide_glucose_features_match_row_reductions():
+    """The fused pass equals pandas' separate row-wise reductions"""
+    rng = np.random.default_rng(2)
+    matrix = rng.gamma(4, 30, (50, 288)) + 40
+    matrix[3] = np.nan
+    matrix[4, ::3] = np.nan
+    matrix[5] = 120.0
+    df = pd.DataFrame(matrix, columns=[f"t_{i}" for i in range(288)])
+    expected = pd.DataFrame({
+        "mean": df.mean(axis=1),
+        "std": df.std(axis=1),
+        "min": df.min(axis=1),
+        "max": df.max(axis=1),
+        "median": df.median(axis=1),
+        "skew": df.skew(axis=1).fillna(0),
+    })
+
+    pd.testing.assert_frame_equal(extract_glucose_features(df, is_synthetic=True), expected,
+                                  check_exact=False, rtol=1e-10, atol=1e-10)
+
+
+def test_histogram_quantile_of_rows():
+    """Quantiles interpolate within a bin; empty rows give NaN"""
+    counts = np.array([[0, 4, 0, 0], [0, 0, 0, 0], [1, 1, 1, 1]])
+    result = histogram_quantile(counts, 0.5, 40.0, 2.0)
+    assert 42 <= result[0] <= 44
+    assert np.isnan(result[1])
+    assert 42 <= result[2] <= 46
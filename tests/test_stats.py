@@ -1,4 +1,9 @@
-from app.utils.stats import update_stats
+from app.models.dataset import build_dataset
+from app.utils.rolling import build_rolling_index
+from app.utils.stats import (
+    GLUCOSE_RANGES, _format_stats, bulk_window_stats, cohort_summary, update_stats, window_stats
+)
+from app.utils.timeparser import precise_day_bounds, window_bounds
 from datetime import timedelta
 import numpy as np
 import pandas as pd
@@ -54,3 +59,73 @@ def test_stats_with_different_dates(sample_data: pd.DataFrame, day_offset: int):
     check_glucose_stats(sample_data, str(last_date))
     check_steps_stats(sample_data, str(last_date))
 
+
+@pytest.mark.parametrize("time_mod", ["30min", "1h", "3h", "1d", "3d", "7d"])
+@pytest.mark.parametrize("hours_offset", [0, 5, 23, 24, 71, 150, 200])
+def test_window_stats_matches_update_stats(sample_data: pd.DataFrame, time_mod: str, hours_offset: int):
+    """Prefix-sum statistics format exactly like the pandas computation"""
+    last_date = str(pd.to_datetime(start_date) + timedelta(hours=hours_offset, minutes=-10))
+    index = build_rolling_index(sample_data["timestamps"].to_numpy(), sample_data["glucose"].to_numpy(),
+                                sample_data["heart_rate"].to_numpy(), sample_data["steps"].to_numpy())
+    start, end = window_bounds(sample_data["timestamps"].to_numpy().view("i8"), time_mod, last_date)
+
+    assert window_stats(index, start, end, time_mod) == update_stats(sample_data, time_mod, last_date)
+
+
+@pytest.fixture
+def cohort(sample_data: pd.DataFrame):
+    """Three users with shifted time ranges and some missing glucose"""
+    frames = []
+    for user_id, shift_hours in enumerate([0, 30, 100]):
+        frame = sample_data.rename(columns={"timestamps": "time"}).copy()
+        frame["time"] += timedelta(hours=shift_hours)
+        frame["user_id"] = user_id
+        frame["glucose"] += 60 * user_id
+        frames.append(frame)
+    frames[1].loc[::7, "glucose"] = np.nan
+    return build_dataset(pd.concat(frames[::-1], ignore_index=True))
+
+
+@pytest.mark.parametrize("time_mod", ["30min", "3h", "1d", "3d", "7d"])
+@pytest.mark.parametrize("hours_offset", [None, -5, 23, 71, 200])
+def test_bulk_window_stats_matches_window_stats(cohort, time_mod: str, hours_offset):
+    """The grouped pass gives the single-user statistics of every user"""
+    last_date = None
+    if hours_offset is not None:
+        last_date = str(pd.to_datetime(start_date) + timedelta(hours=hours_offset, minutes=-10))
+    user_ids = sorted(cohort.offsets)
+    bounds = np.array([cohort.offsets[user_id] for user_id in user_ids])
+    stats = bulk_window_stats(cohort.rolling, cohort.columns["time"].view("i8"),
+                              bounds[:, 0], bounds[:, 1], time_mod, last_date)
+
+    for user_id, row in zip(user_ids, stats.itertuples()):
+        partition = cohort.partition(user_id)
+        index = cohort.user_rolling(user_id)
+        start, end = window_bounds(partition["time"].view("i8"), time_mod, last_date)
+        expected = window_stats(index, start, end, time_mod)
+        assert _format_stats(row.current_glucose, row.average_glucose, row.std_glucose,
+                             row.current_heart_rate,
+                             partition["steps"].dtype.type(row.total_steps)) == expected
+
+
+def test_bulk_time_in_ranges(cohort):
+    """Range fractions match a direct count over the window"""
+    bounds = np.array([cohort.offsets[user_id] for user_id in sorted(cohort.offsets)])
+    stats = bulk_window_stats(cohort.rolling, cohort.columns["time"].view("i8"),
+                              bounds[:, 0], bounds[:, 1], "7d", "2025-06-10")
+    partition, index = cohort.partition(1), cohort.user_rolling(1)
+    start, end = window_bounds(partition["time"].view("i8"), "7d", "2025-06-10")
+    start, end = precise_day_bounds(index.days, index.day_changes, start, end, "7d")
+    glucose = partition["glucose"][start:end]
+    glucose = glucose[~np.isnan(glucose)]
+    expected = pd.Series(pd.cut(glucose, [-np.inf, 53.999, 69.999, 180, 250, np.inf])).value_counts(
+        normalize=True, sort=False).to_numpy()
+    np.testing.assert_allclose(stats.loc[1, list(GLUCOSE_RANGES)].to_numpy(float), expected)
+    np.testing.assert_allclose(stats[list(GLUCOSE_RANGES)].sum(axis=1), 1.0)
+
+    summary = cohort_summary(stats)
+    assert summary["n_users"] == summary["n_users_with_glucose"] == 3
+    assert sum(summary["time_in_range_histogram"]["counts"]) == 3
+    assert summary["average_glucose"]["p50"] == pytest.approx(stats["average_glucose"].median())
+    pooled = stats["in_range"] @ stats["glucose_count"] / stats["glucose_count"].sum()
+    assert summary["time_in_ranges"]["in_range"] == pytest.approx(pooled)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.columnar import load_columnar
+from app.utils.synthetic import generate_time_series, iter_time_series, write_time_series
+
+
+def _inputs(n_users: int = 3, n_samples: int = 288):
+    """Enhanced user features and glucose-only rows for a small cohort"""
+    rng = np.random.default_rng(1)
+    glucose_only = pd.DataFrame(rng.normal(110, 20, (n_users, n_samples)),
+                                columns=[f"t_{i}" for i in range(n_samples)])
+    glucose_only.insert(0, "id", range(n_users))
+    enhanced = pd.DataFrame({
+        "hr_mean": np.linspace(60, 100, n_users),
+        "hr_std": np.full(n_users, 8.0),
+        "steps_mean": np.linspace(20, 80, n_users),
+        "steps_std": np.full(n_users, 30.0),
+    })
+    return enhanced, glucose_only
+
+
+def test_generate_time_series_layout():
+    """Rows are grouped by user with 5-minute timestamps and the user's glucose"""
+    enhanced, glucose_only = _inputs()
+    df = generate_time_series(enhanced, glucose_only, seed=0)
+
+    assert list(df.columns) == ["user_id", "time", "glucose", "heart_rate", "steps"]
+    assert len(df) == 3 * 288
+    assert df["user_id"].tolist() == [0] * 288 + [1] * 288 + [2] * 288
+    user = df[df["user_id"] == 1]
+    assert user["time"].iloc[0] == pd.Timestamp("2025-06-01 00:00:00")
+    assert (user["time"].diff().iloc[1:] == pd.Timedelta(minutes=5)).all()
+    np.testing.assert_array_equal(user["glucose"].to_numpy(),
+                                  glucose_only.iloc[1][[f"t_{i}" for i in range(288)]].to_numpy())
+
+
+def test_generate_time_series_is_seeded_and_clipped():
+    """A fixed seed reproduces the dataset; draws are rounded and clipped"""
+    enhanced, glucose_only = _inputs()
+    first = generate_time_series(enhanced, glucose_only, seed=42)
+    second = generate_time_series(enhanced, glucose_only, seed=42)
+    other = generate_time_series(enhanced, glucose_only, seed=43)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first["heart_rate"].equals(other["heart_rate"])
+    assert first["heart_rate"].between(40, 200).all()
+    assert first["steps"].between(0, 500).all()
+    assert (first["heart_rate"] == first["heart_rate"].round()).all()
+
+
+def test_generate_time_series_follows_user_parameters():
+    """Per-user heart rate follows that user's mean and standard deviation"""
+    enhanced, glucose_only = _inputs(n_users=2, n_samples=20_000)
+    df = generate_time_series(enhanced, glucose_only, seed=7)
+
+    stats = df.groupby("user_id")["heart_rate"].agg(["mean", "std"])
+    np.testing.assert_allclose(stats["mean"], enhanced["hr_mean"], atol=0.3)
+    np.testing.assert_allclose(stats["std"], enhanced["hr_std"], atol=0.3)
+
+
+def test_iter_time_series_matches_generate_for_any_chunk_size():
+    """Chunks of any size concatenate to the output of generate_time_series"""
+    enhanced, glucose_only = _inputs(n_users=5)
+    whole = generate_time_series(enhanced, glucose_only, seed=3)
+    for chunk_users in (1, 2, 5):
+        chunks = list(iter_time_series(enhanced, glucose_only, chunk_users=chunk_users, seed=3))
+        assert len(chunks) == -(-5 // chunk_users)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+    chunks = iter_time_series(enhanced, glucose_only, chunk_users=2, seed=3)
+    assert [chunk["user_id"].unique().tolist() for chunk in chunks] == [[0, 1], [2, 3], [4]]
+
+
+def test_write_time_series_appends_chunks(tmp_path):
+    """Chunks are appended to one CSV file or columnar directory"""
+    enhanced, glucose_only = _inputs(n_users=5)
+    expected = pd.concat(iter_time_series(enhanced, glucose_only, chunk_users=2, seed=1),
+                         ignore_index=True)
+
+    csv_path = str(tmp_path / "out.csv")
+    rows = write_time_series(iter_time_series(enhanced, glucose_only, chunk_users=2, seed=1),
+                             csv_path)
+    written = pd.read_csv(csv_path, parse_dates=["time"])
+    assert rows == len(expected) == len(written)
+    pd.testing.assert_frame_equal(written, expected, check_dtype=False)
+
+    cols_path = str(tmp_path / "out.cols")
+    write_time_series(iter_time_series(enhanced, glucose_only, chunk_users=2, seed=1),
+                      cols_path, fmt="columnar")
+    dataset = load_columnar(cols_path)
+    assert sorted(dataset.offsets) == [0, 1, 2, 3, 4]
+    np.testing.assert_array_equal(dataset.columns["steps"], expected["steps"].to_numpy())
+
+    with pytest.raises(ValueError):
+        write_time_series([], str(tmp_path / "out.parquet"), fmt="parquet")
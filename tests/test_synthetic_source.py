@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.dataset import build_dataset
+from app.models.user import UserRegister
+from app.services.auth import register_user
+from app.services.data_loader import get_dataset, get_user_dataset
+from app.services.synthetic_source import (SAMPLES_PER_DAY, SyntheticSource, extract_profiles,
+                                           generate_patient)
+from app.services.user_store import SqliteUserRepository, set_user_repository
+from app.utils.cohort import load_profile_pool
+from app.utils.patient_model import PROFILE_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    """Profiles of the bundled synthetic dataset"""
+    return extract_profiles(get_dataset(False))
+
+
+def test_patients_are_deterministic(profiles):
+    """A patient only depends on the seed and the user; users differ"""
+    first = generate_patient(profiles, 5000, 0, 2)
+    again = generate_patient(profiles, 5000, 0, 2)
+    other = generate_patient(profiles, 5001, 0, 2)
+    for name in first:
+        np.testing.assert_array_equal(first[name], again[name])
+    assert not np.array_equal(first["glucose"], other["glucose"])
+    reseeded = generate_patient(profiles, 5000, 0, 2, seed=1)
+    assert not np.array_equal(first["glucose"], reseeded["glucose"])
+
+
+def test_day_ranges_are_consistent(profiles):
+    """Any range of days equals the same days of a longer range"""
+    week = generate_patient(profiles, 42, 0, 7)
+    middle = generate_patient(profiles, 42, 3, 2)
+    rows = slice(3 * SAMPLES_PER_DAY, 5 * SAMPLES_PER_DAY)
+    for name in week:
+        np.testing.assert_array_equal(week[name][rows], middle[name])
+
+    times = pd.to_datetime(week["time"])
+    assert times[0] == pd.Timestamp("2025-06-01")
+    assert (np.diff(week["time"].view("i8")) == 300_000_000_000).all()
+    assert week["glucose"].min() >= 40 and week["glucose"].max() <= 400
+    assert week["heart_rate"].min() >= 40 and week["heart_rate"].max() <= 200
+    assert week["steps"].min() >= 0 and week["steps"].max() <= 500
+
+
+def test_generated_cohort_matches_single_patients():
+    """A cohort holds the same patients as one-user generation and skips the LRU"""
+    source = SyntheticSource(max_users=2)
+    dataset = get_dataset(False)
+
+    cohort = source.generate_cohort(dataset, [5000, 42, 5000], "3d", "2025-06-20T08:00:00")
+
+    assert list(cohort.offsets) == [5000, 42]
+    for user_id in (5000, 42):
+        patient = source.get(dataset, user_id, "3d", "2025-06-20T08:00:00")
+        start, stop = cohort.offsets[user_id]
+        for name, column in patient.columns.items():
+            np.testing.assert_array_equal(cohort.columns[name][start:stop], column)
+    assert source.stats()["entries"] == 2
+
+
+def test_profiles_match_cohort_pool(profiles):
+    """On-demand patients and cohorts draw from the same profiles"""
+    pool = load_profile_pool()
+    np.testing.assert_allclose(profiles.glucose, pool.glucose)
+    np.testing.assert_allclose(profiles.hr_steps, pool.features[PROFILE_COLUMNS].to_numpy())
+
+
+def test_source_lru_and_dataset_version():
+    """Patients are cached per dataset version and the least recently used is evicted"""
+    times = pd.date_range("2025-06-01", periods=SAMPLES_PER_DAY, freq="5min")
+    frame = pd.DataFrame({
+        "user_id": np.repeat([0, 1], SAMPLES_PER_DAY),
+        "time": np.tile(times, 2),
+        "glucose": np.linspace(80, 200, 2 * SAMPLES_PER_DAY),
+        "heart_rate": 70.0,
+        "steps": 10.0,
+    })
+    source = SyntheticSource(max_users=1, n_days=2)
+    dataset = build_dataset(frame, "data.csv", 1)
+    patient = source.get(dataset, 7)
+    assert source.get(dataset, 7) is patient
+    assert len(patient.partition(7)["time"]) == 2 * SAMPLES_PER_DAY
+    assert source.get(build_dataset(frame, "data.csv", 2), 7) is not patient
+    stats = source.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (1, 2, 1, 1)
+
+
+def test_dataset_users_are_kept():
+    """Users of the synthetic dataset are still served from it"""
+    dataset = get_dataset(False)
+    assert get_user_dataset(3, False) is dataset
+    assert get_user_dataset(123_456, False) is not dataset
+
+
+def test_generated_user_routes():
+    """Glucose and stats of a user beyond the dataset are served"""
+    client = TestClient(app)
+    url = "real_data=false&time_mod=1d&last_date=2025-06-03T12:00:00"
+    glucose = client.get(f"/api/glucose/250000?{url}").json()
+    assert len(glucose) == SAMPLES_PER_DAY
+    assert glucose[-1]["timestamps"] == "2025-06-03T12:05:00"
+    assert client.get(f"/api/stats/250000?{url}").json()["stats"][0] != "N/A"
+    assert client.get("/api/metrics/synthetic").json()["entries"] >= 1
+
+
+def test_register_draws_from_whole_id_space(tmp_path, monkeypatch):
+    """Registered synthetic users are no longer limited to the dataset"""
+    set_user_repository(SqliteUserRepository(str(tmp_path / "users.db")))
+    monkeypatch.setattr("app.services.auth.random.randrange", lambda n: n - 1)
+    try:
+        user = register_user(UserRegister(username="u", password="p", use_real_data=False))
+    finally:
+        set_user_repository(None)
+    assert user.synthetic_user_id > 200
+
+
+def test_windows_past_the_default_days(profiles):
+    """A window anywhere in time gets the days it covers, at least CGM_SYNTHETIC_DAYS"""
+    source = SyntheticSource(n_days=7)
+    assert source.days(profiles) == (0, 7)
+    assert source.days(profiles, "1d", "2025-06-03T12:00:00") == (0, 7)
+    assert source.days(profiles, "1d", "2025-07-01T12:00:00") == (24, 7)
+    assert source.days(profiles, "30d", "2025-07-01T23:57:00") == (1, 31)
+
+    client = TestClient(app)
+    url = "real_data=false&time_mod=1d&last_date=2025-07-01T12:00:00"
+    glucose = client.get(f"/api/glucose/250000?{url}").json()
+    assert len(glucose) == SAMPLES_PER_DAY
+    assert glucose[-1]["timestamps"] == "2025-07-01T12:05:00"
+    patient = generate_patient(profiles, 250000, 30, 1)
+    assert glucose[-1]["glucose"] == patient["glucose"][145]
+    assert client.get(f"/api/stats/250000?{url}").json()["stats"][0] != "N/A"
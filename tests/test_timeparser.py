@@ -0,0 +1,78 @@
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.timeparser import TIME_INTERVALS, last_x, window_bounds
+
+start_date = "2025-06-01 00:00:00"
+
+
+@pytest.fixture
+def sample_data():
+    """Three days of 5-minute samples"""
+    curr_date = pd.to_datetime(start_date)
+    dates = [curr_date + timedelta(minutes=5 * i) for i in range(864)]
+    return pd.DataFrame({"timestamps": dates, "glucose": np.arange(len(dates), dtype=float)})
+
+
+def reference_last_x(df: pd.DataFrame, time_mod: str, last_date: str = None) -> pd.DataFrame:
+    """Mask-based window lookup the binary search has to match"""
+    df = df.sort_values(by="timestamps").reset_index(drop=True)
+    window_size = int(TIME_INTERVALS[time_mod] * 12)
+    if last_date:
+        mask = df["timestamps"] > pd.to_datetime(last_date).tz_localize(None)
+        end = mask.idxmax() + 1 if mask.any() else len(df)
+    else:
+        end = 1
+    end = min(end, len(df))
+    return df.iloc[max(0, end - window_size):end]
+
+
+@pytest.mark.parametrize("time_mod", list(TIME_INTERVALS))
+@pytest.mark.parametrize("last_date", [
+    None,
+    "2025-05-31 00:00:00",
+    "2025-06-01 00:00:00",
+    "2025-06-01 07:02:00",
+    "2025-06-02T12:00:00",
+    "2025-06-03 23:55:00",
+    "2025-07-01 00:00:00",
+])
+def test_last_x_matches_reference(sample_data: pd.DataFrame, time_mod: str, last_date: str):
+    """Binary-search windows equal the mask-based windows"""
+    expected = reference_last_x(sample_data, time_mod, last_date)
+    result = last_x(sample_data, time_mod, last_date)
+
+    assert result["glucose"].tolist() == expected["glucose"].tolist()
+
+
+def test_window_bounds_on_raw_nanoseconds(sample_data: pd.DataFrame):
+    """Window bounds work directly on sorted int64 nanoseconds"""
+    timestamps_ns = sample_data["timestamps"].to_numpy().view("i8")
+
+    assert window_bounds(timestamps_ns, "1h", "2025-06-01 01:00:00") == (2, 14)
+    assert window_bounds(timestamps_ns, "1h") == (0, 1)
+    assert window_bounds(timestamps_ns[:0], "1h", "2025-06-01 01:00:00") == (0, 0)
+
+
+def test_last_x_unsorted_input(sample_data: pd.DataFrame):
+    """Unsorted frames still go through the sorting path"""
+    shuffled = sample_data.sample(frac=1, random_state=0)
+    result = last_x(shuffled, "3h", "2025-06-02 00:00:00")
+
+    assert result["glucose"].tolist() == reference_last_x(sample_data, "3h", "2025-06-02 00:00:00")["glucose"].tolist()
+
+
+def test_last_x_returns_new_frames(sample_data: pd.DataFrame):
+    """Both paths return a new frame indexed from 0 that does not share the input rows"""
+    for frame in (sample_data, sample_data.sample(frac=1, random_state=0)):
+        result = last_x(frame, "1h", "2025-06-01 05:00:00")
+        assert result.index.tolist() == list(range(12))
+        result.loc[0, "glucose"] = -1.0
+        assert (frame["glucose"] != -1.0).all()
+
+
+def test_last_x_unknown_interval(sample_data: pd.DataFrame):
+    """Unknown intervals are rejected"""
+    with pytest.raises(ValueError, match="Unknown time_mod"):
+        last_x(sample_data, "2w")
@@ -0,0 +1,95 @@
+import json
+import threading
+import pytest
+from app.services.user_store import (
+    JsonUserRepository, SqliteUserRepository, UserRepository, migrate_json_users
+)
+
+
+def new_user(**overrides) -> dict:
+    """User fields as stored at registration"""
+    return {
+        "password": "secret",
+        "use_real_data": False,
+        "real_user_id": None,
+        "synthetic_user_id": 3,
+        "last_viewed_timestamp": None,
+        **overrides,
+    }
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def repository(request, tmp_path):
+    """Each repository backend on an empty store"""
+    if request.param == "sqlite":
+        repo = SqliteUserRepository(str(tmp_path / "users.db"))
+    else:
+        repo = JsonUserRepository(str(tmp_path / "users.json"))
+    yield repo
+    repo.close()
+
+
+def test_create_and_get(repository: UserRepository):
+    """Created users get increasing IDs and can be read back"""
+    first = repository.create("alice", new_user())
+    second = repository.create("bob", new_user(use_real_data=True, real_user_id=4))
+
+    assert second == first + 1
+    assert repository.get("bob") == {"id": second, **new_user(use_real_data=True, real_user_id=4)}
+    assert repository.get("carol") is None
+    assert repository.count() == 2
+
+
+def test_duplicate_username(repository: UserRepository):
+    """Usernames are unique"""
+    repository.create("alice", new_user())
+    with pytest.raises(ValueError, match="already taken"):
+        repository.create("alice", new_user())
+
+
+def test_last_viewed_only_moves_forward(repository: UserRepository):
+    """Older or equal timestamps do not overwrite the stored one"""
+    repository.create("alice", new_user())
+
+    assert repository.update_last_viewed("alice", "2025-06-01T05:00:00") is True
+    assert repository.update_last_viewed("alice", "2025-06-01T04:55:00") is False
+    assert repository.update_last_viewed("alice", "2025-06-01 05:00:00") is False
+    assert repository.update_last_viewed("alice", "2025-06-01T05:05:00") is True
+    assert repository.update_last_viewed("nobody", "2025-06-01T05:05:00") is False
+    assert repository.get("alice")["last_viewed_timestamp"] == "2025-06-01T05:05:00"
+
+
+def test_sqlite_concurrent_registration(tmp_path):
+    """Concurrent registrations never share an ID"""
+    repository = SqliteUserRepository(str(tmp_path / "users.db"))
+    ids = []
+
+    def register(offset: int):
+        for i in range(20):
+            ids.append(repository.create(f"user-{offset}-{i}", new_user()))
+
+    threads = [threading.Thread(target=register, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 80
+    repository.close()
+
+
+def test_migrate_json_users(tmp_path):
+    """Migration keeps IDs and last viewed timestamps and skips existing users"""
+    json_path = tmp_path / "users.json"
+    json_path.write_text(json.dumps({
+        "alice": {"id": 1, **new_user(last_viewed_timestamp="2025-06-01T05:00:00")},
+        "bob": {"id": 7, **new_user()},
+    }))
+    repository = SqliteUserRepository(str(tmp_path / "users.db"))
+
+    assert migrate_json_users(str(json_path), repository) == 2
+    assert migrate_json_users(str(json_path), repository) == 0
+    assert repository.get("bob")["id"] == 7
+    assert repository.update_last_viewed("alice", "2025-06-01T04:00:00") is False
+    assert repository.create("carol", new_user()) == 8
+    repository.close()